@@ -43,7 +43,6 @@ under Contract DE-AC05-76RL01830
 
 import abc
 import logging
-from collections import deque
 from datetime import timedelta as td
 from sympy.core import numbers
 from volttron.platform.agent.utils import setup_logging, get_aware_utc_now, format_timestamp
@@ -51,6 +50,7 @@ from volttron.platform.messaging import topics, headers as headers_mod
 
 from .ilc_matrices import (build_score, input_matrix)
 from .utils import sympy_evaluate, create_device_topic_map, fix_up_point_name
+from .history_buffer import HistoryStore
 
 setup_logging()
 _log = logging.getLogger(__name__)
@@ -71,6 +71,7 @@ class CriteriaCluster(object):
         self.priority = priority
         self.criteria_labels = criteria_labels
         self.row_average = row_average
+        self.history = HistoryStore()
         global mappers
         try:
             mappers = cluster_config.pop("mappers")
@@ -78,7 +79,7 @@ class CriteriaCluster(object):
             mappers = {}
 
         for device_name, device_criteria in cluster_config.items():
-            self.criteria[device_name] = DeviceCriteria(device_criteria, logging_topic, parent)
+            self.criteria[device_name] = DeviceCriteria(device_criteria, logging_topic, parent, self.history)
 
     def get_all_evaluations(self, state):
         results = {}
@@ -146,7 +147,7 @@ class CriteriaContainer(object):
 
 
 class DeviceCriteria(object):
-    def __init__(self, criteria_config, logging_topic, parent):
+    def __init__(self, criteria_config, logging_topic, parent, history=None):
         self.criteria = {}
         self.points = {}
         self.expressions = {}
@@ -156,7 +157,7 @@ class DeviceCriteria(object):
             if "curtail" not in settings.keys() and "augment" not in settings.keys():
                 settings = {"curtail": settings}
             for state, device_criteria in settings.items():
-                criteria = Criteria(device_criteria, logging_topic, parent)
+                criteria = Criteria(device_criteria, logging_topic, parent, history)
                 self.criteria[(device_id, state)] = criteria
 
     def ingest_data(self, time_stamp, data):
@@ -177,19 +178,20 @@ class DeviceCriteria(object):
 
 
 class Criteria(object):
-    def __init__(self, criteria, logging_topic, parent):
+    def __init__(self, criteria, logging_topic, parent, history=None):
         device_topic = criteria.pop("device_topic", "")
         self.device_topics = set()
         self.device_topics.add(device_topic)
         self.criteria = {}
         for name, criterion in criteria.items():
-            self.add(name, criterion, device_topic, logging_topic, parent)
+            self.add(name, criterion, device_topic, logging_topic, parent, history)
 
-    def add(self, name, criterion, device_topic, logging_topic, parent):
+    def add(self, name, criterion, device_topic, logging_topic, parent, history=None):
         _log.debug("Criteria: {}".format(criterion))
         operation_type = criterion.pop('operation_type')
         klass = criterion_registry[operation_type]
-        self.criteria[name] = klass(device_topic=device_topic, logging_topic=logging_topic, parent=parent, **criterion)
+        self.criteria[name] = klass(device_topic=device_topic, logging_topic=logging_topic, parent=parent,
+                                    history=history, **criterion)
 
     def evaluate(self):
         results = {}
@@ -217,7 +219,7 @@ class Criteria(object):
 class BaseCriterion(object):
     __metaclass__ = abc.ABCMeta
 
-    def __init__(self, device_topic="", logging_topic='tnc', parent=None, minimum=None, maximum=None):
+    def __init__(self, device_topic="", logging_topic='tnc', parent=None, minimum=None, maximum=None, history=None):
         self.min_func = (lambda x: x) if minimum is None else (lambda x: max(x, minimum))
         self.max_func = (lambda x: x) if maximum is None else (lambda x: min(x, maximum))
         self.minimum = minimum
@@ -227,6 +229,8 @@ class BaseCriterion(object):
         self.device_topics = set()
         self.topic_set = set()
         self.parent = parent
+        # HistoryStore shared by the criteria of a cluster
+        self.history = history
 
     def numeric_check(self, value):
         """
@@ -419,39 +423,27 @@ class HistoryCriterion(BaseCriterion):
         super(HistoryCriterion, self).__init__(**kwargs)
         if comparison_type is None or point_name is None or previous_time is None:
             raise ValueError('Missing parameter')
-        self.history = deque()
         self.comparison_type = comparison_type
         self.point_name, device = fix_up_point_name(point_name, self.device_topic)
+        self.device = device
         self.device_topics.add(device)
         self.previous_time_delta = td(minutes=previous_time)
         self.current_value = None
         self.history_time = None
         self.topic_set = set()
         self.topic_set.add(self.point_name)
-
-    def linear_interpolation(self, date1, value1, date2, value2, target_date):
-        end_delta_t = (date2 - date1).total_seconds()
-        target_delta_t = (target_date - date1).total_seconds()
-        return (value2 - value1) * (target_delta_t / end_delta_t) + value1
+        if self.history is None:
+            self.history = HistoryStore()
+        self.buffer, self.column = self.history.register(device, self.point_name, self.previous_time_delta)
 
     def evaluate(self):
         if self.current_value is None:
             return self.minimum
 
-        pre_timestamp, pre_value = self.history.pop()
-
-        if pre_timestamp > self.history_time:
-            self.history.append((pre_timestamp, pre_value))
+        prev_value = self.buffer.value_at(self.column, self.history_time.timestamp())
+        if prev_value is None:
             return self.minimum
 
-        post_timestamp, post_value = self.history.pop()
-
-        while post_timestamp < self.history_time:
-            pre_value, pre_timestamp = post_value, post_timestamp
-            post_timestamp, post_value = self.history.pop()
-
-        self.history.append((post_timestamp, post_value))
-        prev_value = self.linear_interpolation(pre_timestamp, pre_value, post_timestamp, post_value, self.history_time)
         if self.comparison_type == 'direct':
             value = abs(prev_value - self.current_value)
         elif self.comparison_type == 'inverse':
@@ -462,5 +454,5 @@ class HistoryCriterion(BaseCriterion):
         if self.point_name in data:
             self.history_time = time_stamp - self.previous_time_delta
             self.current_value = data[self.point_name]
-            self.history.appendleft((time_stamp, self.current_value))
+            self.history.append(self.device, time_stamp, data)
 
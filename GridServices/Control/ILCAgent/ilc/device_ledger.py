@@ -0,0 +1,177 @@
+"""
+Copyright (c) 2023, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_log = logging.getLogger(__name__)
+
+LedgerKey = Tuple[str, str, str]
+
+
+class ControlledDevice(object):
+    """
+    Control action ILC currently holds on one device point.
+    """
+    __slots__ = ("device_name", "device_id", "control_pt", "revert_value", "control_load",
+                 "revert_priority", "control_time", "actuator", "control_mode")
+
+    def __init__(self, device_name, device_id, control_pt, revert_value, control_load,
+                 revert_priority, control_time, actuator, control_mode):
+        self.device_name = device_name
+        self.device_id = device_id
+        self.control_pt = control_pt
+        self.revert_value = revert_value
+        self.control_load = control_load
+        self.revert_priority = revert_priority
+        self.control_time = control_time
+        self.actuator = actuator
+        self.control_mode = control_mode
+
+    @property
+    def key(self) -> LedgerKey:
+        return self.device_name, self.device_id, self.control_pt
+
+    def __repr__(self):
+        return "ControlledDevice({})".format(", ".join(repr(getattr(self, name)) for name in self.__slots__))
+
+
+class DeviceLedger(object):
+    """
+    Devices currently controlled by ILC, keyed by (device, subdevice, point).
+
+    Iteration is in control order (the order devices were added), which is
+    also the order of control time.  Lookups by device and by
+    (device, subdevice) use secondary indexes so membership checks made on
+    every device publish and release step do not scan the ledger.
+    """
+    def __init__(self):
+        self.entries: "OrderedDict[LedgerKey, ControlledDevice]" = OrderedDict()
+        self.by_device: Dict[str, Dict[LedgerKey, None]] = {}
+        self.by_subdevice: Dict[Tuple[str, str], Dict[LedgerKey, None]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def __iter__(self) -> Iterator[ControlledDevice]:
+        return iter(list(self.entries.values()))
+
+    def __contains__(self, key: LedgerKey) -> bool:
+        return key in self.entries
+
+    def __repr__(self):
+        return repr(list(self.entries.values()))
+
+    def add(self, entry: ControlledDevice) -> bool:
+        """
+        Add a controlled device point.  An existing entry for the same key
+        is left untouched so the original revert value is kept.
+
+        :param entry: control action to record.
+        :type entry: ControlledDevice
+        :return: True if the entry was added.
+        :rtype: bool
+        """
+        key = entry.key
+        if key in self.entries:
+            return False
+        self.entries[key] = entry
+        self.by_device.setdefault(entry.device_name, {})[key] = None
+        self.by_subdevice.setdefault((entry.device_name, entry.device_id), {})[key] = None
+        return True
+
+    def release(self, key: LedgerKey) -> Optional[ControlledDevice]:
+        """
+        Remove a device point from the ledger.
+
+        :param key: (device, subdevice, point)
+        :return: removed entry or None if the key is not controlled.
+        """
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        self._unindex(self.by_device, entry.device_name, key)
+        self._unindex(self.by_subdevice, (entry.device_name, entry.device_id), key)
+        return entry
+
+    def retain(self, keys: Iterable[LedgerKey]):
+        """
+        Release every entry whose key is not in keys.
+        """
+        keep = set(keys)
+        for key in [key for key in self.entries if key not in keep]:
+            self.release(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.by_device.clear()
+        self.by_subdevice.clear()
+
+    def is_controlled(self, device_name: str, device_id: str) -> bool:
+        return (device_name, device_id) in self.by_subdevice
+
+    def for_device(self, device_name: str) -> List[ControlledDevice]:
+        return [self.entries[key] for key in self.by_device.get(device_name, ())]
+
+    def for_subdevice(self, device_name: str, device_id: str) -> List[ControlledDevice]:
+        return [self.entries[key] for key in self.by_subdevice.get((device_name, device_id), ())]
+
+    def in_control_order(self) -> List[ControlledDevice]:
+        """
+        Entries ordered by control time, oldest first.
+        """
+        return list(self.entries.values())
+
+    @staticmethod
+    def _unindex(index: Dict[Any, Dict[LedgerKey, None]], index_key: Any, key: LedgerKey):
+        keys = index.get(index_key)
+        if keys is None:
+            return
+        keys.pop(key, None)
+        if not keys:
+            del index[index_key]
@@ -0,0 +1,186 @@
+"""
+Copyright (c) 2023, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+_log = logging.getLogger(__name__)
+
+
+class TimeRingBuffer(object):
+    """
+    Preallocated, time-ordered buffer of rows (timestamp, value per point)
+    for one device.
+
+    Rows live in a contiguous window [start, end) of preallocated arrays so
+    lookups are a binary search over a plain array slice.  Rows older than
+    the retention are dropped by advancing start; when end reaches the
+    capacity the live window is moved back to the front, or the arrays are
+    doubled if the window fills them.
+    """
+    def __init__(self, points: List[str], retention: timedelta, capacity: int = 64):
+        self.points = list(points)
+        self.columns = {point: column for column, point in enumerate(self.points)}
+        self.retention = retention.total_seconds()
+        self.times = np.empty(capacity, dtype=float)
+        self.values = np.full((capacity, len(self.points)), np.nan)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def add_point(self, point: str, retention: timedelta) -> int:
+        """
+        Register another point of the device; returns its column.
+        """
+        self.retention = max(self.retention, retention.total_seconds())
+        if point not in self.columns:
+            self.columns[point] = len(self.points)
+            self.points.append(point)
+            self.values = np.hstack((self.values, np.full((len(self.times), 1), np.nan)))
+        return self.columns[point]
+
+    @property
+    def last_time(self) -> Optional[float]:
+        return self.times[self.end - 1] if self.end > self.start else None
+
+    def append(self, time_stamp: float, data: Dict[str, float]):
+        """
+        Append one row holding every registered point found in data.
+
+        :param time_stamp: POSIX timestamp of the row.
+        :param data: dictionary of point -> value, e.g. a whole devices/.../all message.
+        """
+        if self.end == len(self.times):
+            self._make_room()
+        row = self.values[self.end]
+        row.fill(np.nan)
+        for point, column in self.columns.items():
+            value = data.get(point)
+            if isinstance(value, (int, float)):
+                row[column] = value
+        self.times[self.end] = time_stamp
+        self.end += 1
+        self._trim(time_stamp - self.retention)
+
+    def value_at(self, column: int, target: float) -> Optional[float]:
+        """
+        Value of column at target, linearly interpolated between the rows
+        around it.
+
+        :param column: point column.
+        :param target: POSIX timestamp.
+        :return: interpolated value, or None if there is no row at or before target.
+        """
+        times = self.times[self.start:self.end]
+        values = self.values[self.start:self.end, column]
+        post = int(np.searchsorted(times, target, side="right"))
+        pre = post - 1
+        while pre >= 0 and math.isnan(values[pre]):
+            pre -= 1
+        if pre < 0:
+            return None
+        while post < len(times) and math.isnan(values[post]):
+            post += 1
+        if post >= len(times) or times[pre] == target:
+            return float(values[pre])
+        fraction = (target - times[pre]) / (times[post] - times[pre])
+        return float((values[post] - values[pre]) * fraction + values[pre])
+
+    def _trim(self, cutoff: float):
+        # Keep the newest row at or before cutoff as the left interpolation point.
+        keep = int(np.searchsorted(self.times[self.start:self.end], cutoff, side="right")) - 1
+        if keep > 0:
+            self.start += keep
+
+    def _make_room(self):
+        size = self.end - self.start
+        if size * 2 > len(self.times):
+            times = np.empty(len(self.times) * 2, dtype=float)
+            values = np.full((len(self.times) * 2, len(self.points)), np.nan)
+        else:
+            times, values = self.times, self.values
+        times[:size] = self.times[self.start:self.end]
+        values[:size] = self.values[self.start:self.end]
+        self.times, self.values = times, values
+        self.start, self.end = 0, size
+
+
+class HistoryStore(object):
+    """
+    History of every point used by a history criterion in a criteria
+    cluster, one TimeRingBuffer per device.  A device message is stored as
+    one row for all of the device's history points; criteria sharing a
+    device reuse that row.
+    """
+    def __init__(self):
+        self.buffers: Dict[str, TimeRingBuffer] = {}
+
+    def register(self, device: str, point: str, retention: timedelta) -> Tuple[TimeRingBuffer, int]:
+        """
+        :param device: device topic.
+        :param point: full point path (device/point).
+        :param retention: history length the criterion needs.
+        :return: buffer and column holding the point.
+        """
+        buffer = self.buffers.get(device)
+        if buffer is None:
+            buffer = self.buffers[device] = TimeRingBuffer([], retention)
+        return buffer, buffer.add_point(point, retention)
+
+    def append(self, device: str, time_stamp: datetime, data: Dict[str, float]):
+        """
+        Store a device message once, however many criteria ingest it.
+        """
+        buffer = self.buffers[device]
+        time_stamp = time_stamp.timestamp()
+        last_time = buffer.last_time
+        if last_time is not None and time_stamp <= last_time:
+            return
+        buffer.append(time_stamp, data)
@@ -48,6 +48,7 @@ import math
 from datetime import timedelta as td, datetime as dt
 from dateutil import parser
 import gevent
+from gevent.event import Event
 import dateutil.tz
 from transitions import Machine
 import time
@@ -59,11 +60,13 @@ from volttron.platform.agent.utils import (setup_logging, format_timestamp, get_
 from volttron.platform.vip.agent import Agent, Core, RPC
 from volttron.platform.jsonrpc import RemoteError
 
-from ilc.ilc_matrices import (extract_criteria, calc_column_sums,
-                              normalize_matrix, validate_input)
+from ilc.ilc_matrices import extract_criteria
+from ilc.pairwise_matrices import analyze_clusters
 from ilc.control_handler import ControlCluster, ControlContainer
 from ilc.criteria_handler import CriteriaContainer, CriteriaCluster
 from ilc.utils import sympy_evaluate
+from ilc.point_snapshot import PointSnapshot
+from ilc.device_ledger import ControlledDevice, DeviceLedger
 
 # from transitions.extensions import GraphMachine as Machine
 __author__ = "Robert Lutes, robert.lutes@pnnl.gov"
@@ -239,7 +242,7 @@ class ILCAgent(Agent):
         self.action_end = None
         self.kill_signal_received = False
         self.scheduled_devices = set()
-        self.devices = []
+        self.devices = DeviceLedger()
         self.bldg_power = []
         self.avg_power = None
         self.device_group_size = None
@@ -248,14 +251,35 @@ class ILCAgent(Agent):
         self.power_meta = None
         self.tasks = {}
         self.tz = None
+        self.actions_done = Event()
         self.lock = False
         self.sim_time = 0
+        self.sim_step = 0
+        self.sim_advance_delay = 0.0
         self.config_reload_needed = False
         self.saved_config = None
         self.power_meter_topic = None
         self.kill_device_topic = None
         self.load_control_modes = ["curtail"]
         self.schedule = {}
+        self.snapshot = PointSnapshot()
+
+    @property
+    def lock(self):
+        return self._lock
+
+    @lock.setter
+    def lock(self, value):
+        """
+        Track whether a curtail or release action is in progress.  The
+        actions_done event is used as the simulation barrier: the advance
+        acknowledgement waits for it.
+        """
+        self._lock = value
+        if value:
+            self.actions_done.clear()
+        else:
+            self.actions_done.set()
 
     def configure_main(self, config_name, action, contents):
         config = self.default_config.copy()
@@ -328,7 +352,16 @@ class ILCAgent(Agent):
         self.criteria_container = CriteriaContainer()
         self.control_container = ControlContainer()
 
-        for cluster_config in cluster_configs:
+        # Check that all three parameters are not None
+        cluster_configs = [cluster_config for cluster_config in cluster_configs
+                           if cluster_config["pairwise_criteria_config"]
+                           and cluster_config["device_criteria_config"]
+                           and cluster_config["device_control_config"]]
+        extracted = [extract_criteria(cluster_config["pairwise_criteria_config"]) for cluster_config in cluster_configs]
+        # Column sums, weights and consistency of every cluster in one batched pass
+        analyzed = analyze_clusters([criteria_array for _, criteria_array, _ in extracted])
+
+        for cluster_config, criteria, analysis in zip(cluster_configs, extracted, analyzed):
             _log.debug("CLUSTER CONFIG: {}".format(cluster_config))
             pairwise_criteria_config = cluster_config["pairwise_criteria_config"]
 
@@ -337,23 +370,20 @@ class ILCAgent(Agent):
 
             cluster_priority = cluster_config["cluster_priority"]
             cluster_actuator = cluster_config.get("cluster_actuator", "platform.actuator")
-            # Check that all three parameters are not None
-            if pairwise_criteria_config and criteria_config and control_config:
-                criteria_labels, criteria_array, self.load_control_modes = extract_criteria(pairwise_criteria_config)
-                col_sums = calc_column_sums(criteria_array)
-                row_average = normalize_matrix(criteria_array, col_sums)
-                _log.debug("VALIDATE - criteria_array {} - col_sums {}".format(criteria_array, col_sums))
-                if not validate_input(criteria_array, col_sums):
-                    _log.debug("Inconsistent pairwise configuration. Check "
-                               "configuration in: {}".format(pairwise_criteria_config))
-                    sys.exit()
-
-                criteria_cluster = CriteriaCluster(cluster_priority, criteria_labels, row_average, criteria_config,
-                                                   self.record_topic, self)
-                self.criteria_container.add_criteria_cluster(criteria_cluster)
-                _log.debug("CONTROL config: {}, ------------------- CRITERIA config: {}".format(control_config, criteria_config))
-                control_cluster = ControlCluster(control_config, cluster_actuator, self.record_topic, self)
-                self.control_container.add_control_cluster(control_cluster)
+            criteria_labels, criteria_array, self.load_control_modes = criteria
+            col_sums, row_average, consistent = analysis
+            _log.debug("VALIDATE - criteria_array {} - col_sums {}".format(criteria_array, col_sums))
+            if not consistent:
+                _log.debug("Inconsistent pairwise configuration. Check "
+                           "configuration in: {}".format(pairwise_criteria_config))
+                sys.exit()
+
+            criteria_cluster = CriteriaCluster(cluster_priority, criteria_labels, row_average, criteria_config,
+                                               self.record_topic, self)
+            self.criteria_container.add_criteria_cluster(criteria_cluster)
+            _log.debug("CONTROL config: {}, ------------------- CRITERIA config: {}".format(control_config, criteria_config))
+            control_cluster = ControlCluster(control_config, cluster_actuator, self.record_topic, self)
+            self.control_container.add_control_cluster(control_cluster)
 
         self.base_rpc_path = topics.RPC_DEVICE_PATH(campus="",
                                                     building="",
@@ -428,6 +458,8 @@ class ILCAgent(Agent):
         self.need_actuator_schedule = config.get("need_actuator_schedule", False)
         self.demand_threshold = config.get("demand_threshold", 5.0)
         self.sim_running = config.get("simulation_running", False)
+        self.sim_advance_delay = float(config.get("simulation_advance_delay", 0.0))
+        self.snapshot = PointSnapshot(td(minutes=config.get("snapshot_max_age", 5)))
         self.starting_base('core')
         self.config_reload_needed = False
 
@@ -576,16 +608,9 @@ class ILCAgent(Agent):
         # TODO: as data comes in it loops through all criteria for each device.  This causes near continuous execution of these loop.
         for device_name, device_criteria in self.criteria_container.devices.items():
             for (subdevice, state), criteria in device_criteria.criteria.items():
-                if not self.devices:
-                    status = False
-                    device_criteria.criteria_status((subdevice, state), status)
-                else:
-                    status = False
-                    for curtail_info in self.devices:
-                        if subdevice == curtail_info[1] and device_name == curtail_info[0]:
-                            status = True
-                            break
-                    device_criteria.criteria_status((subdevice, state), status)
+                status = self.devices.is_controlled(device_name, subdevice)
+                device_criteria.criteria_status((subdevice, state), status)
+                if self.devices:
                     _log.debug("Device: {} -- subdevice: {} -- curtail status: {}".format(device_name, subdevice, status))
 
     def new_criteria_data(self, data_topics, now):
@@ -635,6 +660,7 @@ class ILCAgent(Agent):
         data, meta = message
         now = parse_timestamp_string(header[headers_mod.TIMESTAMP])
         data_topics, meta_topics = self.breakout_all_publish(topic, message)
+        self.snapshot.update(now, data_topics, meta_topics)
         self.new_criteria_data(data_topics, now)
         self.new_control_data(data_topics, now)
         end = time.time()
@@ -845,10 +871,47 @@ class ILCAgent(Agent):
                 self.vip.pubsub.publish("pubsub", load_topic, headers=headers, message=power_message).get(timeout=30.0)
             except:
                 _log.debug("Unable to publish average power information.  Input data may not contain metadata.")
-            # TODO: Refactor this code block.  Disparate code paths for simulation and real devices is undesireable
             if self.sim_running:
-                gevent.sleep(0.25)
-                self.vip.pubsub.publish("pubsub", "applications/ilc/advance", headers={}, message={})
+                self.advance_simulation()
+
+    def advance_simulation(self):
+        """
+        Schedule the acknowledgement of a simulation time step on
+        applications/ilc/advance.  The meter callback returns right away;
+        the acknowledgement is published from its own greenlet once the
+        control actions of the step are done (see publish_advance).
+        :return:
+        """
+        self.sim_step += 1
+        timestamp = format_timestamp(self.current_time) if isinstance(self.current_time, dt) else None
+        gevent.spawn(self.publish_advance, self.sim_step, timestamp)
+
+    def publish_advance(self, step, timestamp):
+        """
+        Publish the acknowledgement of a simulation time step.  If a
+        curtail or release action is still running (lock held) this waits
+        for it, up to the actuator RPC timeout.  simulation_advance_delay
+        (seconds) adds an optional fixed pause for co-simulations that
+        need it.
+        :param step: int; simulation step number.
+        :param timestamp: str; time of the step.
+        :return:
+        """
+        if not self.actions_done.wait(timeout=30):
+            _log.warning("Simulation step {}: control action still running, advancing anyway".format(step))
+        if self.sim_advance_delay > 0:
+            gevent.sleep(self.sim_advance_delay)
+        headers = {headers_mod.DATE: timestamp} if timestamp is not None else {}
+        message = {
+            "Step": step,
+            "Timestamp": timestamp,
+            "State": self.state,
+            "ControlledDevices": len(self.devices)
+        }
+        try:
+            self.vip.pubsub.publish("pubsub", "applications/ilc/advance", headers=headers, message=message).get(timeout=30.0)
+        except gevent.Timeout:
+            _log.warning("Simulation step {}: advance acknowledgement timed out".format(step))
 
     def check_load(self):
         """
@@ -903,8 +966,8 @@ class ILCAgent(Agent):
         remaining_devices = score_order[:]
 
         for device in self.devices:
-            if device[8] != "dollar":
-                current_tuple = (device[0], device[1], device[7])
+            if device.control_mode != "dollar":
+                current_tuple = (device.device_name, device.device_id, device.actuator)
                 if current_tuple in remaining_devices:
                     remaining_devices.remove(current_tuple)
 
@@ -914,62 +977,61 @@ class ILCAgent(Agent):
             return
 
         self.lock = True
-        self.state_at_actuation = self.state
-        self.action_end = self.current_time + self.action_time
-        self.next_confirm = self.current_time + self.confirm_time
-
-        for device in remaining_devices:
-            device_name, device_id, actuator = device
-            action_info = self.control_container.get_device((device_name, actuator)).get_control_info(device_id, self.state)
-            _log.debug("State: {} - action info: {} - device {}, {} -- remaining {}".format(self.state, action_info, device_name, device_id, remaining_devices))
-            if action_info is None:
-                continue
-            control_pt, control_value, control_load, revert_priority, revert_value, control_mode, error = self.determine_curtail_parms(action_info, device)
-            if error:
-                gevent.sleep(1)
-                continue
-            try:
-                if self.kill_signal_received:
+        try:
+            self.state_at_actuation = self.state
+            self.action_end = self.current_time + self.action_time
+            self.next_confirm = self.current_time + self.confirm_time
+
+            for device in remaining_devices:
+                device_name, device_id, actuator = device
+                action_info = self.control_container.get_device((device_name, actuator)).get_control_info(device_id, self.state)
+                _log.debug("State: {} - action info: {} - device {}, {} -- remaining {}".format(self.state, action_info, device_name, device_id, remaining_devices))
+                if action_info is None:
+                    continue
+                control_pt, control_value, control_load, revert_priority, revert_value, control_mode, error = self.determine_curtail_parms(action_info, device)
+                if error:
+                    gevent.sleep(1)
+                    continue
+                try:
+                    if self.kill_signal_received:
+                        break
+                    _log.debug("***** ENTER SET POINT *****************")
+                    result = self.vip.rpc.call(actuator, "set_point", "ilc_agent", control_pt, control_value).get(timeout=30)
+                    prefix = self.update_base_topic.split("/")[0]
+                    topic = "/".join([prefix, control_pt, "Actuate"])
+                    message = {"Value": control_value, "PreviousValue": revert_value}
+                    self.publish_record(topic, message)
+                except (RemoteError, gevent.Timeout) as ex:
+                    _log.warning("Failed to set {} to {}: {}".format(control_pt, control_value, str(ex)))
+                    continue
+
+                est_curtailed += control_load
+                self.control_container.get_device((device_name, actuator)).increment_control(device_id)
+                if self.update_devices(device_name, device_id):
+                    self.devices.add(
+                        ControlledDevice(
+                            device_name,
+                            device_id,
+                            control_pt,
+                            revert_value,
+                            control_load,
+                            revert_priority,
+                            format_timestamp(self.current_time),
+                            actuator,
+                            control_mode
+                        )
+                    )
+                if est_curtailed >= need_curtailed:
                     break
-                _log.debug("***** ENTER SET POINT *****************")
-                result = self.vip.rpc.call(actuator, "set_point", "ilc_agent", control_pt, control_value).get(timeout=30)
-                prefix = self.update_base_topic.split("/")[0]
-                topic = "/".join([prefix, control_pt, "Actuate"])
-                message = {"Value": control_value, "PreviousValue": revert_value}
-                self.publish_record(topic, message)
-            except (RemoteError, gevent.Timeout) as ex:
-                _log.warning("Failed to set {} to {}: {}".format(control_pt, control_value, str(ex)))
-                continue
-
-            est_curtailed += control_load
-            self.control_container.get_device((device_name, actuator)).increment_control(device_id)
-            if self.update_devices(device_name, device_id):
-                self.devices.append(
-                    [
-                        device_name,
-                        device_id,
-                        control_pt,
-                        revert_value,
-                        control_load,
-                        revert_priority,
-                        format_timestamp(self.current_time),
-                        actuator,
-                        control_mode
-                     ]
-                )
-            if est_curtailed >= need_curtailed:
-                break
-        self.lock = False
+        finally:
+            self.lock = False
         self.hold()
 
     def update_devices(self, device_name, device_id):
         """
         Update devices list with only newly controlled devices.
         """
-        for device in self.devices:
-            if device_name in device and device_id in device:
-                return False
-        return True
+        return not self.devices.is_controlled(device_name, device_id)
 
     def actuator_request(self, score_order):
         """
@@ -1025,6 +1087,20 @@ class ILCAgent(Agent):
 
         return control_devices
 
+    def get_point_value(self, device_actuator, point):
+        """
+        Read a device point for curtailment planning.  Uses the value last
+        published on the device all topic unless it is older than
+        snapshot_max_age, otherwise calls the actuator get_point RPC.
+        :param device_actuator: actuator identity for the device
+        :param point: point path
+        :return: point value
+        """
+        value = self.snapshot.lookup(point, self.current_time)
+        if value is None:
+            value = self.vip.rpc.call(device_actuator, "get_point", point).get(timeout=30)
+        return value
+
     def determine_curtail_parms(self, control, device_dict):
         """
         Pull stored curtail parameters for devices.
@@ -1047,7 +1123,7 @@ class ILCAgent(Agent):
             for load_arg in control_load["load_equation_args"]:
                 point_to_get = self.base_rpc_path(path=load_arg[1])
                 try:
-                   value = self.vip.rpc.call(device_actuator, "get_point", point_to_get).get(timeout=30)
+                    value = self.get_point_value(device_actuator, point_to_get)
                 except RemoteError as ex:
                     _log.warning("Failed get point for load calculation {} (RemoteError): {}".format(point_to_get, str(ex)))
                     control_load = 0.0
@@ -1059,7 +1135,7 @@ class ILCAgent(Agent):
                     _log.debug("Could not convert expression for load estimation: ")
         error = False
         try:
-            revert_value = self.vip.rpc.call(device_actuator, "get_point", control_pt).get(timeout=30)
+            revert_value = self.get_point_value(device_actuator, control_pt)
         except (RemoteError, gevent.Timeout) as ex:
             error = True
             _log.warning("Failed get point for revert value storage {} (RemoteError): {}".format(control_pt, str(ex)))
@@ -1074,7 +1150,7 @@ class ILCAgent(Agent):
 
             for eq_arg in control["equation_args"]:
                 point_get = self.base_rpc_path(path=eq_arg[1])
-                value = self.vip.rpc.call(device_actuator, "get_point", point_get).get(timeout=30)
+                value = self.get_point_value(device_actuator, point_get)
                 equation_point_values.append((eq_arg[0], value))
 
             control_value = sympy_evaluate(equation, equation_point_values)
@@ -1091,25 +1167,27 @@ class ILCAgent(Agent):
         return control_pt, control_value, control_load, revert_priority, revert_value, control_mode, error
 
     def setup_release(self):
-        if self.stagger_release and self.devices:
-            _log.debug("Number or controlled devices: {}".format(len(self.devices)))
+        controlled = self.devices.in_control_order()
+        if self.stagger_release and controlled:
+            _log.debug("Number or controlled devices: {}".format(len(controlled)))
+            _log.debug("Controlled devices by control time: {}".format([device.key for device in controlled]))
 
             confirm_in_minutes = self.confirm_time.total_seconds()/60.0
             release_steps = int(max(1, math.floor(self.stagger_release_time/confirm_in_minutes + 1)))
 
-            self.device_group_size = [int(math.floor(len(self.devices)/release_steps))] * release_steps
+            self.device_group_size = [int(math.floor(len(controlled)/release_steps))] * release_steps
             _log.debug("Current group size:  {}".format(self.device_group_size))
 
-            if len(self.devices) > release_steps:
-                for group in range(len(self.devices) % release_steps):
+            if len(controlled) > release_steps:
+                for group in range(len(controlled) % release_steps):
                     self.device_group_size[group] += 1
             else:
                 self.device_group_size = [0] * release_steps
-                interval = int(math.ceil(float(release_steps)/len(self.devices)))
+                interval = int(math.ceil(float(release_steps)/len(controlled)))
                 _log.debug("Release interval offset: {}".format(interval))
                 for group in range(0, len(self.device_group_size), interval):
                     self.device_group_size[group] = 1
-                unassigned = len(self.devices) - sum(self.device_group_size)
+                unassigned = len(controlled) - sum(self.device_group_size)
                 for group, value in enumerate(self.device_group_size):
                     if value == 0:
                         self.device_group_size[group] = 1
@@ -1121,7 +1199,7 @@ class ILCAgent(Agent):
             for group in range(int(self.stagger_release_time % (release_steps - 1))):
                 self.current_stagger[group] += 1
         else:
-            self.device_group_size = [len(self.devices)]
+            self.device_group_size = [len(controlled)]
             self.current_stagger = []
 
         _log.debug("Current stagger time:  {}".format(self.current_stagger))
@@ -1132,44 +1210,47 @@ class ILCAgent(Agent):
         Release control of devices.
         :return:
         """
-        scored_devices = self.criteria_container.get_score_order(self.state_at_actuation)
-        controlled = [device for scored in scored_devices for device in self.devices if scored in [(device[0], device[1])]]
+        try:
+            scored_devices = self.criteria_container.get_score_order(self.state_at_actuation)
+            controlled = [device for scored in scored_devices for device in self.devices.for_subdevice(*scored)]
 
-        _log.debug("Controlled devices: {}".format(self.devices))
+            _log.debug("Controlled devices: {}".format(self.devices))
 
-        currently_controlled = controlled[::-1]
-        controlled_iterate = currently_controlled[:]
-        index_counter = 0
-        _log.debug("Controlled devices for release reverse sort: {}".format(currently_controlled))
+            controlled_iterate = controlled[::-1]
+            currently_controlled = set(device.key for device in controlled_iterate)
+            _log.debug("Controlled devices for release reverse sort: {}".format(controlled_iterate))
 
-        for item in range(self.device_group_size.pop(0)):
-            device, device_id, control_pt, revert_val, control_load, revert_priority, modified_time, actuator, control_mode = controlled_iterate[item]
-            revert_value = self.get_revert_value(device, revert_priority, revert_val)
+            for item in range(self.device_group_size.pop(0)):
+                controlled_device = controlled_iterate[item]
+                device = controlled_device.device_name
+                device_id = controlled_device.device_id
+                control_pt = controlled_device.control_pt
+                actuator = controlled_device.actuator
+                revert_value = self.get_revert_value(device, controlled_device.revert_priority, controlled_device.revert_value)
 
-            _log.debug("Returned revert value: {}".format(revert_value))
+                _log.debug("Returned revert value: {}".format(revert_value))
 
-            try:
-                if revert_value is not None:
-                    result = self.vip.rpc.call(actuator, "set_point", "ilc", control_pt, revert_value).get(timeout=30)
-                    _log.debug("Reverted point: {} to value: {}".format(control_pt, revert_value))
-                else:
-                    result = self.vip.rpc.call(actuator, "revert_point", "ilc", control_pt).get(timeout=30)
-                    _log.debug("Reverted point: {} - Result: {}".format(control_pt, result))
-                if currently_controlled:
-                    _log.debug("Removing from controlled list: {} ".format(controlled_iterate[item]))
-                    self.control_container.get_device((device, actuator)).reset_control_status(device_id)
-                    index = controlled_iterate.index(controlled_iterate[item]) - index_counter
-                    currently_controlled.pop(index)
-                    index_counter += 1
-            except RemoteError as ex:
-                _log.warning("Failed to revert point {} (RemoteError): {}".format(control_pt, str(ex)))
-                continue
-        self.devices = currently_controlled
-        if self.current_stagger:
-            self.next_release = self.current_time + td(minutes=self.current_stagger.pop(0))
-        elif self.state not in ['curtail_holding', 'augment_holding', 'augment', 'curtail', 'inactive']:
-            self.finished()
-        self.lock = False
+                try:
+                    if revert_value is not None:
+                        result = self.vip.rpc.call(actuator, "set_point", "ilc", control_pt, revert_value).get(timeout=30)
+                        _log.debug("Reverted point: {} to value: {}".format(control_pt, revert_value))
+                    else:
+                        result = self.vip.rpc.call(actuator, "revert_point", "ilc", control_pt).get(timeout=30)
+                        _log.debug("Reverted point: {} - Result: {}".format(control_pt, result))
+                    if currently_controlled:
+                        _log.debug("Removing from controlled list: {} ".format(controlled_device))
+                        self.control_container.get_device((device, actuator)).reset_control_status(device_id)
+                        currently_controlled.discard(controlled_device.key)
+                except RemoteError as ex:
+                    _log.warning("Failed to revert point {} (RemoteError): {}".format(control_pt, str(ex)))
+                    continue
+            self.devices.retain(currently_controlled)
+            if self.current_stagger:
+                self.next_release = self.current_time + td(minutes=self.current_stagger.pop(0))
+            elif self.state not in ['curtail_holding', 'augment_holding', 'augment', 'curtail', 'inactive']:
+                self.finished()
+        finally:
+            self.lock = False
 
     def get_revert_value(self, device, revert_priority, revert_value):
         """
@@ -1181,23 +1262,19 @@ class ILCAgent(Agent):
         :return:
         """
         # TODO:  Resolve issue with revert_priority as key to do BACNet release.  This is not ideal solution.
-        current_device_list = []
         if revert_priority is None:
             return None
 
-        for controlled_device in self.devices:
-            if controlled_device[0] == device:
-                current_device_list.append(controlled_device)
+        current_device_list = self.devices.for_device(device)
 
         if len(current_device_list) <= 1:
             return revert_value
 
-        index_value = max(current_device_list, key=lambda t: t[4])
-        return_value = index_value[3]
+        index_value = max(current_device_list, key=lambda t: t.control_load)
+        return_value = index_value.revert_value
         _log.debug("Stored revert value: {} for device: {}".format(return_value, device))
-        control_set_index = self.devices.index(index_value)
-        self.devices[control_set_index][3] = revert_value
-        self.devices[control_set_index][4] = revert_priority
+        index_value.revert_value = revert_value
+        index_value.control_load = revert_priority
 
         return return_value
 
@@ -1205,7 +1282,7 @@ class ILCAgent(Agent):
         if self.devices:
             self.device_group_size = [len(self.devices)]
             self.reset_devices()
-        self.devices = []
+        self.devices.clear()
         self.device_group_size = None
         self.next_release = None
         self.action_end = None
@@ -1282,11 +1359,10 @@ class ILCAgent(Agent):
                 previous_value = data[control_pt]
                 control_time = None
                 device_state = "Inactive"
-                for item in self.devices:
-                    if device_name[0] == item[0]:
-                        previous_value = item[2]
-                        control_time = item[4]
-                        device_state = "Active"
+                for item in self.devices.for_device(device_name[0]):
+                    previous_value = item.control_pt
+                    control_time = item.control_load
+                    device_state = "Active"
 
                 if self.sim_running:
                     headers = {
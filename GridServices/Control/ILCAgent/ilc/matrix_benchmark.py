@@ -0,0 +1,148 @@
+"""
+Copyright (c) 2023, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from ilc import ilc_matrices
+from ilc import pairwise_matrices
+
+
+def build_pairwise_config(criteria, rng):
+    """
+    Random pairwise criteria configuration (same format as
+    pairwise_criteria.json) built from hidden weights, so the comparisons
+    are close to consistent.
+    """
+    config = {}
+    for state in ("curtail", "augment"):
+        weights = [rng.uniform(1.0, 9.0) for _ in range(criteria)]
+        labels = ["criteria{}".format(i) for i in range(criteria)]
+        config[state] = {}
+        for i, label in enumerate(labels):
+            config[state][label] = {}
+            for j in range(i + 1, criteria):
+                config[state][label][labels[j]] = round(weights[i] / weights[j] * rng.uniform(0.9, 1.1), 3)
+    return config
+
+
+def run_loops(matrices):
+    results = []
+    start = time.perf_counter()
+    for criteria_array in matrices:
+        col_sums = ilc_matrices.calc_column_sums(criteria_array)
+        row_average = ilc_matrices.normalize_matrix(criteria_array, col_sums)
+        results.append((row_average, ilc_matrices.validate_input(criteria_array, col_sums)))
+    return time.perf_counter() - start, results
+
+
+def run_numpy(matrices):
+    results = []
+    start = time.perf_counter()
+    for criteria_array in matrices:
+        col_sums = pairwise_matrices.calc_column_sums(criteria_array)
+        row_average = pairwise_matrices.normalize_matrix(criteria_array, col_sums)
+        results.append((row_average, pairwise_matrices.validate_input(criteria_array, col_sums)))
+    return time.perf_counter() - start, results
+
+
+def run_batched(matrices):
+    start = time.perf_counter()
+    results = [(row_average, consistent)
+               for _, row_average, consistent in pairwise_matrices.analyze_clusters(matrices)]
+    return time.perf_counter() - start, results
+
+
+def same_results(expected, actual):
+    for (expected_weights, expected_valid), (weights, valid) in zip(expected, actual):
+        if expected_valid != valid:
+            return False
+        for state in expected_weights:
+            if not np.allclose(expected_weights[state], weights[state]):
+                return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ILC pairwise matrix reload benchmark")
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--criteria", type=int, default=10)
+    parser.add_argument("--reloads", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    matrices = []
+    for _ in range(args.clusters):
+        _, criteria_array, _ = ilc_matrices.extract_criteria(build_pairwise_config(args.criteria, rng))
+        matrices.append(criteria_array)
+
+    # ilc_matrices.validate_input only has random index values up to 10 criteria
+    compare = args.criteria <= 10
+    loop_time = numpy_time = batched_time = 0.0
+    for _ in range(args.reloads):
+        if compare:
+            elapsed, expected = run_loops(matrices)
+            loop_time += elapsed
+        elapsed, actual = run_numpy(matrices)
+        numpy_time += elapsed
+        elapsed, batched = run_batched(matrices)
+        batched_time += elapsed
+
+    print("{} clusters x {} criteria, {} reloads".format(args.clusters, args.criteria, args.reloads))
+    if not compare:
+        print("numpy:   {:8.2f} ms/reload".format(numpy_time / args.reloads * 1000))
+        print("batched: {:8.2f} ms/reload".format(batched_time / args.reloads * 1000))
+        print("results match: {}".format(same_results(actual, batched)))
+        return
+    print("loops:   {:8.2f} ms/reload".format(loop_time / args.reloads * 1000))
+    print("numpy:   {:8.2f} ms/reload ({:.1f}x)".format(numpy_time / args.reloads * 1000, loop_time / numpy_time))
+    print("batched: {:8.2f} ms/reload ({:.1f}x)".format(batched_time / args.reloads * 1000, loop_time / batched_time))
+    print("results match: {}".format(same_results(expected, actual) and same_results(expected, batched)))
+
+if __name__ == "__main__":
+    main()
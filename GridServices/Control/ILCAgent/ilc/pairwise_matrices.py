@@ -0,0 +1,230 @@
+"""
+Copyright (c) 2023, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+_log = logging.getLogger(__name__)
+
+# Saaty random consistency index by matrix size; sizes past the table use the last value.
+RANDOM_INDEX = np.array([0, 0, 0, 0.58, 0.9, 1.12, 1.24, 1.32, 1.41, 1.45, 1.49])
+CONSISTENCY_THRESHOLD = 0.2
+
+
+def as_arrays(criteria_matrix: Dict[str, List[List[float]]]) -> Dict[str, np.ndarray]:
+    """
+    Convert the per-state pairwise matrices built by extract_criteria to
+    float arrays.
+
+    :param criteria_matrix: dictionary of state -> square list of lists.
+    :type criteria_matrix: dict
+    :return: dictionary of state -> 2-D array.
+    :rtype: dict
+    """
+    return {state: np.asarray(matrix, dtype=float) for state, matrix in criteria_matrix.items()}
+
+
+def calc_column_sums(criteria_matrix: Dict[str, List[List[float]]]) -> Dict[str, List[float]]:
+    """
+    Calculate the column sums for the criteria matrix of each state.
+    Drop-in replacement for ilc_matrices.calc_column_sums.
+
+    :param criteria_matrix: dictionary of state -> pairwise matrix.
+    :type criteria_matrix: dict
+    :return: dictionary of state -> column sums.
+    :rtype: dict
+    """
+    return {state: matrix.sum(axis=0).tolist() for state, matrix in as_arrays(criteria_matrix).items()}
+
+
+def criteria_weights(matrix: np.ndarray, col_sums: np.ndarray = None) -> np.ndarray:
+    """
+    Criteria weights (row averages of the column-normalized matrix).
+
+    :param matrix: square pairwise matrix, or a stack of them (..., n, n).
+    :type matrix: numpy.ndarray
+    :param col_sums: column sums of matrix; computed when omitted.
+    :type col_sums: numpy.ndarray
+    :return: weights with shape (..., n).
+    :rtype: numpy.ndarray
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    if col_sums is None:
+        col_sums = matrix.sum(axis=-2)
+    col_sums = np.asarray(col_sums, dtype=float)
+    col_sums = np.where(col_sums != 0, col_sums, 1.0)
+    return (matrix / col_sums[..., np.newaxis, :]).mean(axis=-1)
+
+
+def normalize_matrix(criteria_matrix: Dict[str, List[List[float]]],
+                     col_sums: Dict[str, List[float]]) -> Dict[str, List[float]]:
+    """
+    Normalizes the members of each criteria matrix by its column sums and
+    returns the row averages (criteria weights).  Drop-in replacement for
+    ilc_matrices.normalize_matrix.
+
+    :param criteria_matrix: dictionary of state -> pairwise matrix.
+    :type criteria_matrix: dict
+    :param col_sums: dictionary of state -> column sums.
+    :type col_sums: dict
+    :return: dictionary of state -> criteria weights.
+    :rtype: dict
+    """
+    return {state: criteria_weights(matrix, col_sums[state]).tolist()
+            for state, matrix in as_arrays(criteria_matrix).items()}
+
+
+def _group_by_size(matrices: Sequence) -> Dict[int, Tuple[List[int], np.ndarray]]:
+    """
+    Stack matrices of equal size so each size is converted to an array once.
+
+    :param matrices: sequence of square matrices (lists of lists or arrays).
+    :return: dictionary of size -> (input positions, stacked array of shape (k, size, size)).
+    """
+    positions = {}
+    for index, matrix in enumerate(matrices):
+        positions.setdefault(len(matrix), []).append(index)
+    return {size: (indexes, np.array([matrices[index] for index in indexes], dtype=float))
+            for size, indexes in positions.items()}
+
+
+def _consistency_ratio(stack: np.ndarray, col_sums: np.ndarray) -> np.ndarray:
+    size = stack.shape[-1]
+    roots = np.power(np.prod(stack, axis=-1), 1.0 / 5)
+    priority_vec = roots / roots.sum(axis=-1, keepdims=True)
+    lambda_max = (col_sums * priority_vec).sum(axis=-1)
+    consistency_index = (lambda_max - size) / max(size - 1, 1)
+    if size < 4:
+        return consistency_index
+    return consistency_index / RANDOM_INDEX[min(size, len(RANDOM_INDEX) - 1)]
+
+
+def consistency_ratios(matrices: Sequence) -> np.ndarray:
+    """
+    Consistency ratio of many pairwise matrices.  Matrices of equal size
+    are stacked and evaluated together, so the cost is a few array
+    operations per distinct size instead of Python loops per cell.
+
+    Uses the same approximation as ilc_matrices.validate_input: the
+    priority vector is the normalized fifth root of the row products and
+    the ratio is the consistency index for matrices smaller than 4x4.
+
+    :param matrices: sequence of square matrices (sizes may differ).
+    :type matrices: list
+    :return: consistency ratios in input order.
+    :rtype: numpy.ndarray
+    """
+    ratios = np.empty(len(matrices), dtype=float)
+    for indexes, stack in _group_by_size(matrices).values():
+        ratios[indexes] = _consistency_ratio(stack, stack.sum(axis=-2))
+    return ratios
+
+
+def analyze_clusters(criteria_arrays: Sequence[Dict[str, List[List[float]]]]) -> List[Tuple[dict, dict, bool]]:
+    """
+    Column sums, criteria weights and consistency of the pairwise matrices
+    of many clusters in one batched pass.  Equivalent to calling
+    calc_column_sums, normalize_matrix and validate_input per cluster.
+
+    :param criteria_arrays: list of dictionaries of state -> pairwise matrix, one per cluster.
+    :type criteria_arrays: list
+    :return: list of (col_sums, row_average, consistent) per cluster.
+    :rtype: list
+    """
+    keys = [(cluster, state) for cluster, criteria_array in enumerate(criteria_arrays) for state in criteria_array]
+    matrices = [criteria_arrays[cluster][state] for cluster, state in keys]
+    results = [({}, {}, True) for _ in criteria_arrays]
+    for indexes, stack in _group_by_size(matrices).values():
+        col_sums = stack.sum(axis=-2)
+        weights = criteria_weights(stack, col_sums)
+        ratios = _consistency_ratio(stack, col_sums)
+        for position, index in enumerate(indexes):
+            cluster, state = keys[index]
+            cluster_sums, cluster_weights, consistent = results[cluster]
+            cluster_sums[state] = col_sums[position].tolist()
+            cluster_weights[state] = weights[position].tolist()
+            _log.debug(f'Pairwise comparison: {state} - CR: {ratios[position]}')
+            if ratios[position] > CONSISTENCY_THRESHOLD:
+                _log.debug(f'Inconsistent pairwise comparison: {state} - CR: {ratios[position]}')
+                results[cluster] = (cluster_sums, cluster_weights, False)
+    return results
+
+
+def validate_input(pairwise_matrix: Dict[str, List[List[float]]], col_sums: Dict[str, List[float]] = None) -> bool:
+    """
+    Validates that the criteria matrix of every state is internally
+    consistent.  Drop-in replacement for ilc_matrices.validate_input;
+    col_sums is accepted for compatibility and recomputed from the matrix.
+
+    :param pairwise_matrix: dictionary of state -> pairwise matrix.
+    :type pairwise_matrix: dict
+    :param col_sums: dictionary of state -> column sums (unused).
+    :type col_sums: dict
+    :return: True if every matrix is consistent.
+    :rtype: bool
+    """
+    _log.info("Validating matrix")
+    states = list(pairwise_matrix)
+    ratios = consistency_ratios([pairwise_matrix[state] for state in states])
+    consistent = True
+    for state, ratio in zip(states, ratios):
+        _log.debug(f'Pairwise comparison: {state} - CR: {ratio}')
+        if ratio > CONSISTENCY_THRESHOLD:
+            consistent = False
+            _log.debug(f'Inconsistent pairwise comparison: {state} - CR: {ratio}')
+    return consistent
+
+
+def validate_clusters(pairwise_matrices: Sequence[Dict[str, List[List[float]]]]) -> List[bool]:
+    """
+    Batched validate_input for the pairwise matrices of many clusters.
+
+    :param pairwise_matrices: list of dictionaries of state -> pairwise matrix, one per cluster.
+    :type pairwise_matrices: list
+    :return: list with True for every consistent cluster.
+    :rtype: list
+    """
+    return [consistent for _, _, consistent in analyze_clusters(pairwise_matrices)]
@@ -0,0 +1,130 @@
+"""
+Copyright (c) 2023, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+_log = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def as_utc(time_stamp: datetime) -> datetime:
+    """
+    Returns an aware UTC datetime; naive timestamps are assumed to be UTC.
+
+    :param time_stamp: aware or naive datetime.
+    :type time_stamp: datetime
+    :return: aware datetime in UTC.
+    :rtype: datetime
+    """
+    if time_stamp.tzinfo is None:
+        return time_stamp.replace(tzinfo=timezone.utc)
+    return time_stamp.astimezone(timezone.utc)
+
+
+class PointSnapshot(object):
+    """
+    Latest published value, timestamp and meta for every point ILC receives
+    on a devices/.../all subscription, keyed like breakout_all_publish
+    (e.g. "CAMPUS/BUILDING/AHU1/VAV1/ZoneTemperature").
+
+    Curtailment planning reads device values from here instead of making
+    an actuator get_point RPC per point; callers fall back to the RPC when
+    lookup returns None (point never published or older than max_age).
+    """
+    def __init__(self, max_age: Optional[timedelta] = None):
+        self.max_age = max_age
+        self.points: Dict[str, Tuple[Any, datetime]] = {}
+        self.meta: Dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def update(self, time_stamp: datetime, values: Dict[str, Any], meta: Dict[str, dict]):
+        """
+        Store one breakout_all_publish result.
+
+        :param time_stamp: publish timestamp of the device message.
+        :type time_stamp: datetime
+        :param values: dictionary of point -> value.
+        :type values: dict
+        :param meta: dictionary of point -> meta.
+        :type meta: dict
+        """
+        time_stamp = as_utc(time_stamp)
+        for point, value in values.items():
+            self.points[point] = (value, time_stamp)
+        self.meta.update(meta)
+
+    def lookup(self, point: str, now: datetime, default: Any = None) -> Any:
+        """
+        Returns the cached value of point if it was published no more than
+        max_age before now, otherwise default.  A max_age of None or zero
+        disables the cache.
+
+        :param point: point path as used for the actuator get_point RPC.
+        :type point: str
+        :param now: current (device or simulation) time.
+        :type now: datetime
+        :param default: value returned on a cache miss.
+        :return: cached value or default.
+        """
+        entry = self.points.get(point, _MISSING)
+        if entry is _MISSING or not self.max_age or not isinstance(now, datetime):
+            self.misses += 1
+            return default
+        value, time_stamp = entry
+        if value is None or as_utc(now) - time_stamp > self.max_age:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def get_meta(self, point: str) -> Optional[dict]:
+        return self.meta.get(point)
+
+    def clear(self):
+        self.points.clear()
+        self.meta.clear()
@@ -0,0 +1,323 @@
+"""
+Copyright (c) 2023, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from gevent.event import Event
+from dateutil import parser
+from volttron.platform.agent.utils import format_timestamp
+from volttron.platform.messaging import headers as headers_mod
+
+_log = logging.getLogger(__name__)
+
+ADVANCE_TOPIC = "applications/ilc/advance"
+DEFAULT_META = {"type": "float", "tz": "UTC", "units": ""}
+
+# (timestamp, {device topic: {point: value}}, {meter point: value})
+SimulationStep = Tuple[str, Dict[str, Dict[str, Any]], Dict[str, Any]]
+
+
+class LoopbackResult(object):
+    """
+    Already completed result standing in for an RPC or publish AsyncResult.
+    """
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self, timeout=None):
+        return self.value
+
+
+class LoopbackActuator(object):
+    """
+    Stand-in for the actuator agent.  get_point returns the value ILC
+    wrote to a point or, if it has not been written, the last recorded
+    value.  Every write and revert is appended to actions.
+    """
+    def __init__(self):
+        self.recorded: Dict[str, Any] = {}
+        self.overrides: Dict[str, Any] = {}
+        self.actions: List[dict] = []
+        self.current_time: Optional[str] = None
+
+    def update(self, device: str, values: Dict[str, Any]):
+        for point, value in values.items():
+            self.recorded[device + "/" + point] = value
+
+    def get_point(self, point):
+        return self.overrides.get(point, self.recorded.get(point))
+
+    def set_point(self, requester, point, value):
+        self.overrides[point] = value
+        self._record("set_point", point, value)
+        return value
+
+    def revert_point(self, requester, point):
+        self.overrides.pop(point, None)
+        self._record("revert_point", point, None)
+
+    def revert_device(self, requester, device):
+        prefix = device.rstrip("/") + "/"
+        for point in [point for point in self.overrides if point.startswith(prefix)]:
+            self.overrides.pop(point)
+        self._record("revert_device", device, None)
+
+    def request_new_schedule(self, requester, task_id, priority, requests):
+        return {"result": "SUCCESS", "data": {}, "info": ""}
+
+    def request_cancel_schedule(self, requester, task_id):
+        return {"result": "SUCCESS", "data": {}, "info": ""}
+
+    def _record(self, method, point, value):
+        self.actions.append({"Timestamp": self.current_time, "Method": method, "Point": point, "Value": value})
+
+
+class LoopbackRPC(object):
+    def __init__(self, actuator: LoopbackActuator):
+        self.actuator = actuator
+
+    def call(self, peer, method, *args, **kwargs):
+        try:
+            handler = getattr(self.actuator, method)
+        except AttributeError:
+            _log.warning("Simulation: unsupported RPC {}.{}".format(peer, method))
+            return LoopbackResult(None)
+        return LoopbackResult(handler(*args, **kwargs))
+
+
+class LoopbackPubSub(object):
+    """
+    In-process message bus: publishes are delivered synchronously to every
+    subscription whose prefix matches the topic.
+    """
+    def __init__(self, identity: str = "ilc.simulation"):
+        self.identity = identity
+        self.subscriptions: List[Tuple[str, Callable]] = []
+        self.listeners: List[Callable[[str, dict, Any], None]] = []
+
+    def subscribe(self, peer, prefix, callback, *args, **kwargs):
+        self.subscriptions.append((prefix, callback))
+        return LoopbackResult(None)
+
+    def publish(self, peer, topic, headers=None, message=None, *args, **kwargs):
+        headers = headers if headers is not None else {}
+        for listener in self.listeners:
+            listener(topic, headers, message)
+        for prefix, callback in list(self.subscriptions):
+            if topic.startswith(prefix):
+                callback(peer, self.identity, "", topic, headers, message)
+        return LoopbackResult(None)
+
+
+class LoopbackVIP(object):
+    def __init__(self, rpc, pubsub, config):
+        self.rpc = rpc
+        self.pubsub = pubsub
+        self.config = config
+
+
+class SimulationDriver(object):
+    """
+    Drives an ILCAgent in-process from recorded meter and device data.
+
+    The agent's rpc and pubsub subsystems are replaced by loopback versions,
+    so device data, meter data, actuator calls and the advance
+    acknowledgement are all plain function calls and a step costs only the
+    agent's own computation.  Each step publishes the device data and then
+    the meter data, which triggers ILC's curtail/release logic; the step is
+    complete when ILC acknowledges it on applications/ilc/advance.
+
+    :param agent: ILCAgent instance; it is not started on a platform.
+    :param config: resolved ILC main configuration (see resolve_config).
+    :param on_publish: optional callback(topic, headers, message) for every agent publish.
+    :param timeout: seconds to wait for the acknowledgement of a step.
+    """
+    def __init__(self, agent, config: dict, on_publish: Optional[Callable[[str, dict, Any], None]] = None,
+                 timeout: float = 60.0):
+        self.agent = agent
+        self.actuator = LoopbackActuator()
+        self.pubsub = LoopbackPubSub()
+        self.acks: List[dict] = []
+        self.acknowledged = Event()
+        self.timeout = timeout
+        if on_publish is not None:
+            self.pubsub.listeners.append(on_publish)
+        agent.vip = LoopbackVIP(LoopbackRPC(self.actuator), self.pubsub, agent.vip.config)
+        self.pubsub.subscribe("pubsub", ADVANCE_TOPIC, self._on_advance)
+        config = dict(config)
+        config["simulation_running"] = True
+        agent.configure_main("config", "NEW", config)
+
+    @property
+    def actions(self) -> List[dict]:
+        return self.actuator.actions
+
+    def step(self, timestamp: str, devices: Dict[str, Dict[str, Any]], meter: Dict[str, Any]) -> dict:
+        """
+        Run one simulation time step.
+
+        :param timestamp: time of the step (ISO 8601 string).
+        :param devices: device topic (without devices/ and /all) -> point values.
+        :param meter: building meter point values.
+        :return: ILC advance acknowledgement for the step.
+        """
+        headers = {headers_mod.TIMESTAMP: timestamp, headers_mod.DATE: timestamp}
+        self.actuator.current_time = timestamp
+        self.acknowledged.clear()
+        for device, values in devices.items():
+            self.actuator.update(device, values)
+            meta = {point: DEFAULT_META for point in values}
+            self.pubsub.publish("pubsub", "devices/{}/all".format(device), headers, [values, meta])
+        meta = {point: DEFAULT_META for point in meter}
+        self.pubsub.publish("pubsub", self.agent.power_meter_topic, headers, [meter, meta])
+        # ILC acknowledges the step from its own greenlet.
+        if not self.acknowledged.wait(timeout=self.timeout):
+            raise RuntimeError("ILC did not acknowledge simulation step {}".format(timestamp))
+        return self.acks[-1]
+
+    def run(self, steps: Iterable[SimulationStep]) -> List[dict]:
+        """
+        Run all steps and return the actuator actions ILC took.
+        """
+        for timestamp, devices, meter in steps:
+            self.step(timestamp, devices, meter)
+        return self.actions
+
+    def _on_advance(self, peer, sender, bus, topic, headers, message):
+        self.acks.append(message)
+        self.acknowledged.set()
+
+
+def resolve_config(config: dict, store: Dict[str, Any]) -> dict:
+    """
+    Replace config://name references in the cluster section of the ILC main
+    configuration with the corresponding config store entries.
+
+    :param config: ILC main configuration.
+    :param store: config store name -> contents.
+    :return: configuration with cluster references resolved.
+    """
+    config = dict(config)
+    clusters = []
+    for cluster in config.get("clusters", []):
+        cluster = dict(cluster)
+        for key, value in cluster.items():
+            if isinstance(value, str) and value.startswith("config://"):
+                cluster[key] = store[value[len("config://"):]]
+        clusters.append(cluster)
+    config["clusters"] = clusters
+    return config
+
+
+def read_recorded_data(path: str, meter_device: str, timestamp_column: str = "Timestamp") -> Iterator[SimulationStep]:
+    """
+    Read recorded data from a CSV file with a timestamp column and one
+    column per point named <device topic>/<point>, e.g.
+    CAMPUS/BUILDING/AHU1/VAV102/ZoneTemperature.  Columns of meter_device
+    become the meter data of each step.
+
+    :param path: CSV file.
+    :param meter_device: device topic of the building meter.
+    :param timestamp_column: name of the timestamp column.
+    :return: iterator of simulation steps.
+    """
+    with open(path, newline="") as csv_file:
+        reader = csv.DictReader(csv_file)
+        for row in reader:
+            timestamp = format_timestamp(parser.parse(row.pop(timestamp_column)))
+            devices = {}
+            for column, value in row.items():
+                if value is None or value == "":
+                    continue
+                device, point = column.rsplit("/", 1)
+                try:
+                    value = float(value)
+                except ValueError:
+                    pass
+                devices.setdefault(device, {})[point] = value
+            meter = devices.pop(meter_device, {})
+            yield timestamp, devices, meter
+
+
+def main(argv=sys.argv[1:]):
+    arg_parser = argparse.ArgumentParser(description="Run ILC against recorded data without a VOLTTRON platform.")
+    arg_parser.add_argument("config", help="ILC main configuration file")
+    arg_parser.add_argument("data", help="recorded data CSV (columns: Timestamp, <device topic>/<point>, ...)")
+    arg_parser.add_argument("--store", default=".",
+                            help="directory holding the files referenced as config://<name> (default: current directory)")
+    arg_parser.add_argument("--actions", help="write actuator actions to this CSV file")
+    args = arg_parser.parse_args(argv)
+
+    from ilc.ilc_agent import ILCAgent
+
+    with open(args.config) as config_file:
+        config = json.load(config_file)
+    store = {}
+    for cluster in config.get("clusters", []):
+        for value in cluster.values():
+            if isinstance(value, str) and value.startswith("config://"):
+                name = value[len("config://"):]
+                with open(os.path.join(args.store, name)) as store_file:
+                    store[name] = json.load(store_file)
+    config = resolve_config(config, store)
+
+    driver = SimulationDriver(ILCAgent(None, identity="ilc.simulation"), config)
+    meter_device = config["power_meter"]["device_topic"]
+    actions = driver.run(read_recorded_data(args.data, meter_device))
+    print("Simulated {} steps, {} actuator actions".format(len(driver.acks), len(actions)))
+    if args.actions:
+        with open(args.actions, "w", newline="") as actions_file:
+            writer = csv.DictWriter(actions_file, fieldnames=["Timestamp", "Method", "Point", "Value"])
+            writer.writeheader()
+            writer.writerows(actions)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
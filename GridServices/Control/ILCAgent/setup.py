@@ -53,7 +53,7 @@ setup(
     include_package_data=True,
     name=package + 'agent',
     version=__version__,
-    install_requires=['volttron>=3.0', 'sympy', 'transitions'],
+    install_requires=['volttron>=3.0', 'sympy', 'transitions', 'numpy'],
     packages=packages,
     entry_points={
         'setuptools.installation': [
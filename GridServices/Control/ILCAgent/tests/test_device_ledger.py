@@ -0,0 +1,46 @@
+from ilc.device_ledger import ControlledDevice, DeviceLedger
+
+
+def controlled(device_name, device_id, control_pt="ZoneTemperatureSetPoint", revert_value=72.0, control_load=6.0):
+    return ControlledDevice(device_name, device_id, control_pt, revert_value, control_load, None,
+                            "2024-07-01T14:00:00", "platform.actuator", "offset")
+
+
+def make_ledger():
+    ledger = DeviceLedger()
+    for device_name, device_id in [("HP2", "FirstStageCooling"), ("HP1", "FirstStageCooling"),
+                                   ("HP1", "SecondStageCooling"), ("HP3", "FirstStageCooling")]:
+        ledger.add(controlled(device_name, device_id))
+    return ledger
+
+
+def test_add_keeps_first_revert_value():
+    ledger = make_ledger()
+    assert not ledger.add(controlled("HP1", "FirstStageCooling", revert_value=74.0))
+    assert len(ledger) == 4
+    assert [entry.revert_value for entry in ledger.for_subdevice("HP1", "FirstStageCooling")] == [72.0]
+
+
+def test_indexes():
+    ledger = make_ledger()
+    assert ledger.is_controlled("HP1", "SecondStageCooling")
+    assert not ledger.is_controlled("HP2", "SecondStageCooling")
+    assert [entry.device_id for entry in ledger.for_device("HP1")] == ["FirstStageCooling", "SecondStageCooling"]
+    assert ledger.for_device("HP4") == []
+
+
+def test_release_and_retain_keep_control_order():
+    ledger = make_ledger()
+    assert ledger.release(("HP1", "FirstStageCooling", "ZoneTemperatureSetPoint")).device_name == "HP1"
+    assert ledger.release(("HP1", "FirstStageCooling", "ZoneTemperatureSetPoint")) is None
+    assert ledger.is_controlled("HP1", "SecondStageCooling")
+    ledger.add(controlled("HP1", "FirstStageCooling"))
+    ledger.retain([("HP3", "FirstStageCooling", "ZoneTemperatureSetPoint"),
+                   ("HP2", "FirstStageCooling", "ZoneTemperatureSetPoint"),
+                   ("HP1", "FirstStageCooling", "ZoneTemperatureSetPoint")])
+    assert [entry.key[:2] for entry in ledger.in_control_order()] == [
+        ("HP2", "FirstStageCooling"), ("HP3", "FirstStageCooling"), ("HP1", "FirstStageCooling")]
+    assert not ledger.is_controlled("HP1", "SecondStageCooling")
+    ledger.clear()
+    assert not ledger
+    assert ledger.by_device == {} and ledger.by_subdevice == {}
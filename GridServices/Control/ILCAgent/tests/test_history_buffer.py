@@ -0,0 +1,179 @@
+import math
+import random
+from collections import deque
+from datetime import datetime, timedelta as td
+
+import numpy as np
+import pytest
+
+from ilc.criteria_handler import HistoryCriterion
+from ilc.history_buffer import HistoryStore, TimeRingBuffer
+
+DEVICE = "CAMPUS/BUILDING/HP1"
+POINT = DEVICE + "/ZoneTemperature"
+
+
+class DequeHistoryCriterion(object):
+    """
+    HistoryCriterion as it was before the shared buffers, kept as the
+    reference.
+    """
+    def __init__(self, comparison_type, previous_time, minimum=None):
+        self.history = deque()
+        self.comparison_type = comparison_type
+        self.previous_time_delta = td(minutes=previous_time)
+        self.current_value = None
+        self.history_time = None
+        self.minimum = minimum
+
+    def linear_interpolation(self, date1, value1, date2, value2, target_date):
+        end_delta_t = (date2 - date1).total_seconds()
+        target_delta_t = (target_date - date1).total_seconds()
+        return (value2 - value1) * (target_delta_t / end_delta_t) + value1
+
+    def evaluate(self):
+        if self.current_value is None:
+            return self.minimum
+
+        pre_timestamp, pre_value = self.history.pop()
+
+        if pre_timestamp > self.history_time:
+            self.history.append((pre_timestamp, pre_value))
+            return self.minimum
+
+        post_timestamp, post_value = self.history.pop()
+
+        while post_timestamp < self.history_time:
+            pre_value, pre_timestamp = post_value, post_timestamp
+            post_timestamp, post_value = self.history.pop()
+
+        self.history.append((post_timestamp, post_value))
+        prev_value = self.linear_interpolation(pre_timestamp, pre_value, post_timestamp, post_value, self.history_time)
+        if self.comparison_type == 'direct':
+            value = abs(prev_value - self.current_value)
+        elif self.comparison_type == 'inverse':
+            value = 1 / abs(prev_value - self.current_value)
+        return value
+
+    def ingest_data(self, time_stamp, data):
+        if POINT in data:
+            self.history_time = time_stamp - self.previous_time_delta
+            self.current_value = data[POINT]
+            self.history.appendleft((time_stamp, self.current_value))
+
+
+def make_criterion(comparison_type="direct", previous_time=10):
+    return HistoryCriterion(comparison_type=comparison_type, point_name="ZoneTemperature",
+                            previous_time=previous_time, device_topic=DEVICE)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("comparison_type", ["direct", "inverse"])
+def test_matches_deque_where_it_returns_a_value(seed, comparison_type):
+    rng = random.Random(seed)
+    criterion = make_criterion(comparison_type)
+    reference = DequeHistoryCriterion(comparison_type, 10)
+    time_stamp = datetime(2024, 7, 1, 12, 0, 0)
+    compared = 0
+    for _ in range(300):
+        time_stamp += td(seconds=rng.choice([30, 60, 60, 90, 240]))
+        data = {POINT: rng.uniform(68.0, 78.0)}
+        criterion.ingest_data(time_stamp, data)
+        reference.ingest_data(time_stamp, data)
+        expected = reference.evaluate()
+        value = criterion.evaluate()
+        if expected is not None:
+            assert value == pytest.approx(expected)
+            compared += 1
+    assert compared > 100
+
+
+def test_interpolates_where_deque_lost_its_left_point():
+    criterion = make_criterion(previous_time=10)
+    reference = DequeHistoryCriterion("direct", 10)
+    start = datetime(2024, 7, 1, 12, 0, 0)
+    for minutes, value in [(0, 70.0), (20, 72.0), (21, 73.0)]:
+        criterion.ingest_data(start + td(minutes=minutes), {POINT: value})
+        reference.ingest_data(start + td(minutes=minutes), {POINT: value})
+        if minutes == 20:
+            # history_time 12:10 lies between 70 at 12:00 and 72 at 12:20
+            assert reference.evaluate() == pytest.approx(1.0)
+            assert criterion.evaluate() == pytest.approx(1.0)
+    # history_time 12:11: the deque dropped the 12:00 row and has no history,
+    # the buffer still interpolates 70 + 2 * 11 / 20
+    assert reference.evaluate() is None
+    assert criterion.evaluate() == pytest.approx(73.0 - 71.1)
+
+
+def test_no_history_returns_minimum():
+    criterion = HistoryCriterion(comparison_type="direct", point_name="ZoneTemperature", previous_time=10,
+                                 device_topic=DEVICE, minimum=0.5)
+    assert criterion.evaluate() == 0.5
+    criterion.ingest_data(datetime(2024, 7, 1, 12, 0, 0), {POINT: 70.0})
+    assert criterion.evaluate() == 0.5
+
+
+def test_value_at():
+    buffer = TimeRingBuffer(["a", "b"], td(hours=1))
+    buffer.append(0.0, {"a": 1.0, "b": 10.0})
+    buffer.append(10.0, {"a": 2.0})
+    buffer.append(20.0, {"a": 3.0, "b": 30.0, "c": 5.0})
+    assert buffer.value_at(0, -1.0) is None
+    assert buffer.value_at(0, 0.0) == 1.0
+    assert buffer.value_at(0, 5.0) == pytest.approx(1.5)
+    # Rows without the point are skipped
+    assert buffer.value_at(1, 5.0) == pytest.approx(15.0)
+    # At or after the newest row
+    assert buffer.value_at(0, 20.0) == 3.0
+    assert buffer.value_at(1, 25.0) == 30.0
+
+
+def test_retention_keeps_left_point():
+    buffer = TimeRingBuffer(["a"], td(seconds=100))
+    for t in range(0, 500, 30):
+        buffer.append(float(t), {"a": float(t)})
+    # 480 - 100 = 380: the row at 360 is kept to interpolate at 380
+    assert buffer.times[buffer.start] == 360.0
+    assert buffer.value_at(0, 380.0) == pytest.approx(380.0)
+    assert len(buffer) == 5
+
+
+def test_wrap_around_and_growth():
+    buffer = TimeRingBuffer(["a"], td(seconds=40), capacity=4)
+    times = []
+    for t in range(0, 1000, 40):
+        buffer.append(float(t), {"a": 2.0 * t})
+        times.append(float(t))
+        live = buffer.times[buffer.start:buffer.end]
+        assert buffer.end <= len(buffer.times)
+        assert list(live) == [x for x in times if x >= t - 40]
+    # The live window was moved back to the front instead of growing
+    assert len(buffer.times) == 4
+    assert buffer.value_at(0, 940.0) == pytest.approx(1880.0)
+
+    # A longer retention keeps more rows than the capacity: the arrays are
+    # doubled. Rows dropped before it was registered stay dropped.
+    buffer.add_point("b", td(seconds=1000))
+    for t in range(1000, 1400, 40):
+        buffer.append(float(t), {"a": 2.0 * t, "b": 1.0})
+    assert len(buffer.times) == 16
+    assert list(buffer.times[buffer.start:buffer.end]) == [float(t) for t in range(920, 1400, 40)]
+    assert np.isnan(buffer.values[buffer.start, 1])
+    assert buffer.value_at(0, 900.0) is None
+    assert buffer.value_at(0, 980.0) == pytest.approx(1960.0)
+    assert buffer.value_at(1, 1200.0) == 1.0
+
+
+def test_store_shares_device_rows():
+    store = HistoryStore()
+    buffer, zt = store.register(DEVICE, POINT, td(minutes=10))
+    same, oat = store.register(DEVICE, DEVICE + "/OutdoorAirTemperature", td(minutes=30))
+    assert same is buffer and (zt, oat) == (0, 1)
+    assert buffer.retention == 1800.0
+    time_stamp = datetime(2024, 7, 1, 12, 0, 0)
+    store.append(DEVICE, time_stamp, {POINT: 70.0, DEVICE + "/OutdoorAirTemperature": 90.0})
+    # A repeated or older message is not stored again
+    store.append(DEVICE, time_stamp, {POINT: 71.0})
+    assert len(buffer) == 1
+    assert buffer.value_at(zt, time_stamp.timestamp()) == 70.0
+    assert math.isclose(buffer.value_at(oat, time_stamp.timestamp()), 90.0)
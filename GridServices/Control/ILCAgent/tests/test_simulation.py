@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta as td
+
+import gevent
+import pytest
+
+from ilc.ilc_agent import ILCAgent
+from ilc.simulation import SimulationDriver
+
+DEVICES = ["HP1", "HP2"]
+
+
+def control_config():
+    config = {}
+    for device in DEVICES:
+        config[device] = {
+            "FirstStageCooling": {
+                "device_topic": "CAMPUS/BUILDING/" + device,
+                "device_status": {
+                    "curtail": {
+                        "condition": "FirstStageCooling",
+                        "device_status_args": ["FirstStageCooling"]
+                    }
+                },
+                "curtail_settings": {
+                    "point": "ZoneTemperatureSetPoint",
+                    "control_method": "offset",
+                    "offset": 2.0,
+                    "load": 6.0
+                }
+            }
+        }
+    return config
+
+
+def criteria_config():
+    config = {}
+    for device in DEVICES:
+        config[device] = {
+            "FirstStageCooling": {
+                "curtail": {
+                    "device_topic": "CAMPUS/BUILDING/" + device,
+                    "rated-power": {
+                        "on_value": 6.0,
+                        "off_value": 0.0,
+                        "operation_type": "status",
+                        "point_name": "FirstStageCooling"
+                    },
+                    "stage": {
+                        "value": 1.0,
+                        "operation_type": "constant"
+                    }
+                }
+            }
+        }
+    return config
+
+
+def ilc_config():
+    return {
+        "campus": "CAMPUS",
+        "building": "BUILDING",
+        "power_meter": {
+            "device_topic": "CAMPUS/BUILDING/METERS",
+            "point": "WholeBuildingPower"
+        },
+        "agent_id": "ILC",
+        "demand_limit": 30.0,
+        "control_time": 20.0,
+        "confirm_time": 5,
+        "average_building_power_window": 15.0,
+        "stagger_release": False,
+        "clusters": [
+            {
+                "device_control_config": control_config(),
+                "device_criteria_config": criteria_config(),
+                "pairwise_criteria_config": {"curtail": {"rated-power": {"stage": 1}, "stage": {}}},
+                "cluster_priority": 1.0
+            }
+        ]
+    }
+
+
+def steps(count, power, start=datetime(2024, 7, 1, 14, 0)):
+    for n in range(count):
+        timestamp = (start + td(minutes=n)).isoformat() + "+00:00"
+        devices = {
+            "CAMPUS/BUILDING/" + device: {"FirstStageCooling": 1, "ZoneTemperatureSetPoint": 72.0}
+            for device in DEVICES
+        }
+        yield timestamp, devices, {"WholeBuildingPower": power}
+
+
+@pytest.fixture
+def driver():
+    return SimulationDriver(ILCAgent(None, identity="ilc.simulation"), ilc_config(), timeout=5.0)
+
+
+def test_steps_are_acknowledged_in_order(driver):
+    driver.run(steps(6, 20.0))
+    assert [ack["Step"] for ack in driver.acks] == list(range(1, 7))
+    assert all(ack["State"] == "inactive" for ack in driver.acks)
+    assert driver.actions == []
+
+
+def test_curtailment_is_acknowledged_after_actions(driver):
+    driver.run(steps(6, 50.0))
+    assert [action["Method"] for action in driver.actions] == ["set_point", "set_point"]
+    assert {action["Value"] for action in driver.actions} == {74.0}
+    ack = driver.acks[-1]
+    assert ack["ControlledDevices"] == 2
+    assert ack["State"] != "inactive"
+    assert driver.agent.actions_done.is_set()
+
+
+def test_meter_callback_does_not_wait_for_running_action(driver):
+    driver.run(steps(5, 20.0))
+    driver.agent.lock = True
+    acknowledged = len(driver.acks)
+    timestamp, devices, meter = next(steps(1, 20.0, datetime(2024, 7, 1, 15, 0)))
+    # The meter callback returns while the action holds the lock ...
+    with pytest.raises(RuntimeError):
+        driver.timeout = 0.1
+        driver.step(timestamp, devices, meter)
+    assert len(driver.acks) == acknowledged
+    # ... and the step is acknowledged once the action finishes.
+    driver.agent.lock = False
+    gevent.sleep(0.01)
+    assert driver.acks[-1]["Step"] == acknowledged + 1
+
+
+def test_failed_action_releases_lock(driver):
+    driver.run(steps(4, 50.0))
+
+    def failing_call(*args, **kwargs):
+        raise RuntimeError("actuator failure")
+
+    driver.agent.vip.rpc.call = failing_call
+    with pytest.raises(RuntimeError):
+        driver.step(*next(steps(1, 50.0, datetime(2024, 7, 1, 14, 4))))
+    assert not driver.agent.lock
+    assert driver.agent.actions_done.is_set()
+
+
+def test_stagger_release_groups_cover_controlled_devices(driver):
+    driver.run(steps(6, 50.0))
+    agent = driver.agent
+    agent.stagger_release = True
+    agent.stagger_release_time = 10.0
+    agent.setup_release()
+    assert sum(agent.device_group_size) == len(agent.devices.in_control_order()) == 2
+    assert len(agent.device_group_size) == len(agent.current_stagger) + 1
@@ -68,18 +68,43 @@ class AHUAgent(Aggregator):
         model_config = config.get("model_parameters")
         self.agent_name = config.get("agent_name", "ahu")
         Aggregator.__init__(self, config, **kwargs)
+        # market index -> (key, electric demand curve) of the last translation
+        self.translation_cache = {}
         #self.init_markets()
 
     def translate_aggregate_demand(self, air_demand, index):
-        electric_demand_curve = PolyLine()
-        oat = self.oat_predictions[index] if self.oat_predictions else None
-        for point in air_demand.points:
-            electric_demand_curve.add(Point(price=point.y, quantity=self.model.calculate_load(point.x, oat)))
+        electric_demand_curve = self.translate_points(air_demand, index)
         _log.debug("{}: electric demand : {}".format(self.agent_name, electric_demand_curve.points))
         # Hard-coding the market names is not ideal.  Need to come up with more robust solution
         for market in self.consumer_market:
             self.consumer_demand_curve[market][index] = electric_demand_curve
 
+    def translate_points(self, air_demand, index):
+        """
+        Translate an aggregated air demand curve to an electric demand curve
+        with one evaluation of the AHU model.  The last curve of each market
+        is reused while its air demand curve, OAT prediction and the model's
+        measured inputs are unchanged.
+        :param air_demand: PolyLine; aggregated air demand curve
+        :param index: int; market index
+        :return: PolyLine; electric demand curve
+        """
+        electric_demand_curve = PolyLine()
+        oat = self.oat_predictions[index] if self.oat_predictions else None
+        if not hasattr(self.model, "calculate_loads"):
+            for point in air_demand.points:
+                electric_demand_curve.add(Point(price=point.y, quantity=self.model.calculate_load(point.x, oat)))
+            return electric_demand_curve
+
+        key = (tuple((point.x, point.y) for point in air_demand.points), self.model.load_inputs(oat))
+        cached = self.translation_cache.get(index)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        loads = self.model.calculate_loads([point.x for point in air_demand.points], oat).tolist()
+        for point, load in zip(air_demand.points, loads):
+            electric_demand_curve.add(Point(price=point.y, quantity=load))
+        self.translation_cache[index] = (key, electric_demand_curve)
+        return electric_demand_curve
 
 def main():
     """Main method called to start the agent."""
@@ -317,8 +317,8 @@ class BuildingAgent(MarketAgent, myTransactiveNode):
             self.campus.model.check_for_convergence(market)
             if not self.campus.model.converged:
                 _log.debug("Campus model not converged. Sending signal back to campus.")
-                self.campus.model.prep_transactive_signal(market, self)
-                self.campus.model.send_transactive_signal(self, self.building_demand_topic)
+                self.prep_transactive_signals(market, [self.campus])
+                self.send_transactive_signals([(self.campus, self.building_demand_topic)])
 
     def offer_callback(self, timestamp, market_name, buyer_seller):
         if market_name in self.market_names:
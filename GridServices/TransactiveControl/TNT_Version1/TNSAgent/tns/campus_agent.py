@@ -176,38 +176,40 @@ class CampusAgent(Agent, myTransactiveNode):
             # Send only if either of the 2 conditions below occurs:
             # 1) Model balancing did not converge
             # 2) A new cycle (ie. begin of hour)
+            signals = []
             for n in self.neighbors:
                 # If the neighbor failed to converge (eg., building1 failed to converge)
                 if n == fail_to_converged_neighbor and n is not None:
-                    n.model.prep_transactive_signal(market, self)
                     topic = self.campus_demand_topic
                     if n != self.city:
                         topic = self.campus_supply_topic.format(n.name)
-                    n.model.send_transactive_signal(self, topic, start_of_cycle)
-                    _log.debug("NeighborModel {} sent records.".format(n.model.name))
+                    signals.append((n, topic))
 
                 else:
                     # Always send signal downstream at the start of a new cyle
                     if start_of_cycle:
                         if n != self.city:
-                            n.model.prep_transactive_signal(market, self)
                             topic = self.campus_supply_topic.format(n.name)
-                            n.model.send_transactive_signal(self, topic, start_of_cycle)
-                            _log.debug("NeighborModel {} sent records.".format(n.model.name))
+                            signals.append((n, topic))
                     else:
                         _log.debug("Not start of cycle. Check convergence for neighbor {}.".format(n.model.name))
                         n.model.check_for_convergence(market)
                         if not n.model.converged:
-                            n.model.prep_transactive_signal(market, self)
                             topic = self.campus_demand_topic
                             if n != self.city:
                                 topic = self.campus_supply_topic.format(n.name)
-                            n.model.send_transactive_signal(self, topic, start_of_cycle)
-                            _log.debug("NeighborModel {} sent records.".format(n.model.name))
+                            signals.append((n, topic))
                         else:
                             _log.debug("{} ({}) did not send records due to check_for_convergence()."
                                        .format(n.model.name, self.name))
 
+            # Prepare the signals of these neighbors in one pass over the
+            # balanced market, then publish them.
+            self.prep_transactive_signals(market, [n for n, topic in signals])
+            failed = self.send_transactive_signals(signals, start_of_cycle)
+            if failed:
+                _log.error("{} could not send records to {}.".format(self.name, [n.name for n in failed]))
+
             # Schedule rerun balancing if not in simulation mode
             if not self.simulation:
                 # For start_of_cyle=True, the code above always send signal to neighbors so don't need to reschedule
@@ -234,8 +236,8 @@ class CampusAgent(Agent, myTransactiveNode):
                                         )
         else:
             _log.debug("Market balancing sub-problem failed.")
-            self.city.model.prep_transactive_signal(market, self)
-            self.city.model.send_transactive_signal(self, self.campus_demand_topic, start_of_cycle)
+            self.prep_transactive_signals(market, [self.city])
+            self.send_transactive_signals([(self.city, self.campus_demand_topic)], start_of_cycle)
 
     def init_objects(self):
         # Add meter
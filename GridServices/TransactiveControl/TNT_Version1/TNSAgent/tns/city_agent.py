@@ -183,9 +183,8 @@ class CityAgent(Agent, myTransactiveNode):
                                          'current_time': _time
                                          }
                                 )
-        self.campus.model.prep_transactive_signal(market, self)
-        self.campus.model.send_transactive_signal(self, self.city_supply_topic,
-                                                  start_of_cycle=start_of_cycle)
+        self.prep_transactive_signals(market, [self.campus])
+        self.send_transactive_signals([(self.campus, self.city_supply_topic)], start_of_cycle=start_of_cycle)
 
         # Schedule to run next hour with start_of_cycle = True
         cur_exp_time = parser.parse(cur_exp_time)
@@ -219,8 +218,8 @@ class CityAgent(Agent, myTransactiveNode):
             self.campus.model.check_for_convergence(market)
             if not self.campus.model.converged:
                 _log.debug("NeighborModel {} sends records to campus.".format(self.campus.model.name))
-                self.campus.model.prep_transactive_signal(market, self)
-                self.campus.model.send_transactive_signal(self, self.city_supply_topic, start_of_cycle=False)
+                self.prep_transactive_signals(market, [self.campus])
+                self.send_transactive_signals([(self.campus, self.city_supply_topic)], start_of_cycle=False)
             else:
                 # Schedule rerun balancing only if not in simulation mode
                 if not self.simulation:
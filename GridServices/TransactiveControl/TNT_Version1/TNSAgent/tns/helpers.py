@@ -82,6 +82,26 @@ def find_obj_by_ti(items, ti):
     return found_items[0] if len(found_items) > 0 else None
 
 
+def index_by_ti(items):
+    """Map time interval start time to the first item in that interval,
+    so repeated find_obj_by_ti lookups become dictionary lookups.
+    """
+    index = {}
+    for x in items:
+        index.setdefault(x.timeInterval.startTime, x)
+    return index
+
+
+def group_by_ti_name(records):
+    """Group transactive records by the name of their time interval,
+    keeping the records' order within each group.
+    """
+    groups = {}
+    for x in records:
+        groups.setdefault(x.timeInterval, []).append(x)
+    return groups
+
+
 def find_objs_by_st(items, value):
     found_items = [x for x in items if x.startTime == value]
     return found_items
@@ -43,6 +43,7 @@ under Contract DE-AC05-76RL01830
 
 
 import logging
+from math import isnan
 
 from volttron.platform.agent import utils
 
@@ -54,6 +55,7 @@ from .helpers import *
 from .market import Market
 from .time_interval import TimeInterval
 from .local_asset import LocalAsset
+from .vertex_curves import VertexCurves
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
@@ -454,20 +456,22 @@ class LocalAssetModel(Model, object):
         time_interval_values = [t.startTime for t in time_intervals]
         self.dualCosts = [x for x in self.dualCosts if x.timeInterval.startTime in time_interval_values]
 
+        marginal_prices = index_by_ti(mkt.marginalPrices)
+        scheduled_powers = index_by_ti(self.scheduledPowers)
+        production_costs = index_by_ti(self.productionCosts)
+        dual_costs = index_by_ti(self.dualCosts)
+
         # Index through the time intervals ti
         for i in range(1, len(time_intervals)):
             # Find the marginal price mp for the indexed time interval ti(i) in
             # the given market mkt
-            mp = find_obj_by_ti(mkt.marginalPrices, time_intervals[i])
-            mp = mp.value  # a marginal price [$/kWh]
+            mp = marginal_prices[time_intervals[i].startTime].value  # a marginal price [$/kWh]
 
             # Find the scheduled power sp for the asset in the indexed time interval ti(i)
-            sp = find_obj_by_ti(self.scheduledPowers, time_intervals[i])
-            sp = sp.value  # schedule power [avg.kW]
+            sp = scheduled_powers[time_intervals[i].startTime].value  # schedule power [avg.kW]
 
             # Find the production cost in the indexed time interval
-            pc = find_obj_by_ti(self.productionCosts, time_intervals[i])
-            pc = pc.value  # production cost [$]
+            pc = production_costs[time_intervals[i].startTime].value  # production cost [$]
 
             # Dual cost in the time interval is calculated as production cost,
             # minus the product of marginal price, scheduled power, and the
@@ -476,7 +480,7 @@ class LocalAssetModel(Model, object):
             dc = pc - (mp * sp * dur)  # a dual cost [$]
 
             # Check whether a dual cost exists in the indexed time interval
-            iv = find_obj_by_ti(self.dualCosts, time_intervals[i])
+            iv = dual_costs.get(time_intervals[i].startTime)
 
             if iv is None:
                 # No dual cost was found in the indexed time interval. Create an
@@ -510,23 +514,33 @@ class LocalAssetModel(Model, object):
         time_interval_values = [t.startTime for t in time_intervals]
         self.productionCosts = [x for x in self.productionCosts if x.timeInterval.startTime in time_interval_values]
 
+        # Get the scheduled powers sp in the active time intervals, excluding
+        # the first one
+        scheduled_powers = index_by_ti(self.scheduledPowers)
+        scheduled_powers = [scheduled_powers[t.startTime].value for t in time_intervals[1:]]  # [avg.kW]
+
+        # Calculate the production costs pc based on the vertices of the supply
+        # or demand curves of all these time intervals in one call.
+        # NOTE that def prod_cost_from_vertices() remains the reference for
+        # the intervals in which the curves find no cost.
+        production_costs = VertexCurves.from_model(self, time_intervals[1:]).production_costs(scheduled_powers)
+
+        transition_costs = index_by_ti(self.transitionCosts)
+        existing_costs = index_by_ti(self.productionCosts)
+
         # Index through the active time interval ti
         for i in range(1, len(time_intervals)):
-            # Get the scheduled power sp in the indexed time interval
-            sp = find_obj_by_ti(self.scheduledPowers, time_intervals[i])
-            sp = sp.value  # schedule power [avg.kW]
-
-            # Call on def that calculates production cost pc based on the
-            # vertices of the supply or demand curve
-            # NOTE that this def is now stand-alone because it might be
-            # generally useful for a number of models.
-            pc = prod_cost_from_vertices(self, time_intervals[i], sp)  # interval production cost [$]
+            pc = production_costs[i - 1]  # interval production cost [$]
+            if isnan(pc):
+                pc = prod_cost_from_vertices(self, time_intervals[i], scheduled_powers[i - 1])
+            else:
+                pc = float(pc)
 
             # Check for a transition cost in the indexed time interval.
             # (NOTE: this differs from neighbor models, which do not posses the
             # concept of commitment and engagement. This is a good reason to keep
             # this method within its base class to allow for subtle differences.)
-            tc = find_obj_by_ti(self.transitionCosts, time_intervals[i])
+            tc = transition_costs.get(time_intervals[i].startTime)
 
             if tc is None:
                 tc = 0.0  # [$]
@@ -538,7 +552,7 @@ class LocalAssetModel(Model, object):
 
             # Check to see if the production cost value has been defined for the
             # indexed time interval
-            iv = find_obj_by_ti(self.productionCosts, time_intervals[i])
+            iv = existing_costs.get(time_intervals[i].startTime)
 
             if iv is None:
                 # The production cost value has not been defined in the indexed
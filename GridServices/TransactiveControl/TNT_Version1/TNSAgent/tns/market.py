@@ -45,6 +45,7 @@ under Contract DE-AC05-76RL01830
 import gevent
 from datetime import datetime, timedelta
 import logging
+import time
 
 from volttron.platform.agent import utils
 
@@ -56,6 +57,7 @@ from .meter_point import MeterPoint
 from .market_state import MarketState
 from .time_interval import TimeInterval
 from .timer import Timer
+from .vertex_curves import VertexCurves, column_sums, fill_missing, outer
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
@@ -104,6 +106,11 @@ class Market:
 
         self.new_data_signal = False
 
+        self.maximumIterations = 100  # iterations allowed in one balance
+        self.balanceIteration = 0  # iterations completed in the current balance
+        self.balanceWallTime = 0.0  # wall time spent in the current balance [s]
+        self.convergenceRecords = []  # one dict per balance iteration, see balance()
+
     def assign_system_vertices(self, mtn):
         # Collect active vertices from neighbor and asset models
         # and reassign them with aggregate system information for all active time intervals.
@@ -156,6 +163,12 @@ class Market:
     def balance(self, mtn):
         """
         Balance current market
+
+        Every iteration of the current or last balance is recorded in
+        self.convergenceRecords. Each call balances new data and starts with a
+        fresh budget of self.maximumIterations iterations. A balance that runs
+        out of iterations is taken as converged; its last record is marked
+        exhausted.
         :param mtn: my transactive node object
         :return:
         """
@@ -179,8 +192,12 @@ class Market:
 
         # Initialize the iteration counter k
         k = 1
+        self.balanceIteration = 0
+        self.balanceWallTime = 0.0
+        self.convergenceRecords = []
+        start_time = time.perf_counter()
 
-        while not self.converged and k < 100:
+        while not self.converged and k < self.maximumIterations:
             if self.new_data_signal:
                 self.converged = False
                 return
@@ -218,6 +235,18 @@ class Market:
                 # 1.3.1 System has converged to an acceptable balance.
                 self.converged = True
 
+            # Record the iteration. The step size is the largest marginal price
+            # change that this iteration makes (see below).
+            record = {'iteration': k,
+                      'duality_gap': dg,
+                      'total_production_cost': self.totalProductionCost,
+                      'total_dual_cost': self.totalDualCost,
+                      'step_size': 0.0,
+                      'wall_time': 0.0,
+                      'converged': self.converged,
+                      'exhausted': False}
+            self.convergenceRecords.append(record)
+
             # System is not converged. Iterate. The next code in this
             # method revised the marginal prices in active intervals to drive
             # the system toward balance and convergence.
@@ -319,17 +348,26 @@ class Market:
                 # Regardless of the method used, variable "xlamda" should now hold
                 # the updated marginal price. Assign it to the marginal price
                 # value for the indexed active time interval.
+                record['step_size'] = max(record['step_size'], abs(xlamda - mp.value))  # [$/kWh]
                 mp.value = xlamda  # [$/kWh]
 
+            record['wall_time'] = time.perf_counter() - start_time  # [s]
+            self.balanceWallTime = record['wall_time']
+            self.balanceIteration = k
+
             # Increment the iteration counter.
             k = k + 1
-            if k == 100:
+            if k == self.maximumIterations:
                 self.converged = True
+                record['exhausted'] = not record['converged']
 
             if self.new_data_signal:
                 self.converged = False
                 return
 
+        _log.debug("{} market balance ended after {} iterations in {:.3f} s, converged: {}".format(
+            self.name, self.balanceIteration, self.balanceWallTime, self.converged))
+
     def calculate_blended_prices(self):
         # Calculate the blended prices for active time intervals.
         #
@@ -529,7 +567,40 @@ class Market:
         for n in mtn.neighbors:
             n.model.schedule(self)
 
-    def sum_vertices(self, mtn, ti, ote=None):
+    def model_curves(self, mtn, time_intervals=None):
+        # Build the supply or demand curves of all neighbor and local asset
+        # models (see class VertexCurves), stacked per time interval with one
+        # row per model. The curves may be shared by calls to sum_vertices() as
+        # long as the active vertices do not change, e.g., while the
+        # transactive signals of all neighbors are prepared after a balance.
+        #
+        # INPUTS:
+        # mtn - myTransactiveNode object
+        # time_intervals - TimeInterval objects, the active ones by default
+        #
+        # OUTPUTS:
+        # dict of time interval start time -> (models, VertexCurves)
+        if time_intervals is None:
+            time_intervals = self.timeIntervals
+
+        models = [x.model for x in mtn.neighbors] + [x.model for x in mtn.localAssets]
+
+        # Group each model's active vertices by time interval once.
+        model_vertices = []
+        for nm in models:
+            vertices = {}
+            for x in nm.activeVertices:
+                vertices.setdefault(x.timeInterval.startTime, []).append(x.value)
+            model_vertices.append(vertices)
+
+        curves = {}
+        for ti in time_intervals:
+            curve = VertexCurves([x.get(ti.startTime, []) for x in model_vertices],
+                                 [get_duration_in_hour(ti.duration)] * len(models))
+            curves[ti.startTime] = (models, curve)
+        return curves
+
+    def sum_vertices(self, mtn, ti, ote=None, curves=None):
         # Create system vertices with system information
         # for a single time interval. An optional argument allows the exclusion of
         # a transactive neighbor object, which is useful for transactive records
@@ -537,72 +608,37 @@ class Market:
         # This utility method should be used for creating transactive signals (by
         # excluding the neighbor object), and for visualization tools that review
         # the local system's net supply/demand curve.
+        # The curves of the models may be passed in from model_curves(); they
+        # are otherwise built for this time interval.
 
-        # Initialize a list of marginal prices mps at which vertices will be created.
-        mps = []
-
-        # Index through the active neighbor objects
-        for i in range(len(mtn.neighbors)):
-
-            # Change the reference to the corresponding neighbor model
-            nm = mtn.neighbors[i].model
-
-            # Jump out of this iteration if neighbor model nm happens to be the
-            # "object to exclude" ote
-            if ote is not None and nm == ote:
-                continue
-
-            # Find the neighbor model's active vertices in this time interval
-            mp = find_objs_by_ti(nm.activeVertices, ti)  # IntervalValues
-
-            if len(mp) > 0:
-                # At least one active vertex was found in the time interval
-                # Extract the vertices from the interval values
-                mp = [x.value for x in mp]  # Vertices
-
-                if len(mp) == 1:
-                    # There is one vertex. This means the power is constant for
-                    # this neighbor. Enforce the policy of assigning infinite
-                    # marginal price to constant vertices.
-                    mp = [float("inf")]  # marginal price [$/kWh]
+        if curves is None:
+            curves = self.model_curves(mtn, [ti])
 
-                else:
-                    # There are multiple vertices. Use the marginal price values
-                    # from the vertices themselves.
-                    mp = [x.marginalPrice for x in mp]  # marginal prices [$/kWh]
-
-                mps.extend(mp)  # marginal prices [$/kWh]
-
-        for i in range(len(mtn.localAssets)):
-            # Change the reference to the corresponding local asset model
-            nm = mtn.localAssets[i].model  # a local asset model
+        # The neighbor and local asset models, and their curves in this time
+        # interval (one row per model)
+        models, curve = curves[ti.startTime]
 
-            # Jump out of this iteration if local asset model nm happens to be
-            # the "object to exclude" ote
-            if ote is not None and nm == ote:
-                continue
+        # Index the included models, jumping over the "object to exclude" ote
+        included = [k for k in range(len(models)) if ote is None or models[k] != ote]
 
-            # Find the local asset model's active vertices in this time interval
-            mp = find_objs_by_ti(nm.activeVertices, ti)
-
-            if len(mp) > 0:
-                # At least one active vertex was found in the time interval
-                # Extract the vertices from the interval values
-                mp = [x.value for x in mp]  # mp = [mp.value]  # Vertices
+        # Initialize a list of marginal prices mps at which vertices will be created.
+        mps = []
 
-                # Extract the marginal prices from the vertices
-                if len(mp) == 1:
-                    # There is one vertex. This means the power is constant for
-                    # this local asset. Enforce the policy of assigning infinite
-                    # marginal price to constant vertices.
-                    mp = [float("inf")]  # marginal price [$/kWh]
+        # Index through the included neighbor and local asset models
+        for k in included:
+            # Number of the model's active vertices in this time interval
+            count = curve.counts[k]
 
-                else:
-                    # There are multiple vertices. Use the marginal price values
-                    # from the vertices themselves.
-                    mp = [x.marginalPrice for x in mp]  # marginal prices [$/kWh]
+            if count == 1:
+                # There is one vertex. This means the power is constant for
+                # this model. Enforce the policy of assigning infinite
+                # marginal price to constant vertices.
+                mps.append(float("inf"))  # marginal price [$/kWh]
 
-                mps.extend(mp)  # marginal prices [$/kWh]
+            elif count > 1:
+                # There are multiple vertices. Use the marginal price values
+                # from the vertices themselves.
+                mps.extend(curve.marginalPrices[k, :count].tolist())  # marginal prices [$/kWh]
 
         # Trim mps, which was originally padded with zeros.
         # mps = mps(1:mps_cnt)  # marginal prices [$/kWh]
@@ -666,6 +702,23 @@ class Market:
                 # very small number
                 mps[i - 1] = mps[i - 1] - 1e-10  # marginal prices [$/kWh]
 
+        # Calculate the powers and production costs of the included neighbor
+        # and local asset models at all the marginal prices in one call (see
+        # class VertexCurves). Functions production() and
+        # prod_cost_from_vertices() remain the reference where a curve finds
+        # no value. NOTE: This must not corrupt the "scheduled power" and
+        # "scheduled" production cost at the converged system's marginal price.
+        rows, prices = outer(included, mps)
+        powers = fill_missing(curve.productions(prices, rows),
+                              lambda j: production(models[rows[j]], prices[j], ti))  # [avg.kW]
+        costs = fill_missing(curve.production_costs(powers, rows),
+                             lambda j: prod_cost_from_vertices(models[rows[j]], ti, powers[j]))  # [$]
+
+        # Sum the powers and production costs of the neighbor models, and then
+        # of the local asset models, at each marginal price
+        net_powers = column_sums(powers, len(mps))  # net powers [avg.kW]
+        production_costs = column_sums(costs, len(mps))  # production costs [$]
+
         # Create vertices at the marginal prices
         # Initialize the list of vertices
         vertices = []
@@ -675,51 +728,9 @@ class Market:
             # Create a vertex at the indexed marginal price value
             iv = Vertex(mps[i], 0, 0)
 
-            # Initialize the net power pwr and total production cost pc at the
-            # indexed vertex
-            pwr = 0.0  # net power [avg.kW]
-            pc = 0.0  # production cost [$]
-
-            # Include power and production costs from neighbor models
-            # Index through the active neighbor models
-            for k in range(len(mtn.neighbors)):
-                nm = mtn.neighbors[k].model
-
-                if nm == ote:
-                    continue
-
-                # Calculate the indexed neighbor model's power at the indexed
-                # marginal price and time interval. NOTE: This must not corrupt
-                # the "scheduled power" at the converged system's marginal price.
-                p = production(nm, mps[i], ti)  # power [avg.kW]
-
-                # Calculate the neighbor model's production cost at the indexed
-                # marginal price and time interval, and add it to the sum
-                # production cost pc. NOTE: This must not corrupt the "scheduled"
-                # production cost for this neighbor model.
-                pc = pc + prod_cost_from_vertices(nm, ti, p)  # production cost [$]
-
-                # Add the neighbor model's power to the sum net power at this vertex.
-                pwr = pwr + p  # net power [avg.kW]
-
-            # Include power and production costs from local asset models
-            # Index through the local asset models
-            for k in range(len(mtn.localAssets)):
-                nm = mtn.localAssets[k].model
-
-                if nm == ote:
-                    continue
-
-                # Calculate the power for the indexed local asset model at the
-                # indexed marginal price and time interval.
-                p = production(nm, mps[i], ti)  # power [avg.kW]
-
-                # Find the indexed local asset model's production cost and add it
-                # to the sum of production cost pc for this vertex.
-                pc = pc + prod_cost_from_vertices(nm, ti, p)  # production cost [$]
-
-                # Add local asset power p to the sum net power pwr for this vertex.
-                pwr = pwr + p  # net power [avg.kW]
+            # The net power pwr and total production cost pc at the indexed vertex
+            pwr = net_powers[i]  # net power [avg.kW]
+            pc = production_costs[i]  # production cost [$]
 
             # Save the sum production cost pc into the new vertex iv
             iv.cost = pc  # sum production cost [$]
@@ -0,0 +1,516 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+
+
+import os
+import json
+import shutil
+import logging
+import tempfile
+from collections import deque
+from datetime import datetime, timedelta
+from timeit import default_timer
+
+from gevent.event import AsyncResult
+
+from .campus_agent import CampusAgent
+from .city_agent import CityAgent
+from .local_asset import LocalAsset
+from .local_asset_model import LocalAssetModel
+from .market import Market
+from .market_state import MarketState
+from .meter_point import MeterPoint
+from .measurement_type import MeasurementType
+from .measurement_unit import MeasurementUnit
+from .myTransactiveNode import myTransactiveNode
+from .neighbor import Neighbor
+from .neighbor_model import NeighborModel
+from .temperature_forecast_model import TemperatureForecastModel
+from .vertex import Vertex
+from .timer import Timer
+
+_log = logging.getLogger(__name__)
+
+WEATHER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'weather_data', 'prediction_from_simulation.csv')
+
+
+class MessageExchange(object):
+    """
+    In-memory stand-in for the VOLTTRON message bus. Published messages are
+    queued and delivered in publishing order by deliver_all() to every
+    subscription whose prefix matches the topic.
+    """
+
+    def __init__(self):
+        self.subscriptions = []  # (node, prefix, callback)
+        self.queue = deque()
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, node, prefix, callback):
+        self.subscriptions.append((node, prefix, callback))
+
+    def publish(self, sender, topic, headers, message):
+        self.queue.append((sender, topic, headers or {}, message))
+        self.published += 1
+        result = AsyncResult()
+        result.set(None)
+        return result
+
+    def deliver_all(self, max_messages=10000):
+        """
+        Deliver queued messages, including the ones published while
+        delivering, until the queue is empty.
+        :param max_messages: int; messages delivered before giving up
+        :return: True if the queue was drained, False if max_messages was reached
+        """
+        count = 0
+        while self.queue:
+            if count >= max_messages:
+                _log.warning("Stopped after {} messages, {} left undelivered.".format(count, len(self.queue)))
+                self.queue.clear()
+                return False
+            sender, topic, headers, message = self.queue.popleft()
+            count += 1
+            for node, prefix, callback in self.subscriptions:
+                if topic.startswith(prefix):
+                    callback('pubsub', sender.name, 'pubsub', topic, headers, message)
+                    self.delivered += 1
+        return True
+
+
+class _PubSub(object):
+    def __init__(self, exchange, node):
+        self.exchange = exchange
+        self.node = node
+
+    def publish(self, peer, topic, headers=None, message=None):
+        return self.exchange.publish(self.node, topic, headers, message)
+
+    def subscribe(self, peer, prefix, callback):
+        self.exchange.subscribe(self.node, prefix, callback)
+
+
+class _Vip(object):
+    def __init__(self, exchange, node):
+        self.pubsub = _PubSub(exchange, node)
+
+
+class _Core(object):
+    # The harness drives the market cycles itself, so scheduled calls are
+    # only recorded.
+    def __init__(self):
+        self.scheduled = []
+
+    def schedule(self, deadline, func, *args, **kwargs):
+        self.scheduled.append((deadline, func, args, kwargs))
+
+
+class SimulatedNode(myTransactiveNode):
+    """
+    A transactive node whose VOLTTRON plumbing (vip.pubsub and core) is
+    served by a MessageExchange. The config is written to config_dir so
+    that TemperatureForecastModel can load it like the agents do.
+    """
+
+    def __init__(self, exchange, config, config_dir):
+        myTransactiveNode.__init__(self)
+        self.config = config
+        self.name = config.get('name')
+        self.db_topic = config.get('db_topic', 'tnc')
+        self.duality_gap_threshold = float(config.get('duality_gap_threshold', 0.01))
+        self.demand_threshold_coef = float(config.get('demand_threshold_coef'))
+        self.monthly_peak_power = float(config.get('monthly_peak_power'))
+        self.system_loss_topic = "{}/{}/system_loss".format(self.db_topic, self.name)
+        self.dc_threshold_topic = "{}/{}/dc_threshold_topic".format(self.db_topic, self.name)
+        self.price_topic = "{}/{}/marginal_prices".format(self.db_topic, self.name)
+        self.reschedule_interval = timedelta(minutes=10, seconds=1)
+        self.simulation = True
+        self.neighbors = []
+
+        self.config_path = os.path.join(config_dir, self.name + '.config')
+        with open(self.config_path, 'w') as f:
+            json.dump(config, f)
+
+        self.vip = _Vip(exchange, self)
+        self.core = _Core()
+
+    def onstart(self):
+        self.init_objects()
+
+
+class CityNode(SimulatedNode):
+    # The market logic is CityAgent's own.
+    schedule_run = CityAgent.schedule_run
+    get_next_exp_time = CityAgent.get_next_exp_time
+    new_demand_signal = CityAgent.new_demand_signal
+    balance_market = CityAgent.balance_market
+    init_objects = CityAgent.init_objects
+    make_campus = CityAgent.make_campus
+    make_supplier = CityAgent.make_supplier
+
+    def __init__(self, exchange, config, config_dir):
+        super(CityNode, self).__init__(exchange, config, config_dir)
+        self.supplier_loss_factor = float(config.get('supplier_loss_factor'))
+        self.campus_demand_topic = "{}/campus/city/demand".format(self.db_topic)
+        self.city_supply_topic = "{}/city/campus/supply".format(self.db_topic)
+        self.simulation_one_hour_in_seconds = 3600
+
+    def onstart(self):
+        self.init_objects()
+        self.vip.pubsub.subscribe(peer='pubsub',
+                                  prefix=self.campus_demand_topic,
+                                  callback=self.new_demand_signal)
+
+
+class CampusNode(SimulatedNode):
+    # The market logic is CampusAgent's own.
+    new_demand_signal = CampusAgent.new_demand_signal
+    new_supply_signal = CampusAgent.new_supply_signal
+    balance_market = CampusAgent.balance_market
+    init_objects = CampusAgent.init_objects
+    make_bldg_neighbor = CampusAgent.make_bldg_neighbor
+
+    def __init__(self, exchange, config, config_dir):
+        super(CampusNode, self).__init__(exchange, config, config_dir)
+        self.building_names = config.get('buildings', [])
+        self.building_powers = config.get('building_powers')
+        self.PV_max_kW = float(config.get('PV_max_kW'))
+        self.city_loss_factor = float(config.get('city_loss_factor'))
+        self.city_supply_topic = "{}/city/campus/supply".format(self.db_topic)
+        self.building_demand_topic = "/".join([self.db_topic, "{}/campus/demand"])
+        self.campus_demand_topic = "{}/campus/city/demand".format(self.db_topic)
+        self.campus_supply_topic = "/".join([self.db_topic, "campus/{}/supply"])
+        self.solar_topic = "/".join([self.db_topic, "campus/pv"])
+
+    def onstart(self):
+        self.init_objects()
+        self.vip.pubsub.subscribe(peer='pubsub',
+                                  prefix=self.city_supply_topic,
+                                  callback=self.new_supply_signal)
+        for bldg in self.building_names:
+            self.vip.pubsub.subscribe(peer='pubsub',
+                                      prefix=self.building_demand_topic.format(bldg),
+                                      callback=self.new_demand_signal)
+
+
+class BuildingNode(SimulatedNode):
+    """
+    The TNS side of BuildingAgent: a market, the campus neighbor and the
+    building load. The building load is an inelastic LocalAssetModel instead
+    of the TccModel, which needs the mix-market and its device agents.
+    """
+
+    def __init__(self, exchange, config, config_dir):
+        super(BuildingNode, self).__init__(exchange, config, config_dir)
+        self.max_deliver_capacity = float(config.get('max_deliver_capacity'))
+        self.campus_loss_factor = float(config.get('campus_loss_factor', 0.01))
+        self.load_power = float(config.get('load_power', -0.5 * self.max_deliver_capacity))
+        self.building_demand_topic = "{}/{}/campus/demand".format(self.db_topic, self.name)
+        self.campus_supply_topic = "{}/campus/{}/supply".format(self.db_topic, self.name)
+
+    def onstart(self):
+        self.init_objects()
+        self.vip.pubsub.subscribe(peer='pubsub',
+                                  prefix=self.campus_supply_topic,
+                                  callback=self.new_supply_signal)
+
+    def new_supply_signal(self, peer, sender, bus, topic, headers, message):
+        self.campus.model.receive_transactive_signal(self, message['curves'])
+        self.balance_market(1)
+
+    def balance_market(self, run_cnt):
+        # As BuildingAgent.balance_market
+        market = self.markets[0]
+        market.new_data_signal = True
+        market.balance(self)
+
+        if market.converged:
+            market.assign_system_vertices(self)
+            self.campus.model.check_for_convergence(market)
+            if not self.campus.model.converged:
+                self.prep_transactive_signals(market, [self.campus])
+                self.send_transactive_signals([(self.campus, self.building_demand_topic)])
+
+    def init_objects(self):
+        # Add weather forecast service
+        weather_service = TemperatureForecastModel(self.config_path, self)
+        self.informationServiceModels.append(weather_service)
+
+        # Add building load
+        load = LocalAsset()
+        load.name = 'BuildingLoad'
+        load.maximumPower = 0  # Remember that a load is a negative power [kW]
+        load.minimumPower = -self.max_deliver_capacity
+
+        load_model = LocalAssetModel()
+        load_model.name = 'BuildingLoadModel'
+        load_model.defaultPower = self.load_power  # [kW]
+        load_model.defaultVertices = [Vertex(float("inf"), 0, self.load_power, True)]
+
+        # Cross-reference asset & asset model
+        load_model.object = load
+        load.model = load_model
+        self.localAssets.append(load)
+
+        # Add Market
+        market = Market()
+        market.name = 'dayAhead'
+        market.commitment = False
+        market.converged = False
+        market.defaultPrice = 0.0428  # [$/kWh]
+        market.dualityGapThreshold = self.duality_gap_threshold
+        market.initialMarketState = MarketState.Inactive
+        market.marketOrder = 1
+        market.intervalsToClear = 1
+        market.futureHorizon = timedelta(hours=24)
+        market.intervalDuration = timedelta(hours=1)
+        market.marketClearingInterval = timedelta(hours=1)
+        market.marketClearingTime = Timer.get_cur_time().replace(hour=0, minute=0, second=0, microsecond=0)
+        market.nextMarketClearingTime = market.marketClearingTime + timedelta(hours=1)
+        self.markets.append(market)
+
+        # Campus object
+        campus = Neighbor()
+        campus.name = 'PNNL_Campus'
+        campus.maximumPower = self.max_deliver_capacity
+        campus.minimumPower = 0.  # [avg.kW]
+        campus.lossFactor = self.campus_loss_factor
+
+        # Campus model
+        campus_model = NeighborModel()
+        campus_model.name = 'PNNL_Campus_Model'
+        campus_model.location = self.name
+        campus_model.defaultVertices = [Vertex(0.045, 25, 0, True), Vertex(0.048, 0, self.max_deliver_capacity, True)]
+        campus_model.transactive = True
+        campus_model.demand_threshold_coef = self.demand_threshold_coef
+        campus_model.demandThreshold = self.monthly_peak_power
+        campus_model.inject(self,
+                            system_loss_topic=self.system_loss_topic,
+                            dc_threshold_topic=self.dc_threshold_topic)
+
+        building_meter = MeterPoint()
+        building_meter.name = self.name + ' ElectricMeter'
+        building_meter.measurementType = MeasurementType.AverageDemandkW
+        building_meter.measurementUnit = MeasurementUnit.kWh
+        campus_model.meterPoints.append(building_meter)
+
+        # Cross-reference object & model
+        campus_model.object = campus
+        campus.model = campus_model
+        self.campus = campus
+        self.neighbors.append(campus)
+
+
+class MultiNodeHarness(object):
+    """
+    Offline benchmark of a city, a campus and building_count buildings that
+    exchange transactive signals through a MessageExchange.
+
+    Each call of run_cycle() sets the simulated clock to the next hour,
+    starts the cycle the way CityAgent does at the top of the hour and
+    delivers messages until no node has anything left to send. Temperatures
+    are read from a recorded weather file in weather_data/.
+    """
+
+    def __init__(self, building_count=3, start_time=datetime(2018, 7, 2, 0, 0),
+                 weather_file=WEATHER_FILE, duality_gap_threshold=0.01, max_messages=10000):
+        self.building_count = building_count
+        self.start_time = start_time
+        self.weather_file = weather_file
+        self.duality_gap_threshold = duality_gap_threshold
+        self.max_messages = max_messages
+        self.cycle = 0
+        self.reports = []
+        self.exchange = None
+        self.config_dir = None
+        self.nodes = []
+        self._iterations = {}
+        self._balances = {}
+
+    def node_configs(self):
+        # Returns (city, campus, buildings) configs
+        weather = {'weather_file': self.weather_file}
+        names = ['Building{}'.format(i + 1) for i in range(self.building_count)]
+        # Building sizes, [kW]
+        capacities = [200.0 + 100.0 * (i % 5) for i in range(self.building_count)]
+        city = {'name': 'CoR',
+                'duality_gap_threshold': self.duality_gap_threshold,
+                'supplier_loss_factor': 0.01,
+                'demand_threshold_coef': 1,
+                'monthly_peak_power': 200000,
+                'weather_forecast': weather}
+        campus = {'name': 'PNNL',
+                  'duality_gap_threshold': self.duality_gap_threshold,
+                  'buildings': names,
+                  'building_powers': dict((n, [0.0, -c]) for n, c in zip(names, capacities)),
+                  'PV_max_kW': 120,
+                  'city_loss_factor': 0.01,
+                  'demand_threshold_coef': 1,
+                  'monthly_peak_power': 20000,
+                  'weather_forecast': weather}
+        buildings = [{'name': n,
+                      'duality_gap_threshold': self.duality_gap_threshold,
+                      'max_deliver_capacity': c,
+                      'load_power': -0.4 * c,
+                      'campus_loss_factor': 0.01,
+                      'demand_threshold_coef': 1,
+                      'monthly_peak_power': c,
+                      'weather_forecast': weather} for n, c in zip(names, capacities)]
+        return city, campus, buildings
+
+    def set_clock(self, dt):
+        Timer.simulation = True
+        Timer.sim_one_hr_in_sec = 3600
+        Timer.created_time = datetime.now()
+        Timer.sim_start_time = dt
+
+    def setup(self):
+        self.close()
+        self.set_clock(self.start_time)
+        self.exchange = MessageExchange()
+        self.config_dir = tempfile.mkdtemp(prefix='tns_harness_')
+        city_config, campus_config, building_configs = self.node_configs()
+        self.city = CityNode(self.exchange, city_config, self.config_dir)
+        self.campus = CampusNode(self.exchange, campus_config, self.config_dir)
+        self.buildings = [BuildingNode(self.exchange, c, self.config_dir) for c in building_configs]
+        self.nodes = [self.city, self.campus] + self.buildings
+        for node in self.nodes:
+            node.onstart()
+            self._count_balances(node)
+        self.cycle = 0
+        self.reports = []
+
+    def close(self):
+        if self.config_dir is not None:
+            shutil.rmtree(self.config_dir, ignore_errors=True)
+            self.config_dir = None
+
+    def _count_balances(self, node):
+        # Count every call of the node's Market.balance and the iterations
+        # that the call took.
+        market = node.markets[0]
+        balance = market.balance
+
+        def counted_balance(mtn):
+            try:
+                balance(mtn)
+            finally:
+                self._balances[node.name] += 1
+                self._iterations[node.name] += market.balanceIteration
+
+        market.balance = counted_balance
+
+    def run_cycle(self):
+        """
+        Run one market cycle.
+        :return: dict report of the cycle
+        """
+        if self.exchange is None:
+            self.setup()
+        analysis_time = self.start_time + timedelta(hours=self.cycle)
+        self.set_clock(analysis_time)
+        self._iterations = dict((n.name, 0) for n in self.nodes)
+        self._balances = dict((n.name, 0) for n in self.nodes)
+        published = self.exchange.published
+        delivered = self.exchange.delivered
+
+        start = default_timer()
+        # As CityAgent.onstart and the hourly CityAgent.schedule_run
+        self.city.schedule_run(analysis_time.isoformat(), analysis_time.isoformat(), True)
+        drained = self.exchange.deliver_all(self.max_messages)
+        latency = default_timer() - start
+
+        self.city.core.scheduled = []
+        report = {'cycle': self.cycle,
+                  'time': analysis_time,
+                  'latency': latency,  # [s]
+                  'messages': self.exchange.published - published,
+                  'signals': self.exchange.delivered - delivered,  # delivered to a subscriber
+                  'drained': drained,
+                  'balances': self._balances,
+                  'iterations': self._iterations,
+                  'converged': dict((n.name, n.markets[0].converged) for n in self.nodes)}
+        self.reports.append(report)
+        self.cycle += 1
+        return report
+
+    def run(self, cycles):
+        """
+        Run several market cycles.
+        :param cycles: int
+        :return: list of dict reports, one per cycle
+        """
+        return [self.run_cycle() for i in range(cycles)]
+
+    def summary(self):
+        # Returns latency, balance iterations and messages per cycle
+        count = len(self.reports)
+        if count == 0:
+            return {}
+        latencies = [r['latency'] for r in self.reports]
+        return {'cycles': count,
+                'buildings': self.building_count,
+                'mean_latency': sum(latencies) / count,
+                'max_latency': max(latencies),
+                'mean_iterations': sum(sum(r['iterations'].values()) for r in self.reports) / float(count),
+                'mean_messages': sum(r['messages'] for r in self.reports) / float(count),
+                'mean_signals': sum(r['signals'] for r in self.reports) / float(count)}
+
+
+if __name__ == '__main__':
+    import sys
+
+    building_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    harness = MultiNodeHarness(building_count)
+    try:
+        for r in harness.run(cycles):
+            print("Cycle {} at {}: latency {:.3f} s, {} messages ({} signals), {} balance iterations, drained {}".format(
+                r['cycle'], r['time'], r['latency'], r['messages'], r['signals'], sum(r['iterations'].values()),
+                r['drained']))
+        print(harness.summary())
+    finally:
+        harness.close()
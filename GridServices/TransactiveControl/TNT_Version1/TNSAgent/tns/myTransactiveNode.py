@@ -42,6 +42,11 @@ under Contract DE-AC05-76RL01830
 """
 
 
+import logging
+
+_log = logging.getLogger(__name__)
+
+
 class myTransactiveNode(object):
     """
     myTransactiveNode is the local persepctive of the computational agent among a network of TransactiveNodes.
@@ -61,3 +66,56 @@ class myTransactiveNode(object):
         self.markets = []
         self.meterPoints = []
         self.neighbors = []
+
+    def prep_transactive_signals(self, mkt, neighbors):
+        """
+        Prepare the transactive signals of several neighbors after the same
+        balance. The models' supply and demand curves are built once from the
+        market's active vertices and shared by all neighbors.
+        :param mkt: Market object
+        :param neighbors: Neighbor objects
+        :return:
+        """
+        if not neighbors:
+            return
+        curves = mkt.model_curves(self)
+        for n in neighbors:
+            n.model.prep_transactive_signal(mkt, self, curves)
+
+    def send_transactive_signals(self, signals, start_of_cycle=False, fail_to_converged=False, retries=2):
+        """
+        Send prepared transactive signals. Publishing does not wait for the
+        message bus; a publish the bus later rejects is logged, not resent,
+        since a resent signal could reach the neighbor twice. Only a send
+        that raises is retried, and a neighbor that fails does not hold back
+        the others.
+        :param signals: list of (Neighbor, topic)
+        :param start_of_cycle: bool
+        :param fail_to_converged: bool
+        :param retries: int; additional attempts per neighbor
+        :return: list of the Neighbor objects whose signal could not be sent
+        """
+        failed = []
+        for n, topic in signals:
+            for attempt in range(retries + 1):
+                try:
+                    result = n.model.send_transactive_signal(self, topic, start_of_cycle, fail_to_converged)
+                except Exception as ex:
+                    _log.warning("NeighborModel {} failed to send records (attempt {}): {}".format(
+                        n.model.name, attempt + 1, ex))
+                    continue
+                if result is not None:
+                    result.rawlink(self._signal_published(n, topic))
+                _log.debug("NeighborModel {} sent records.".format(n.model.name))
+                break
+            else:
+                failed.append(n)
+        return failed
+
+    @staticmethod
+    def _signal_published(n, topic):
+        def published(result):
+            if not result.successful():
+                _log.error("NeighborModel {} records on {} were not published: {}".format(
+                    n.model.name, topic, result.exception))
+        return published
@@ -43,6 +43,7 @@ under Contract DE-AC05-76RL01830
 
 from datetime import datetime, timedelta, date, time
 import csv
+from math import isnan
 
 import logging
 import json
@@ -54,6 +55,7 @@ from .interval_value import IntervalValue
 from .transactive_record import TransactiveRecord
 from .vertex import Vertex
 from .timer import Timer
+from .vertex_curves import VertexCurves
 
 from volttron.platform.agent import utils
 utils.setup_logging()
@@ -297,53 +299,26 @@ class NeighborModel(Model, object):
         #
         # INPUTS:
         # power - scheduled power [avg.kW]
-        # vertices - array of supply- or demand-curve vertices
+        # vertices - array of supply- or demand-curve vertices, or the
+        # VertexCurves object that was built from them
         #
         # OUTPUTS:
         # mp - a marginal price that corresponds to p [$/kWh]
 
-        # Sort the supplied vertices by power and marginal price.
-        vertices = order_vertices(vertices)
-
-        # number of supplied vertices len
-        v_len = len(vertices)
-
-        if power < vertices[0].power:
-            # The power is below the first vertex. Marginal price is
-            # indeterminate. Assign the marginal price of the first vertex,
-            # create a warning, and return. (This should be an unlikely
-            # condition.)
-            # warning('power was lower than first vertex')
-            marginal_price = vertices[0].marginalPrice  # price [$/kWh]
-            return marginal_price
-
-        elif power >= vertices[-1].power:
-            # The power is above the last vertex. Marginal price is
-            # indeterminate. Assign the marginal price of the last vertex, create
-            # a warning, and return. (This should be an unlikely condition.)
-            # warning('power was greater than last vertex')
-            marginal_price = vertices[-1].marginalPrice  # price [$/kWh]
-            return marginal_price
-
-        # There are multiple vertices v. Index through them.
-        for i in range(v_len - 1):  # for i = 1:(len - 1)
-            if vertices[i].power <= power < vertices[i + 1].power:
-                # The power lies on a segment between two defined vertices.
-                if vertices[i].power == vertices[i + 1].power:
-                    # The segment is horizontal. Marginal price is indefinite.
-                    # Assign the marginal price of the second vertex and return.
-                    _log.warning('segment is horizontal')
-                    marginal_price = vertices[i + 1].marginalPrice
-                    return marginal_price
-                else:
-                    # The segment is not horizontal. Interpolate on the segment.
-                    # First, determine the segment's slope.
-                    slope = (vertices[i + 1].marginalPrice - vertices[i].marginalPrice) \
-                            / (vertices[i + 1].power - vertices[i].power)  # [$/kWh/kW]
+        # Sort the supplied vertices by power and marginal price, unless a curve
+        # has already been built from them.
+        if not isinstance(vertices, VertexCurves):
+            vertices = VertexCurves([vertices])
+
+        # Below the first vertex and above the last vertex, the marginal price
+        # is indeterminate and that of the first or last vertex is assigned.
+        # Otherwise, the marginal price is interpolated on the segment between
+        # two defined vertices (see VertexCurves.marginal_prices()).
+        marginal_price = vertices.marginal_prices(power, 0)[0]  # price [$/kWh]
 
-                    # Then interpolate to find marginal price.
-                    marginal_price = vertices[i].marginalPrice + (power - vertices[i].power) * slope  # [$/kWh]
-                    return marginal_price
+        if isnan(marginal_price):
+            return None
+        return float(marginal_price)
 
     # SEALED - DONOT MODIFY
     # Have object schedule its power in active time intervals
@@ -385,22 +360,29 @@ class NeighborModel(Model, object):
         time_interval_values = [t.startTime for t in time_intervals]
         self.scheduledPowers = [x for x in self.scheduledPowers if x.timeInterval.startTime in time_interval_values]
 
+        # Find the marginal prices of the active time intervals
+        marginal_prices = index_by_ti(mkt.marginalPrices)
+        marginal_prices = [marginal_prices[t.startTime].value for t in time_intervals]  # [$/kWh]
+
+        # Find the powers that correspond to the marginal prices according to
+        # the sets of active vertices in the active time intervals, all in one
+        # call. Function production() remains the reference for the intervals
+        # in which no power is found (e.g., there are no active vertices).
+        values = VertexCurves.from_model(self, time_intervals).productions(marginal_prices)  # [avg. kW]
+
+        scheduled_powers = index_by_ti(self.scheduledPowers)
+
         # Index through active time intervals ti
         for i in range(len(time_intervals)):
-            # Find the marginal price for the indexed time interval
-            marginal_price = find_obj_by_ti(mkt.marginalPrices, time_intervals[i])  # an IntervalValue
-            marginal_price = marginal_price.value
-
-            # Find the power that corresponds to the marginal price according
-            # to the set of active vertices in the indexed time interval.
-            # Function Production() works for any power that is determined by
-            # its supply curve or demand curve, as represented by the object's
-            # active vertices.
-            value = production(self, marginal_price, time_intervals[i])  # [avg. kW]
+            value = values[i]  # [avg. kW]
+            if isnan(value):
+                value = production(self, marginal_prices[i], time_intervals[i])  # [avg. kW]
+            else:
+                value = float(value)
 
             # Check to see if a scheduled power already exists in the indexed
             # time interval
-            interval_value = find_obj_by_ti(self.scheduledPowers, time_intervals[i])  # an IntervalValue
+            interval_value = scheduled_powers.get(time_intervals[i].startTime)  # an IntervalValue
 
             if interval_value is None:
                 # No scheduled power was found in the indexed time interval.
@@ -484,18 +466,20 @@ class NeighborModel(Model, object):
         time_interval_values = [t.startTime for t in time_intervals]
         self.dualCosts = [x for x in self.dualCosts if x.timeInterval.startTime in time_interval_values]
 
+        marginal_prices = index_by_ti(mkt.marginalPrices)
+        scheduled_powers = index_by_ti(self.scheduledPowers)
+        production_costs = index_by_ti(self.productionCosts)
+        dual_costs = index_by_ti(self.dualCosts)
+
         for i in range(1, len(time_intervals)):
             # Find the marginal price mp for the indexed time interval in the given market
-            marginal_price = find_obj_by_ti(mkt.marginalPrices, time_intervals[i])
-            marginal_price = marginal_price.value
+            marginal_price = marginal_prices[time_intervals[i].startTime].value
 
             # Find the scheduled power for the neighbor in the indexed time interval.
-            scheduled_power = find_obj_by_ti(self.scheduledPowers, time_intervals[i])
-            scheduled_power = scheduled_power.value
+            scheduled_power = scheduled_powers[time_intervals[i].startTime].value
 
             # Find the production cost in the indexed time interval.
-            production_cost = find_obj_by_ti(self.productionCosts, time_intervals[i])
-            production_cost = production_cost.value
+            production_cost = production_costs[time_intervals[i].startTime].value
 
             # Dual cost in the time interval is calculated as production cost,
             # minus the product of marginal price, scheduled power, and the
@@ -506,7 +490,7 @@ class NeighborModel(Model, object):
 
             # Check whether a dual cost exists in the indexed time interval
             # interval_value = findobj(self.dualCosts, 'timeInterval', time_intervals[i])  # an IntervalValue
-            interval_value = find_obj_by_ti(self.dualCosts, time_intervals[i])
+            interval_value = dual_costs.get(time_intervals[i].startTime)
 
             if interval_value is None:
                 # No dual cost was found in the indexed time interval. Create an
@@ -534,19 +518,29 @@ class NeighborModel(Model, object):
         time_interval_values = [t.startTime for t in time_intervals]
         self.productionCosts = [x for x in self.productionCosts if x.timeInterval.startTime in time_interval_values]
 
-        for i in range(1, len(time_intervals)):
-            # Get the scheduled power in the indexed time interval.
-            scheduled_power = find_obj_by_ti(self.scheduledPowers, time_intervals[i])
-            scheduled_power = scheduled_power.value
+        # Get the scheduled powers in the active time intervals, excluding the
+        # first one.
+        scheduled_powers = index_by_ti(self.scheduledPowers)
+        scheduled_powers = [scheduled_powers[t.startTime].value for t in time_intervals[1:]]
 
-            # Call on function that calculates production cost pc based on the
-            # vertices of the supply or demand curve.
-            production_cost = prod_cost_from_vertices(self, time_intervals[i], scheduled_power)  # prod cost [$]
+        # Calculate the production costs pc based on the vertices of the supply
+        # or demand curves in one call. Function prod_cost_from_vertices()
+        # remains the reference for the intervals in which no cost is found.
+        production_costs = VertexCurves.from_model(self, time_intervals[1:]).production_costs(scheduled_powers)
+
+        existing_costs = index_by_ti(self.productionCosts)
+
+        for i in range(1, len(time_intervals)):
+            production_cost = production_costs[i - 1]  # prod cost [$]
+            if isnan(production_cost):
+                production_cost = prod_cost_from_vertices(self, time_intervals[i], scheduled_powers[i - 1])
+            else:
+                production_cost = float(production_cost)
 
             # Check to see if the production cost value has been defined for the
             # indexed time interval.
             # interval_value = findobj(self.productionCosts, 'timeInterval', time_intervals[i])  # an IntervalValue
-            interval_value = find_obj_by_ti(self.productionCosts, time_intervals[i])
+            interval_value = existing_costs.get(time_intervals[i].startTime)
 
             if interval_value is None:
                 # The production cost value has not been defined in the indexed
@@ -604,28 +598,39 @@ class NeighborModel(Model, object):
         time_intervals = mkt.timeIntervals
         time_interval_values = [t.startTime for t in time_intervals]
 
-        # Delete any active vertices that are not in active time intervals. This
-        # prevents time intervals from accumulating indefinitely.
-        self.activeVertices = [x for x in self.activeVertices if x.timeInterval.startTime in time_interval_values]
+        # Get the default vertices.
+        default_vertices = self.defaultVertices
+
+        if len(default_vertices) == 0:
+            # No default vertices are found. Delete any active vertices that
+            # are not in active time intervals, as well as those of the first
+            # active time interval, which would have been recreated. Warn and
+            # return.
+            self.activeVertices = [x for x in self.activeVertices if x.timeInterval.startTime in time_interval_values
+                                   and x.timeInterval.startTime != time_interval_values[0]]
+            _log.warning('At least one default vertex must be defined for neighbor model object %s. '
+                         'Scheduling was not performed' % (self.name))
+            return
+
+        # Every active vertex in an active time interval is recreated below, and
+        # those in other time intervals are deleted. This prevents time intervals
+        # from accumulating indefinitely. The new vertices are collected by time
+        # interval and joined into the list of active vertices at the end, so
+        # each time interval's vertices are replaced and looked up directly
+        # instead of filtering the whole list.
+        vertices_by_interval = {}
+
+        # Group the received transactive records by time interval name.
+        received_by_interval = group_by_ti_name(self.receivedSignal)
 
         for i in range(len(time_intervals)):
             # Flag for logging demand charge 1st time only
             dc_logged = False
 
-            # Keep active vertices that are not in the indexed time interval, but
-            # discard the one(s) in the indexed time interval. These shall be
+            # Discard the vertices in the indexed time interval. These shall be
             # recreated in this iteration.
-            self.activeVertices = [x for x in self.activeVertices if
-                                   x.timeInterval.startTime != time_interval_values[i]]
-
-            # Get the default vertices.
-            default_vertices = self.defaultVertices
-
-            if len(default_vertices) == 0:
-                # No default vertices are found. Warn and return.
-                _log.warning('At least one default vertex must be defined for neighbor model object %s. '
-                             'Scheduling was not performed' % (self.name))
-                return
+            vertices_by_interval.pop(time_interval_values[i], None)
+            interval_vertices = vertices_by_interval[time_interval_values[i]] = []
 
             if not self.transactive:  # Neighbor is non-transactive
                 # Default vertices were found. Index through the default vertices.
@@ -638,11 +643,11 @@ class NeighborModel(Model, object):
                     interval_value = IntervalValue(self, time_intervals[i], mkt, MeasurementType.ActiveVertex, value)
 
                     # Append the active vertex to the list of active vertices
-                    self.activeVertices.append(interval_value)
+                    interval_vertices.append(interval_value)
 
             elif self.transactive:  # a transactive neighbor
                 # Check for transactive records in the indexed time interval.
-                received_vertices = [x for x in self.receivedSignal if x.timeInterval == time_intervals[i].name]
+                received_vertices = received_by_interval.get(time_intervals[i].name, [])
 
                 if len(received_vertices) == 0:
                     # No received transactive records address the indexed time
@@ -663,7 +668,7 @@ class NeighborModel(Model, object):
                         # Append the active vertex to the list of active
                         # vertices.
                         # self.activeVertices = [self.activeVertices, interval_value]  # IntervalValue objects
-                        self.activeVertices.append(interval_value)
+                        interval_vertices.append(interval_value)
                 else:  # at least 1 vertex received
                     # One or more transactive records have been received
                     # concerning the indexed time interval. Use these to
@@ -780,12 +785,14 @@ class NeighborModel(Model, object):
                                                                 topic=self.dc_threshold_topic,
                                                                 message=dc_msg)
 
-                                # Debug negative price & demand charge
-                                _log.debug("power: {} - demand charge threshold: {} - predicted power peak: {}"
-                                           .format(power, demand_charge_threshold, predicted_prior_peak))
-                                _log.debug("prior power: {}".format(prior_power))
-                                _log.debug("received vertices: {}"
-                                           .format([(v.timeInterval, v.power) for v in received_vertices]))
+                                # Debug negative price & demand charge. The messages list all the
+                                # received vertices, so only format them when they are logged.
+                                if _log.isEnabledFor(logging.DEBUG):
+                                    _log.debug("power: {} - demand charge threshold: {} - predicted power peak: {}"
+                                               .format(power, demand_charge_threshold, predicted_prior_peak))
+                                    _log.debug("prior power: {}".format(prior_power))
+                                    _log.debug("received vertices: {}"
+                                               .format([(v.timeInterval, v.power) for v in received_vertices]))
 
                             except:
                                 _log.error("{} has power {} AND object ({}) maxPower {} and minPower {}"
@@ -807,7 +814,7 @@ class NeighborModel(Model, object):
                                                        MeasurementType.ActiveVertex, value)
 
                         # Append the active vertex to the list of active vertices.
-                        self.activeVertices.append(interval_value)
+                        interval_vertices.append(interval_value)
 
                     # DEMAND CHARGES
                     # Check whether the power of any of the vertices was found to
@@ -818,8 +825,7 @@ class NeighborModel(Model, object):
                         # Demand charges are in play.
                         # Get the newly updated active vertices for this
                         # transactive Neighbor again in the indexed time interval.
-                        vertices = [x.value for x in self.activeVertices if
-                                    x.timeInterval.startTime == time_intervals[i].startTime]
+                        vertices = [x.value for x in interval_vertices]
 
                         # Find the marginal price that would correspond to the
                         # demand-charge threshold, based on the newly updated
@@ -837,7 +843,7 @@ class NeighborModel(Model, object):
                                                        MeasurementType.ActiveVertex, vertex)
 
                         # Store the new active vertex interval value
-                        self.activeVertices.append(interval_value)
+                        interval_vertices.append(interval_value)
 
                         # Create the marginal price of the second of the two new
                         # vertices, augmented by the demand rate.
@@ -851,14 +857,13 @@ class NeighborModel(Model, object):
                                                        MeasurementType.ActiveVertex, vertex)
 
                         # ... and finally store the active vertex.
-                        self.activeVertices.append(interval_value)
+                        interval_vertices.append(interval_value)
 
                         # Check that vertices having power greater than the
                         # demand threshold have their marginal prices reflect the
                         # demand charges. Start by picking out those in the
                         # currently indexed time interval.
-                        interval_values = [x for x in self.activeVertices
-                                           if x.timeInterval.startTime == time_intervals[i].startTime]
+                        interval_values = list(interval_vertices)
 
                         # Index through the current active vertices in the
                         # indexed time interval. At this point, these include
@@ -886,10 +891,12 @@ class NeighborModel(Model, object):
                 # Logic should not arrive here. Error.
                 raise ('Neighbor %s must be either transactive or not.' % (self.name))
 
+        self.activeVertices = [x for interval_vertices in vertices_by_interval.values() for x in interval_vertices]
+
         av = [(x.timeInterval.name, x.value.marginalPrice, x.value.power) for x in self.activeVertices]
         _log.debug("{} neighbor model active vertices are: {}".format(self.name, av))
 
-    def prep_transactive_signal(self, mkt, mtn):
+    def prep_transactive_signal(self, mkt, mtn, curves=None):
         # Prepare transactive records to send
         # to a transactive neighbor. The prepared transactive signal should
         # represent the residual flexibility offered to the transactive neighbor in
@@ -913,6 +920,8 @@ class NeighborModel(Model, object):
         # transactive signal is to be sent
         # mkt - Market object
         # mtn - myTransactiveNode object
+        # curves - optional model curves from mkt.model_curves(), shared when the
+        # signals of several neighbors are prepared after the same balance
         #
         # OUTPUTS:
         # - Updates mySignal property, which contains transactive records that
@@ -941,7 +950,10 @@ class NeighborModel(Model, object):
             # Create the vertices of the net supply or demand curve, EXCLUDING
             # this transactive neighbor (i.e., "tnm"). NOTE: It is important that
             # the transactive neighbor is excluded.
-            vertices = mkt.sum_vertices(mtn, time_intervals[i], self)  # Vertices
+            vertices = mkt.sum_vertices(mtn, time_intervals[i], self, curves)  # Vertices
+
+            # Build the curve once for the marginal prices of the records below.
+            curve = VertexCurves([vertices])
 
             # Find the minimum and maximum powers from the vertices. These are
             # soft constraints that represent a range of flexibility. The range
@@ -971,7 +983,7 @@ class NeighborModel(Model, object):
                 if len(vertices) == 1:
                     marginal_price_0 = float('inf')
                 else:
-                    marginal_price_0 = self.marginal_price_from_vertices(scheduled_power, vertices)
+                    marginal_price_0 = self.marginal_price_from_vertices(scheduled_power, curve)
             except:
                 _log.error('errors/warnings with object ' + self.name)
 
@@ -994,7 +1006,7 @@ class NeighborModel(Model, object):
 
                 # Find the marginal price on the modified net suppy or demand curve
                 # that corresponds to the minimum power
-                marginal_price_1 = self.marginal_price_from_vertices(minimum_power, vertices)
+                marginal_price_1 = self.marginal_price_from_vertices(minimum_power, curve)
 
                 # Create transactive record #1 to represent the minimum power, and
                 # populate its properties.
@@ -1011,7 +1023,7 @@ class NeighborModel(Model, object):
 
                 # Find the marginal price on the modified net supply or demand curve
                 # that corresponds to the neighbor's maximum power p
-                marginal_price_2 = self.marginal_price_from_vertices(maximum_power, vertices)  # price [$/kWh]
+                marginal_price_2 = self.marginal_price_from_vertices(maximum_power, curve)  # price [$/kWh]
 
                 # Create Transactive Record #2 and populate its properties.
                 transactive_record = TransactiveRecord(time_intervals[i], 2, marginal_price_2, maximum_power)
@@ -1091,17 +1103,20 @@ class NeighborModel(Model, object):
                    .format(Timer.get_cur_time(),
                            self.name,
                            self.location, topic, msg))
-        mtn.vip.pubsub.publish(peer='pubsub',
-                               topic=topic,
-                               message={'source': self.location,
-                                        'curves': msg,
-                                        'start_of_cycle': start_of_cycle,
-                                        'fail_to_converged': fail_to_converged})
+        result = mtn.vip.pubsub.publish(peer='pubsub',
+                                        topic=topic,
+                                        message={'source': self.location,
+                                                 'curves': msg,
+                                                 'start_of_cycle': start_of_cycle,
+                                                 'fail_to_converged': fail_to_converged})
 
         # Save the sent TransactiveRecord messages (i.e., sentSignal) as a copy
         # of the calculated set that was drawn upon by this method (i.e., mySignal).
         self.sentSignal = self.mySignal
 
+        # Return the pending publish so that the caller may wait for it.
+        return result
+
     def receive_transactive_signal(self, mtn, curves):
         # Receive and save transactive records from a transactive Neighbor object.
         # mtn = myTransactiveNode object
@@ -0,0 +1,298 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+
+
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .helpers import *
+from .measurement_type import MeasurementType
+from .interval_value import IntervalValue
+from .local_asset_model import LocalAssetModel
+from .information_service_model import InformationServiceModel
+
+_log = logging.getLogger(__name__)
+
+
+class OpenLoopLoadPredictor(LocalAssetModel, object):
+    """
+    Base class of the open-loop regression load predictors.
+
+    # LOAD = scale_factor * (DOW_Intercept(DOW)
+    #     + HOUR_SEASON_REGIME_Intercept(HOUR,SEASON,REGIME)
+    #     + Factor(HOUR,SEASON,REGIME) * TEMP)
+    Subclasses provide the lookup tables dowIntercept, season and values.
+    All active time intervals are predicted at once: the categorical indexes
+    are gathered into arrays and the table lookups and arithmetic are numpy
+    operations.
+    """
+
+    dowIntercept = []
+    season = []
+    values = []
+    scale_factor = 1.0
+
+    # Default temperature [deg.F] when no forecast is available. It is also
+    # the heating regime threshold.
+    default_temperature = 56.6
+
+    def __init__(self, temperature_forecaster):
+        super(OpenLoopLoadPredictor, self).__init__()
+        self.temperature_forecaster = temperature_forecaster
+        self._tables = None
+
+    def lookup_tables(self):
+        # Convert the class tables to arrays once per instance.
+        if self._tables is None:
+            self._tables = (np.asarray(self.dowIntercept, dtype=float),
+                            np.asarray(self.season, dtype=int),
+                            np.asarray(self.values, dtype=float))
+        return self._tables
+
+    def forecast_temperatures(self, time_intervals):
+        """
+        Forecast temperature of each time interval, or the default
+        temperature where the forecaster has no (or a None) value.
+        :param time_intervals: list of TimeInterval
+        :return: array of temperatures [deg.F]
+        """
+        temperatures = np.full(len(time_intervals), self.default_temperature)
+        if self.temperature_forecaster is None:
+            return temperatures
+        forecast = index_by_ti(self.temperature_forecaster.predictedValues)
+        for i, time_interval in enumerate(time_intervals):
+            interval_value = forecast.get(time_interval.startTime)
+            if interval_value is not None and interval_value.value is not None:
+                temperatures[i] = interval_value.value
+        return temperatures
+
+    def predict_loads(self, start_times, temperatures):
+        """
+        Predict the load of many time intervals.
+        :param start_times: interval start times (datetime)
+        :param temperatures: forecast temperatures [deg.F]
+        :return: array of loads [avg.kW], negative for consumption
+        """
+        dow_intercept, season, values = self.lookup_tables()
+        temperatures = np.asarray(temperatures, dtype=float)
+        calendar = np.array([(t.weekday(), t.hour, t.month) for t in start_times], dtype=int).reshape(-1, 3)
+        down, hour, month = calendar[:, 0], calendar[:, 1], calendar[:, 2]
+
+        SEASON = season[month - 1]
+        # Heating regime applies only in the Spring (1) and Fall (4) seasons.
+        REGIME = (((SEASON == 1) | (SEASON == 4)) & (temperatures <= self.default_temperature)).astype(int)
+
+        # Table row; Matlab is 1-based vs. python 0-based.
+        row = 6 * hour + SEASON + REGIME - 1
+
+        load = dow_intercept[down] + values[row, 0] + values[row, 1] * temperatures
+        # The table defined electric load as a positive value. The network
+        # model defines load as a negative value.
+        return -load * self.scale_factor
+
+    def schedule_power(self, mkt):
+        """
+        Predict municipal load.
+        This is a model of non-price-responsive load using an open-loop regression model.
+        :param mkt:
+        :return:
+        """
+        # Get the active time intervals.
+        time_intervals = mkt.timeIntervals  # TimeInterval objects
+        if not time_intervals:
+            return
+
+        temperatures = self.forecast_temperatures(time_intervals)
+        loads = self.predict_loads([ti.startTime for ti in time_intervals], temperatures)
+
+        # Update existing scheduled powers or create new ones.
+        scheduled = index_by_ti(self.scheduledPowers)
+        for time_interval, load in zip(time_intervals, loads.tolist()):
+            interval_value = scheduled.get(time_interval.startTime)
+            if interval_value is None:
+                interval_value = IntervalValue(self, time_interval, mkt, MeasurementType.ScheduledPower, load)
+                self.scheduledPowers.append(interval_value)
+                scheduled[time_interval.startTime] = interval_value
+            else:
+                interval_value.value = load
+
+    @classmethod
+    def predict_2017(cls, weather_file=None, year=2017):
+        """
+        Replay a year of hourly predictions and time the batch predictor
+        against predicting and upserting one interval at a time.
+        :param weather_file: CSV with Timestamp and Value (deg.F) columns; hours not in the
+        file use the default temperature.
+        :param year: year to replay
+        :return: list of (start time, scheduled power)
+        """
+        from .market import Market
+        from .time_interval import TimeInterval
+        from dateutil import parser
+
+        if weather_file is None:
+            weather_file = os.path.join(os.path.dirname(__file__), 'weather_data', 'forecast.csv')
+
+        mkt = Market()
+        start = datetime(year, 1, 1)
+        duration = timedelta(hours=1)
+        hours = int((datetime(year + 1, 1, 1) - start) / duration)
+        mkt.timeIntervals = [TimeInterval(start, duration, mkt, start, start + i * duration) for i in range(hours)]
+
+        forecaster = InformationServiceModel()
+        by_hour = {ti.startTime.replace(year=2000): ti for ti in mkt.timeIntervals
+                   if not (ti.startTime.month == 2 and ti.startTime.day == 29)}
+        with open(weather_file) as f:
+            next(f)
+            for line in f:
+                timestamp, value = line.strip().split(',')
+                timestamp = parser.parse(timestamp).replace(year=2000, minute=0, second=0, microsecond=0)
+                if timestamp in by_hour:
+                    forecaster.predictedValues.append(IntervalValue(forecaster, by_hour[timestamp], mkt,
+                                                                    MeasurementType.Temperature, float(value)))
+
+        predictor = cls(forecaster)
+        begin = time.perf_counter()
+        predictor.schedule_power(mkt)
+        batch_time = time.perf_counter() - begin
+
+        reference = cls(forecaster)
+        begin = time.perf_counter()
+        reference_schedule_power(reference, mkt)
+        loop_time = time.perf_counter() - begin
+
+        powers = [(x.timeInterval.startTime, x.value) for x in predictor.scheduledPowers]
+        difference = max(abs(x.value - y.value) for x, y in zip(predictor.scheduledPowers, reference.scheduledPowers))
+        print('{}: {} intervals, total power {:.1f} kWh'.format(cls.__name__, len(powers), sum(p[1] for p in powers)))
+        print('batch: {:.3f} s, per interval: {:.3f} s ({:.0f}x), max difference {:.2e}'.format(
+            batch_time, loop_time, loop_time / batch_time, difference))
+        return powers
+
+
+def reference_schedule_power(model, mkt):
+    """
+    schedule_power of the PNNL and Richland predictors before the batch
+    path, one time interval at a time.  Kept unchanged as the reference
+    predict_2017 checks the batch predictor against.
+    :param model: OpenLoopLoadPredictor
+    :param mkt: Market
+    :return:
+    """
+    # Get the active time intervals.
+    time_intervals = mkt.timeIntervals  # TimeInterval objects
+
+    TEMP = None
+    # Index through the active time intervals.
+    for time_interval in time_intervals:
+        # Extract the start time from the indexed time interval.
+        interval_start_time = time_interval.startTime
+
+        if model.temperature_forecaster is None:
+            # No appropriate information service was found, must use a
+            # default temperature value.
+            TEMP = 56.6  # [deg.F]
+        else:
+            # An appropriate information service was found. Get the
+            # temperature that corresponds to the indexed time interval.
+            interval_value = find_obj_by_ti(model.temperature_forecaster.predictedValues, time_interval)
+
+            if interval_value is None:
+                # No stored temperature was found. Assign a default value.
+                TEMP = 56.6  # [def.F]
+            else:
+                # A stored temperature value was found. Use it.
+                TEMP = interval_value.value  # [def.F]
+
+            if TEMP is None:
+                # The temperature value is not a number. Use a default value.
+                TEMP = 56.6  # [def.F]
+
+        # Look up the DOW_intercept of the weekday number DOWN.
+        DOWN = interval_start_time.weekday()
+        DOW_Intercept = model.dowIntercept[DOWN]
+
+        # Categorical HOUR [0,23] and SEASON, a function of MONTH.
+        HOUR = interval_start_time.hour
+        MONTH = interval_start_time.month
+        SEASON = model.season[MONTH - 1]
+
+        # Determine categorical REGIME, which is also an index for use with
+        # the HOUR_SEASON_REGIME_Intercept lookup table.
+        REGIME = 0  # The default assignment
+        if (SEASON == 1 or SEASON == 4) and TEMP <= 56.6:  # (Spring season index OR Fall season index) # AND Heating regime
+            REGIME = 1
+
+        # Calcualte the table row. Matlab is 1-based vs. python 0-based.
+        row = 6 * HOUR + SEASON + REGIME
+        row = row - 1
+
+        # Assign the Intercept and Factor values that were found.
+        HOUR_SEASON_REGIME_Intercept = model.values[row][0]
+        HOUR_SEASON_REGIME_Factor = model.values[row][1]
+
+        # Finally, predict the city load.
+        LOAD = DOW_Intercept + HOUR_SEASON_REGIME_Intercept + HOUR_SEASON_REGIME_Factor * TEMP  # [avg.kW]
+
+        # Scale for whole campus
+        LOAD *= model.scale_factor
+
+        # The table defined electric load as a positive value. The network
+        # model defines load as a negative value.
+        LOAD = -LOAD  # [avg.kW]
+
+        # Look for the scheduled power in the indexed time interval.
+        interval_value = find_obj_by_ti(model.scheduledPowers, time_interval)
+
+        if interval_value is None:
+            # No scheduled power was found in the indexed time interval.
+            # Create one and store it.
+            interval_value = IntervalValue(model, time_interval, mkt, MeasurementType.ScheduledPower, LOAD)
+            model.scheduledPowers.append(interval_value)
+        else:
+            # The interval value already exist. Simply reassign its value.
+            interval_value.value = LOAD
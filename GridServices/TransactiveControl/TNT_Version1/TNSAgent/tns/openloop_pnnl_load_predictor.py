@@ -53,11 +53,11 @@ from .measurement_type import MeasurementType
 from .interval_value import IntervalValue
 from .market import Market
 from .time_interval import TimeInterval
-from .local_asset_model import LocalAssetModel
+from .openloop_load_predictor import OpenLoopLoadPredictor
 from .temperature_forecast_model import TemperatureForecastModel
 
 
-class OpenLoopPnnlLoadPredictor(LocalAssetModel, object):
+class OpenLoopPnnlLoadPredictor(OpenLoopLoadPredictor, object):
     """
     Predict electrical load for PNNL using hour-of-day, season, heating/cooling regime, and
     forecasted Fahrenheit temperature.
@@ -256,148 +256,16 @@ class OpenLoopPnnlLoadPredictor(LocalAssetModel, object):
     ]
 
     def __init__(self, temperature_forecaster):
-        super(OpenLoopPnnlLoadPredictor, self).__init__()
-        self.temperature_forecaster = temperature_forecaster
+        super(OpenLoopPnnlLoadPredictor, self).__init__(temperature_forecaster)
         self.model_2017_consumption = 42350128.
         self.campus_2017_consumption = 91116072.
         self.scale_factor = self.campus_2017_consumption/self.model_2017_consumption
 
-    def schedule_power(self, mkt):
-        """
-        Predict municipal load.
-        This is a model of non-price-responsive load using an open-loop regression model.
-        :param mkt:
-        :return:
-        """
-
-        # Get the active time intervals.
-        time_intervals = mkt.timeIntervals  # TimeInterval objects
-
-        TEMP = None
-        # Index through the active time intervals.
-        for time_interval in time_intervals:
-            # Extract the start time from the indexed time interval.
-            interval_start_time = time_interval.startTime
-
-            if self.temperature_forecaster is None:  # if isempty(temperature_forecaster)
-                # No appropriate information service was found, must use a
-                # default temperature value.
-                TEMP = 56.6  # [deg.F]
-            else:
-                # An appropriate information service was found. Get the
-                # temperature that corresponds to the indexed time interval.
-                interval_value = find_obj_by_ti(self.temperature_forecaster.predictedValues, time_interval)
-
-                if interval_value is None:  # if isempty(interval_value)
-                    # No stored temperature was found. Assign a default value.
-                    TEMP = 56.6  # [def.F]
-                else:
-                    # A stored temperature value was found. Use it.
-                    TEMP = interval_value.value  # [def.F]
-
-                if TEMP is None:
-                    # The temperature value is not a number. Use a default value.
-                    TEMP = 56.6  # [def.F]
-
-            # Determine the DOW_Intercept.
-            # The DOW_Intercept is a function of categorical day-of-week number
-            # DOWN. Calculate the weekday number DOWN.
-            DOWN = interval_start_time.weekday()  # weekday(interval_start_time)
-
-            # Look up the DOW_intercept from the short table that is among the
-            # class's constant properties.
-            DOW_Intercept = self.dowIntercept[DOWN]
-
-            # Determine categorical HOUR of the indexed time interval. This will
-            # be needed to mine the HOUR_SEASON_REGIME_Intercept lookup table.
-            # The hour is incremented by 1 because the lookup table uses hours
-            # [1,24], not [0,23].
-            HOUR = interval_start_time.hour  # + 1
-
-            # Determine the categorical SEASON of the indexed time interval.
-            # SEASON is a function of MONTH, so start by determining the MONTH of
-            # the indexed time interval.
-            MONTH = interval_start_time.month  # MONTH = month(interval_start_time)
-
-            # Property season provides an index for use with the
-            # HOUR_SEASON_REGIME_Intercept lookup table.
-            SEASON = self.season[MONTH - 1]  # obj.season(MONTH);
-
-            # Determine categorical REGIME, which is also an index for use with
-            # the HOUR_SEASON_REGIME_Intercept lookup table.
-            REGIME = 0  # The default assignment
-            if (SEASON == 1 or SEASON == 4) and TEMP <= 56.6:  # (Spring season index OR Fall season index) # AND Heating regime
-                REGIME = 1
-
-            # Calcualte the table row. Add final 1 because of header row.
-            row = 6 * HOUR + SEASON + REGIME  # 6 * (HOUR - 1) + SEASON + REGIME
-
-            # Matlab is 1-based vs. python 0-based.
-            row = row - 1
-
-            # Assign the Intercept and Factor values that were found.
-            HOUR_SEASON_REGIME_Intercept = self.values[row][0]
-            HOUR_SEASON_REGIME_Factor = self.values[row][1]
-
-            # Finally, predict the city load.
-            LOAD = DOW_Intercept + HOUR_SEASON_REGIME_Intercept + HOUR_SEASON_REGIME_Factor * TEMP  # [avg.kW]
-
-            # Scale for whole campus
-            LOAD *= self.scale_factor
-
-            # The table defined electric load as a positive value. The network
-            # model defines load as a negative value.
-            LOAD = -LOAD  # [avg.kW]
-
-            # Look for the scheduled power in the indexed time interval.
-            interval_value = find_obj_by_ti(self.scheduledPowers, time_interval)
-
-            if interval_value is None:
-                # No scheduled power was found in the indexed time interval.
-                # Create one and store it.
-                interval_value = IntervalValue(self, time_interval, mkt, MeasurementType.ScheduledPower, LOAD)
-                self.scheduledPowers.append(interval_value)
-            else:
-                # The interval value already exist. Simply reassign its value.
-                interval_value.value = LOAD
-
     @classmethod
     def test_all(cls):
         # TEST_ALL() - test all the class methods
         print('Running OpenLoopRichlandLoadPredictor.test_all()')
         OpenLoopPnnlLoadPredictor.test_schedule_power()
-    
-    @classmethod
-    def predict_2017(cls):
-        from .market import Market
-
-        from dateutil import parser
-
-        forecaster = TemperatureForecastModel('/home/hngo/PycharmProjects/volttron-applications/pnnl/TNSAgent/campus_config')
-
-        # Create market with some time intervals
-        mkt = Market()
-        analysis_time = parser.parse("2017-01-01 00:00:00")
-        mkt.marketClearingTime = analysis_time
-        mkt.nextMarketClearingTime = mkt.marketClearingTime + mkt.marketClearingInterval
-
-        # Control steps using horizon
-        mkt.futureHorizon = timedelta(days=365)
-
-        mkt.check_intervals(analysis_time)
-
-        # set time intervals
-        forecaster.update_information(mkt)
-
-        # schedule powers
-        predictor = OpenLoopPnnlLoadPredictor(forecaster)
-        predictor.schedule_power(mkt)
-
-        powers = [(x.timeInterval.startTime, x.value) for x in predictor.scheduledPowers]
-        total_power = sum([s[1] for s in powers])
-
-        print(powers)
-        print(total_power)
 
 
 if __name__ == '__main__':
@@ -53,11 +53,11 @@ from .measurement_type import MeasurementType
 from .interval_value import IntervalValue
 from .market import Market
 from .time_interval import TimeInterval
-from .local_asset_model import LocalAssetModel
+from .openloop_load_predictor import OpenLoopLoadPredictor
 from .temperature_forecast_model import TemperatureForecastModel
 
 
-class OpenLoopRichlandLoadPredictor(LocalAssetModel, object):
+class OpenLoopRichlandLoadPredictor(OpenLoopLoadPredictor, object):
     # OPENLOOPRICHLANDLOADPREDICTOR - predicted electrical load of the City of
     # Richland using hour-of-day, season, heating/cooling regime, and
     # forecasted Fahrenheit temperature.
@@ -254,104 +254,7 @@ class OpenLoopRichlandLoadPredictor(LocalAssetModel, object):
     ]
 
     def __init__(self, temperature_forecaster):
-        super(OpenLoopRichlandLoadPredictor, self).__init__()
-        self.temperature_forecaster = temperature_forecaster
-
-    def schedule_power(self, mkt):
-        """
-        Predict municipal load.
-        This is a model of non-price-responsive load using an open-loop regression model.
-        :param mkt:
-        :return:
-        """
-
-        # Get the active time intervals.
-        time_intervals = mkt.timeIntervals  # TimeInterval objects
-        
-        TEMP = None
-        # Index through the active time intervals.
-        for time_interval in time_intervals:
-            # Extract the start time from the indexed time interval.        
-            interval_start_time = time_interval.startTime
-            
-            if self.temperature_forecaster is None:  #if isempty(temperature_forecaster)
-                # No appropriate information service was found, must use a
-                # default temperature value.
-                TEMP = 56.6  # [deg.F]
-            else:
-                # An appropriate information service was found. Get the
-                # temperature that corresponds to the indexed time interval.
-                interval_value = find_obj_by_ti(self.temperature_forecaster.predictedValues, time_interval)
-
-                if interval_value is None:  #if isempty(interval_value)
-                    # No stored temperature was found. Assign a default value.
-                    TEMP = 56.6  # [def.F]
-                else:
-                    # A stored temperature value was found. Use it.
-                    TEMP = interval_value.value  # [def.F]
-
-                if TEMP is None:
-                    # The temperature value is not a number. Use a default value.
-                    TEMP = 56.6  # [def.F]
-            
-            # Determine the DOW_Intercept.
-            # The DOW_Intercept is a function of categorical day-of-week number
-            # DOWN. Calculate the weekday number DOWN.
-            DOWN = interval_start_time.weekday()  #weekday(interval_start_time)
-            
-            # Look up the DOW_intercept from the short table that is among the
-            # class's constant properties.
-            DOW_Intercept = self.dowIntercept[DOWN]
-            
-            # Determine categorical HOUR of the indexed time interval. This will
-            # be needed to mine the HOUR_SEASON_REGIME_Intercept lookup table.
-            # The hour is incremented by 1 because the lookup table uses hours
-            # [1,24], not [0,23].
-            HOUR = interval_start_time.hour  # + 1
-            
-            # Determine the categorical SEASON of the indexed time interval.
-            # SEASON is a function of MONTH, so start by determining the MONTH of
-            # the indexed time interval.      
-            MONTH = interval_start_time.month  #MONTH = month(interval_start_time)
-            
-            # Property season provides an index for use with the 
-            # HOUR_SEASON_REGIME_Intercept lookup table.
-            SEASON = self.season[MONTH-1]  #obj.season(MONTH);
-            
-            # Determine categorical REGIME, which is also an index for use with
-            # the HOUR_SEASON_REGIME_Intercept lookup table.
-            REGIME = 0  # The default assignment
-            if (SEASON == 1 or SEASON == 4) and TEMP <= 56.6:  # (Spring season index OR Fall season index) # AND Heating regime
-                REGIME = 1
-            
-            # Calcualte the table row. Add final 1 because of header row.
-            row = 6 * HOUR + SEASON + REGIME  #6 * (HOUR - 1) + SEASON + REGIME
-            
-            # Matlab is 1-based vs. python 0-based.
-            row = row - 1
-
-            # Assign the Intercept and Factor values that were found.
-            HOUR_SEASON_REGIME_Intercept = self.values[row][0]
-            HOUR_SEASON_REGIME_Factor = self.values[row][1]
-            
-            # Finally, predict the city load.
-            LOAD = DOW_Intercept + HOUR_SEASON_REGIME_Intercept + HOUR_SEASON_REGIME_Factor * TEMP  # [avg.kW]
-            
-            # The table defined electric load as a positive value. The network
-            # model defines load as a negative value.
-            LOAD = -LOAD  # [avg.kW]
-            
-            # Look for the scheduled power in the indexed time interval.
-            interval_value = find_obj_by_ti(self.scheduledPowers, time_interval)
-            
-            if interval_value is None:
-                # No scheduled power was found in the indexed time interval.
-                # Create one and store it.
-                interval_value = IntervalValue(self, time_interval, mkt, MeasurementType.ScheduledPower, LOAD)
-                self.scheduledPowers.append(interval_value)
-            else:
-                # The interval value already exist. Simply reassign its value.
-                interval_value.value = LOAD
+        super(OpenLoopRichlandLoadPredictor, self).__init__(temperature_forecaster)
 
     @classmethod
     def test_all(cls):
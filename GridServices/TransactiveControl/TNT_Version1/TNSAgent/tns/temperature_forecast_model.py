@@ -43,7 +43,7 @@ under Contract DE-AC05-76RL01830
 
 
 import os
-import csv
+import math
 import logging
 from datetime import datetime, timedelta
 from dateutil import parser
@@ -54,6 +54,7 @@ from .information_service_model import InformationServiceModel
 from .measurement_type import MeasurementType
 from .measurement_unit import MeasurementUnit
 from .interval_value import IntervalValue
+from .weather_provider import WeatherIndex, ForecastCache, FALLBACK_HOURS
 
 from volttron.platform.agent import utils
 from volttron.platform.jsonrpc import RemoteError
@@ -79,6 +80,7 @@ class TemperatureForecastModel(InformationServiceModel, object):
         self.parent = parent
         self.predictedValues = []
         self.weather_data = []
+        self.weather_index = WeatherIndex([], [])
         self.last_modified = None
         try:
            self.localtz = dateutil.tz.tzlocal()
@@ -96,6 +98,12 @@ class TemperatureForecastModel(InformationServiceModel, object):
             self.location = [self.weather_config.get("location")]
             self.oat_point_name = self.config.get("temperature_point_name", "OutdoorAirTemperature")
             self.weather_data = None
+            self.rpc_timeout = self.weather_config.get("rpc_timeout", 15)
+            # Forecasts are cached for forecast_ttl seconds and refreshed in the background.
+            # A forecast older than forecast_max_age seconds is not used.
+            self.forecast_cache = ForecastCache(self.fetch_forecast,
+                                                self.weather_config.get("forecast_ttl", 900),
+                                                self.weather_config.get("forecast_max_age", 3600))
             # there is no easy way to check if weather service is running on a remote platform
             if self.weather_vip not in self.parent.vip.peerlist.list().get() and self.remote_platform is None:
                _log.warning("Weather service is not running!")
@@ -111,34 +119,37 @@ class TemperatureForecastModel(InformationServiceModel, object):
         if self.last_modified is None or cur_modified != self.last_modified:
             self.last_modified = cur_modified
 
-            # Clear weather_data for re-init
-            self.weather_data = []
+            # Re-index the whole file; timestamps are truncated to the hour.
+            self.weather_index = WeatherIndex.from_csv(self.weather_file)
 
-            with open(self.weather_file) as f:
-                reader = csv.DictReader(f)
-                self.weather_data = [r for r in reader]
-                for rec in self.weather_data:
-                    rec['Timestamp'] = parser.parse(rec['Timestamp']).replace(minute=0, second=0, microsecond=0)
-                    rec['Value'] = float(rec['Value'])
-
-    def get_forecast_weatherservice(self, mkt):
+    def fetch_forecast(self):
         """
-        Uses VOLTTRON DarkSky weather agent running on local or remote platform to
-        get 24 hour forecast for weather data.
-        :param mkt:
-        :return:
+        Get the hourly forecast from the weather agent.
+        :return: weather results or None if the call failed
         """
-        weather_results = None
-        weather_data = None
         try:
             result = self.parent.vip.rpc.call(self.weather_vip,
                                               "get_hourly_forecast",
                                               self.location,
-                                              external_platform=self.remote_platform).get(timeout=15)
-            weather_results = result[0]["weather_results"]
-
+                                              external_platform=self.remote_platform).get(timeout=self.rpc_timeout)
+            return result[0]["weather_results"]
         except (gevent.Timeout, RemoteError) as ex:
             _log.warning("RPC call to {} failed for weather forecast: {}".format(self.weather_vip, ex))
+        except (IndexError, KeyError, TypeError) as ex:
+            _log.warning("Unexpected weather forecast from {}: {}".format(self.weather_vip, ex))
+        return None
+
+    def get_forecast_weatherservice(self, mkt):
+        """
+        Uses VOLTTRON DarkSky weather agent running on local or remote platform to
+        get 24 hour forecast for weather data. The forecast is served from a cache
+        that is refreshed in the background, so only the first call waits for the
+        weather agent.
+        :param mkt:
+        :return:
+        """
+        weather_data = None
+        weather_results = self.forecast_cache.get()
 
         if weather_results is not None:
             try:
@@ -156,14 +167,11 @@ class TemperatureForecastModel(InformationServiceModel, object):
         # Copy weather data to predictedValues
         if weather_data is not None:
             self.predictedValues = []
-            for ti in mkt.timeIntervals:
-                # Find item which has the same timestamp as ti.timeStamp
-                start_time = ti.startTime.replace(minute=0)
-                items = [x[1] for x in weather_data if x[0] == start_time]
-
+            weather_index = WeatherIndex.from_pairs(weather_data)
+            temps = weather_index.lookup([ti.startTime for ti in mkt.timeIntervals])
+            for ti, temp in zip(mkt.timeIntervals, temps.tolist()):
                 # Create interval value and add it to predicted values
-                if items:
-                    temp = items[0]
+                if not math.isnan(temp):
                     interval_value = IntervalValue(self, ti, mkt, MeasurementType.PredictedValue, temp)
                     self.predictedValues.append(interval_value)
         elif self.predictedValues:
@@ -184,25 +192,16 @@ class TemperatureForecastModel(InformationServiceModel, object):
 
     def get_forecast_file(self, mkt):
         self.init_weather_data()
-        # Copy weather data to predictedValues
+        # Copy weather data to predictedValues. Intervals without a row for
+        # their hour use the nearest of the hours in FALLBACK_HOURS.
         self.predictedValues = []
-        for ti in mkt.timeIntervals:
-            # Find item which has the same timestamp as ti.timeStamp
-            start_time = ti.startTime.replace(minute=0)
-            items = [x for x in self.weather_data if x['Timestamp'] == start_time]
-            if len(items) == 0:
-                trial_deltas = [-1, 1, -2, 2, -24, 24]
-                for delta in trial_deltas:
-                    items = [x for x in self.weather_data if x['Timestamp'] == (start_time - timedelta(hours=delta))]
-                    if len(items) > 0:
-                        break
-
-                # None exist, raise exception
-                if len(items) == 0:
-                    raise Exception('No weather data for time: {}'.format(utils.format_timestamp(ti.startTime)))
+        temps = self.weather_index.lookup([ti.startTime for ti in mkt.timeIntervals], FALLBACK_HOURS)
+        for ti, temp in zip(mkt.timeIntervals, temps.tolist()):
+            # None exist, raise exception
+            if math.isnan(temp):
+                raise Exception('No weather data for time: {}'.format(utils.format_timestamp(ti.startTime)))
 
             # Create interval value and add it to predicted values
-            temp = items[0]['Value']
             interval_value = IntervalValue(self, ti, mkt, MeasurementType.PredictedValue, temp)
             self.predictedValues.append(interval_value)
 
@@ -44,6 +44,7 @@ under Contract DE-AC05-76RL01830
 
 
 from datetime import datetime, timedelta
+from timeit import default_timer
 
 from .model import Model
 from .vertex import Vertex
@@ -60,6 +61,7 @@ from .neighbor_model import NeighborModel
 from .local_asset import LocalAsset
 from .local_asset_model import LocalAssetModel
 from .myTransactiveNode import myTransactiveNode
+from .timer import Timer
 
 
 def test_all():
@@ -71,6 +73,7 @@ def test_all():
     test_check_marginal_prices()  # High priorty - test not completed
     test_schedule()  # High priorty - test not completed
     test_sum_vertices()  # High priorty - test not completed
+    test_sum_vertices_shared_curves()
     test_update_costs()  # High priorty - test not completed
     test_update_supply_demand()  # High priorty - test not completed
     #test_view_net_curve()  # High priorty - test not completed
@@ -86,13 +89,145 @@ def test_assign_system_vertices():
     print('Result: #s\n\n', pf)
 
 
+def create_balance_fixture(load_power=-400):
+    # Create a transactive node having a test market, a supplier Neighbor
+    # with a sloped supply curve, and an inelastic LocalAsset load.
+    mtn = myTransactiveNode()
+
+    test_mkt = Market()
+    test_mkt.name = 'test_mkt'
+    mtn.markets = [test_mkt]
+
+    test_obj1 = Neighbor()
+    test_obj1.maximumPower = 1000
+    test_obj1.minimumPower = 0
+
+    test_mdl1 = NeighborModel()
+    test_mdl1.name = 'test_supplier'
+    test_mdl1.defaultVertices = [Vertex(0.02, 0, 0), Vertex(0.08, 60, 1000)]
+    test_obj1.model = test_mdl1
+    test_mdl1.object = test_obj1
+
+    test_obj2 = LocalAsset()
+    test_obj2.maximumPower = 0
+    test_obj2.minimumPower = -1000
+
+    test_mdl2 = LocalAssetModel()
+    test_mdl2.name = 'test_load'
+    test_mdl2.defaultPower = load_power
+    test_obj2.model = test_mdl2
+    test_mdl2.object = test_obj2
+
+    mtn.neighbors = [test_obj1]
+    mtn.localAssets = [test_obj2]
+
+    return mtn, test_mkt
+
+
+def set_simulation_time(dt):
+    # Make Timer report simulated time dt (in real-time steps)
+    Timer.simulation = True
+    Timer.sim_one_hr_in_sec = 3600
+    Timer.created_time = datetime.now()
+    Timer.sim_start_time = dt
+
+
 def test_balance():
     print('Running Market.test_balance()')
-    pf = 'test is not complete'
+    pf = 'pass'
+
+    simulation = (Timer.simulation, Timer.sim_one_hr_in_sec, Timer.created_time, Timer.sim_start_time)
+    try:
+        mtn, test_mkt = create_balance_fixture()
+
+        set_simulation_time(datetime(2018, 1, 1, 12, 10, 0))
+        test_mkt.balance(mtn)
+
+        # The load of 400 kW is supplied at a marginal price of 0.02 + 0.06 * 0.4
+        if not test_mkt.converged \
+                or not all([abs(x.value - 0.044) < 0.0001 for x in test_mkt.marginalPrices]):
+            pf = 'fail'
+            print('- the market did not balance at the expected marginal price')
+        else:
+            print('- the market balanced at the expected marginal price')
+
+        if len(test_mkt.convergenceRecords) != test_mkt.balanceIteration \
+                or not test_mkt.convergenceRecords[-1]['converged']:
+            pf = 'fail'
+            print('- the convergence records are inconsistent')
+        else:
+            print('- the convergence records were kept for {} iterations'.format(test_mkt.balanceIteration))
+
+        if test_mkt.convergenceRecords[-1]['exhausted']:
+            pf = 'fail'
+            print('- the converged balance was marked exhausted')
+
+        # A balance that runs out of iterations is taken as converged, and its
+        # last record is marked exhausted
+        test_mkt.maximumIterations = 2
+        mtn.localAssets[0].model.defaultPower = -900
+        for x in test_mkt.marginalPrices:
+            x.value = 0.02
+        test_mkt.balance(mtn)
+        if not test_mkt.converged or test_mkt.balanceIteration != 1 \
+                or test_mkt.convergenceRecords[-1]['converged'] \
+                or not test_mkt.convergenceRecords[-1]['exhausted']:
+            pf = 'fail'
+            print('- the exhausted balance was not recorded as exhausted')
+        else:
+            print('- the exhausted balance was converged and recorded as exhausted')
+
+        # The next balance gets a fresh budget
+        test_mkt.maximumIterations = 100
+        mtn.localAssets[0].model.defaultPower = -400
+        test_mkt.balance(mtn)
+        if not test_mkt.converged or test_mkt.convergenceRecords[0]['iteration'] != 1:
+            pf = 'fail'
+            print('- the balance of new data did not start a fresh budget')
+        else:
+            print('- the balance of new data started a fresh budget')
+
+    finally:
+        Timer.simulation, Timer.sim_one_hr_in_sec, Timer.created_time, Timer.sim_start_time = simulation
 
     # Success
     print('- the test ran to completion')
-    print('Result: #s\n\n', pf)
+    print('Result: {}\n\n'.format(pf))
+
+
+def benchmark_balance():
+    print('Running Market.benchmark_balance()')
+    pf = 'pass'
+
+    simulation = (Timer.simulation, Timer.sim_one_hr_in_sec, Timer.created_time, Timer.sim_start_time)
+    try:
+        # Balance a rolling hourly market over several cycles with a varying
+        # load, and report the convergence records of each cycle.
+        loads = [-400, -400, -500, -500, -450, -400]
+        mtn, test_mkt = create_balance_fixture()
+        iterations = []
+        wall_time = 0.0
+
+        for hour in range(len(loads)):
+            set_simulation_time(datetime(2018, 1, 1, hour, 10, 0))
+            mtn.localAssets[0].model.defaultPower = loads[hour]
+
+            start = default_timer()
+            test_mkt.balance(mtn)
+            wall_time = wall_time + default_timer() - start
+            iterations.append(test_mkt.balanceIteration)
+            print('  - hour {}: duality gaps {}'.format(
+                hour, ['{:.2e}'.format(x['duality_gap']) for x in test_mkt.convergenceRecords]))
+
+        print('  - {} iterations per cycle, {:.1f} ms per cycle'.format(
+            iterations, wall_time * 1000 / len(iterations)))
+
+    finally:
+        Timer.simulation, Timer.sim_one_hr_in_sec, Timer.created_time, Timer.sim_start_time = simulation
+
+    # Success
+    print('- the test ran to completion')
+    print('Result: {}\n\n'.format(pf))
 
 
 def test_calculate_blended_prices():
@@ -433,6 +568,39 @@ def test_sum_vertices():
     print('Result: #s\n\n', pf)
 
 
+def test_sum_vertices_shared_curves():
+    print('Running Market.test_sum_vertices_shared_curves()')
+    pf = 'pass'
+
+    simulation = (Timer.simulation, Timer.sim_one_hr_in_sec, Timer.created_time, Timer.sim_start_time)
+    try:
+        mtn, test_mkt = create_balance_fixture()
+        set_simulation_time(datetime(2018, 1, 1, 12, 10, 0))
+        test_mkt.balance(mtn)
+
+        # The vertices summed with the curves shared by all time intervals must
+        # equal those summed interval by interval, with and without exclusion.
+        curves = test_mkt.model_curves(mtn)
+        for ote in [None, mtn.neighbors[0].model]:
+            for ti in test_mkt.timeIntervals:
+                expected = test_mkt.sum_vertices(mtn, ti, ote)
+                vertices = test_mkt.sum_vertices(mtn, ti, ote, curves)
+                if [(x.marginalPrice, x.power, x.cost) for x in vertices] \
+                        != [(x.marginalPrice, x.power, x.cost) for x in expected]:
+                    pf = 'fail'
+                    print('- the vertices in {} differ'.format(ti.name))
+
+        if pf == 'pass':
+            print('- the shared curves summed the same vertices')
+
+    finally:
+        Timer.simulation, Timer.sim_one_hr_in_sec, Timer.created_time, Timer.sim_start_time = simulation
+
+    # Success
+    print('- the test ran to completion')
+    print('Result: {}\n\n'.format(pf))
+
+
 def test_update_costs():
     print('Running Market.test_update_costs()')
     pf = 'test is not complete'
@@ -539,3 +707,4 @@ def test_view_marginal_prices():
 
 if __name__ == '__main__':
     test_all()
+    benchmark_balance()
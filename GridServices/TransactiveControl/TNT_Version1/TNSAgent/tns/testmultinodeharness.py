@@ -0,0 +1,136 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+from datetime import timedelta
+
+from .multi_node_harness import MultiNodeHarness
+
+
+def test_run_cycle():
+    print('Running test_run_cycle()')
+    pf = 'pass'
+
+    harness = MultiNodeHarness(building_count=2)
+    try:
+        reports = harness.run(2)
+    finally:
+        harness.close()
+
+    for report in reports:
+        # The exchange must come to rest within the cycle
+        if not report['drained']:
+            pf = 'fail'
+            print('  - cycle {} did not come to rest'.format(report['cycle']))
+
+        # Every node balanced its market at least once
+        if not all([x > 0 for x in report['balances'].values()]):
+            pf = 'fail'
+            print('  - a node did not balance in cycle {}: {}'.format(report['cycle'], report['balances']))
+
+        if not all(report['converged'].values()):
+            pf = 'fail'
+            print('  - a market did not converge in cycle {}: {}'.format(report['cycle'], report['converged']))
+
+        if report['signals'] == 0 or report['messages'] < report['signals']:
+            pf = 'fail'
+            print('  - unexpected message counts {} and {}'.format(report['messages'], report['signals']))
+        else:
+            print('  - cycle {}: {} messages, {} delivered signals'.format(
+                report['cycle'], report['messages'], report['signals']))
+
+    if harness.reports[1]['time'] - harness.reports[0]['time'] != timedelta(hours=1):
+        pf = 'fail'
+        print('  - the simulated clock did not advance by one hour')
+
+    # Success
+    print('- the test ran to completion')
+    print('Result: {}\n\n'.format(pf))
+
+
+def test_repeatable():
+    print('Running test_repeatable()')
+    pf = 'pass'
+
+    results = []
+    for i in range(2):
+        harness = MultiNodeHarness(building_count=1)
+        try:
+            results.append([(r['messages'], r['iterations']) for r in harness.run(1)])
+        finally:
+            harness.close()
+
+    if results[0] != results[1]:
+        pf = 'fail'
+        print('  - runs differ: {} and {}'.format(results[0], results[1]))
+    else:
+        print('  - runs have the same messages and balance iterations')
+
+    # Success
+    print('- the test ran to completion')
+    print('Result: {}\n\n'.format(pf))
+
+
+def benchmark_harness():
+    print('Running benchmark_harness()')
+    pf = 'pass'
+
+    for building_count in [1, 5, 10]:
+        harness = MultiNodeHarness(building_count=building_count)
+        try:
+            harness.run(2)
+        finally:
+            harness.close()
+        summary = harness.summary()
+        print('  - {} buildings: {:.3f} s per cycle, {:.1f} balance iterations, {:.1f} messages, {:.1f} signals'.format(
+            building_count, summary['mean_latency'], summary['mean_iterations'], summary['mean_messages'],
+            summary['mean_signals']))
+
+    # Success
+    print('- the test ran to completion')
+    print('Result: {}\n\n'.format(pf))
+
+
+if __name__ == '__main__':
+    test_run_cycle()
+    test_repeatable()
+    benchmark_harness()
@@ -43,6 +43,7 @@ under Contract DE-AC05-76RL01830
 
 
 from datetime import datetime, timedelta, date, time
+from timeit import default_timer
 from dateutil import relativedelta
 
 from .model import Model
@@ -1423,5 +1424,57 @@ def test_update_vertices():
     print('\nResult: #s\n\n', pf)
 
 
+
+def benchmark_update_vertices():
+    # Time update_vertices() for a transactive neighbor with 24 and 48 active
+    # time intervals and many received breakpoints per interval, and check
+    # that every interval got its own vertices in time interval order.
+    print('Running NeighborModel.benchmark_update_vertices()')
+    pf = 'pass'
+
+    for interval_count in [24, 48]:
+        for breakpoint_count in [10, 100]:
+            test_market = Market()
+            dt = datetime(2020, 8, 3)
+            test_market.timeIntervals = [TimeInterval(dt, timedelta(hours=1), test_market, dt, dt + timedelta(hours=i))
+                                         for i in range(interval_count)]
+
+            test_model = NeighborModel()
+            test_object = Neighbor()
+            test_object.maximumPower = 10000
+            test_object.minimumPower = 0
+            test_object.lossFactor = 0.01
+            test_object.model = test_model
+            test_model.object = test_object
+            test_model.transactive = True
+            test_model.defaultVertices = [Vertex(0.05, 0, 100)]
+            test_model.demandThreshold = 1e6
+
+            # Record 0 is the balance point, the others are the breakpoints of
+            # the received supply curve. Interleave the intervals as received
+            # signals need not be ordered by time interval.
+            test_model.receivedSignal = [TransactiveRecord(ti, k, 0.02 + 0.001 * k, 10.0 * (k + 1))
+                                         for k in range(breakpoint_count + 1)
+                                         for ti in test_market.timeIntervals]
+
+            start = default_timer()
+            for _ in range(10):
+                test_model.update_vertices(test_market)
+            elapsed = (default_timer() - start) / 10
+
+            expected = [ti.startTime for ti in test_market.timeIntervals for _ in range(breakpoint_count)]
+            if [x.timeInterval.startTime for x in test_model.activeVertices] != expected:
+                pf = 'fail'
+                print('  - the active vertices do not match the time intervals and breakpoints')
+
+            print('  - {} intervals x {} breakpoints: {:.2f} ms per update'.format(interval_count, breakpoint_count,
+                                                                                  elapsed * 1000))
+
+    # Success.
+    print('- the test ran to completion')
+    print('\nResult: #s\n\n', pf)
+
+
 if __name__ == '__main__':
     test_all()
+    benchmark_update_vertices()
@@ -0,0 +1,218 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+
+
+from datetime import datetime, timedelta
+from timeit import default_timer
+
+from .helpers import *
+from .vertex import Vertex
+from .time_interval import TimeInterval
+from .interval_value import IntervalValue
+from .measurement_type import MeasurementType
+from .market import Market
+from .local_asset_model import LocalAssetModel
+from .neighbor_model import NeighborModel
+from .vertex_curves import VertexCurves
+
+
+def create_test_object(vertex_sets):
+    # Create a local asset model having one time interval for each set of
+    # active vertices
+    test_market = Market()
+    test_object = LocalAssetModel()
+    test_object.activeVertices = []
+
+    dt = datetime.now()
+    time_intervals = []
+    for i in range(len(vertex_sets)):
+        st = dt + timedelta(hours=i)
+        ti = TimeInterval(dt, timedelta(hours=1), test_market, dt, st)
+        time_intervals.append(ti)
+        for v in vertex_sets[i]:
+            test_object.activeVertices.append(
+                IntervalValue(test_object, ti, test_market, MeasurementType.ActiveVertex, v))
+
+    return test_object, time_intervals
+
+
+# Vertex sets that include vertical and horizontal segments, a lone vertex,
+# and unsorted vertices.
+test_vertex_sets = [
+    [Vertex(0.0200, 5.00, 0.0), Vertex(0.0200, 7.00, 100.0), Vertex(0.0250, 9.25, 200.0)],
+    [Vertex(0.0300, 4.00, 50.0)],
+    [Vertex(0.0400, 9.00, 150.0), Vertex(0.0100, 1.00, -50.0), Vertex(0.0300, 6.00, 150.0)],
+    [Vertex(0.0100, 0.00, -100.0), Vertex(0.0500, 20.00, 100.0)]
+]
+
+
+def test_production_costs():
+    print('Running test_production_costs()')
+    pf = 'pass'
+
+    test_object, time_intervals = create_test_object(test_vertex_sets)
+    curves = VertexCurves.from_model(test_object, time_intervals)
+
+    # The costs of all time intervals must agree with prod_cost_from_vertices()
+    for test_power in [-150.0, -50.0, 0.0, 25.0, 100.0, 120.0, 150.0, 200.0, 250.0]:
+        costs = curves.production_costs([test_power] * len(time_intervals))
+        expected = [prod_cost_from_vertices(test_object, ti, test_power) for ti in time_intervals]
+        if not all([abs(costs[i] - expected[i]) < 0.0001 for i in range(len(expected))]):
+            pf = 'fail'
+            print('  - production costs at {} differ: {} vs. {}'.format(test_power, list(costs), expected))
+
+    if pf == 'pass':
+        print('- the production costs were correctly calculated')
+
+    # Success
+    print('- the test ran to completion')
+    print('Result: {}\n\n'.format(pf))
+
+
+def test_productions():
+    print('Running test_productions()')
+    pf = 'pass'
+
+    test_object, time_intervals = create_test_object(test_vertex_sets)
+    curves = VertexCurves.from_model(test_object, time_intervals)
+
+    # The powers of all time intervals must agree with production()
+    for test_price in [-0.010, 0.000, 0.010, 0.020, 0.0225, 0.030, 0.035, 0.040, 0.060]:
+        powers = curves.productions([test_price] * len(time_intervals))
+        expected = [production(test_object, test_price, ti) for ti in time_intervals]
+        if not all([abs(powers[i] - expected[i]) < 0.0001 for i in range(len(expected))]):
+            pf = 'fail'
+            print('  - powers at {} differ: {} vs. {}'.format(test_price, list(powers), expected))
+
+    if pf == 'pass':
+        print('- the powers were correctly calculated')
+
+    # Several prices may be evaluated on the curve of one time interval
+    powers = curves.productions([0.000, 0.020, 0.0225, 0.030], 0)
+    if not all([abs(powers[i] - [0.0, 100.0, 150.0, 200.0][i]) < 0.0001 for i in range(4)]):
+        pf = 'fail'
+        print('- the powers of one time interval were incorrectly calculated')
+    else:
+        print('- the powers of one time interval were correctly calculated')
+
+    # Success
+    print('- the test ran to completion')
+    print('Result: {}\n\n'.format(pf))
+
+
+def test_marginal_prices():
+    print('Running test_marginal_prices()')
+    pf = 'pass'
+
+    # Below the first vertex, on the vertical and sloped segments, and above
+    # the last vertex of the first vertex set
+    curves = VertexCurves([test_vertex_sets[0]])
+    marginal_prices = curves.marginal_prices([-50.0, 50.0, 150.0, 250.0], 0)
+    expected = [0.0200, 0.0200, 0.0225, 0.0250]
+    if not all([abs(marginal_prices[i] - expected[i]) < 0.0001 for i in range(len(expected))]):
+        pf = 'fail'
+        print('- the marginal prices were incorrectly calculated')
+    else:
+        print('- the marginal prices were correctly calculated')
+
+    # NeighborModel.marginal_price_from_vertices() accepts either the vertices
+    # or the curve built from them
+    test_model = NeighborModel()
+    if test_model.marginal_price_from_vertices(150.0, test_vertex_sets[0]) \
+            != test_model.marginal_price_from_vertices(150.0, curves):
+        pf = 'fail'
+        print('- the neighbor model found different marginal prices')
+    else:
+        print('- the neighbor model found the same marginal prices')
+
+    # Interpolated between the two vertices of the last set
+    marginal_price = VertexCurves([test_vertex_sets[3]]).marginal_prices(0.0, 0)[0]
+    if abs(marginal_price - 0.030) >= 0.0001:
+        pf = 'fail'
+        print('- the marginal price was incorrectly interpolated')
+    else:
+        print('- the marginal price was correctly interpolated')
+
+    # Success
+    print('- the test ran to completion')
+    print('Result: {}\n\n'.format(pf))
+
+
+def benchmark_vertex_curves():
+    print('Running benchmark_vertex_curves()')
+    pf = 'pass'
+
+    # Time the scalar helpers against the curves over all time intervals.
+    for interval_count in [24, 48]:
+        for vertex_count in [10, 100]:
+            vertex_sets = [[Vertex(0.001 * j, float(j), 10.0 * j) for j in range(vertex_count)]
+                           for i in range(interval_count)]
+            test_object, time_intervals = create_test_object(vertex_sets)
+            test_powers = [5.0 * vertex_count] * interval_count
+            test_prices = [0.0005 * vertex_count] * interval_count
+
+            start = default_timer()
+            [prod_cost_from_vertices(test_object, time_intervals[i], test_powers[i]) for i in range(interval_count)]
+            [production(test_object, test_prices[i], time_intervals[i]) for i in range(interval_count)]
+            scalar = default_timer() - start
+
+            start = default_timer()
+            curves = VertexCurves.from_model(test_object, time_intervals)
+            curves.production_costs(test_powers)
+            curves.productions(test_prices)
+            batched = default_timer() - start
+
+            print('  - {} intervals x {} vertices: {:.2f} ms scalar, {:.2f} ms batched'.format(
+                interval_count, vertex_count, scalar * 1000, batched * 1000))
+
+    # Success
+    print('- the test ran to completion')
+    print('Result: {}\n\n'.format(pf))
+
+
+if __name__ == '__main__':
+    test_production_costs()
+    test_productions()
+    test_marginal_prices()
+    benchmark_vertex_curves()
@@ -0,0 +1,193 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+
+import math
+from datetime import datetime, timedelta
+
+import gevent
+from gevent.event import Event
+
+from . import weather_provider
+from .weather_provider import FALLBACK_HOURS, ForecastCache, WeatherIndex
+
+
+class FakeClock(object):
+    # Stands in for module time in weather_provider
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_lookup():
+    print('Running test_lookup()')
+    pf = 'pass'
+
+    start = datetime(2020, 7, 1, 0, 0, 0)
+    # Hours 0, 1, 3 and 4, with a second row at hour 3 that must not win
+    pairs = [[start + timedelta(hours=h), float(h)] for h in [4, 3, 0, 1]]
+    pairs.append([start + timedelta(hours=3, minutes=30), 30.0])
+    index = WeatherIndex.from_pairs(pairs)
+
+    # Times are truncated to the hour
+    values = index.lookup([start + timedelta(minutes=45), start + timedelta(hours=3, minutes=59)])
+    if values.tolist() != [0.0, 3.0]:
+        pf = 'fail'
+        print('- the times were not truncated to the hour: {}'.format(values.tolist()))
+    else:
+        print('- the times were truncated to the hour')
+
+    # Without fallback offsets a missing hour is NaN
+    values = index.lookup([start + timedelta(hours=2), start + timedelta(hours=9)])
+    if not all([math.isnan(x) for x in values]):
+        pf = 'fail'
+        print('- the missing hours were not NaN')
+    else:
+        print('- the missing hours were NaN')
+
+    # Hour 2 is missing: offset +1 (hour 3) is tried before -1 (hour 1).
+    # Hour 5 finds -1 (hour 4), and hour 9 matches none of the offsets.
+    values = index.lookup([start + timedelta(hours=h) for h in [2, 5, 9]], FALLBACK_HOURS)
+    if values[0] != 3.0 or values[1] != 4.0 or not math.isnan(values[2]):
+        pf = 'fail'
+        print('- the fallback offsets were not tried in order: {}'.format(values.tolist()))
+    else:
+        print('- the fallback offsets were tried in order')
+
+    # The day offsets come last
+    values = index.lookup([start + timedelta(hours=25)], [0, 24, -24])
+    if values.tolist() != [1.0]:
+        pf = 'fail'
+        print('- the day offset was not used')
+    else:
+        print('- the day offset was used')
+
+    if not math.isnan(WeatherIndex.from_pairs([]).lookup([start])[0]):
+        pf = 'fail'
+        print('- an empty index did not return NaN')
+
+    # Success
+    print('- the test ran to completion')
+    print('Result: {}\n\n'.format(pf))
+
+
+def test_forecast_cache():
+    print('Running test_forecast_cache()')
+    pf = 'pass'
+
+    clock = FakeClock()
+    time_module = weather_provider.time
+    weather_provider.time = clock
+    try:
+        results = ['first', 'second']
+        released = Event()
+        released.set()
+        calls = []
+
+        def fetch():
+            calls.append(clock.now)
+            released.wait()
+            return results.pop(0) if results else None
+
+        cache = ForecastCache(fetch, ttl=900, max_age=3600)
+
+        # The first get waits for the forecast, later ones are served from the cache
+        if cache.get() != 'first' or cache.get() != 'first' or len(calls) != 1:
+            pf = 'fail'
+            print('- the forecast was not cached')
+        else:
+            print('- the forecast was cached')
+
+        # Once the ttl expires, gets keep the cached forecast and start a
+        # single background refresh
+        clock.now += 900
+        released.clear()
+        if cache.get() != 'first' or cache.get() != 'first':
+            pf = 'fail'
+            print('- the stale forecast was not served while refreshing')
+        gevent.sleep(0)
+        released.set()
+        cache.pending.join()
+        if len(calls) != 2 or cache.get() != 'second':
+            pf = 'fail'
+            print('- the forecast was refreshed {} times'.format(len(calls) - 1))
+        else:
+            print('- the forecast was refreshed once in the background')
+
+        # A failed refresh keeps the forecast until it is max_age old
+        clock.now += 900
+        cache.get()
+        cache.pending.join()
+        if cache.get() != 'second':
+            pf = 'fail'
+            print('- the failed refresh dropped the forecast')
+        else:
+            print('- the failed refresh kept the forecast')
+
+        clock.now += 2700
+        if cache.get() is not None:
+            pf = 'fail'
+            print('- the forecast older than max_age was returned')
+        else:
+            print('- the forecast older than max_age was not returned')
+        cache.pending.join()
+
+        # A failed first fetch returns None
+        cache = ForecastCache(lambda: None)
+        if cache.get() is not None:
+            pf = 'fail'
+            print('- the failed first fetch returned a forecast')
+
+    finally:
+        weather_provider.time = time_module
+
+    # Success
+    print('- the test ran to completion')
+    print('Result: {}\n\n'.format(pf))
+
+
+if __name__ == '__main__':
+    test_lookup()
+    test_forecast_cache()
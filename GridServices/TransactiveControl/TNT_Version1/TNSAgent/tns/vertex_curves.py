@@ -0,0 +1,294 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+
+
+
+import numpy as np
+
+from .helpers import get_duration_in_hour
+
+
+def outer(rows, values):
+    # Pair every row with every value, row by row, for evaluating several
+    # curves at the same values in one call.
+    #
+    # OUTPUTS:
+    # rows, values - flat arrays of len(rows) * len(values) pairs
+    rows = np.asarray(rows, dtype=int)
+    values = np.asarray(values, dtype=float)
+    return np.repeat(rows, values.size), np.tile(values, rows.size)
+
+
+def fill_missing(values, fallback):
+    # Replace the undefined (NaN) entries of an evaluation with fallback(j),
+    # j being the index of the entry.
+    #
+    # OUTPUTS:
+    # values - list
+    result = values.tolist()
+    for j in np.flatnonzero(np.isnan(values)):
+        result[j] = fallback(j)
+    return result
+
+
+def column_sums(values, columns):
+    # Sum a flat, row by row table (see outer()) over its rows. The rows are
+    # added in order, starting from 0.0, exactly as a loop over the rows would.
+    #
+    # OUTPUTS:
+    # sums - list with one sum per column
+    table = np.asarray(values, dtype=float).reshape(-1, columns)
+    table = np.concatenate([np.zeros((1, columns)), table])
+    return np.cumsum(table, axis=0)[-1].tolist()
+
+
+class VertexCurves:
+    # Piecewise-linear supply or demand curves of several time intervals, held
+    # in numpy arrays so that production costs, marginal prices and powers can
+    # be evaluated for all time intervals in one call.
+    #
+    # Row i holds the vertices of curve i ordered by increasing marginal price
+    # and power, as done by helpers.order_vertices(). The curves are built once
+    # per update of the active vertices; the evaluation methods follow
+    # helpers.prod_cost_from_vertices(), helpers.production() and
+    # NeighborModel.marginal_price_from_vertices() and return NaN where those
+    # functions find no value.
+
+    def __init__(self, vertices, durations=None):
+        # INPUTS:
+        # vertices - list holding a list of Vertex objects for each curve
+        # durations - duration of each curve's time interval [h], used for
+        # production costs. Defaults to 1 h.
+        rows = len(vertices)
+        width = max([len(x) for x in vertices] + [1])
+
+        self.counts = np.array([len(x) for x in vertices], dtype=int)
+        self.marginalPrices = np.full((rows, width), np.nan)  # [$/kWh]
+        self.powers = np.full((rows, width), np.nan)  # [avg.kW]
+        self.costs = np.full((rows, width), np.nan)  # [$]
+
+        for i, row in enumerate(vertices):
+            n = len(row)
+            self.marginalPrices[i, :n] = [x.marginalPrice for x in row]
+            self.powers[i, :n] = [x.power for x in row]
+            self.costs[i, :n] = [x.cost for x in row]
+
+        # Order each row by marginal price, then power. The sort is stable and
+        # places the NaN padding last.
+        order = np.lexsort((self.powers, self.marginalPrices), axis=-1)
+        self.marginalPrices = np.take_along_axis(self.marginalPrices, order, axis=-1)
+        self.powers = np.take_along_axis(self.powers, order, axis=-1)
+        self.costs = np.take_along_axis(self.costs, order, axis=-1)
+
+        if durations is None:
+            durations = np.ones(rows)
+        self.durations = np.asarray(durations, dtype=float)  # [h]
+
+    @classmethod
+    def from_model(cls, obj, time_intervals):
+        # Build the curves of an asset or neighbor model from its active vertices
+        #
+        # INPUTS:
+        # obj - LocalAssetModel or NeighborModel object
+        # time_intervals - TimeInterval objects, one curve is built for each
+        vertices = {}
+        for x in obj.activeVertices:
+            vertices.setdefault(x.timeInterval.startTime, []).append(x.value)
+
+        return cls([vertices.get(ti.startTime, []) for ti in time_intervals],
+                   [get_duration_in_hour(ti.duration) for ti in time_intervals])
+
+    def __len__(self):
+        return len(self.counts)
+
+    def _points(self, values, rows):
+        # Pair each evaluation value with the row of the curve it applies to.
+        # By default value i is evaluated on curve i.
+        if rows is None:
+            rows = np.arange(len(self.counts))
+        rows = np.atleast_1d(np.asarray(rows, dtype=int))
+        values = np.asarray(values, dtype=float)
+        if rows.size == 1 and values.ndim == 1:
+            rows = np.repeat(rows, values.size)
+        values = np.broadcast_to(values, rows.shape).astype(float)
+        return rows, values
+
+    def _first_segment(self, x, lower, upper, counts, candidates):
+        # Index k of the first segment, k < count - 1, for which
+        # lower[k] <= x < upper[k], for each candidate row. Returns k and a
+        # flag that is false where no segment qualifies.
+        n = len(x)
+        if lower.shape[1] == 0:
+            return np.zeros(n, dtype=int), np.zeros(n, dtype=bool)
+        segments = np.arange(lower.shape[1]) < (counts - 1)[:, None]
+        match = segments & (lower <= x[:, None]) & (x[:, None] < upper) & candidates[:, None]
+        return match.argmax(axis=1), match.any(axis=1)
+
+    def production_costs(self, powers, rows=None):
+        # Production costs at the given powers (see
+        # helpers.prod_cost_from_vertices())
+        #
+        # OUTPUTS:
+        # cost - production cost in each curve's time interval [$]
+        rows, x = self._points(powers, rows)
+        counts = self.counts[rows]
+        p = self.powers[rows]
+        mp = self.marginalPrices[rows]
+        c = self.costs[rows]
+        dur = self.durations[rows]
+        r = np.arange(len(rows))
+        last = np.maximum(counts - 1, 0)
+
+        cost = np.full(len(rows), np.nan)
+
+        # Only generation and importation of electricity contribute
+        negative = x < 0.0
+        cost[negative] = 0.0
+
+        single = ~negative & (counts == 1)
+        cost[single] = c[single, 0]
+
+        multiple = ~negative & (counts > 1)
+        at_minimum = multiple & (x <= p[:, 0])
+        cost[at_minimum] = c[at_minimum, 0]
+
+        at_maximum = multiple & ~at_minimum & (x >= p[r, last])
+        cost[at_maximum] = c[r, last][at_maximum]
+
+        between = multiple & ~at_minimum & ~at_maximum
+        k, found = self._first_segment(x, p[:, :-1], p[:, 1:], counts, between)
+        if found.any():
+            k1 = np.minimum(k + 1, p.shape[1] - 1)
+            a0 = c[r, k]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                a1 = mp[r, k]
+                a1 = a1 * (x - p[r, k])
+                a1 = a1 * dur
+                a2 = mp[r, k1] - mp[r, k]
+                a2 = a2 / (p[r, k1] - p[r, k])
+                a2 = a2 * (x - p[r, k]) ** 2
+                a2 = a2 * dur
+            a2 = np.where(p[r, k1] == p[r, k], 0.0, a2)
+            segment_cost = a0 + a1 + a2
+            cost[found] = segment_cost[found]
+
+        return cost
+
+    def productions(self, prices, rows=None):
+        # Powers at the given marginal prices (see helpers.production())
+        #
+        # OUTPUTS:
+        # power - economic power production in each curve's time interval [avg.kW]
+        rows, x = self._points(prices, rows)
+        counts = self.counts[rows]
+        p = self.powers[rows]
+        mp = self.marginalPrices[rows]
+        r = np.arange(len(rows))
+        last = np.maximum(counts - 1, 0)
+
+        power = np.full(len(rows), np.nan)
+
+        single = counts == 1
+        power[single] = p[single, 0]
+
+        multiple = counts > 1
+        below = multiple & (x < mp[:, 0])
+        power[below] = p[below, 0]
+
+        above = multiple & ~below & (x >= mp[r, last])
+        power[above] = p[r, last][above]
+
+        between = multiple & ~below & ~above
+        if mp.shape[1] > 1:
+            # The first vertex k for which the price lies on the segment that
+            # starts at k, or equals the vertex's marginal price.
+            segments = np.arange(mp.shape[1] - 1) < (counts - 1)[:, None]
+            lower = mp[:, :-1]
+            upper = mp[:, 1:]
+            on_segment = segments & (lower <= x[:, None]) & (x[:, None] < upper)
+            at_vertex = segments & (x[:, None] == lower)
+            match = (on_segment | at_vertex) & between[:, None]
+            k = match.argmax(axis=1)
+            found = match.any(axis=1)
+            if found.any():
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    interpolated = p[r, k] + (x - mp[r, k]) * (p[r, k + 1] - p[r, k]) / (mp[r, k + 1] - mp[r, k])
+                # Vertices that lie vertically at the price take the greater power.
+                value = np.where(on_segment[r, k], interpolated, np.where(x == mp[r, k + 1], p[r, k + 1], p[r, k]))
+                power[found] = value[found]
+
+        return power
+
+    def marginal_prices(self, powers, rows=None):
+        # Marginal prices at the given powers (see
+        # NeighborModel.marginal_price_from_vertices())
+        #
+        # OUTPUTS:
+        # mp - marginal price in each curve's time interval [$/kWh]
+        rows, x = self._points(powers, rows)
+        counts = self.counts[rows]
+        p = self.powers[rows]
+        mp = self.marginalPrices[rows]
+        r = np.arange(len(rows))
+        last = np.maximum(counts - 1, 0)
+
+        marginal_price = np.full(len(rows), np.nan)
+
+        defined = counts > 0
+        below = defined & (x < p[:, 0])
+        marginal_price[below] = mp[below, 0]
+
+        above = defined & ~below & (x >= p[r, last])
+        marginal_price[above] = mp[r, last][above]
+
+        between = defined & ~below & ~above
+        k, found = self._first_segment(x, p[:, :-1], p[:, 1:], counts, between)
+        if found.any():
+            k1 = np.minimum(k + 1, p.shape[1] - 1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                slope = (mp[r, k1] - mp[r, k]) / (p[r, k1] - p[r, k])
+                interpolated = mp[r, k] + (x - p[r, k]) * slope
+            marginal_price[found] = interpolated[found]
+
+        return marginal_price
@@ -0,0 +1,193 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+
+
+import csv
+import logging
+import time
+import warnings
+from datetime import datetime, timedelta
+
+import gevent
+import numpy as np
+from dateutil import parser
+
+_log = logging.getLogger(__name__)
+
+# Hour offsets tried, in order, when a weather file has no row for an interval.
+FALLBACK_HOURS = [0, 1, -1, 2, -2, 24, -24]
+
+
+def to_hours(times):
+    """
+    Convert datetimes (naive or aware; aware ones keep their wall-clock
+    time) to an array of numpy hours.
+    """
+    return np.array([t.replace(tzinfo=None) for t in times], dtype='datetime64[h]')
+
+
+def parse_hours(timestamps):
+    """
+    Parse timestamp strings to an array of numpy hours (minutes and seconds
+    dropped). ISO 8601 strings are parsed in one vectorized call; any other
+    format, or strings carrying a time zone, fall back to dateutil per row.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            return np.array(timestamps, dtype='datetime64[s]').astype('datetime64[h]')
+    except (ValueError, UserWarning, DeprecationWarning):
+        return to_hours([parser.parse(ts) for ts in timestamps])
+
+
+class WeatherIndex(object):
+    """
+    Hourly weather values sorted by time for O(log n) lookups.
+
+    Rows with the same hour keep their file order, so lookups return the
+    first row of an hour as the linear scans did.
+    """
+    def __init__(self, hours, values):
+        order = np.argsort(hours, kind='stable')
+        self.hours = np.asarray(hours, dtype='datetime64[h]')[order]
+        self.values = np.asarray(values, dtype=float)[order]
+
+    def __len__(self):
+        return len(self.hours)
+
+    @classmethod
+    def from_csv(cls, filename, time_column='Timestamp', value_column='Value'):
+        with open(filename) as f:
+            rows = list(csv.DictReader(f))
+        return cls(parse_hours([r[time_column] for r in rows]), [float(r[value_column]) for r in rows])
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """
+        :param pairs: list of [datetime, value]
+        """
+        return cls(to_hours([p[0] for p in pairs]), [p[1] for p in pairs])
+
+    def lookup(self, times, fallback_hours=(0,)):
+        """
+        Values at many times.  For each time the offsets in fallback_hours
+        are tried in order and the first hour present in the index wins.
+        :param times: list of datetime
+        :param fallback_hours: hour offsets to try
+        :return: array of values, NaN where no offset matched
+        """
+        targets = to_hours(times)
+        result = np.full(len(targets), np.nan)
+        missing = np.ones(len(targets), dtype=bool)
+        if not len(self.hours):
+            return result
+        for offset in fallback_hours:
+            if not missing.any():
+                break
+            candidates = targets[missing] + np.timedelta64(offset, 'h')
+            positions = np.searchsorted(self.hours, candidates)
+            found = positions < len(self.hours)
+            found[found] = self.hours[positions[found]] == candidates[found]
+            indexes = np.flatnonzero(missing)[found]
+            result[indexes] = self.values[positions[found]]
+            missing[indexes] = False
+        return result
+
+
+class ForecastCache(object):
+    """
+    Time-to-live cache of a forecast fetched over RPC.
+
+    get() returns the cached forecast without waiting.  Once it is older
+    than ttl seconds a single background greenlet refreshes it.  Only the
+    first get(), when nothing has been fetched yet, waits for the fetch.
+    fetch() returns the forecast or None on failure; a failed refresh keeps
+    the previous forecast, but get() returns None once it is older than
+    max_age seconds so that callers handle the missing forecast.
+    """
+    def __init__(self, fetch, ttl=900, max_age=3600):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_age = max_age
+        self.data = None
+        self.fetched_at = None
+        self.attempted = False
+        self.pending = None
+
+    def age(self):
+        """
+        :return: seconds since the last successful fetch, None before it
+        """
+        if self.fetched_at is None:
+            return None
+        return time.monotonic() - self.fetched_at
+
+    def is_stale(self):
+        return self.fetched_at is None or self.age() >= self.ttl
+
+    def get(self):
+        if not self.attempted:
+            self._refresh()
+        elif self.is_stale():
+            self.refresh()
+        if self.fetched_at is None or self.age() >= self.max_age:
+            return None
+        return self.data
+
+    def refresh(self):
+        """
+        Start a background refresh unless one is already running.
+        :return: the refresh greenlet
+        """
+        if self.pending is None or self.pending.dead:
+            self.pending = gevent.spawn(self._refresh)
+        return self.pending
+
+    def _refresh(self):
+        self.attempted = True
+        data = self.fetch()
+        if data is not None:
+            self.data = data
+            self.fetched_at = time.monotonic()
+        return data
@@ -53,7 +53,7 @@ setup(
     include_package_data=True,
     name=package + 'agent',
     version=__version__,
-    install_requires=['volttron>=3.0', 'sympy'],
+    install_requires=['volttron>=3.0', 'sympy', 'numpy', 'transactive-utils'],
     packages=packages,
     entry_points={
         'setuptools.installation': [
@@ -42,10 +42,14 @@ under Contract DE-AC05-76RL01830
 """
 
 import logging
-import re
+import math
+from collections import defaultdict
+from datetime import datetime
+from functools import lru_cache
+import numpy as np
 from dateutil.parser import parse
 from sympy.parsing.sympy_parser import parse_expr
-from sympy import symbols
+from sympy import symbols, lambdify
 from volttron.platform.agent.utils import setup_logging
 
 __version__ = "0.2"
@@ -54,6 +58,17 @@ setup_logging()
 _log = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4096)
+def clean_text(text):
+    """
+    Remove spaces so point names can be used as sympy symbols.  Device
+    messages repeat the same point names so the result is cached.
+    :param text:
+    :return:
+    """
+    return text.replace(" ", "")
+
+
 def parse_sympy(data, condition=False):
     """
     :param condition:
@@ -61,12 +76,6 @@ def parse_sympy(data, condition=False):
     :return:
     """
 
-    def clean_text(text, rep={" ": ""}):
-        rep = dict((re.escape(k), v) for k, v in rep.items())
-        pattern = re.compile("|".join(rep.keys()))
-        new_key = pattern.sub(lambda m: rep[re.escape(m.group(0))], text)
-        return new_key
-
     if isinstance(data, dict):
         return_data = {}
         for key, value in data.items():
@@ -88,6 +97,109 @@ def parse_sympy(data, condition=False):
         return_data = clean_text(data)
     return return_data
 
+
+class CompiledExpression(object):
+    """
+    Sympy expression compiled once into a numpy callable.
+
+    The point names in args are bound to the callable's positional
+    arguments so evaluating a device message is a dict lookup per point
+    followed by a single call instead of a sympy substitution.  The same
+    callable evaluates a whole column of messages when given arrays.
+    """
+    def __init__(self, expression, args):
+        self.expression = expression
+        self.args = tuple(args)
+        self.expr = parse_expr(expression)
+        _symbols = symbols(self.args)
+        unbound = self.expr.free_symbols - set(_symbols)
+        if unbound:
+            _log.warning("{} uses points missing from its args: {}".format(expression, unbound))
+        self.func = lambdify(_symbols, self.expr, modules="numpy")
+
+    def __call__(self, data):
+        """
+        Evaluate the expression for one device message.
+        :param data: dict of cleaned point name -> value.
+        :return:
+        """
+        return self.func(*[data[arg] for arg in self.args])
+
+    def evaluate_many(self, rows):
+        """
+        Evaluate the expression for several device messages in one call.
+        :param rows: list of dicts of cleaned point name -> value.
+        :return: float array with one value per row.
+        """
+        columns = [np.asarray([row[arg] for row in rows], dtype=float) for arg in self.args]
+        result = self.func(*columns)
+        return np.broadcast_to(np.asarray(result, dtype=float), (len(rows),))
+
+    def __repr__(self):
+        return self.expression
+
+
+@lru_cache(maxsize=None)
+def _compile(expression, args):
+    return CompiledExpression(expression, args)
+
+
+def compile_expression(expression, args):
+    """
+    Return the compiled expression, shared by every device configured
+    with the same expression and args.
+    :param expression: cleaned expression string, may be empty.
+    :param args: cleaned point names.
+    :return: CompiledExpression or None if expression is empty.
+    """
+    if not expression:
+        return None
+    return _compile(expression, tuple(args))
+
+
+def is_on(value):
+    """
+    Interpret an evaluated on condition, NaN or a non-numeric result is off.
+    :param value:
+    :return:
+    """
+    try:
+        return bool(value) and not math.isnan(value)
+    except (TypeError, ValueError):
+        return False
+
+
+def evaluate_batch(expressions, rows, default=0.):
+    """
+    Evaluate one expression per row, grouping rows that share a compiled
+    expression so each group is a single vectorized call.
+    :param expressions: list of CompiledExpression or None.
+    :param rows: list of dicts of cleaned point name -> value.
+    :param default: value used where the expression is None.
+    :return: float array with one value per row.
+    """
+    results = np.full(len(rows), default, dtype=float)
+    groups = defaultdict(list)
+    for index, expr in enumerate(expressions):
+        if expr is not None:
+            groups[expr].append(index)
+    for expr, indices in groups.items():
+        results[indices] = expr.evaluate_many([rows[index] for index in indices])
+    return results
+
+
+def parse_date(value):
+    """
+    Parse a message Date header, ISO 8601 headers skip the dateutil parser.
+    :param value:
+    :return:
+    """
+    try:
+        return datetime.fromisoformat(value)
+    except (AttributeError, TypeError, ValueError):
+        return parse(value)
+
+
 def init_schedule(schedule):
     _schedule = {}
     if schedule:
@@ -141,6 +253,18 @@ class ClusterContainer(object):
     def get_device(self, device_name):
         return self.devices[device_name]
 
+    def ingest_data(self, device_data):
+        """
+        Pass parsed device messages to the clusters of the devices.
+        :param device_data: dict of device name -> parsed device message.
+        :return:
+        """
+        for cluster in self.clusters:
+            cluster_data = dict((device_name, data) for device_name, data in device_data.items()
+                                if device_name in cluster.devices)
+            if cluster_data:
+                cluster.ingest_data(cluster_data)
+
     def get_power_bounds(self):
         positive_power = []
         negative_power = []
@@ -160,6 +284,29 @@ class DeviceClusters(object):
             elif load_type == "continuous":
                 self.devices[device_name] = ContinuousLoadManager(device_config)
 
+    def ingest_data(self, device_data):
+        """
+        Evaluate the conditions of many devices in the cluster at once.
+        Devices configured with the same expressions are evaluated in one
+        vectorized call per expression.
+        :param device_data: dict of device name -> parsed device message.
+        :return:
+        """
+        targets = []
+        rows = []
+        for device_name, data in device_data.items():
+            device = self.devices[device_name]
+            for device_id in device.rated_power:
+                targets.append((device, device_id))
+                rows.append(data)
+        if not targets:
+            return
+        conditions = evaluate_batch([device.on_expr.get(device_id) for device, device_id in targets], rows)
+        pos_sop = evaluate_batch([device.sop_expr[device_id][0] for device, device_id in targets], rows)
+        neg_sop = evaluate_batch([device.sop_expr[device_id][1] for device, device_id in targets], rows)
+        for index, (device, device_id) in enumerate(targets):
+            device.update_device(device_id, is_on(conditions[index]), [pos_sop[index], neg_sop[index]])
+
     def get_power_values(self):
         positive_power = []
         negative_power = []
@@ -169,6 +316,11 @@ class DeviceClusters(object):
             negative_power.extend(neg_power)
         return positive_power, negative_power
 
+
+def evaluate_sop(sop_expr, data):
+    return [float(expr(data)) if expr is not None else 0. for expr in sop_expr]
+
+
 class DiscreetLoadManager(object):
     def __init__(self, device_config):
         self.command_status = {}
@@ -176,13 +328,11 @@ class DiscreetLoadManager(object):
         self.device_status_args = {}
         self.sop_args = {}
         self.sop_expr = {}
-        self.expr = {}
+        self.on_expr = {}
 
         self.condition = {}
         self.sop_condition = {}
 
-        self.points = {}
-        self.sop_points = {}
         self.rated_power = {}
         self.positive_power = {}
         self.negative_power = {}
@@ -195,16 +345,17 @@ class DiscreetLoadManager(object):
 
             self.device_status_args[device_id] = device_status_args
             self.condition[device_id] = parse_sympy(condition, condition=True)
-            self.points[device_id] = symbols(device_status_args)
-            self.expr[device_id] = parse_expr(self.condition[device_id])
+            # No status points means the device is never considered on.
+            if device_status_args:
+                self.on_expr[device_id] = compile_expression(self.condition[device_id], device_status_args)
+            else:
+                self.on_expr[device_id] = None
             pos_sop_condition = device_dict.get("pos_sop", "")
             neg_sop_condition = device_dict.get("neg_sop", "")
             sop_args = parse_sympy(device_dict['sop_args'])
             self.sop_args[device_id] = sop_args
             self.sop_condition[device_id] = [parse_sympy(pos_sop_condition), parse_sympy(neg_sop_condition)]
-            self.sop_points[device_id] = symbols(sop_args)
-
-            self.sop_expr[device_id] = [parse_expr(sop_cond) if sop_cond else False for sop_cond in self.sop_condition[device_id]]
+            self.sop_expr[device_id] = [compile_expression(sop_cond, sop_args) for sop_cond in self.sop_condition[device_id]]
 
             self.command_status[device_id] = False
             self.device_power[device_id] = 0.
@@ -214,32 +365,18 @@ class DiscreetLoadManager(object):
 
     def ingest_data(self, data):
         for device_id in self.rated_power:
-            conditional_points = []
-            sop_points = []
-
-            for item in self.device_status_args[device_id]:
-                conditional_points.append((item, data[item]))
-
-            for item in self.sop_args[device_id]:
-                sop_points.append((item, data[item]))
-
-            conditional_value = False
-            sop_values = []
-            if conditional_points:
-                conditional_value = self.expr[device_id].subs(conditional_points)
-            for expr in self.sop_expr[device_id]:
-                if sop_points and expr or not self.sop_args[device_id]:
-                    sop_values.append(expr.subs(sop_points))
-                elif not expr:
-                    sop_values.append(0.)
-
-            _log.debug('{} - {} (device status) evaluated to {}'.format(device_id, self.condition[device_id], conditional_value))
-            _log.debug('{} - {} (device power) evaluated to {}'.format(device_id, self.sop_condition[device_id], sop_values))
-            try:
-                self.command_status[device_id] = bool(conditional_value)
-            except TypeError:
-                self.command_status[device_id] = False
-            self.determine_power_adders(device_id, sop_values)
+            on_expr = self.on_expr[device_id]
+            conditional_value = on_expr(data) if on_expr is not None else False
+            sop_values = evaluate_sop(self.sop_expr[device_id], data)
+
+            if _log.isEnabledFor(logging.DEBUG):
+                _log.debug('{} - {} (device status) evaluated to {}'.format(device_id, self.condition[device_id], conditional_value))
+                _log.debug('{} - {} (device power) evaluated to {}'.format(device_id, self.sop_condition[device_id], sop_values))
+            self.update_device(device_id, is_on(conditional_value), sop_values)
+
+    def update_device(self, device_id, status, sop_values):
+        self.command_status[device_id] = status
+        self.determine_power_adders(device_id, sop_values)
 
     def get_power_values(self):
         return self.positive_power.values(), self.negative_power.values()
@@ -255,8 +392,9 @@ class DiscreetLoadManager(object):
             self.positive_power[device_id] = float(sop[0]) * self.rated_power[device_id]
             self.negative_power[device_id] = 0
 
-        _log.debug("{} - Negative Power: {} - sop: {}".format(device_id, self.negative_power, sop))
-        _log.debug("{} - Positive Power: {} - sop: {}".format(device_id, self.positive_power, sop))
+        if _log.isEnabledFor(logging.DEBUG):
+            _log.debug("{} - Negative Power: {} - sop: {}".format(device_id, self.negative_power, sop))
+            _log.debug("{} - Positive Power: {} - sop: {}".format(device_id, self.positive_power, sop))
 
 
 class ContinuousLoadManager(object):
@@ -266,12 +404,12 @@ class ContinuousLoadManager(object):
         self.sop_args = {}
         self.condition = {}
         self.sop_condition = {}
-        self.points = {}
-        self.sop_points = {}
         self.rated_power = {}
         self.positive_power = {}
         self.negative_power = {}
         self.sop_expr = {}
+        # Continuous loads have no on condition.
+        self.on_expr = {}
         for device_id, config in device_config.items():
             rated_power = config['rated_power']
             device_dict = config.pop('parameters')
@@ -281,8 +419,7 @@ class ContinuousLoadManager(object):
             sop_args = parse_sympy(device_dict['sop_args'])
             self.sop_args[device_id] = sop_args
             self.sop_condition[device_id] = [parse_sympy(pos_sop_condition), parse_sympy(neg_sop_condition)]
-            self.sop_points[device_id] = symbols(sop_args)
-            self.sop_expr[device_id] = [parse_expr(sop_cond) if sop_cond else False for sop_cond in self.sop_condition[device_id]]
+            self.sop_expr[device_id] = [compile_expression(sop_cond, sop_args) for sop_cond in self.sop_condition[device_id]]
 
             self.device_power[device_id] = 0.
             self.rated_power[device_id] = rated_power
@@ -291,18 +428,14 @@ class ContinuousLoadManager(object):
 
     def ingest_data(self, data):
         for device_id in self.rated_power:
-            sop_points = []
-            for item in self.sop_args[device_id]:
-                sop_points.append((item, data[item]))
-            sop_values = []
-            for expr in self.sop_expr[device_id]:
-                if sop_points and expr or not self.sop_args[device_id]:
-                    sop_values.append(expr.subs(sop_points))
-                elif not expr:
-                    sop_values.append(0)
-            _log.debug('{} (device power) evaluated to {}'.format(self.sop_condition[device_id], sop_values))
+            sop_values = evaluate_sop(self.sop_expr[device_id], data)
+            if _log.isEnabledFor(logging.DEBUG):
+                _log.debug('{} (device power) evaluated to {}'.format(self.sop_condition[device_id], sop_values))
             self.determine_power_adders(device_id, sop_values)
 
+    def update_device(self, device_id, status, sop_values):
+        self.determine_power_adders(device_id, sop_values)
+
     def get_power_values(self):
         return self.positive_power.values(), self.negative_power.values()
 
@@ -312,5 +445,6 @@ class ContinuousLoadManager(object):
         self.negative_power[device_id] = float(sop[1]) * self.rated_power[device_id]
         self.positive_power[device_id] = float(sop[0]) * self.rated_power[device_id]
 
-        _log.debug("{} - Negative Power: {} - sop: {}".format(device_id, self.negative_power, sop))
-        _log.debug("{} - Positive Power: {} - sop: {}".format(device_id, self.positive_power, sop))
+        if _log.isEnabledFor(logging.DEBUG):
+            _log.debug("{} - Negative Power: {} - sop: {}".format(device_id, self.negative_power, sop))
+            _log.debug("{} - Positive Power: {} - sop: {}".format(device_id, self.positive_power, sop))
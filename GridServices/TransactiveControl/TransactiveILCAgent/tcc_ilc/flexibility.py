@@ -0,0 +1,145 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+from collections import deque
+from datetime import timedelta as td
+
+import numpy as np
+
+# Added to the span of the stored samples when deciding if the window is full.
+SAMPLE_PADDING = td(seconds=15)
+
+
+def smoothing_constant(n):
+    """
+    Smoothing constant used to weight a window of n samples.
+    :param n:
+    :return:
+    """
+    k = 2.0 / (n + 1.0) * 2.0 if n else 1.0
+    return k if k <= 1.0 else 1.0
+
+
+class RollingFlexibility(object):
+    """
+    Exponentially weighted average of building power and of the minimum and
+    maximum achievable power over a rolling window of meter samples.
+
+    The averages equal sum(x[n] * k * (1 - k)**n) with the samples ordered
+    newest first and k = smoothing_constant(len(window)).  Once the window is
+    full every new sample replaces the oldest one, so the weighted sums are
+    updated in constant time.  The sums are rebuilt from the samples while the
+    window is still growing or when samples arrive out of time order.
+    """
+    def __init__(self, window, padding=SAMPLE_PADDING):
+        self.window = window
+        self.padding = padding
+        self.samples = deque()
+        self.average = 0.
+        self.minimum = 0.
+        self.maximum = 0.
+        # Weighted sums of (power, minimum, maximum) for decay = 1 - k.
+        self._sums = np.zeros(3)
+        self._decay = 0.
+        # Number of adjacent samples that are not in increasing time order.
+        self._unordered = 0
+        self._rebuild = False
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __bool__(self):
+        return bool(self.samples)
+
+    @property
+    def last_time(self):
+        return self.samples[-1][0] if self.samples else None
+
+    def is_full(self):
+        if not self.samples:
+            return False
+        return self.samples[-1][0] - self.samples[0][0] + self.padding >= self.window
+
+    def add(self, time_stamp, power, power_min, power_max):
+        """
+        Add a meter sample, samples without positive power are ignored.
+        :param time_stamp:
+        :param power: building power.
+        :param power_min: minimum achievable power.
+        :param power_max: maximum achievable power.
+        :return:
+        """
+        if not power > 0:
+            return
+        full = self.is_full()
+        if self.samples and time_stamp <= self.samples[-1][0]:
+            self._unordered += 1
+        sample = (time_stamp, power, power_min, power_max)
+        self.samples.append(sample)
+        if full:
+            oldest = self.samples.popleft()
+            if oldest[0] >= self.samples[0][0]:
+                self._unordered -= 1
+            if not self._unordered and not self._rebuild:
+                tail = self._decay ** len(self.samples)
+                self._sums = np.array(sample[1:], dtype=float) + self._decay * self._sums - tail * np.array(oldest[1:], dtype=float)
+                self._update_averages()
+                return
+        self._rebuild_sums()
+
+    def _rebuild_sums(self):
+        n = len(self.samples)
+        self._decay = 1.0 - smoothing_constant(n)
+        if self._unordered:
+            ordered = sorted(self.samples, reverse=True)
+        else:
+            ordered = reversed(self.samples)
+        values = np.array([sample[1:] for sample in ordered], dtype=float)
+        self._sums = self._decay ** np.arange(n) @ values
+        # The sums are only valid for the incremental update if the samples were in order.
+        self._rebuild = self._unordered > 0
+        self._update_averages()
+
+    def _update_averages(self):
+        k = 1.0 - self._decay
+        self.average, self.minimum, self.maximum = (float(value) for value in k * self._sums)
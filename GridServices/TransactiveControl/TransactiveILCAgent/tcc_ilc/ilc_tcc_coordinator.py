@@ -47,10 +47,12 @@ import logging
 
 from datetime import timedelta as td, datetime as dt
 import uuid
-from dateutil.parser import parse
 import numpy as np
 
-from tcc_ilc.device_handler import ClusterContainer, DeviceClusters, parse_sympy, init_schedule, check_schedule
+from tcc_ilc.device_handler import ClusterContainer, DeviceClusters, parse_sympy, init_schedule, check_schedule, parse_date
+from tcc_ilc.flexibility import RollingFlexibility
+from transactive_utils.transactive_base.price_statistics import PriceStatistics
+from transactive_utils.transactive_base.record_publisher import RecordPublisher
 import pandas as pd
 from volttron.platform.agent import utils
 from volttron.platform.messaging import topics, headers as headers_mod
@@ -58,7 +60,7 @@ import dateutil.tz
 
 from volttron.platform.agent.utils import setup_logging, format_timestamp, get_aware_utc_now
 from volttron.platform.agent.math_utils import mean, stdev
-from volttron.platform.vip.agent import Agent, Core
+from volttron.platform.vip.agent import Agent, Core, RPC
 
 from volttron.platform.agent.base_market_agent import MarketAgent
 from volttron.platform.agent.base_market_agent.poly_line import PolyLine
@@ -124,7 +126,6 @@ class TransactiveIlcCoordinator(MarketAgent):
                                                       path="",
                                                       point="all")
         self.demand_limit = None
-        self.bldg_power = []
         self.avg_power = 0.
         self.last_demand_update = None
         self.demand_curve = None
@@ -132,11 +133,19 @@ class TransactiveIlcCoordinator(MarketAgent):
         self.power_min = None
         self.power_max = None
         self.current_price = None
+        self.price_statistics = PriceStatistics()
+        self.record_publisher = RecordPublisher(self.vip,
+                                                interval=config.get("record_publish_interval", 1.0),
+                                                max_pending=config.get("record_queue_size", 1000),
+                                                timeout=config.get("record_publish_timeout", 10.0),
+                                                spill_file=config.get("record_spill_file"))
 
         self.average_building_power_window = td(minutes=config.get("average_building_power_window", 15))
+        self.bldg_power = RollingFlexibility(self.average_building_power_window)
         self.minimum_update_time = td(minutes=config.get("minimum_update_time", 5))
         self.market_name = config.get("market", "electric_0")
         self.tz = config.get("timezone", "US/Pacific")
+        self.tz_info = dateutil.tz.gettz(self.tz)
         # self.prices = power_prices
         self.oat_predictions = []
         self.comfort_to_dollar = config.get('comfort_to_dollar', 1.0)
@@ -174,6 +183,7 @@ class TransactiveIlcCoordinator(MarketAgent):
         # self.power_prices['hour'] = self.power_prices.index.hour.astype(int)
         hour = float(message['hour'])
         self.power_prices = message["prices"]
+        self.price_statistics.reset(self.power_prices)
         _log.debug("Get RTP Prices: {}".format(self.power_prices))
         self.current_price = self.power_prices[-1]
 
@@ -194,6 +204,19 @@ class TransactiveIlcCoordinator(MarketAgent):
         self.vip.pubsub.subscribe(peer="pubsub", prefix=self.power_meter_topic, callback=self.load_message_handler)
         self.setup_prices()
 
+    @Core.receiver("onstop")
+    def stopping(self, sender, **kwargs):
+        self.record_publisher.stop()
+
+    @RPC.export
+    def get_record_metrics(self):
+        """
+        Return the record publishing counters (queued, coalesced, published,
+        failed, unconfirmed, spilled, dropped, max_pending).
+        :return: dict
+        """
+        return dict(self.record_publisher.metrics)
+
     def offer_callback(self, timestamp, market_name, buyer_seller):
         if self.current_time is not None:
             demand_curve = self.create_demand_curve()
@@ -216,8 +239,8 @@ class TransactiveIlcCoordinator(MarketAgent):
 
     def price_callback(self, timestamp, market_name, buyer_seller, price, quantity):
         if self.bldg_power:
-            _log.debug("Price is {} at {}".format(price, self.bldg_power[-1][0]))
-            dt = self.bldg_power[-1][0]
+            _log.debug("Price is {} at {}".format(price, self.bldg_power.last_time))
+            dt = self.bldg_power.last_time
             occupied = check_schedule(dt, self.occupancy_schedule)
         if price is None and self.price is not None:
             _log.debug("Using stored price information! - market price: %x -- price: %s", price, self.current_price)
@@ -293,9 +316,9 @@ class TransactiveIlcCoordinator(MarketAgent):
         # topic of form:  devices/campus/building/device
         device_name = self.device_topic_map[topic]
         data = message[0]
-        self.current_time = parse(headers["Date"])
+        self.current_time = parse_date(headers["Date"])
         parsed_data = parse_sympy(data)
-        self.clusters.get_device(device_name).ingest_data(parsed_data)
+        self.clusters.ingest_data({device_name: parsed_data})
 
     def generate_price_points(self):
         # need to figure out where we are getting the pricing information and the form
@@ -307,17 +330,14 @@ class TransactiveIlcCoordinator(MarketAgent):
         # _log.debug("DEBUG TCC price - min {} - max {}".format(float(price_min), float(price_max)))
         # return max(float(price_min), 0.0), float(price_max)
         if self.power_prices and not self.static_price_flag:
-            avg_price = np.mean(self.power_prices)
-            std_price = np.std(self.power_prices)
-            price_min = avg_price - self.comfort_to_dollar * std_price
-            price_max = avg_price + self.comfort_to_dollar * std_price
+            price_min, price_max = self.price_statistics.bounds(self.comfort_to_dollar)
+            _log.debug("Prices: {} - avg: {} - std: {}".format(self.power_prices,
+                                                               self.price_statistics.mean,
+                                                               self.price_statistics.std))
         else:
-            avg_price = None
-            std_price = None
             price_min = self.default_min_price
             price_max = self.default_max_price
-        _log.debug("Prices: {} - avg: {} - std: {}".format(self.power_prices, avg_price, std_price))
-        price_array = np.linspace(price_min, price_max, 11)
+            _log.debug("Prices: {} - avg: None - std: None".format(self.power_prices))
         return price_min, price_max
 
     def generate_power_points(self, current_power):
@@ -341,8 +361,7 @@ class TransactiveIlcCoordinator(MarketAgent):
         # Use instantaneous power or average building power.
         data = message[0]
         current_power = data[self.power_point]
-        tz_info = dateutil.tz.gettz(self.tz)
-        current_time = parse(headers["Date"]).astimezone(tz_info)
+        current_time = parse_date(headers["Date"]).astimezone(self.tz_info)
 
         power_max, power_min = self.generate_power_points(current_power)
         _log.debug("QUANTITIES: max {} - min {} - cur {}".format(power_max, power_min, current_power))
@@ -351,39 +370,17 @@ class TransactiveIlcCoordinator(MarketAgent):
         message = {"MaximumPower": power_max, "MinimumPower": power_min, "AveragePower": current_power}
         self.publish_record(topic_suffix, message)
 
-        if self.bldg_power:
-            current_average_window = self.bldg_power[-1][0] - self.bldg_power[0][0] + td(seconds=15)
-        else:
-            current_average_window = td(minutes=0)
-
-        if current_average_window >= self.average_building_power_window and current_power > 0:
-            self.bldg_power.append((current_time, current_power, power_min, power_max))
-            self.bldg_power.pop(0)
-        elif current_power > 0:
-            self.bldg_power.append((current_time, current_power, power_min, power_max))
-
-        smoothing_constant = 2.0 / (len(self.bldg_power) + 1.0) * 2.0 if self.bldg_power else 1.0
-        smoothing_constant = smoothing_constant if smoothing_constant <= 1.0 else 1.0
-        power_sort = list(self.bldg_power)
-        power_sort.sort(reverse=True)
-        avg_power_max = 0.
-        avg_power_min = 0.
-        avg_power = 0.
-
-        for n in range(len(self.bldg_power)):
-            avg_power += power_sort[n][1] * smoothing_constant * (1.0 - smoothing_constant) ** n
-            avg_power_min += power_sort[n][2] * smoothing_constant * (1.0 - smoothing_constant) ** n
-            avg_power_max += power_sort[n][3] * smoothing_constant * (1.0 - smoothing_constant) ** n
-        self.avg_power = avg_power
-        self.power_min = avg_power_min
-        self.power_max = avg_power_max
+        self.bldg_power.add(current_time, current_power, power_min, power_max)
+        self.avg_power = self.bldg_power.average
+        self.power_min = self.bldg_power.minimum
+        self.power_max = self.bldg_power.maximum
 
     def error_callback(self, timestamp, market_name, buyer_seller, error_code, error_message, aux):
         # figure out what to send if the market is not formed or curves don't intersect.
         _log.debug("AUX: {}".format(aux))
         if market_name == "electric":
             if self.bldg_power:
-                dt = self.bldg_power[-1][0]
+                dt = self.bldg_power.last_time
                 occupied = check_schedule(dt, self.occupancy_schedule)
 
             _log.debug("AUX: {}".format(aux))
@@ -408,7 +405,7 @@ class TransactiveIlcCoordinator(MarketAgent):
     def publish_record(self, topic, message):
         headers = {headers_mod.DATE: format_timestamp(get_aware_utc_now())}
         message["TimeStamp"] = format_timestamp(self.current_time)
-        self.vip.pubsub.publish("pubsub", topic, headers, message).get()
+        self.record_publisher.publish(topic, headers, message)
 
 
 def main(argv=sys.argv):
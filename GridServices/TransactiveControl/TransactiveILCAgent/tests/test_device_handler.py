@@ -0,0 +1,85 @@
+import copy
+import random
+
+import pytest
+
+from tcc_ilc.device_handler import ClusterContainer, DeviceClusters, parse_sympy
+
+HP_CLUSTER = {
+    "HP{}".format(n): {
+        "HP{}".format(n): {
+            "parameters": {
+                "discreet_on_condition": ["FirstStageCooling > 0", "|", "SecondStageCooling > 0"],
+                "discreet_on_condition_args": ["FirstStageCooling", "SecondStageCooling"],
+                "pos_sop": "(ZoneTemperature - CoolingTemperatureSetPoint + 1.0)/2.0",
+                "neg_sop": "(CoolingTemperatureSetPoint + 1.0 - ZoneTemperature)/2.0",
+                "sop_args": ["ZoneTemperature", "CoolingTemperatureSetPoint"]
+            },
+            "rated_power": 4.0 + n
+        }
+    } for n in range(4)
+}
+
+VAV_CLUSTER = {
+    "AHU1/VAV{}".format(n): {
+        "VAV{}".format(n): {
+            "parameters": {
+                "pos_sop": "({0}**3 - ZoneAirFlow**3)/(17950*{0}**2)*(ZoneTemperature - ZoneCoolingTemperatureSetPoint + 1.1)/2.2".format(500 + 50 * n),
+                "neg_sop": "(ZoneAirFlow**3 - 125**3)/(17950*{0}**2)*(ZoneCoolingTemperatureSetPoint + 1.1 - ZoneTemperature)/2.2".format(500 + 50 * n),
+                "sop_args": ["ZoneCoolingTemperatureSetPoint", "ZoneTemperature", "ZoneAirFlow"]
+            },
+            "rated_power": 10.0
+        }
+    } for n in range(4)
+}
+
+
+def make_clusters():
+    clusters = ClusterContainer()
+    clusters.add_curtailment_cluster(DeviceClusters(copy.deepcopy(HP_CLUSTER), "discreet"))
+    clusters.add_curtailment_cluster(DeviceClusters(copy.deepcopy(VAV_CLUSTER), "continuous"))
+    return clusters
+
+
+def device_message(rng, device_name):
+    if device_name.startswith("HP"):
+        return {"First Stage Cooling": rng.choice([0, 1]), "Second Stage Cooling": rng.choice([0, 1]),
+                "ZoneTemperature": rng.uniform(68.0, 78.0), "CoolingTemperatureSetPoint": rng.uniform(70.0, 76.0)}
+    return {"ZoneCoolingTemperatureSetPoint": rng.uniform(70.0, 76.0), "ZoneTemperature": rng.uniform(68.0, 78.0),
+            "ZoneAirFlow": rng.uniform(100.0, 600.0)}
+
+
+def power_state(clusters):
+    state = []
+    for device_name, device in sorted(clusters.devices.items()):
+        for device_id in sorted(device.rated_power):
+            state.extend([device.positive_power[device_id], device.negative_power[device_id]])
+    return state
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_ingest_data_matches_device_path(seed):
+    rng = random.Random(seed)
+    batched = make_clusters()
+    per_device = make_clusters()
+    device_names = sorted(batched.get_device_name_list())
+    for _ in range(20):
+        device_name = rng.choice(device_names)
+        parsed_data = parse_sympy(device_message(rng, device_name))
+        # As TransactiveIlcCoordinator.new_data
+        batched.ingest_data({device_name: parsed_data})
+        per_device.get_device(device_name).ingest_data(parsed_data)
+        assert power_state(batched) == pytest.approx(power_state(per_device))
+    assert batched.get_power_bounds() == pytest.approx(per_device.get_power_bounds())
+
+
+def test_ingest_data_many_devices():
+    rng = random.Random(7)
+    batched = make_clusters()
+    per_device = make_clusters()
+    device_data = dict((device_name, parse_sympy(device_message(rng, device_name)))
+                       for device_name in batched.get_device_name_list())
+    batched.ingest_data(device_data)
+    for device_name, parsed_data in device_data.items():
+        per_device.get_device(device_name).ingest_data(parsed_data)
+    assert power_state(batched) == pytest.approx(power_state(per_device))
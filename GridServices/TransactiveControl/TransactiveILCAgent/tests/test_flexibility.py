@@ -0,0 +1,85 @@
+import random
+from datetime import datetime, timedelta as td
+
+import pytest
+
+from tcc_ilc.flexibility import RollingFlexibility
+
+
+def legacy_flexibility(trace, window):
+    """
+    Rolling average as computed by load_message_handler before it used
+    RollingFlexibility, yields (avg_power, power_min, power_max) per sample.
+    """
+    bldg_power = []
+    for current_time, current_power, power_min, power_max in trace:
+        if bldg_power:
+            current_average_window = bldg_power[-1][0] - bldg_power[0][0] + td(seconds=15)
+        else:
+            current_average_window = td(minutes=0)
+
+        if current_average_window >= window and current_power > 0:
+            bldg_power.append((current_time, current_power, power_min, power_max))
+            bldg_power.pop(0)
+        elif current_power > 0:
+            bldg_power.append((current_time, current_power, power_min, power_max))
+
+        smoothing_constant = 2.0 / (len(bldg_power) + 1.0) * 2.0 if bldg_power else 1.0
+        smoothing_constant = smoothing_constant if smoothing_constant <= 1.0 else 1.0
+        power_sort = list(bldg_power)
+        power_sort.sort(reverse=True)
+        avg_power_max = 0.
+        avg_power_min = 0.
+        avg_power = 0.
+
+        for n in range(len(bldg_power)):
+            avg_power += power_sort[n][1] * smoothing_constant * (1.0 - smoothing_constant) ** n
+            avg_power_min += power_sort[n][2] * smoothing_constant * (1.0 - smoothing_constant) ** n
+            avg_power_max += power_sort[n][3] * smoothing_constant * (1.0 - smoothing_constant) ** n
+        yield avg_power, avg_power_min, avg_power_max
+
+
+def meter_trace(samples, interval, seed=7, disorder=False):
+    """
+    Replay of a building meter feed: a daily load shape with noise, meter
+    dropouts (zero readings), jitter in the reporting interval and, when
+    disorder is set, a few late or repeated time stamps.
+    """
+    rng = random.Random(seed)
+    current_time = datetime(2020, 8, 3, 6, 0)
+    power = 350.0
+    trace = []
+    for i in range(samples):
+        current_time += td(seconds=interval, milliseconds=rng.choice((0, 0, 0, 250, -250)))
+        time_stamp = current_time
+        if disorder and rng.random() < 0.02:
+            time_stamp = current_time - td(seconds=rng.choice((0, interval, 3 * interval)))
+        power = max(50.0, power + rng.gauss(0.5, 8.0))
+        reading = 0.0 if rng.random() < 0.01 else round(power, 2)
+        positive = rng.uniform(0.0, 60.0)
+        negative = rng.uniform(0.0, 90.0)
+        trace.append((time_stamp, reading, reading - negative, reading + positive))
+    return trace
+
+
+@pytest.mark.parametrize("interval, window, disorder", [
+    (1, td(minutes=15), False),
+    (5, td(minutes=15), False),
+    (5, td(minutes=5), True),
+    (60, td(minutes=15), False),
+])
+def test_matches_legacy_average(interval, window, disorder):
+    trace = meter_trace(3000, interval, disorder=disorder)
+    flexibility = RollingFlexibility(window)
+    for sample, expected in zip(trace, legacy_flexibility(trace, window)):
+        flexibility.add(*sample)
+        result = (flexibility.average, flexibility.minimum, flexibility.maximum)
+        assert result == pytest.approx(expected, rel=1e-9, abs=1e-9)
+
+
+def test_ignores_samples_without_power():
+    flexibility = RollingFlexibility(td(minutes=15))
+    flexibility.add(datetime(2020, 8, 3, 6, 0), 0.0, -10.0, 10.0)
+    assert not flexibility
+    assert flexibility.last_time is None
+    assert (flexibility.average, flexibility.minimum, flexibility.maximum) == (0., 0., 0.)
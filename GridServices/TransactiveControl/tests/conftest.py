@@ -0,0 +1,13 @@
+import os
+import sys
+
+
+def path_is_in_pythonpath(path):
+    path = os.path.normcase(path)
+    return any(os.path.normcase(sp) == path for sp in sys.path)
+
+
+package_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+if not path_is_in_pythonpath(package_dir):
+    sys.path.insert(0, package_dir)
@@ -0,0 +1,116 @@
+import pytest
+
+from transactive_utils.transactive_base.input_data import InputRouter
+from transactive_utils.transactive_base.market_simulator import MarketSimulator
+
+
+def make_router():
+    router = InputRouter()
+    router.add("zt", "ZoneTemperature", 22.)
+    router.add("zaf", "ZoneAirFlow", 0.8)
+    router.add("oat", "OutdoorAirTemperature")
+    return router
+
+
+def test_update_returns_changed_points():
+    router = make_router()
+    changed = router.update({"ZoneTemperature": 23., "ZoneAirFlow": 0.7, "SupplyFanStatus": 1})
+    assert changed == {"ZoneTemperature": 23., "ZoneAirFlow": 0.7}
+    assert router.update({"ZoneTemperature": 23., "ZoneAirFlow": 0.9}) == {"ZoneAirFlow": 0.9}
+    assert router.get("zt") == 23. and router.get("zaf") == 0.9
+
+
+def test_repeated_value_is_suppressed():
+    router = make_router()
+    router.update({"OutdoorAirTemperature": 30.})
+    version = router.version
+    assert router.update({"OutdoorAirTemperature": 30.}) == {}
+    assert router.version == version
+    assert router.update({}) == {}
+
+
+def test_initial_value_followed_by_first_reading():
+    router = make_router()
+    assert router.get("zt") == 22.
+    assert router.get("oat") is None
+    # The first reading is recorded even when it equals the initial value
+    assert router.update({"ZoneTemperature": 22., "OutdoorAirTemperature": 31.}) == {
+        "ZoneTemperature": 22., "OutdoorAirTemperature": 31.}
+    assert router.get("oat") == 31.
+
+
+def test_point_feeds_every_mapped_name():
+    router = make_router()
+    router.add("oat2", "OutdoorAirTemperature", 25.)
+    router.update({"OutdoorAirTemperature": 32.})
+    assert router.get("oat") == router.get("oat2") == 32.
+
+
+def test_readding_mapped_name_moves_route():
+    router = make_router()
+    router.update({"ZoneTemperature": 23.})
+    router.add("zt", "ZoneTemperature2", 21.)
+    assert "ZoneTemperature" not in router.routes
+    assert "ZoneTemperature" not in router.received
+    assert router.get("zt") == 21.
+    # The old point no longer feeds zt
+    assert router.update({"ZoneTemperature": 25.}) == {}
+    assert router.get("zt") == 21.
+    assert router.update({"ZoneTemperature2": 24.}) == {"ZoneTemperature2": 24.}
+    assert router.get("zt") == 24.
+
+
+def test_clear():
+    router = make_router()
+    router.update({"ZoneTemperature": 23.})
+    router.clear()
+    assert len(router) == 0 and "zt" not in router
+    assert router.routes == {} and router.received == {}
+    assert router.update({"ZoneTemperature": 23.}) == {}
+
+
+@pytest.fixture
+def vav():
+    simulator = MarketSimulator(vav_count=1, ahu_count=1)
+    simulator.setup()
+    agent = simulator.vavs[0]
+    agent.simulator = simulator
+    agent.records = []
+    agent.publish_record = lambda topic_suffix, message: agent.records.append((topic_suffix, dict(message)))
+    yield agent
+    simulator.close()
+
+
+def test_agent_records_only_changed_inputs(vav):
+    vav.update_data({"ZoneTemperature": 23., "ZoneAirFlow": 0.8, "Other": 1.})
+    vav.update_data({"ZoneTemperature": 23., "ZoneAirFlow": 0.8})
+    vav.update_data({"ZoneTemperature": 23.5, "ZoneAirFlow": 0.8})
+    assert vav.records == [("InputData", {"ZoneTemperature": 23., "ZoneAirFlow": 0.8}),
+                           ("InputData", {"ZoneTemperature": 23.5})]
+    assert vav.get_input_value("zt") == 23.5
+
+
+def test_agent_get_input_value_unknown(vav):
+    assert vav.get_input_value("unknown") is None
+
+
+def test_agent_reconfigure_clears_inputs(vav):
+    vav.update_data({"ZoneTemperature": 23.})
+    # The configuration store delivers fresh contents on every update
+    config = vav.simulator.vav_config(1, 1)
+    config["inputs"] = [x for x in config["inputs"] if x["mapped"] != "zaf"]
+    for x in config["inputs"]:
+        if x["mapped"] == "zt":
+            x["point"] = "ZoneTemperature2"
+    vav.vip.config.store["config"] = config
+    vav.vip.config.deliver("UPDATE")
+    assert vav.get_input_value("zaf") is None
+    assert "zaf" not in vav.inputs
+    # Initial values again until the points are received
+    assert vav.get_input_value("zt") == 22.
+    vav.records = []
+    vav.update_data({"ZoneTemperature": 25., "ZoneAirFlow": 0.7})
+    assert vav.records == []
+    vav.update_data({"ZoneTemperature2": 24.})
+    assert vav.records == [("InputData", {"ZoneTemperature2": 24.})]
+    assert vav.get_input_value("zt") == 24.
@@ -0,0 +1,83 @@
+import pytest
+
+from volttron.platform.agent.base_market_agent.poly_line import PolyLine
+from volttron.platform.agent.base_market_agent.point import Point
+
+from transactive_utils.transactive_base.market_simulator import MarketSimulator, aggregate_curves, clear_market
+
+
+def curve(*points):
+    poly_line = PolyLine()
+    for quantity, price in points:
+        poly_line.add(Point(price=price, quantity=quantity))
+    return poly_line
+
+
+def points(poly_line):
+    return [value for point in poly_line.points for value in (point.x, point.y)]
+
+
+def test_aggregate_curves_sums_at_every_price():
+    first = curve((10., 0.02), (5., 0.06))
+    second = curve((4., 0.04), (2., 0.08))
+    aggregate = aggregate_curves([first, None, second, PolyLine()])
+    # Each curve keeps its end quantity beyond its price range
+    assert points(aggregate) == pytest.approx([14., 0.02, 11.5, 0.04, 8., 0.06, 7., 0.08])
+
+
+def test_aggregate_curves_without_points():
+    assert aggregate_curves([]) is None
+    assert aggregate_curves([None, PolyLine()]) is None
+
+
+def test_clear_market_sloped_curves():
+    demand = curve((10., 0.), (0., 0.1))
+    supply = curve((0., 0.), (10., 0.1))
+    assert clear_market(demand, supply) == pytest.approx((5., 0.05))
+
+
+def test_clear_market_fixed_price_supply():
+    demand = curve((10., 0.), (0., 0.1))
+    assert clear_market(demand, curve((0., 0.03), (100., 0.03))) == pytest.approx((7., 0.03))
+    # The demand does not reach the supply quantities
+    assert clear_market(demand, curve((20., 0.03), (100., 0.03))) == (None, None)
+
+
+def test_clear_market_fixed_quantity_supply():
+    demand = curve((10., 0.), (0., 0.1))
+    assert clear_market(demand, curve((4., 0.), (4., 1.))) == pytest.approx((4., 0.06))
+    assert clear_market(demand, curve((12., 0.), (12., 1.))) == (None, None)
+
+
+def test_clear_market_no_intersection():
+    demand = curve((10., 0.), (5., 0.1))
+    supply = curve((0., 0.), (4., 0.1))
+    assert clear_market(demand, supply) == (None, None)
+
+
+@pytest.fixture
+def simulator():
+    simulator = MarketSimulator(vav_count=2, ahu_count=1)
+    simulator.setup()
+    yield simulator
+    simulator.close()
+
+
+def assert_all_cleared(report):
+    # 24 electric and 24 air markets
+    assert report['cleared'] == 48
+    assert report['failed'] == 0
+    assert all(price is not None for price in report['electric_prices'])
+
+
+def test_round_clears_all_markets(simulator):
+    assert_all_cleared(simulator.run_round())
+
+
+def test_config_update_keeps_market_indexes(simulator):
+    simulator.run_round()
+    ahu = simulator.ahus[0]
+    ahu.vip.config.deliver("UPDATE")
+    assert len(ahu.consumer_demand_curve["electric"]) == len(ahu.consumer_market["electric"]) == 24
+    assert ahu.consumer_market_index["electric_23"] == ("electric", 23)
+    assert_all_cleared(simulator.run_round())
@@ -0,0 +1,170 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from transactive_utils.models import Model
+from transactive_utils.models import ahuchiller, rtu, vav
+
+HOURS = 24
+
+
+def coefficients(offset):
+    return [[offset + 0.01 * (n + i) for i in range(HOURS)] for n in range(4)]
+
+
+def make_parent(inputs, market_number=24, oat_predictions=None):
+    return SimpleNamespace(
+        get_input_value=inputs.get,
+        market_number=market_number,
+        current_datetime=datetime(2024, 7, 1, 14),
+        oat_predictions=oat_predictions or [],
+        prediction_error=1.1,
+        flexibility=[0.1, 1.0],
+        agent_name="test",
+        commodity=None,
+        single_market_contol_interval=None
+    )
+
+
+def make_vav(inputs, **kwargs):
+    a1, a2, a3, a4 = coefficients(0.002)
+    config = {"a1": a1, "a2": a2, "a3": a3, "a4": a4, "terminal_box_type": "VAV"}
+    return vav.firstorderzone(config, make_parent(inputs, **kwargs))
+
+
+def make_rtu(inputs, **kwargs):
+    c1, c2, c3, c4 = coefficients(-0.01)
+    config = {"c1": c1, "c2": c2, "c3": c3, "c4": c4, "rated_power": 10.0}
+    return rtu.firstorderzone(config, make_parent(inputs, **kwargs))
+
+
+def model_for(predictor):
+    model = Model.__new__(Model)
+    model.model = predictor
+    return model
+
+
+def batch_and_scalar(predictor, sets, sched_index, market_index, occupied):
+    batch = model_for(predictor).get_q_batch(sets, sched_index, market_index, occupied)
+    scalar = [predictor.predict(_set, sched_index, market_index, occupied) for _set in sets]
+    return batch, scalar
+
+
+INPUTS = {"oat": 85.0, "zt": 74.0, "sfs": None}
+SETS = list(np.linspace(70.0, 76.0, 11))
+
+
+@pytest.mark.parametrize("make", [make_vav, make_rtu])
+@pytest.mark.parametrize("occupied", [True, False])
+def test_predict_batch_matches_predict(make, occupied):
+    oat_predictions = [80.0 + i for i in range(HOURS)]
+    predictor = make(dict(INPUTS), oat_predictions=oat_predictions)
+    predictor.zt_predictions = [73.0 + 0.1 * i for i in range(HOURS)]
+    for market_index in range(HOURS):
+        sched_index = (market_index + 15) % HOURS
+        batch, scalar = batch_and_scalar(predictor, SETS, sched_index, market_index, occupied)
+        assert batch == pytest.approx(scalar)
+
+
+@pytest.mark.parametrize("make", [make_vav, make_rtu])
+def test_predict_batch_matches_predict_single_market(make):
+    predictor = make(dict(INPUTS), market_number=1)
+    batch, scalar = batch_and_scalar(predictor, SETS, 3, 0, True)
+    assert batch == pytest.approx(scalar)
+
+
+@pytest.mark.parametrize("make", [make_vav, make_rtu])
+def test_predict_batch_without_data_raises_like_predict(make):
+    # zt_predictions start as [zt] * 24 with no zone temperature received.
+    predictor = make({"oat": 85.0})
+    assert predictor.zt_predictions[0] is None
+    with pytest.raises(TypeError):
+        predictor.predict(SETS[0], 0, 0, True)
+    with pytest.raises(TypeError):
+        model_for(predictor).get_q_batch(SETS, 0, 0, True)
+
+
+@pytest.mark.parametrize("make", [make_vav, make_rtu])
+def test_predict_batch_missing_oat_prediction_raises_like_predict(make):
+    oat_predictions = [80.0] * HOURS
+    oat_predictions[5] = None
+    predictor = make(dict(INPUTS), oat_predictions=oat_predictions)
+    predictor.zt_predictions = [73.0] * HOURS
+    batch, scalar = batch_and_scalar(predictor, SETS, 4, 4, True)
+    assert batch == pytest.approx(scalar)
+    with pytest.raises(TypeError):
+        predictor.predict(SETS[0], 5, 5, True)
+    with pytest.raises(TypeError):
+        model_for(predictor).get_q_batch(SETS, 5, 5, True)
+
+
+def make_ahu(inputs, variable_volume=True, has_economizer=True, building_chiller=True, smc_interval=None):
+    config = {
+        "equipment_configuration": {
+            "has_economizer": has_economizer,
+            "economizer_limit": 65.0,
+            "minimum_oaf": 0.2,
+            "variable_volume": variable_volume,
+            "supply_air_setpoint": 55.0,
+            "building_chiller": building_chiller,
+            "nominal_zone_setpoint": 72.0
+        },
+        "model_configuration": {
+            "c0": 0.02, "c1": 0.0003, "c2": 1.5e-7, "c3": 2.1e-11,
+            "cpAir": 1.006,
+            "COP": 3.0
+        }
+    }
+    parent = make_parent(inputs)
+    parent.single_market_contol_interval = smc_interval
+    model = ahuchiller.ahuchiller(config, parent)
+    model.update_data()
+    return model
+
+
+AHU_INPUTS = {"oat": 80.0, "saf": 5.0, "dat": 56.0, "mat": 74.0}
+
+
+def calculate_load_each(model, q_loads, oat):
+    return [model.calculate_load(q_load, oat) for q_load in q_loads]
+
+
+@pytest.mark.parametrize("variable_volume", [True, False])
+@pytest.mark.parametrize("has_economizer", [True, False])
+@pytest.mark.parametrize("oat", [None, 50.0, 60.0, 70.0, 90.0])
+def test_calculate_loads_matches_calculate_load(variable_volume, has_economizer, oat):
+    model = make_ahu(dict(AHU_INPUTS), variable_volume=variable_volume, has_economizer=has_economizer)
+    q_loads = list(np.linspace(0.5, 8.0, 9)) if variable_volume else list(np.linspace(50.0, 70.0, 9))
+    loads = model.calculate_loads(q_loads, oat)
+    assert list(loads) == pytest.approx(calculate_load_each(model, q_loads, oat), rel=1e-12)
+
+
+@pytest.mark.parametrize("variable_volume", [True, False])
+def test_calculate_loads_nan_oat_matches_calculate_load(variable_volume):
+    # A NaN OAT is not replaced by the measured OAT, both return NaN.
+    model = make_ahu(dict(AHU_INPUTS), variable_volume=variable_volume)
+    q_loads = [1.0, 2.0, 3.0] if variable_volume else [52.0, 55.0, 58.0]
+    loads = model.calculate_loads(q_loads, float("nan"))
+    assert np.isnan(calculate_load_each(model, q_loads, float("nan"))).all()
+    assert np.isnan(loads).all()
+
+
+@pytest.mark.parametrize("inputs, building_chiller, smc_interval", [
+    ({"saf": 5.0}, True, None),  # no measured oat
+    (AHU_INPUTS, False, None),
+    (AHU_INPUTS, True, 300)
+])
+def test_calculate_loads_no_coil_model_matches_calculate_load(inputs, building_chiller, smc_interval):
+    model = make_ahu(dict(inputs), building_chiller=building_chiller, smc_interval=smc_interval)
+    q_loads = [1.0, 2.0, 3.0]
+    loads = model.calculate_loads(q_loads)
+    assert list(loads) == pytest.approx(calculate_load_each(model, q_loads, None), rel=1e-12)
+
+
+def test_calculate_loads_keeps_model_state():
+    model = make_ahu(dict(AHU_INPUTS), variable_volume=False)
+    state = (model.mDotAir, model.tDis, model.dat, model.coil_load, model.fan_power)
+    model.calculate_loads([50.0, 60.0], 85.0)
+    assert (model.mDotAir, model.tDis, model.dat, model.coil_load, model.fan_power) == state
@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+import pytest
+
+from transactive_utils.transactive_base.price_statistics import PriceStatistics
+
+
+def random_prices(count, seed=0):
+    rng = random.Random(seed)
+    return [rng.uniform(0.01, 0.2) for _ in range(count)]
+
+
+def test_empty():
+    statistics = PriceStatistics(window=24)
+    assert not statistics
+    assert statistics.mean == 0.
+    assert statistics.std == 0.
+    assert statistics.bounds() == (0., 0.)
+
+
+@pytest.mark.parametrize("window", [None, 1, 24, 168])
+def test_add_matches_numpy(window):
+    statistics = PriceStatistics(window=window)
+    prices = random_prices(500)
+    for count, price in enumerate(prices, 1):
+        statistics.add(price)
+        expected = prices[max(0, count - window):count] if window is not None else prices[:count]
+        assert list(statistics.prices) == expected
+        assert statistics.mean == pytest.approx(np.mean(expected), rel=1e-9, abs=1e-12)
+        assert statistics.std == pytest.approx(np.std(expected), rel=1e-6, abs=1e-9)
+
+
+def test_window_evicts_oldest():
+    statistics = PriceStatistics(window=3)
+    for price in [1.0, 2.0, 3.0, 10.0]:
+        statistics.add(price)
+    assert len(statistics) == 3
+    assert list(statistics.prices) == [2.0, 3.0, 10.0]
+    assert statistics.mean == pytest.approx(5.0)
+
+
+@pytest.mark.parametrize("window", [None, 24])
+def test_reset_matches_numpy(window):
+    prices = random_prices(100, seed=1)
+    statistics = PriceStatistics(window=window)
+    statistics.add(5.0)
+    statistics.reset(prices)
+    expected = prices[-window:] if window is not None else prices
+    assert list(statistics.prices) == expected
+    assert statistics.mean == pytest.approx(np.mean(expected))
+    assert statistics.std == pytest.approx(np.std(expected))
+    statistics.reset()
+    assert not statistics and statistics.mean == 0. and statistics.std == 0.
+
+
+def test_bounds_and_price_range():
+    prices = random_prices(24, seed=2)
+    statistics = PriceStatistics()
+    statistics.reset(prices)
+    mean, std = np.mean(prices), np.std(prices)
+    assert statistics.bounds(2.0) == pytest.approx((mean - 2.0 * std, mean + 2.0 * std))
+    price_range = statistics.price_range(2.0, 5)
+    assert list(price_range) == pytest.approx(list(np.linspace(mean - 2.0 * std, mean + 2.0 * std, 5)))
+    # Cached until the prices change
+    assert statistics.price_range(2.0, 5) is price_range
+    statistics.add(0.5)
+    assert statistics.price_range(2.0, 5) is not price_range
+    assert not price_range.flags.writeable
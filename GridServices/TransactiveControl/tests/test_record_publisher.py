@@ -0,0 +1,117 @@
+import json
+
+import gevent
+import pytest
+
+from volttron.platform.vip.agent import errors
+
+from transactive_utils.transactive_base.record_publisher import RecordPublisher
+
+
+class Result(object):
+    def __init__(self, error=None):
+        self.error = error
+
+    def get(self, timeout=None):
+        if self.error is not None:
+            raise self.error
+
+
+class PubSub(object):
+    def __init__(self):
+        self.published = []
+        self.errors = []
+
+    def publish(self, peer, topic, headers, message):
+        error = self.errors.pop(0) if self.errors else None
+        if error is None or isinstance(error, gevent.Timeout):
+            # An unacknowledged publish may still reach the bus.
+            self.published.append((topic, dict(message)))
+        return Result(error)
+
+
+class Vip(object):
+    def __init__(self):
+        self.pubsub = PubSub()
+
+
+@pytest.fixture
+def publisher(tmpdir):
+    return RecordPublisher(Vip(), interval=60.0, spill_file=str(tmpdir.join("spill.json")))
+
+
+def spilled(publisher):
+    try:
+        with open(publisher.spill_file) as spill:
+            return [json.loads(line) for line in spill]
+    except IOError:
+        return []
+
+
+def test_keyed_records_are_coalesced(publisher):
+    publisher.publish("record/DemandCurve", {}, {"MarketIndex": 0, "Curve": [1]}, key=(0, "Air"))
+    publisher.publish("record/DemandCurve", {}, {"MarketIndex": 1, "Curve": [2]}, key=(1, "Air"))
+    publisher.publish("record/DemandCurve", {}, {"MarketIndex": 0, "Curve": [3]}, key=(0, "Air"))
+    assert len(publisher) == 2
+    assert publisher.flush()
+    assert publisher.vip.pubsub.published == [("record/DemandCurve", {"MarketIndex": 0, "Curve": [3]}),
+                                              ("record/DemandCurve", {"MarketIndex": 1, "Curve": [2]})]
+    assert publisher.metrics["coalesced"] == 1
+    assert publisher.metrics["published"] == 2
+
+
+def test_keyless_records_are_not_coalesced(publisher):
+    publisher.publish("record/Actuate", {}, {"ZoneCoolingTemperatureSetPoint": 72.0, "Price": 0.05})
+    publisher.publish("record/Actuate", {}, {"SupplyFanSpeed": 0.8, "Price": 0.05})
+    publisher.publish("record/Actuate", {}, {"ZoneCoolingTemperatureSetPoint": 73.0, "Price": 0.06})
+    assert len(publisher) == 3
+    assert publisher.flush()
+    assert [message for _, message in publisher.vip.pubsub.published] == [
+        {"ZoneCoolingTemperatureSetPoint": 72.0, "Price": 0.05},
+        {"SupplyFanSpeed": 0.8, "Price": 0.05},
+        {"ZoneCoolingTemperatureSetPoint": 73.0, "Price": 0.06}]
+    assert publisher.metrics["coalesced"] == 0
+
+
+def test_full_queue_spills_oldest(publisher):
+    publisher.max_pending = 2
+    for i in range(3):
+        publisher.publish("record/MarketClear", {}, {"Price": i})
+    assert len(publisher) == 2
+    assert [r["message"] for r in spilled(publisher)] == [{"Price": 0}]
+    assert publisher.metrics["spilled"] == 1
+
+
+def test_rejected_publish_is_spilled(publisher):
+    publisher.vip.pubsub.errors = [errors.VIPError(-1, "rejected", "", "")]
+    publisher.publish("record/MarketClear", {}, {"Price": 1})
+    publisher.publish("record/MarketClear", {}, {"Price": 2})
+    assert not publisher.flush()
+    assert [r["message"] for r in spilled(publisher)] == [{"Price": 1}]
+    assert len(publisher) == 1
+    assert publisher.flush()
+    assert publisher.vip.pubsub.published == [("record/MarketClear", {"Price": 2})]
+    assert publisher.metrics["failed"] == 1
+
+
+def test_unacknowledged_publish_is_not_spilled(publisher):
+    publisher.vip.pubsub.errors = [gevent.Timeout()]
+    publisher.publish("record/MarketClear", {}, {"Price": 1})
+    publisher.publish("record/MarketClear", {}, {"Price": 2})
+    assert not publisher.flush()
+    assert publisher.flush()
+    # Each record reached the bus once and none was spilled.
+    assert [message for _, message in publisher.vip.pubsub.published] == [{"Price": 1}, {"Price": 2}]
+    assert spilled(publisher) == []
+    assert publisher.metrics["unconfirmed"] == 1
+    assert publisher.metrics["spilled"] == 0
+
+
+def test_stop_without_spill_file_drops(publisher):
+    publisher.spill_file = None
+    publisher.vip.pubsub.errors = [errors.VIPError(-1, "rejected", "", "")]
+    publisher.publish("record/MarketClear", {}, {"Price": 1})
+    publisher.publish("record/MarketClear", {}, {"Price": 2})
+    publisher.stop()
+    assert len(publisher) == 0
+    assert publisher.metrics["dropped"] == 2
@@ -43,6 +43,7 @@ under Contract DE-AC05-76RL01830
 
 import importlib
 import logging
+import numpy as np
 from volttron.platform.agent import utils
 from volttron.platform.agent.math_utils import mean, stdev
 
@@ -75,6 +76,36 @@ class Model(object):
         q = self.model.predict(_set, sched_index, market_index, occupied)
         return q
 
+    def get_q_batch(self, sets, sched_index, market_index, occupied):
+        """
+        Predict the quantities for several setpoints in one call.  Models
+        may implement predict_batch, which receives arrays of setpoints,
+        schedule indices, market indices and occupancy and returns an
+        array of quantities.  Models without it are called through get_q
+        once per setpoint.
+        :param sets: list or np.array of setpoints
+        :param sched_index: int or array of int; hour of day for each setpoint
+        :param market_index: int or array of int; market index for each setpoint
+        :param occupied: bool or array of bool
+        :return: list of quantities
+        """
+        count = len(sets)
+        sched_index = self._as_array(sched_index, count)
+        market_index = self._as_array(market_index, count)
+        occupied = self._as_array(occupied, count)
+        predict_batch = getattr(self.model, "predict_batch", None)
+        if predict_batch is not None:
+            q = predict_batch(np.asarray(sets, dtype=float), sched_index, market_index, occupied)
+            return np.asarray(q, dtype=float).tolist()
+        return [self.get_q(_set, int(sched), int(market), bool(occ))
+                for _set, sched, market, occ in zip(sets, sched_index, market_index, occupied)]
+
+    @staticmethod
+    def _as_array(value, count):
+        if np.ndim(value) == 0:
+            return np.full(count, value)
+        return np.asarray(value)
+
     def store_model_config(self, _config):
         try:
             config = self.vip.config.get("model")
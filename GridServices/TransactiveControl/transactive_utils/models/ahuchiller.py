@@ -43,6 +43,7 @@ under Contract DE-AC05-76RL01830
 
 import logging
 import importlib
+import numpy as np
 
 from volttron.platform.agent import utils
 import transactive_utils.models.input_names as data_names
@@ -164,3 +165,70 @@ class ahuchiller(object):
             _log.debug("AHUChiller building does not have chiller or no oat!")
             self.coil_load = 0.0
         return abs(self.coil_load)/self.cop/0.9 + max(self.fan_power, 0)
+
+    def calculate_loads(self, q_loads, oat=None):
+        """
+        calculate_load for an array of zone loads, without changing the
+        model state.
+        :param q_loads: array of zone air flows (VAV) or discharge air temperatures
+        :param oat: outdoor air temperature, None uses the measured oat.
+        :return: np.array of electric power
+        """
+        q_loads = np.asarray(q_loads, dtype=float)
+        if self.vav_flag:
+            m_dot_air = q_loads
+            t_dis = self.tDis
+            dat = self.dat
+        else:
+            m_dot_air = np.full(q_loads.shape, float(self.saf))
+            t_dis = q_loads
+            dat = q_loads
+
+        fan_power = self.c0 + m_dot_air*(self.c1 + m_dot_air*(self.c2 + m_dot_air*self.c3))
+        if self.power_unit == 'W':
+            fan_power = fan_power*1000.  # watts
+
+        oat = oat if oat is not None else self.oat
+        if not self.building_chiller or oat is None:
+            coil_load = 0.0
+        elif self.smc_interval is not None:
+            try:
+                coil_load = m_dot_air * self.cpAir * (dat - self.mat)
+            except TypeError:
+                _log.debug("AHU for single market requires dat and mat measurements!")
+                coil_load = 0.0
+        elif np.ndim(t_dis) == 0:
+            # A single discharge temperature selects one coil model
+            if self.has_economizer and oat < t_dis:
+                coil_load = 0.0
+            elif self.has_economizer and oat < self.economizer_limit:
+                coil_load = m_dot_air * self.cpAir * (t_dis - oat)
+            else:
+                mat = self.tset_avg*(1.0 - self.min_oaf) + self.min_oaf*oat
+                coil_load = m_dot_air * self.cpAir * (t_dis - mat)
+            # heating mode is not yet supported!
+            coil_load = np.minimum(coil_load, 0.0)
+        else:
+            mat = self.tset_avg*(1.0 - self.min_oaf) + self.min_oaf*oat
+            coil_load = m_dot_air * self.cpAir * (t_dis - mat)
+            if self.has_economizer:
+                economizer_load = m_dot_air * self.cpAir * (t_dis - oat)
+                coil_load = np.where(oat < self.economizer_limit, economizer_load, coil_load)
+                coil_load = np.where(oat < t_dis, 0.0, coil_load)
+            # heating mode is not yet supported!
+            coil_load = np.minimum(coil_load, 0.0)
+        return np.abs(coil_load)/self.cop/0.9 + np.maximum(fan_power, 0)
+
+    def load_inputs(self, oat=None):
+        """
+        Measured values that calculate_loads depends on besides its
+        arguments, e.g. to key a cache of translated curves.
+        :param oat: outdoor air temperature passed to calculate_loads
+        :return: tuple
+        """
+        inputs = (self.oat if oat is None else oat,)
+        if not self.vav_flag:
+            inputs += (self.saf,)
+        if self.smc_interval is not None:
+            inputs += (self.dat, self.mat)
+        return inputs
@@ -42,6 +42,7 @@ under Contract DE-AC05-76RL01830
 """
 
 import logging
+import numpy as np
 
 from volttron.platform.agent import utils
 import transactive_utils.models.input_names as data_names
@@ -63,6 +64,9 @@ class simple(object):
     def predict(self, _set, sched_index, market_index, occupied):
         return _set*self.rated_power
 
+    def predict_batch(self, sets, sched_index, market_index, occupied):
+        return sets*self.rated_power
+
 
 class simple_profile(object):
     def __init__(self, config, parent, **kwargs):
@@ -84,3 +88,7 @@ class simple_profile(object):
         else:
             power = _set*self.rated_power
         return power
+
+    def predict_batch(self, sets, sched_index, market_index, occupied):
+        unoccupied_power = np.take(self.lighting_schedule, sched_index)*self.rated_power
+        return np.where(occupied, sets*self.rated_power, unoccupied_power)
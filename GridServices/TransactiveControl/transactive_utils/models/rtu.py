@@ -43,9 +43,10 @@ under Contract DE-AC05-76RL01830
 
 import logging
 import operator
+import numpy as np
 import importlib
 from volttron.platform.agent import utils
-from transactive_utils.models.utils import clamp
+from transactive_utils.models.utils import clamp, clamp_array, has_missing
 import transactive_utils.models.input_names as data_names
 
 _log = logging.getLogger(__name__)
@@ -121,6 +122,11 @@ class firstorderzone(object):
         self.c2 = config.get("c2", 0)
         self.c3 = config.get("c3", 0)
         self.c4 = config.get("c4", 0)
+        # Coefficients by schedule index for predict_batch
+        try:
+            self.coefficient_array = np.array([self.c1, self.c2, self.c3, self.c4], dtype=float)
+        except (TypeError, ValueError):
+            self.coefficient_array = None
         # type = config.get("terminal_box_type", "VAV")
         # if type.lower() == "vav":
         #     self.parent.commodity = "ZoneAirFlow"
@@ -150,6 +156,44 @@ class firstorderzone(object):
             q = 0.0
         return q
 
+    def predict_batch(self, sets, sched_index, market_index, occupied):
+        """
+        predict for arrays of setpoints, schedule indices, market indices
+        and occupancy (see Model.get_q_batch).
+        :return: np.array of quantities
+        """
+        if self.coefficient_array is None or self.coefficient_array.ndim != 2:
+            # Coefficients are not hourly lists, use the scalar path.
+            return self.predict_each(sets, sched_index, market_index, occupied)
+        if self.parent.market_number == 1:
+            oat = self.oat
+            zt = self.zt
+        else:
+            zt = [self.zt_predictions[i] for i in market_index]
+            if self.parent.oat_predictions:
+                oat = [self.parent.oat_predictions[i] for i in market_index]
+            else:
+                oat = self.oat
+        if has_missing(zt, oat):
+            # No data, the scalar path raises as predict does.
+            return self.predict_each(sets, sched_index, market_index, occupied)
+        if self.parent.market_number == 1:
+            if self.sfs is not None:
+                occupied = np.full(len(sets), bool(self.sfs))
+            sched_index = np.full(len(sets), self.parent.current_datetime.hour)
+        zt = np.asarray(zt, dtype=float)
+        oat = np.asarray(oat, dtype=float)
+        c1, c2, c3, c4 = self.coefficient_array[:, sched_index]
+        q = sets * c1 + zt * c2 + oat * c3 + c4
+        _log.debug("{}: RTU predicted {} - zt: {} - set: {} - sched: {}".format(self.parent.agent_name, q, zt, sets, sched_index))
+        q = clamp_array(q, min(self.parent.flexibility), max(self.parent.flexibility))
+        q = self.rated_power*q
+        return np.where(occupied, q, 0.0)
+
+    def predict_each(self, sets, sched_index, market_index, occupied):
+        return [self.predict(_set, sched, market, occ)
+                for _set, sched, market, occ in zip(sets, sched_index, market_index, occupied)]
+
     def getQ(self, oat, temp, temp_stpt, index):
         q = temp_stpt * self.c1[index] + temp * self.c2[index] + oat * self.c3[index] + self.c4[index]
         return q
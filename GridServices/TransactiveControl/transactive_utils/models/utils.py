@@ -41,8 +41,30 @@ operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
 under Contract DE-AC05-76RL01830
 """
 
+import numpy as np
+
+
 def clamp(value, x1, x2):
     min_value = min(abs(x1), abs(x2))
     max_value = max(abs(x1), abs(x2))
     value = value
     return min(max(value, min_value), max_value)
+
+
+def clamp_array(values, x1, x2):
+    """
+    clamp for an array of values.
+    """
+    min_value = min(abs(x1), abs(x2))
+    max_value = max(abs(x1), abs(x2))
+    return np.minimum(np.maximum(values, min_value), max_value)
+
+
+def has_missing(*values):
+    """
+    True if any value, or any item of a list value, is None.
+    """
+    for value in values:
+        if value is None or (isinstance(value, list) and None in value):
+            return True
+    return False
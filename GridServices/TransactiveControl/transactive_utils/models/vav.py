@@ -42,8 +42,9 @@ under Contract DE-AC05-76RL01830
 """
 
 import logging
+import numpy as np
 from volttron.platform.agent import utils
-from transactive_utils.models.utils import clamp
+from transactive_utils.models.utils import clamp, clamp_array, has_missing
 import transactive_utils.models.input_names as data_names
 
 _log = logging.getLogger(__name__)
@@ -83,6 +84,11 @@ class firstorderzone(object):
         self.a2 = config.get("a2", 0)
         self.a3 = config.get("a3", 0)
         self.a4 = config.get("a4", 0)
+        # Coefficients by schedule index for predict_batch
+        try:
+            self.coefficient_array = np.array([self.a1, self.a2, self.a3, self.a4], dtype=float)
+        except (TypeError, ValueError):
+            self.coefficient_array = None
         type = config.get("terminal_box_type", "VAV")
         if type.lower() == "vav":
             self.parent.commodity = "ZoneAirFlow"
@@ -133,6 +139,51 @@ class firstorderzone(object):
             q = 0.0
         return q
 
+    def predict_batch(self, sets, sched_index, market_index, occupied):
+        """
+        predict for arrays of setpoints, schedule indices, market indices
+        and occupancy (see Model.get_q_batch).
+        :return: np.array of quantities
+        """
+        if self.coefficient_array is None or self.coefficient_array.ndim != 2:
+            # Coefficients are not hourly lists, use the scalar path.
+            return self.predict_each(sets, sched_index, market_index, occupied)
+        if self.parent.market_number == 1:
+            oat = self.get_input_value(self.oat_name)
+            sfs = self.get_input_value(self.sfs_name)
+            zt = self.get_input_value(self.zt_name)
+        else:
+            current_zt = self.get_input_value(self.zt_name)
+            zt = [self.zt_predictions[i] for i in market_index]
+            zt = [current_zt if x is None else x for x in zt]
+            if self.parent.oat_predictions:
+                oat = [self.parent.oat_predictions[i] for i in market_index]
+            else:
+                oat = self.get_input_value(self.oat_name)
+        if has_missing(zt, oat):
+            # No data, the scalar path raises as predict does.
+            return self.predict_each(sets, sched_index, market_index, occupied)
+        if self.parent.market_number == 1:
+            if sfs is not None:
+                occupied = np.full(len(sets), bool(sfs))
+            sched_index = np.full(len(sets), self.parent.current_datetime.hour)
+        zt = np.asarray(zt, dtype=float)
+        oat = np.asarray(oat, dtype=float)
+        # getT and getM share the same linear model.
+        a1, a2, a3, a4 = self.coefficient_array[:, sched_index]
+        q = sets*a1+zt*a2+oat*a3+a4
+        q_correct = q * self.parent.prediction_error
+        _log.debug(
+            "%s: vav.firstorderzone q: %s -  q_corrected %s- zt: %s- set: %s - sched: %s",
+            self.parent.agent_name, q, q_correct, zt, sets, sched_index
+        )
+        q = clamp_array(q_correct, min(self.parent.flexibility), max(self.parent.flexibility))
+        return np.where(occupied, q, 0.0)
+
+    def predict_each(self, sets, sched_index, market_index, occupied):
+        return [self.predict(_set, sched, market, occ)
+                for _set, sched, market, occ in zip(sets, sched_index, market_index, occupied)]
+
     def getT(self, oat, temp, temp_stpt, index):
         T = temp_stpt*self.a1[index]+temp*self.a2[index]+oat*self.a3[index]+self.a4[index]
         return T
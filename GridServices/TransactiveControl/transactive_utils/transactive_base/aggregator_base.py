@@ -27,6 +27,9 @@ class Aggregator(TransactiveBase):
         self.supplier_market = []
         self.consumer_demand_curve = {}
         self.consumer_market = {}
+        # market name -> index, market name -> (market base name, index)
+        self.supplier_market_index = {}
+        self.consumer_market_index = {}
         self.aggregate_demand = []
         self.supply_commodity = None
         self.markets_initialized = False
@@ -52,17 +55,32 @@ class Aggregator(TransactiveBase):
                 consumer_market_base_name = [consumer_market_base_name]
 
             self.aggregate_clearing_market = config.get("aggregate_clearing_market")
-            self.consumer_demand_curve = dict.fromkeys(consumer_market_base_name, [])
-            self.consumer_market = dict.fromkeys(consumer_market_base_name, [])
-            if self.market_number is not None and not self.markets_initialized:
-                self.supplier_market = ['_'.join([supplier_market_base_name, str(i)]) for i in range(self.market_number)]
-                self.aggregate_demand = [None] * self.market_number
-                if consumer_market_base_name:
+            # Markets already joined keep their names, an update only
+            # resets the demand curves.
+            if not self.markets_initialized:
+                self.consumer_market = {market_name: [] for market_name in consumer_market_base_name}
+                if self.market_number is not None:
+                    self.supplier_market = ['_'.join([supplier_market_base_name, str(i)]) for i in range(self.market_number)]
+                    self.aggregate_demand = [None] * self.market_number
                     for market_name in self.consumer_market:
                         self.consumer_market[market_name] = ['_'.join([market_name, str(i)]) for i in range(self.market_number)]
-                        self.consumer_demand_curve[market_name] = [None] * self.market_number
+            self.consumer_demand_curve = {market_name: [None] * len(market_list)
+                                          for market_name, market_list in self.consumer_market.items()}
+            self.index_markets()
+            if self.market_number is not None and not self.markets_initialized:
                 self.init_markets()
 
+    def index_markets(self):
+        """
+        Rebuild the market name indexes, needed whenever supplier_market or
+        consumer_market is reassigned.
+        :return:
+        """
+        self.supplier_market_index = {market: index for index, market in enumerate(self.supplier_market)}
+        self.consumer_market_index = {market: (market_base, index)
+                                      for market_base, market_list in self.consumer_market.items()
+                                      for index, market in enumerate(market_list)}
+
     def init_markets(self):
 
         for market in self.supplier_market:
@@ -80,7 +98,7 @@ class Aggregator(TransactiveBase):
 
     def aggregate_callback(self, timestamp, market_name, buyer_seller, agg_demand):
         if buyer_seller == BUYER:
-            market_index = self.supplier_market.index(market_name)
+            market_index = self.supplier_market_index[market_name]
             _log.debug("%s - received aggregated %s curve - %s",
                        self.core.identity, market_name, agg_demand.points)
             self.aggregate_demand[market_index] = agg_demand
@@ -117,27 +135,28 @@ class Aggregator(TransactiveBase):
 
     def consumer_price_callback(self, timestamp, consumer_market, buyer_seller, price, quantity):
         self.report_cleared_price(buyer_seller, consumer_market, price, quantity, timestamp)
-        for market_base, market_list in self.consumer_market.items():
-            if consumer_market in market_list:
-                market_index = market_list.index(consumer_market)
-                if market_base == self.aggregate_clearing_market:
-                    supply_market = self.supplier_market[market_index]
-                    if price is not None:
-                        self.make_supply_offer(price, supply_market)
-                    if self.consumer_demand_curve[market_base][market_index] is not None and self.consumer_demand_curve[market_base][market_index]:
-                        cleared_quantity = self.consumer_demand_curve[market_base][market_index].x(price)
-                        _log.debug("%s price callback market: %s, price: %s, quantity: %s", self.core.identity, consumer_market, price, quantity)
-                        topic_suffix = "/".join([self.core.identity, "MarketClear"])
-                        message = {
-                            "MarketIndex": market_index,
-                            "Price": price,
-                            "Quantity": [quantity, cleared_quantity],
-                            "Commodity": market_base
-                        }
-                        self.publish_record(topic_suffix, message)
+        try:
+            market_base, market_index = self.consumer_market_index[consumer_market]
+        except KeyError:
+            return
+        if market_base == self.aggregate_clearing_market:
+            supply_market = self.supplier_market[market_index]
+            if price is not None:
+                self.make_supply_offer(price, supply_market)
+            if self.consumer_demand_curve[market_base][market_index] is not None and self.consumer_demand_curve[market_base][market_index]:
+                cleared_quantity = self.consumer_demand_curve[market_base][market_index].x(price)
+                _log.debug("%s price callback market: %s, price: %s, quantity: %s", self.core.identity, consumer_market, price, quantity)
+                topic_suffix = "/".join([self.core.identity, "MarketClear"])
+                message = {
+                    "MarketIndex": market_index,
+                    "Price": price,
+                    "Quantity": [quantity, cleared_quantity],
+                    "Commodity": market_base
+                }
+                self.publish_record(topic_suffix, message)
 
     def create_supply_curve(self, clear_price, supply_market):
-        index = self.supplier_market.index(supply_market)
+        index = self.supplier_market_index[supply_market]
         supply_curve = PolyLine()
         try:
             if self.aggregate_demand:
@@ -164,7 +183,7 @@ class Aggregator(TransactiveBase):
                                                                            supply_market,
                                                                            SELLER,
                                                                            supply_curve.points))
-        market_index = self.supplier_market.index(supply_market)
+        market_index = self.supplier_market_index[supply_market]
         topic_suffix = "/".join([self.core.identity, "SupplyCurve"])
         message = {"MarketIndex": market_index, "Curve": supply_curve.tuppleize(), "Commodity": self.supply_commodity}
         _log.debug("{} debug demand_curve - curve: {}".format(self.core.identity, supply_curve.points))
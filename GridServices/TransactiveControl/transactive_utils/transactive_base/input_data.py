@@ -0,0 +1,89 @@
+_MISSING = object()
+
+
+class InputRouter(object):
+    """
+    Point-indexed store for the configured device inputs of a transactive
+    agent.
+
+    Each device point is mapped once, when the inputs are configured, to the
+    model names (mapped) it feeds.  Incoming device data is routed by
+    looking up only the points it carries and the current value of a mapped
+    name is read from its slot directly.  update reports the points whose
+    value changed since they were last received so that only those are
+    recorded.
+    """
+    def __init__(self):
+        # mapped -> current value
+        self.values = {}
+        # mapped -> device point
+        self.points = {}
+        # device point -> tuple of mapped names it feeds
+        self.routes = {}
+        # device point -> last received value
+        self.received = {}
+        # Incremented whenever an input value changes.
+        self.version = 0
+
+    def __contains__(self, mapped):
+        return mapped in self.values
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def clear(self):
+        self.values.clear()
+        self.points.clear()
+        self.routes.clear()
+        self.received.clear()
+        self.version += 1
+
+    def add(self, mapped, point, value=None):
+        """
+        Route a device point to a mapped input.
+        :param mapped: str; name used by the model.
+        :param point: str; point name as published by the MasterDriverAgent.
+        :param value: initial value until the point is received.
+        :return:
+        """
+        previous = self.points.get(mapped)
+        if previous is not None and previous != point:
+            self.routes[previous] = tuple(name for name in self.routes[previous] if name != mapped)
+            if not self.routes[previous]:
+                del self.routes[previous]
+                self.received.pop(previous, None)
+        if mapped not in self.routes.get(point, ()):
+            self.routes[point] = self.routes.get(point, ()) + (mapped,)
+        self.points[mapped] = point
+        self.values[mapped] = value
+        self.version += 1
+
+    def get(self, mapped, default=None):
+        return self.values.get(mapped, default)
+
+    def update(self, data):
+        """
+        Store the values of the configured points found in data.
+        :param data: dict; key value pairs from master driver.
+        :return: dict; point -> value for the points that changed.
+        """
+        changed = {}
+        routes = self.routes
+        if len(data) < len(routes):
+            points = [point for point in data if point in routes]
+        else:
+            points = [point for point in routes if point in data]
+        for point in points:
+            value = data[point]
+            if self.received.get(point, _MISSING) == value:
+                continue
+            self.received[point] = value
+            for mapped in routes[point]:
+                self.values[mapped] = value
+            changed[point] = value
+        if changed:
+            self.version += 1
+        return changed
@@ -0,0 +1,710 @@
+import os
+import sys
+import json
+import math
+import shutil
+import logging
+import tempfile
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta as td
+from timeit import default_timer
+
+import dateutil.tz
+import gevent
+from gevent.event import AsyncResult
+import numpy as np
+
+from volttron.platform.agent.base_market_agent import MarketAgent
+from volttron.platform.agent.base_market_agent.buy_sell import BUYER, SELLER
+from volttron.platform.agent.base_market_agent.poly_line import PolyLine
+from volttron.platform.agent.base_market_agent.point import Point
+from volttron.platform.agent.utils import format_timestamp
+
+_log = logging.getLogger(__name__)
+
+MARKET_AGENTS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             'MarketAgents')
+
+
+def curve_arrays(curve):
+    """
+    Prices and quantities of a curve sorted by price.
+    :param curve: PolyLine
+    :return: (np.array prices, np.array quantities)
+    """
+    points = sorted(curve.points, key=lambda point: point.y)
+    prices = np.array([point.y for point in points], dtype=float)
+    quantities = np.array([point.x for point in points], dtype=float)
+    return prices, quantities
+
+
+def aggregate_curves(curves):
+    """
+    Sum demand curves at every price of any of the curves.  Each curve
+    keeps its end quantity beyond its price range.
+    :param curves: list of PolyLine
+    :return: PolyLine, None if no curve has points
+    """
+    arrays = [curve_arrays(curve) for curve in curves if curve is not None and curve.points]
+    if not arrays:
+        return None
+    prices = np.unique(np.concatenate([curve_prices for curve_prices, _ in arrays]))
+    quantities = np.zeros(len(prices))
+    for curve_prices, curve_quantities in arrays:
+        quantities += np.interp(prices, curve_prices, curve_quantities)
+    aggregate = PolyLine()
+    for price, quantity in zip(prices.tolist(), quantities.tolist()):
+        aggregate.add(Point(price=price, quantity=quantity))
+    return aggregate
+
+
+def clear_market(demand, supply):
+    """
+    Intersection of a demand and a supply curve.  A supply curve with a
+    single price (or quantity) clears at that price (quantity) if the
+    demand reaches it.
+    :param demand: PolyLine
+    :param supply: PolyLine
+    :return: (quantity, price), (None, None) if the curves do not intersect
+    """
+    demand_prices, demand_quantities = curve_arrays(demand)
+    supply_prices, supply_quantities = curve_arrays(supply)
+    if supply_prices[0] == supply_prices[-1]:
+        price = supply_prices[0]
+        quantity = np.interp(price, demand_prices, demand_quantities)
+        if not supply_quantities.min() <= quantity <= supply_quantities.max():
+            return None, None
+    elif supply_quantities.min() == supply_quantities.max():
+        quantity = supply_quantities[0]
+        if not demand_quantities.min() <= quantity <= demand_quantities.max():
+            return None, None
+        order = np.argsort(demand_quantities, kind='stable')
+        price = np.interp(quantity, demand_quantities[order], demand_prices[order])
+    else:
+        prices = np.union1d(demand_prices, supply_prices)
+        excess = np.interp(prices, demand_prices, demand_quantities) - np.interp(prices, supply_prices,
+                                                                                 supply_quantities)
+        crossing = np.nonzero(np.diff(np.sign(excess)))[0]
+        if excess[0] == 0.:
+            price = prices[0]
+        elif len(crossing) == 0:
+            return None, None
+        else:
+            i = crossing[0]
+            price = prices[i] + (prices[i + 1] - prices[i]) * excess[i] / (excess[i] - excess[i + 1])
+        quantity = np.interp(price, demand_prices, demand_quantities)
+    return float(quantity), float(price)
+
+
+Registration = namedtuple('Registration', ['agent', 'buyer_seller', 'offer_callback', 'aggregate_callback',
+                                           'price_callback', 'error_callback'])
+
+
+class SimulatedMarket(object):
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index
+        self.registrations = {BUYER: {}, SELLER: {}}
+        self.reset()
+
+    def reset(self):
+        self.offers = {BUYER: {}, SELLER: {}}
+        self.aggregate_demand = None
+        self.aggregated = False
+        self.price = None
+        self.quantity = None
+        self.state = 'collecting'
+
+    def offers_complete(self, buyer_seller):
+        return len(self.offers[buyer_seller]) == len(self.registrations[buyer_seller])
+
+
+class MarketService(object):
+    """
+    In-process stand-in for the VOLTTRON market service.
+
+    Markets are looked up by name and grouped by their index suffix
+    (electric_3 is market 3).  run_market runs the offer phase of all
+    markets of one index: buyers registered with an offer callback are
+    asked for their curves, the aggregate demand is sent to sellers
+    registered with an aggregate callback once all buyers offered and the
+    market clears once all sellers offered, calling the price callback of
+    every participant.  Offers made from inside callbacks are processed in
+    order from a queue, so a price clearing in one market can complete the
+    supply offers of markets lower in the hierarchy.
+    """
+
+    def __init__(self):
+        self.markets = {}
+        self.market_indices = {}
+        self.timestamp = None
+        self._ready = deque()
+        self._processing = False
+        self.offers = 0
+        self.aggregations = 0
+        self.aggregation_time = 0.
+        self.clearings = 0
+        self.clearing_time = 0.
+
+    def market(self, market_name):
+        market = self.markets.get(market_name)
+        if market is None:
+            base, _, index = market_name.rpartition('_')
+            index = int(index) if base and index.isdigit() else 0
+            market = SimulatedMarket(market_name, index)
+            self.markets[market_name] = market
+            self.market_indices.setdefault(index, []).append(market)
+        return market
+
+    def join_market(self, agent, market_name, buyer_seller, reservation_callback, offer_callback,
+                    aggregate_callback, price_callback, error_callback):
+        registration = Registration(agent, buyer_seller, offer_callback, aggregate_callback,
+                                    price_callback, error_callback)
+        self.market(market_name).registrations[buyer_seller][agent.core.identity] = registration
+
+    def make_offer(self, agent, market_name, buyer_seller, curve):
+        market = self.markets.get(market_name)
+        identity = agent.core.identity
+        if market is None or identity not in market.registrations[buyer_seller]:
+            return False, "{} is not a {} in market {}".format(identity, buyer_seller, market_name)
+        if market.state != 'collecting':
+            return False, "Market {} is not accepting offers".format(market_name)
+        if curve is None or not curve.points:
+            return False, "Empty curve from {}".format(identity)
+        market.offers[buyer_seller][identity] = curve
+        self.offers += 1
+        self._ready.append(market)
+        self._process()
+        return True, None
+
+    def run_market(self, index, timestamp):
+        """
+        Run the markets with one index to completion.
+        :param index: int; market index
+        :param timestamp: str; timestamp passed to the callbacks
+        :return: list of SimulatedMarket
+        """
+        self.timestamp = timestamp
+        markets = self.market_indices.get(index, [])
+        for market in markets:
+            market.reset()
+        self._processing = True
+        try:
+            for market in markets:
+                for buyer_seller in (BUYER, SELLER):
+                    for registration in list(market.registrations[buyer_seller].values()):
+                        if registration.offer_callback is not None:
+                            registration.offer_callback(timestamp, market.name, buyer_seller)
+                self._ready.append(market)
+        finally:
+            self._processing = False
+        self._process()
+        for market in markets:
+            if market.state == 'collecting':
+                self._fail(market, "Market {} did not receive all offers".format(market.name))
+        return markets
+
+    def _process(self):
+        if self._processing:
+            return
+        self._processing = True
+        try:
+            while self._ready:
+                self._update(self._ready.popleft())
+        finally:
+            self._processing = False
+
+    def _update(self, market):
+        if market.state != 'collecting' or not market.registrations[BUYER] or not market.offers_complete(BUYER):
+            return
+        if not market.aggregated:
+            start = default_timer()
+            market.aggregate_demand = aggregate_curves(list(market.offers[BUYER].values()))
+            self.aggregation_time += default_timer() - start
+            self.aggregations += 1
+            market.aggregated = True
+            for registration in list(market.registrations[SELLER].values()):
+                if registration.aggregate_callback is not None:
+                    registration.aggregate_callback(self.timestamp, market.name, BUYER, market.aggregate_demand)
+        if market.state != 'collecting' or not market.registrations[SELLER] or not market.offers_complete(SELLER):
+            return
+        supply_curves = list(market.offers[SELLER].values())
+        start = default_timer()
+        if len(supply_curves) == 1:
+            supply = supply_curves[0]
+        else:
+            supply = aggregate_curves(supply_curves)
+        quantity, price = clear_market(market.aggregate_demand, supply)
+        self.clearing_time += default_timer() - start
+        self.clearings += 1
+        if price is None:
+            self._fail(market, "Market {} curves do not intersect".format(market.name))
+            return
+        market.state = 'cleared'
+        market.price = price
+        market.quantity = quantity
+        for buyer_seller in (BUYER, SELLER):
+            for registration in list(market.registrations[buyer_seller].values()):
+                if registration.price_callback is not None:
+                    registration.price_callback(self.timestamp, market.name, buyer_seller, price, quantity)
+
+    def _fail(self, market, message):
+        _log.warning(message)
+        market.state = 'failed'
+        for buyer_seller in (BUYER, SELLER):
+            for registration in list(market.registrations[buyer_seller].values()):
+                if registration.error_callback is not None:
+                    registration.error_callback(self.timestamp, market.name, buyer_seller, 'NO_INTERSECT',
+                                                message, {})
+
+
+class MessageBus(object):
+    """
+    In-memory stand-in for the VOLTTRON message bus.  Messages are
+    delivered immediately to every subscription whose prefix matches the
+    topic.
+    """
+
+    def __init__(self):
+        self.subscriptions = []  # (prefix, callback)
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, prefix, callback):
+        self.subscriptions.append((prefix, callback))
+
+    def unsubscribe(self, prefix, callback):
+        self.subscriptions = [(p, c) for p, c in self.subscriptions if p != prefix or c != callback]
+
+    def publish(self, sender, topic, headers, message):
+        self.published += 1
+        for prefix, callback in list(self.subscriptions):
+            if topic.startswith(prefix):
+                callback('pubsub', sender, 'pubsub', topic, headers or {}, message)
+                self.delivered += 1
+
+
+def _done(value=None):
+    result = AsyncResult()
+    result.set(value)
+    return result
+
+
+class _PubSub(object):
+    def __init__(self, bus, identity):
+        self.bus = bus
+        self.identity = identity
+
+    def publish(self, peer, topic, headers=None, message=None):
+        self.bus.publish(self.identity, topic, headers, message)
+        return _done()
+
+    def subscribe(self, peer, prefix, callback, **kwargs):
+        self.bus.subscribe(prefix, callback)
+        return _done()
+
+    def unsubscribe(self, peer, prefix, callback, **kwargs):
+        self.bus.unsubscribe(prefix, callback)
+        return _done()
+
+
+class _RPC(object):
+    def __init__(self):
+        self.calls = 0
+
+    def call(self, peer, method, *args, **kwargs):
+        # Devices are not simulated, get_point returns None.
+        self.calls += 1
+        return _done()
+
+
+class _Config(object):
+    def __init__(self):
+        self.store = {}
+        self.callbacks = []
+
+    def set_default(self, name, contents):
+        self.store.setdefault(name, contents)
+
+    def get(self, name):
+        return self.store[name]
+
+    def set(self, name, contents, send_update=True):
+        self.store[name] = contents
+
+    def subscribe(self, callback, actions=None, pattern=None):
+        self.callbacks.append(callback)
+
+    def deliver(self, action="NEW"):
+        for callback in self.callbacks:
+            callback("config", action, self.store.get("config", {}))
+
+
+class _Vip(object):
+    def __init__(self, bus, identity):
+        self.pubsub = _PubSub(bus, identity)
+        self.rpc = _RPC()
+        self.config = _Config()
+
+
+class _Greenlet(object):
+    def kill(self):
+        pass
+
+
+class _Core(object):
+    def __init__(self, identity):
+        self.identity = identity
+
+    def periodic(self, period, func, wait=None):
+        # Actuation is not simulated.
+        return _Greenlet()
+
+    def schedule(self, deadline, func, *args, **kwargs):
+        return _Greenlet()
+
+
+class SimulatedParticipant(object):
+    """
+    Routes MarketAgent.join_market and make_offer of an agent to a
+    MarketService.
+    """
+    market_service = None
+
+    def join_market(self, market_name, buyer_seller, reservation_callback, offer_callback,
+                    aggregate_callback, price_callback, error_callback):
+        self.market_service.join_market(self, market_name, buyer_seller, reservation_callback, offer_callback,
+                                        aggregate_callback, price_callback, error_callback)
+
+    def make_offer(self, market_name, buyer_seller, curve):
+        return self.market_service.make_offer(self, market_name, buyer_seller, curve)
+
+
+@contextmanager
+def offline_market_agents(service, bus):
+    """
+    Within the context MarketAgent.__init__ gives agents stand-in core and
+    vip subsystems instead of connecting them to a platform.
+    """
+    original = vars(MarketAgent).get('__init__')
+
+    def __init__(self, identity=None, **kwargs):
+        self.core = _Core(identity)
+        self.vip = _Vip(bus, identity)
+        self.market_service = service
+
+    MarketAgent.__init__ = __init__
+    try:
+        yield
+    finally:
+        if original is None:
+            del MarketAgent.__init__
+        else:
+            MarketAgent.__init__ = original
+
+
+def load_agent_classes():
+    """
+    Import the VAV, AHU and meter agents, from the MarketAgents directory
+    if they are not installed.
+    :return: (VAVAgent, AHUAgent, MeterAgent)
+    """
+    for name in ('VAVAgent', 'AHUAgent', 'MeterAgent'):
+        path = os.path.join(MARKET_AGENTS, name)
+        if os.path.isdir(path) and path not in sys.path:
+            sys.path.append(path)
+    from vav.agent import VAVAgent
+    from ahu.agent import AHUAgent
+    from meter.agent import MeterAgent
+    return VAVAgent, AHUAgent, MeterAgent
+
+
+class MarketSimulator(object):
+    """
+    N VAV agents served by M AHU aggregators and one building meter,
+    clearing 24 hourly (TNS) markets in process.
+
+    Each round publishes the day-ahead prices and temperature forecast
+    (mixmarket/start_new_cycle) and one set of device data, then runs
+    market indices 0-23 in order: the VAV air demand is aggregated for
+    each AHU, translated to electric demand, aggregated by the electric
+    market and cleared against the meter supply, and the cleared electric
+    price sets the AHU air supply price for its VAVs.
+    """
+
+    def __init__(self, vav_count=10, ahu_count=1, start_time=datetime(2020, 7, 1, 0, 0, tzinfo=dateutil.tz.tzutc()),
+                 seed=0, agent_classes=None):
+        self.vav_count = vav_count
+        self.ahu_count = ahu_count
+        self.current_time = start_time
+        self.random = np.random.RandomState(seed)
+        self.agent_classes = agent_classes
+        self.service = MarketService()
+        self.bus = MessageBus()
+        self.config_dir = None
+        self.meter = None
+        self.ahus = []
+        self.vavs = []
+        self.round = 0
+        self.reports = []
+
+    def vav_config(self, index, ahu):
+        coefficients = [[-0.2 * factor, 0.1 * factor, 0.03 * factor, 2.2 * factor]
+                        for factor in self.random.uniform(0.8, 1.2, 24)]
+        return {
+            "campus": "CAMPUS",
+            "building": "BUILDING",
+            "device": "AHU{}".format(ahu),
+            "subdevice": "VAV{}".format(index),
+            "agent_name": "vav{}".format(index),
+            "market_name": "air_AHU{}".format(ahu),
+            "actuation_method": "market_clear",
+            "record_publish_interval": 0.,
+            "inputs": [
+                {"mapped": "sfs", "point": "SupplyFanStatus",
+                 "topic": "devices/CAMPUS/BUILDING/AHU{}/all".format(ahu), "initial_value": 1},
+                {"mapped": "oat", "point": "OutdoorAirTemperature",
+                 "topic": "devices/CAMPUS/BUILDING/AHU{}/all".format(ahu), "initial_value": 30.},
+                {"mapped": "zt", "point": "ZoneTemperature",
+                 "topic": "devices/CAMPUS/BUILDING/AHU{}/VAV{}/all".format(ahu, index), "initial_value": 22.},
+                {"mapped": "zaf", "point": "ZoneAirFlow",
+                 "topic": "devices/CAMPUS/BUILDING/AHU{}/VAV{}/all".format(ahu, index), "initial_value": 0.8}
+            ],
+            "outputs": [
+                {"mapped": "csp", "point": "ZoneCoolingTemperatureSetPoint",
+                 "topic": "CAMPUS/BUILDING/AHU{}/VAV{}/ZoneCoolingTemperatureSetPoint".format(ahu, index),
+                 "flexibility_range": [1.5, 0.2], "control_flexibility": [21., 24.],
+                 "off_setpoint": 26., "fallback": 22.5}
+            ],
+            "schedule": {day: "always_on" for day in ("Monday", "Tuesday", "Wednesday", "Thursday",
+                                                      "Friday", "Saturday", "Sunday")},
+            "model_parameters": {
+                "model_type": "vav.firstorderzone",
+                "terminal_box_type": "VAV",
+                "a1": [c[0] for c in coefficients],
+                "a2": [c[1] for c in coefficients],
+                "a3": [c[2] for c in coefficients],
+                "a4": [c[3] for c in coefficients]
+            }
+        }
+
+    def ahu_config(self, ahu):
+        return {
+            "campus": "CAMPUS",
+            "building": "BUILDING",
+            "device": "AHU{}".format(ahu),
+            "agent_name": "ahu{}".format(ahu),
+            "supplier_market_name": "air_AHU{}".format(ahu),
+            "consumer_market_name": "electric",
+            "record_publish_interval": 0.,
+            "inputs": [
+                {"mapped": name, "point": point, "topic": "devices/CAMPUS/BUILDING/AHU{}/all".format(ahu),
+                 "initial_value": value}
+                for name, point, value in (("sfs", "SupplyFanStatus", 1),
+                                           ("oat", "OutdoorAirTemperature", 30.),
+                                           ("mat", "MixedAirTemperature", 24.),
+                                           ("dat", "DischargeAirTemperature", 13.),
+                                           ("saf", "SupplyAirFlow", 10.),
+                                           ("rat", "ReturnAirTemperature", 23.))
+            ],
+            "outputs": [],
+            "schedule": {},
+            "model_parameters": {
+                "model_type": "ahuchiller.ahuchiller",
+                "equipment_configuration": {
+                    "has_economizer": True,
+                    "economizer_limit": 18.33,
+                    "supply_air_setpoint": 13.0,
+                    "nominal_zone_setpoint": 21.1,
+                    "building_chiller": True
+                },
+                "model_configuration": {
+                    "c0": 0.0024916812889370643,
+                    "c1": 0.53244827213615642,
+                    "c2": -0.15144710994850016,
+                    "c3": 0.060900887939007789,
+                    "cpAir": 1.006,
+                    "COP": 5.5
+                }
+            }
+        }
+
+    def meter_config(self):
+        return {
+            "campus": "CAMPUS",
+            "building": "BUILDING",
+            "agent_name": "meter",
+            "supplier_market_name": "electric",
+            "record_publish_interval": 0.,
+            "inputs": [],
+            "outputs": [],
+            "schedule": {},
+            "model_parameters": {"model_type": "meter.simple"}
+        }
+
+    def build_agent(self, agent_class, config):
+        """
+        Create an agent with stand-in platform subsystems and configure it.
+        :param agent_class: a TransactiveBase agent class
+        :param config: dict; agent configuration
+        :return: agent
+        """
+        cls = type(agent_class.__name__, (SimulatedParticipant, agent_class), {})
+        config_path = os.path.join(self.config_dir, config["agent_name"] + ".config")
+        with open(config_path, 'w') as config_file:
+            json.dump(config, config_file)
+        with offline_market_agents(self.service, self.bus):
+            agent = cls(config_path, identity=config["agent_name"])
+        agent.vip.config.deliver()
+        return agent
+
+    def setup(self):
+        vav_class, ahu_class, meter_class = self.agent_classes or load_agent_classes()
+        self.config_dir = tempfile.mkdtemp(prefix='market_simulator_')
+        self.meter = self.build_agent(meter_class, self.meter_config())
+        self.ahus = [self.build_agent(ahu_class, self.ahu_config(ahu + 1)) for ahu in range(self.ahu_count)]
+        self.vavs = [self.build_agent(vav_class, self.vav_config(index + 1, index % self.ahu_count + 1))
+                     for index in range(self.vav_count)]
+
+    def close(self):
+        for agent in [self.meter] + self.ahus + self.vavs:
+            if agent is not None:
+                agent.record_publisher.stop()
+        if self.config_dir is not None:
+            shutil.rmtree(self.config_dir, ignore_errors=True)
+            self.config_dir = None
+
+    @property
+    def agents(self):
+        return [self.meter] + self.ahus + self.vavs
+
+    def forecast(self):
+        # Day-ahead prices and outdoor air temperatures of the next 24 hours
+        hours = self.current_time.hour + 1 + np.arange(24)
+        phase = 2 * math.pi * (hours - 9) / 24.
+        prices = 0.05 + 0.03 * np.sin(phase) + self.random.normal(0., 0.002, 24)
+        temperatures = 28. + 6. * np.sin(phase) + self.random.normal(0., 0.5, 24)
+        return prices.tolist(), temperatures.tolist()
+
+    def publish_inputs(self, headers, temperature):
+        for ahu in range(1, self.ahu_count + 1):
+            self.bus.publish("simulator", "devices/CAMPUS/BUILDING/AHU{}/all".format(ahu), headers, [{
+                "SupplyFanStatus": 1,
+                "OutdoorAirTemperature": temperature,
+                "MixedAirTemperature": 24. + self.random.normal(0., 0.2),
+                "DischargeAirTemperature": 13. + self.random.normal(0., 0.1),
+                "SupplyAirFlow": 0.8 * self.vav_count / self.ahu_count,
+                "ReturnAirTemperature": 23.
+            }, {}])
+        for index in range(1, self.vav_count + 1):
+            ahu = (index - 1) % self.ahu_count + 1
+            self.bus.publish("simulator", "devices/CAMPUS/BUILDING/AHU{}/VAV{}/all".format(ahu, index), headers, [{
+                "ZoneTemperature": 22. + self.random.normal(0., 0.5),
+                "ZoneAirFlow": 0.8 + self.random.normal(0., 0.05)
+            }, {}])
+
+    def run_round(self):
+        """
+        Publish prices and device data, then clear the 24 hourly markets.
+        :return: dict report of the round
+        """
+        timestamp = format_timestamp(self.current_time)
+        headers = {"Date": timestamp}
+        prices, temperatures = self.forecast()
+        service = self.service
+        offers, aggregations, aggregation_time = service.offers, service.aggregations, service.aggregation_time
+        clearings, clearing_time = service.clearings, service.clearing_time
+        published = self.bus.published
+
+        start = default_timer()
+        self.bus.publish("simulator", "mixmarket/start_new_cycle", headers,
+                         {"Date": timestamp, "prices": prices, "temp": temperatures})
+        self.publish_inputs(headers, temperatures[0])
+        market_latency = []
+        cleared = {}
+        failed = 0
+        for index in range(24):
+            for vav in self.vavs:
+                if index > 0 and not vav.update_flag[index - 1]:
+                    # Market index - 1 did not clear for this VAV, its
+                    # offer_callback would wait for it indefinitely.
+                    vav.update_flag[index - 1] = True
+            market_start = default_timer()
+            markets = service.run_market(index, timestamp)
+            market_latency.append(default_timer() - market_start)
+            for market in markets:
+                if market.state == 'cleared':
+                    cleared[market.name] = (market.price, market.quantity)
+                else:
+                    failed += 1
+        latency = default_timer() - start
+        # Let the record publishers drain
+        gevent.sleep(0)
+        gevent.sleep(0)
+
+        electric = [cleared.get("electric_{}".format(index), (None, None)) for index in range(24)]
+        report = {
+            'round': self.round,
+            'time': timestamp,
+            'latency': latency,
+            'max_market_latency': max(market_latency),
+            'offers': service.offers - offers,
+            'aggregations': service.aggregations - aggregations,
+            'aggregation_time': service.aggregation_time - aggregation_time,
+            'clearings': service.clearings - clearings,
+            'clearing_time': service.clearing_time - clearing_time,
+            'cleared': len(cleared),
+            'failed': failed,
+            'records': self.bus.published - published,
+            'electric_prices': [price for price, _ in electric],
+            'electric_quantities': [quantity for _, quantity in electric]
+        }
+        self.reports.append(report)
+        self.round += 1
+        self.current_time += td(hours=1)
+        return report
+
+    def run(self, rounds):
+        """
+        Run several market rounds.
+        :param rounds: int
+        :return: list of dict reports, one per round
+        """
+        return [self.run_round() for i in range(rounds)]
+
+    def summary(self):
+        # Returns latency and aggregation cost per round
+        count = len(self.reports)
+        if count == 0:
+            return {}
+        latencies = [r['latency'] for r in self.reports]
+        aggregations = sum(r['aggregations'] for r in self.reports)
+        aggregation_time = sum(r['aggregation_time'] for r in self.reports)
+        return {'rounds': count,
+                'vavs': self.vav_count,
+                'ahus': self.ahu_count,
+                'mean_latency': sum(latencies) / count,
+                'max_latency': max(latencies),
+                'mean_aggregation_time': aggregation_time / count,
+                'aggregation_cost': aggregation_time / aggregations if aggregations else 0.,
+                'mean_clearing_time': sum(r['clearing_time'] for r in self.reports) / count,
+                'mean_offers': sum(r['offers'] for r in self.reports) / float(count),
+                'failed': sum(r['failed'] for r in self.reports)}
+
+
+if __name__ == '__main__':
+    vav_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    ahu_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    simulator = MarketSimulator(vav_count, ahu_count)
+    simulator.setup()
+    try:
+        for r in simulator.run(rounds):
+            print("Round {} at {}: latency {:.3f} s, {} offers, {} aggregations in {:.2f} ms, "
+                  "{} markets cleared, {} failed".format(r['round'], r['time'], r['latency'], r['offers'],
+                                                         r['aggregations'], r['aggregation_time'] * 1000.,
+                                                         r['cleared'], r['failed']))
+        print(simulator.summary())
+    finally:
+        simulator.close()
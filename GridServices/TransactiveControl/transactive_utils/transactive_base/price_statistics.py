@@ -0,0 +1,115 @@
+from collections import deque
+import math
+
+import numpy as np
+
+
+class PriceStatistics(object):
+    """
+    Rolling mean and (population) standard deviation of a price window.
+
+    The statistics are maintained with Welford's update when a price is
+    added to or dropped from the window and are only recomputed from the
+    prices when the whole window is replaced.  Demand curve builders read
+    the precomputed bounds instead of recomputing np.mean and np.std over
+    the window every market cycle.
+    """
+    def __init__(self, window=None):
+        """
+        :param window: int; maximum number of prices kept, None for no limit.
+        """
+        self.window = window
+        self.prices = deque()
+        self.mean = 0.
+        self._m2 = 0.
+        # Incremented whenever the statistics change.
+        self.version = 0
+        self._price_range = None
+
+    def __len__(self):
+        return len(self.prices)
+
+    def __bool__(self):
+        return bool(self.prices)
+
+    @property
+    def variance(self):
+        return max(self._m2 / len(self.prices), 0.) if self.prices else 0.
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def reset(self, prices=()):
+        """
+        Replace the price window.
+        :param prices: iterable of prices.
+        :return:
+        """
+        self.prices = deque(float(price) for price in prices)
+        if self.window is not None:
+            while len(self.prices) > self.window:
+                self.prices.popleft()
+        if self.prices:
+            values = np.array(self.prices)
+            self.mean = float(values.mean())
+            self._m2 = float(((values - self.mean) ** 2).sum())
+        else:
+            self.mean = 0.
+            self._m2 = 0.
+        self.version += 1
+
+    def add(self, price):
+        """
+        Append a price, dropping the oldest price if the window is full.
+        :param price: float
+        :return:
+        """
+        price = float(price)
+        self.prices.append(price)
+        delta = price - self.mean
+        self.mean += delta / len(self.prices)
+        self._m2 += delta * (price - self.mean)
+        if self.window is not None and len(self.prices) > self.window:
+            self._remove(self.prices.popleft())
+        self.version += 1
+
+    def _remove(self, price):
+        count = len(self.prices)
+        if not count:
+            self.mean = 0.
+            self._m2 = 0.
+            return
+        if count == 1:
+            # Exact, so rounding left by the updates does not persist
+            self.mean = self.prices[0]
+            self._m2 = 0.
+            return
+        delta = price - self.mean
+        self.mean -= delta / count
+        self._m2 -= delta * (price - self.mean)
+
+    def bounds(self, multiplier=1.0):
+        """
+        Price bounds one multiple of the standard deviation around the mean.
+        :param multiplier: float
+        :return: (price_min, price_max)
+        """
+        std = self.std
+        return self.mean - multiplier * std, self.mean + multiplier * std
+
+    def price_range(self, multiplier=1.0, points=11):
+        """
+        Evenly spaced prices between the bounds, cached until the prices
+        change.  The returned array is read only.
+        :param multiplier: float
+        :param points: int
+        :return: np.array
+        """
+        key = (self.version, multiplier, points)
+        if self._price_range is None or self._price_range[0] != key:
+            price_min, price_max = self.bounds(multiplier)
+            price_array = np.linspace(price_min, price_max, points)
+            price_array.flags.writeable = False
+            self._price_range = (key, price_array)
+        return self._price_range[1]
@@ -0,0 +1,163 @@
+import itertools
+import json
+import logging
+from collections import OrderedDict
+
+import gevent
+
+from volttron.platform.vip.agent import errors
+
+_log = logging.getLogger(__name__)
+
+
+class RecordPublisher(object):
+    """
+    Queues record publishes of an agent and sends them from a background
+    greenlet so that market and data callbacks never wait on the message
+    bus.
+
+    Records published with a key and queued within one interval under the
+    same topic and key are coalesced into one message, later values
+    replacing earlier ones; records without a key are never coalesced.  At
+    most max_pending records are held; when the queue is full or the bus
+    rejects a publish the oldest record is appended to spill_file (one JSON
+    object per line) or, without a spill file, dropped.  A publish the bus
+    does not acknowledge within timeout may still be delivered, so it is
+    counted as unconfirmed and neither spilled nor retried.  The counters in
+    metrics report the backpressure.
+    """
+    def __init__(self, vip, interval=1.0, max_pending=1000, timeout=10.0, spill_file=None):
+        """
+        :param vip: agent vip subsystem used to publish.
+        :param interval: float; seconds between publishes of the queue.
+        :param max_pending: int; maximum number of queued records.
+        :param timeout: float; seconds to wait for the bus per publish.
+        :param spill_file: str; file records are written to instead of
+        being dropped, None to drop them.
+        """
+        self.vip = vip
+        self.interval = interval
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.spill_file = spill_file
+        self.pending = OrderedDict()
+        self.metrics = {
+            "queued": 0,
+            "coalesced": 0,
+            "published": 0,
+            "failed": 0,
+            "unconfirmed": 0,
+            "spilled": 0,
+            "dropped": 0,
+            "max_pending": 0
+        }
+        self._greenlet = None
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def configure(self, interval=None, max_pending=None, timeout=None, spill_file=None):
+        if interval is not None:
+            self.interval = interval
+        if max_pending is not None:
+            self.max_pending = max_pending
+        if timeout is not None:
+            self.timeout = timeout
+        self.spill_file = spill_file
+
+    def publish(self, topic, headers, message, key=None):
+        """
+        Queue a record, starting the publishing greenlet if needed.
+        :param topic: str
+        :param headers: dict
+        :param message: dict
+        :param key: hashable; records of a topic with the same key (e.g.
+        market index) are coalesced, None to never coalesce the record.
+        :return:
+        """
+        if key is None:
+            record_key = (topic, None, next(self._sequence))
+        else:
+            record_key = (topic, key)
+        record = self.pending.get(record_key)
+        if record is not None:
+            record[1] = headers
+            record[2].update(message)
+            self.metrics["coalesced"] += 1
+        else:
+            while self.pending and len(self.pending) >= self.max_pending:
+                _, oldest = self.pending.popitem(last=False)
+                self._overflow(*oldest)
+            self.pending[record_key] = [topic, headers, dict(message)]
+            self.metrics["max_pending"] = max(self.metrics["max_pending"], len(self.pending))
+        self.metrics["queued"] += 1
+        if self._greenlet is None or self._greenlet.dead:
+            self._greenlet = gevent.spawn(self._run)
+
+    def _run(self):
+        while self.pending:
+            gevent.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        """
+        Publish the queued records, oldest first.  Stops at the first
+        publish the bus rejects or does not acknowledge; a rejected record
+        is spilled or dropped and the rest are retried on the next interval.
+        :return: bool; True if the queue was emptied.
+        """
+        while self.pending:
+            record_key, record = self.pending.popitem(last=False)
+            topic, headers, message = record
+            try:
+                self.vip.pubsub.publish("pubsub", topic, headers, message).get(timeout=self.timeout)
+            except gevent.GreenletExit:
+                # Killed by stop, keep the record for the last attempt.
+                newer = self.pending.pop(record_key, None)
+                if newer is not None:
+                    record[1] = newer[1]
+                    record[2].update(newer[2])
+                self.pending[record_key] = record
+                self.pending.move_to_end(record_key, last=False)
+                raise
+            except gevent.Timeout:
+                # The bus may still deliver the record, spilling it could
+                # store it twice.
+                _log.warning("Record publish to %s was not acknowledged in %s s", topic, self.timeout)
+                self.metrics["unconfirmed"] += 1
+                return False
+            except errors.VIPError as ex:
+                _log.warning("Record publish to %s failed: %s", topic, ex)
+                self.metrics["failed"] += 1
+                self._overflow(topic, headers, message)
+                return False
+            self.metrics["published"] += 1
+        return True
+
+    def stop(self):
+        """
+        Stop the publishing greenlet and make a last attempt to publish
+        the queued records, spilling or dropping them if the bus is slow.
+        :return:
+        """
+        if self._greenlet is not None:
+            self._greenlet.kill()
+            self._greenlet = None
+        if not self.flush():
+            while self.pending:
+                _, record = self.pending.popitem(last=False)
+                self._overflow(*record)
+
+    def _overflow(self, topic, headers, message):
+        if self.spill_file is not None:
+            try:
+                with open(self.spill_file, "a") as spill:
+                    spill.write(json.dumps({"topic": topic, "headers": headers, "message": message},
+                                           default=str) + "\n")
+                self.metrics["spilled"] += 1
+                return
+            except (IOError, OSError, TypeError, ValueError) as ex:
+                _log.warning("Could not spill record for %s: %s", topic, ex)
+        self.metrics["dropped"] += 1
+        _log.debug("Dropped record for %s", topic)
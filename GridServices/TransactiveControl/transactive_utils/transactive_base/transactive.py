@@ -13,12 +13,15 @@ from volttron.platform.agent.base_market_agent.poly_line import PolyLine
 from volttron.platform.agent.base_market_agent.point import Point
 from volttron.platform.agent.base_market_agent.buy_sell import BUYER
 from volttron.platform.agent.utils import setup_logging, format_timestamp, get_aware_utc_now
-from volttron.platform.vip.agent import Agent, Core
+from volttron.platform.vip.agent import Agent, Core, RPC
 from volttron.platform.messaging import topics, headers as headers_mod
 from volttron.platform.jsonrpc import RemoteError
 from volttron.platform.vip.agent import errors
 
 from transactive_utils.models import Model
+from transactive_utils.transactive_base.price_statistics import PriceStatistics
+from transactive_utils.transactive_base.input_data import InputRouter
+from transactive_utils.transactive_base.record_publisher import RecordPublisher
 
 _log = logging.getLogger(__name__)
 setup_logging()
@@ -44,6 +47,10 @@ class TransactiveBase(MarketAgent, Model):
             "outputs": [],
             "schedule": {},
             "model_parameters": {},
+            "record_publish_interval": 1.0,
+            "record_queue_size": 1000,
+            "record_publish_timeout": 10.0,
+            "record_spill_file": None
         }
         # Initaialize run parameters
         self.aggregator = aggregator
@@ -64,6 +71,11 @@ class TransactiveBase(MarketAgent, Model):
         self.market_prices = {}
         self.day_ahead_prices = []
         self.last_24_hour_prices = []
+        # Statistics of market_prices, either the hourly cleared prices
+        # or the last list of prices received.
+        self.hourly_price_statistics = PriceStatistics(window=24)
+        self.received_price_statistics = PriceStatistics()
+        self.price_statistics = self.received_price_statistics
         self.input_topics = set()
 
         self.commodity = "electricity"
@@ -81,7 +93,7 @@ class TransactiveBase(MarketAgent, Model):
         self.market_number = None
         self.single_market_contol_interval = None
         self.hour_prediction_offset = 1
-        self.inputs = {}
+        self.inputs = InputRouter()
         self.outputs = {}
         self.schedule = {}
         self.actuation_method = None
@@ -95,6 +107,7 @@ class TransactiveBase(MarketAgent, Model):
         self.default_min_price = 0.01
         self.default_max_price = 0.1
         self.oat_predictions = []
+        self.record_publisher = RecordPublisher(self.vip)
         if config:
             default_config.update(config)
             self.default_config = default_config
@@ -130,12 +143,17 @@ class TransactiveBase(MarketAgent, Model):
             else:
                 self.actuate_topic = actuate_topic
             self.price_multiplier = config.get("price_multiplier", 1.0)
+            self.record_publisher.configure(interval=config.get("record_publish_interval", 1.0),
+                                            max_pending=config.get("record_queue_size", 1000),
+                                            timeout=config.get("record_publish_timeout", 10.0),
+                                            spill_file=config.get("record_spill_file"))
             input_data_tz = config.get("input_data_timezone")
             self.input_data_tz = dateutil.tz.gettz(input_data_tz)
             inputs = config.get("inputs", [])
             schedule = config.get("schedule")
             self.clear_input_subscriptions()
             self.input_topics = set()
+            self.inputs.clear()
             self.init_inputs(inputs)
             self.init_schedule(schedule)
             outputs = config.get("outputs")
@@ -204,6 +222,16 @@ class TransactiveBase(MarketAgent, Model):
                     self.actuation_obj.kill()
                     self.actuation_obj = None
                 self.actuate(topic, release, actuator)
+        self.record_publisher.stop()
+
+    @RPC.export
+    def get_record_metrics(self):
+        """
+        Return the record publishing counters (queued, coalesced, published,
+        failed, unconfirmed, spilled, dropped, max_pending).
+        :return: dict
+        """
+        return dict(self.record_publisher.metrics)
 
     def init_markets(self):
         """
@@ -229,7 +257,7 @@ class TransactiveBase(MarketAgent, Model):
                 sys.exit()
 
             value = input_info.get("initial_value")
-            self.inputs[mapped] = {point: value}
+            self.inputs.add(mapped, point, value)
             self.input_topics.add(topic)
 
     def init_outputs(self, outputs):
@@ -522,12 +550,12 @@ class TransactiveBase(MarketAgent, Model):
         demand_curve = PolyLine()
         prices = self.determine_prices()
         self.update_prediction_error()
-        for control, price in zip(self.ct_flexibility, prices):
-            if occupied:
-                _set = control
-            else:
-                _set = self.off_setpoint
-            q = self.get_q(_set, sched_index, market_index, occupied)
+        if occupied:
+            sets = self.ct_flexibility
+        else:
+            sets = [self.off_setpoint]*len(self.ct_flexibility)
+        quantities = self.get_q_batch(sets, sched_index, market_index, occupied)
+        for q, price in zip(quantities, prices):
             demand_curve.add(Point(price=price, quantity=q))
 
         topic_suffix = "DemandCurve"
@@ -610,15 +638,18 @@ class TransactiveBase(MarketAgent, Model):
             if current_hour != self.current_hour:
                 self.current_price = self.day_ahead_prices[0]
                 self.last_24_hour_prices.append(self.current_price)
+                self.hourly_price_statistics.add(self.current_price)
                 if len(self.last_24_hour_prices) > 24:
                     self.last_24_hour_prices.pop(0)
                     self.market_prices = self.last_24_hour_prices
+                    self.price_statistics = self.hourly_price_statistics
                 elif len(self.last_24_hour_prices) == 24:
                     self.market_prices = self.last_24_hour_prices
+                    self.price_statistics = self.hourly_price_statistics
                 else:
-                    self.market_prices = message['prices']
+                    self.set_market_prices(message['prices'])
         else:
-            self.market_prices = message["prices"]
+            self.set_market_prices(message["prices"])
 
         self.current_hour = current_hour
         self.oat_predictions = []
@@ -628,10 +659,21 @@ class TransactiveBase(MarketAgent, Model):
 
     def update_rtp_prices(self, peer, sender, bus, topic, headers, message):
         hour = float(message['hour'])
-        self.market_prices = message["prices"]
+        self.set_market_prices(message["prices"])
         _log.debug("Get RTP Prices: {}".format(self.market_prices))
         self.current_price = self.market_prices[-1]
 
+    def set_market_prices(self, prices):
+        """
+        Replace market_prices and update the price statistics used to
+        build demand curves.
+        :param prices: list of prices
+        :return:
+        """
+        self.market_prices = prices
+        self.received_price_statistics.reset(prices)
+        self.price_statistics = self.received_price_statistics
+
     def determine_control(self, sets, prices, price):
         """
         prices is an list of 11 elements, evenly spaced from the smallest price
@@ -656,17 +698,12 @@ class TransactiveBase(MarketAgent, Model):
         :return:
         """
         if self.market_prices and not self.static_price_flag:
-            avg_price = np.mean(self.market_prices)
-            std_price = np.std(self.market_prices)
-            price_min = avg_price - self.price_multiplier * std_price
-            price_max = avg_price + self.price_multiplier * std_price
+            price_array = self.price_statistics.price_range(self.price_multiplier)
+            _log.debug("Prices: %s - avg: %s - std: %s", self.market_prices,
+                       self.price_statistics.mean, self.price_statistics.std)
         else:
-            avg_price = None
-            std_price = None
-            price_min = self.default_min_price
-            price_max = self.default_max_price
-        _log.debug("Prices: {} - avg: {} - std: {}".format(self.market_prices, avg_price, std_price))
-        price_array = np.linspace(price_min, price_max, 11)
+            _log.debug("Prices: %s - avg: None - std: None", self.market_prices)
+            price_array = np.linspace(self.default_min_price, self.default_max_price, 11)
         return price_array
 
     def update_input_data(self, peer, sender, bus, topic, headers, message):
@@ -702,15 +739,12 @@ class TransactiveBase(MarketAgent, Model):
         :param data: dict; key value pairs from master driver.
         :return:
         """
-        to_publish = {}
-        for name, input_data in self.inputs.items():
-            for point, value in input_data.items():
-                if point in data:
-                    self.inputs[name][point] = data[point]
-                    to_publish[point] = data[point]
-        topic_suffix = "InputData"
-        message = to_publish
-        self.publish_record(topic_suffix, message)
+        to_publish = self.inputs.update(data)
+        # Only inputs that changed since they were last received are recorded.
+        if to_publish:
+            topic_suffix = "InputData"
+            message = to_publish
+            self.publish_record(topic_suffix, message)
         # Call models update_data method
         if self.model is not None:
             self.model.update_data()
@@ -738,10 +772,7 @@ class TransactiveBase(MarketAgent, Model):
         :param mapped:
         :return:
         """
-        try:
-            return list(self.inputs[mapped].values())[0]
-        except KeyError:
-            return None
+        return self.inputs.get(mapped)
 
     def update_model(self, peer, sender, bus, topic, headers, message):
         config = self.store_model_config(message)
@@ -758,4 +789,9 @@ class TransactiveBase(MarketAgent, Model):
         headers = {headers_mod.DATE: format_timestamp(get_aware_utc_now())}
         message["TimeStamp"] = format_timestamp(self.current_datetime)
         topic = "/".join([self.record_topic, topic_suffix])
-        self.vip.pubsub.publish("pubsub", topic, headers, message).get()
+        # Only per-market records are coalesced, one per market and commodity.
+        if "MarketIndex" in message:
+            key = (message["MarketIndex"], message.get("Commodity"))
+        else:
+            key = None
+        self.record_publisher.publish(topic, headers, message, key=key)
@@ -0,0 +1,150 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE
+for the
+UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+# Alert throughput benchmark for the MonitorAgent rule engine.
+#
+# Builds a synthetic campus of devices, each with zone temperature and
+# discharge-air rules, replays one message per device per minute through
+# RuleEngine and reports rules evaluated per second.  The same messages are
+# also evaluated with per-rule sympy substitution for comparison.
+#
+# Usage (from the MonitorAgent directory):
+#     python -m monitor.rule_benchmark --devices 200 --rules-per-device 10 --minutes 60
+
+import argparse
+import datetime
+import random
+import time
+
+from monitor.rule_engine import RuleEngine
+
+
+def build_rules(devices, rules_per_device):
+    rules = []
+    for d in range(devices):
+        topic = "devices/CAMPUS/BUILDING{}/RTU{}/all".format(d // 20, d)
+        for r in range(rules_per_device - 1):
+            rules.append({
+                "condition": "(ZoneTemperatureRm{}>{}) & (OccupancyMode)".format(r, 74 + r % 3),
+                "inputs": {topic: ["ZoneTemperatureRm{}".format(r), "OccupancyMode"]},
+                "duration": 20,
+                "alert_message": "High zone temperature RTU{} Room {}".format(d, r)
+            })
+        rules.append({
+            "condition": "(DischargeAirTemperature>65.0) & (OccupancyMode) & (FirstStageCooling)",
+            "inputs": {topic: ["DischargeAirTemperature", "FirstStageCooling", "OccupancyMode"]},
+            "duration": 20,
+            "alert_message": "High discharge-air temperature RTU{}".format(d)
+        })
+    return rules
+
+
+def build_messages(engine, minutes, seed=0):
+    rng = random.Random(seed)
+    start = datetime.datetime(2024, 7, 1, 12)
+    messages = []
+    for minute in range(minutes):
+        timestamp = start + datetime.timedelta(minutes=minute)
+        for topic in engine.topics:
+            data = {point: rng.uniform(70.0, 78.0) for point in engine.topic_points[topic]}
+            data["OccupancyMode"] = 1
+            data["FirstStageCooling"] = rng.randint(0, 1)
+            messages.append((topic, data, timestamp))
+    return messages
+
+
+def run_engine(rules, messages):
+    engine = RuleEngine(rules)
+    alerts = 0
+    start = time.perf_counter()
+    for topic, data, timestamp in messages:
+        alerts += len(engine.ingest(topic, data, timestamp))
+    return time.perf_counter() - start, alerts
+
+
+def run_sympy(engine, messages, limit):
+    evaluated = 0
+    start = time.perf_counter()
+    for topic, data, timestamp in messages[:limit]:
+        for rule in engine.topic_index[topic]:
+            bool(rule.condition.subs({point: data[point] for _, point in rule.bindings}))
+            evaluated += 1
+    return time.perf_counter() - start, evaluated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MonitorAgent rule engine alert throughput benchmark")
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--rules-per-device", type=int, default=10)
+    parser.add_argument("--minutes", type=int, default=60)
+    parser.add_argument("--sympy-messages", type=int, default=50,
+                        help="number of messages to evaluate with sympy substitution for comparison")
+    args = parser.parse_args()
+
+    rules = build_rules(args.devices, args.rules_per_device)
+    start = time.perf_counter()
+    engine = RuleEngine(rules)
+    compile_time = time.perf_counter() - start
+    messages = build_messages(engine, args.minutes)
+    evaluations = len(messages) * args.rules_per_device
+
+    elapsed, alerts = run_engine(rules, messages)
+    print("rules: {}  condition groups: {}  compile: {:.2f} s".format(len(rules), len(engine.groups), compile_time))
+    print("rule engine: {} messages, {} evaluations, {} alerts in {:.3f} s ({:.0f} evaluations/s)".format(
+        len(messages), evaluations, alerts, elapsed, evaluations / elapsed))
+    if args.sympy_messages:
+        elapsed, evaluated = run_sympy(engine, messages, args.sympy_messages)
+        print("sympy subs: {} evaluations in {:.3f} s ({:.0f} evaluations/s)".format(
+            evaluated, elapsed, evaluated / elapsed))
+
+
+if __name__ == "__main__":
+    main()
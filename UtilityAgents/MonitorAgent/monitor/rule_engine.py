@@ -0,0 +1,262 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE
+for the
+UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+
+import logging
+from collections import defaultdict
+
+import numpy as np
+from sympy import Symbol, lambdify, preorder_traversal, srepr
+from sympy.parsing.sympy_parser import parse_expr
+
+_log = logging.getLogger(__name__)
+
+
+def build_template(expression):
+    """
+    Replace the variables and numeric constants of a condition with
+    positional symbols (x0, x1, ... and c0, c1, ...).
+
+    Conditions that differ only in point names and thresholds produce the
+    same template and can be evaluated together in one vectorized call.
+    :param expression: sympy expression of a rule condition.
+    :return: (template, variables, constants)
+    """
+    variables = []
+    constants = []
+    for node in preorder_traversal(expression):
+        if node.is_Symbol:
+            if node not in variables:
+                variables.append(node)
+        elif node.is_Number:
+            if node not in constants:
+                constants.append(node)
+    replacements = {}
+    for i, variable in enumerate(variables):
+        replacements[variable] = Symbol("x{}".format(i))
+    for i, constant in enumerate(constants):
+        replacements[constant] = Symbol("c{}".format(i))
+    template = expression.xreplace(replacements)
+    return template, variables, [float(constant) for constant in constants]
+
+
+class ConditionGroup(object):
+    """
+    Rules whose conditions share one template, compiled once into a
+    numpy callable that evaluates every rule of the group in one call.
+    """
+    def __init__(self, template, n_variables, n_constants):
+        self.template = template
+        args = [Symbol("x{}".format(i)) for i in range(n_variables)]
+        args.extend(Symbol("c{}".format(i)) for i in range(n_constants))
+        self.function = lambdify(args, template, modules="numpy")
+        self.n_variables = n_variables
+        self.n_constants = n_constants
+        self.rules = []
+        self.rule_constants = []
+        self.constants = None
+
+    def add(self, rule, constants):
+        rule.group_position = len(self.rules)
+        self.rules.append(rule)
+        self.rule_constants.append(constants)
+        self.constants = None
+
+    def evaluate(self, rules, topic_values):
+        """
+        Evaluate the conditions of rules (all members of this group).
+        Rules with a missing or non-numeric input evaluate to False.
+        :param rules: list of Rule.
+        :param topic_values: dict of topic -> {point: value}.
+        :return: numpy bool array, one entry per rule.
+        """
+        n = len(rules)
+        inputs = np.full((self.n_variables, n), np.nan)
+        for j, rule in enumerate(rules):
+            for i, (topic, point) in enumerate(rule.bindings):
+                value = topic_values[topic].get(point)
+                try:
+                    inputs[i, j] = float(value)
+                except (TypeError, ValueError):
+                    pass
+        if self.constants is None:
+            self.constants = np.array(self.rule_constants, dtype=float).reshape(len(self.rules), self.n_constants)
+        positions = [rule.group_position for rule in rules]
+        constants = self.constants[positions].T
+        with np.errstate(invalid="ignore"):
+            result = self.function(*inputs, *constants)
+        result = np.broadcast_to(np.asarray(result, dtype=bool), (n,))
+        return result & ~np.isnan(inputs).any(axis=0)
+
+
+class Rule(object):
+    """
+    One watchdog rule from the MonitorAgent configuration.
+    """
+    def __init__(self, index, rule):
+        self.index = index
+        self.condition = parse_expr(rule.get("condition"))
+        # input is a  dictionary where keys are
+        # topics and value is list of points
+        inputs = rule.get("inputs")
+        self.alert_message = rule.get("alert_message", "")
+        self.duration = rule.get("duration", 15)
+        self.disable_actuation = rule.get("disable_actuation", False)
+        self.disable_actuation_payload = rule.get("disable_actuation_payload", {})
+        self.topics = list(inputs)
+        point_topic = {}
+        for _topic, points in inputs.items():
+            for point in points:
+                point_topic.setdefault(point, _topic)
+        self.template, variables, self.constants = build_template(self.condition)
+        self.bindings = []
+        for variable in variables:
+            name = str(variable)
+            if name not in point_topic:
+                raise ValueError("Rule condition {} uses {} which is not in its inputs".format(self.condition, name))
+            self.bindings.append((point_topic[name], name))
+        self.pending = set(self.topics)
+        self.group_position = None
+
+
+class RuleEngine(object):
+    """
+    Shared evaluator for all MonitorAgent rules.
+
+    Every condition is compiled once, grouped with the conditions that
+    share its template.  Incoming device messages are routed to the rules
+    that use the topic through an index; rules become ready when all of
+    their topics have reported since their last evaluation, and all ready
+    rules are evaluated group by group in vectorized calls.  Duration
+    state is kept in arrays indexed by rule.
+    """
+    def __init__(self, rules):
+        self.rules = []
+        self.groups = {}
+        self.topic_index = defaultdict(list)
+        self.topic_points = defaultdict(set)
+        self.topic_values = defaultdict(dict)
+        for rule in rules:
+            self.add_rule(rule)
+        n = len(self.rules)
+        self.status = np.zeros(n, dtype=bool)
+        self.initial_time = np.full(n, np.nan)
+        self.durations = np.array([rule.duration * 60.0 for rule in self.rules], dtype=float)
+
+    def add_rule(self, config):
+        rule = Rule(len(self.rules), config)
+        key = srepr(rule.template)
+        group = self.groups.get(key)
+        if group is None:
+            group = ConditionGroup(rule.template, len(rule.bindings), len(rule.constants))
+            self.groups[key] = group
+        group.add(rule, rule.constants)
+        rule.group = group
+        self.rules.append(rule)
+        for _topic in rule.topics:
+            self.topic_index[_topic].append(rule)
+        for _topic, point in rule.bindings:
+            self.topic_points[_topic].add(point)
+        return rule
+
+    @property
+    def topics(self):
+        return list(self.topic_index)
+
+    def ingest(self, topic, data, timestamp):
+        """
+        Store the points of a device message and evaluate every rule that is ready.
+        :param topic: device topic the message was published on.
+        :param data: dict of point -> value.
+        :param timestamp: datetime of the message.
+        :return: list of Rule whose condition held for longer than its duration.
+        """
+        values = self.topic_values[topic]
+        for point in self.topic_points[topic]:
+            if point in data:
+                values[point] = data[point]
+        ready = defaultdict(list)
+        for rule in self.topic_index.get(topic, []):
+            rule.pending.discard(topic)
+            if not rule.pending:
+                ready[rule.group].append(rule)
+                rule.pending.update(rule.topics)
+        if not ready:
+            return []
+        indices = []
+        conditions = []
+        for group, rules in ready.items():
+            indices.extend(rule.index for rule in rules)
+            conditions.append(group.evaluate(rules, self.topic_values))
+        return self.update_status(np.array(indices), np.concatenate(conditions), timestamp)
+
+    def update_status(self, indices, conditions, timestamp):
+        """
+        Advance the duration state of the evaluated rules.
+
+        A rule alerts when its condition has been continuously true for
+        longer than its duration; the duration then restarts.  A false
+        condition or a timestamp earlier than the stored start time
+        restarts the duration.
+        :param indices: numpy array of rule indices.
+        :param conditions: numpy bool array of condition values.
+        :param timestamp: datetime of the message.
+        :return: list of Rule that alert.
+        """
+        now = timestamp.timestamp()
+        previous = self.status[indices]
+        initial = self.initial_time[indices]
+        restart = ~(conditions & previous) | ~(initial <= now)
+        elapsed = now - initial
+        fire = conditions & previous & ~restart & (elapsed > self.durations[indices])
+        self.initial_time[indices[restart | fire]] = now
+        self.status[indices] = conditions
+        return [self.rules[i] for i in indices[fire]]
@@ -40,14 +40,18 @@
 import logging
 import sys
 from collections import defaultdict
-from typing import Dict, Tuple, List, Any
+from typing import Dict, FrozenSet, Iterable, Set, Tuple, List, Any
 
 import gevent
+from gevent.pool import Pool
 from volttron.platform.agent import utils
 
 from volttron.platform.vip.agent import Agent, Core, RPC
 from volttron.platform.jsonrpc import RemoteError
 
+from .relay import CircuitBreaker, PlatformRelay, RelayItem
+from .routing import RoutingCache
+
 utils.setup_logging()
 _log = logging.getLogger(__name__)
 __version__ = '2.0'
@@ -59,8 +63,22 @@ class MultiplatformCoordinator(Agent):
         self.config = utils.load_config(config_path) if config_path else {}
         self.vip.config.set_default("config", self.config)
         self.configured_platforms = self.config.get("connected_platforms")
-        self.routing_table = {}
+        self.routing = RoutingCache(self.update_routing_table, listener=self.routing_changed)
+        self.routing_refresh = None
+        self.routing_refresh_interval = 60.0
         self.subscription_registry = defaultdict(lambda: defaultdict(dict))
+        # platform -> identity -> topics, used to prune subscriptions of one platform without walking the registry
+        self.subscription_index = defaultdict(lambda: defaultdict(set))
+        # platform -> identity -> routing generation the subscription was registered under
+        self.unverified = defaultdict(dict)
+        self.batch_callbacks = {}
+        self.relays = {}
+        self.relay_pool = Pool()
+        self.relay_timeout = 10.0
+        self.relay_queue_depth = 1000
+        self.relay_batch_size = 50
+        self.breaker_failure_threshold = 3
+        self.breaker_reset_timeout = 30.0
         self.vip.config.subscribe(self.configure_main, actions=['NEW', 'UPDATE'], pattern='config')
         self.error = False
 
@@ -69,6 +87,8 @@ class MultiplatformCoordinator(Agent):
 
         Checks if the given platform and identity exist in the routing table.
 
+        Answers from the routing cache and never blocks; a stale entry triggers a background refresh.
+
         Args:
             platform (str): The platform to check in the routing table.
             identity (str): The identity to check for within the platform's entry in the routing table.
@@ -77,53 +97,81 @@ class MultiplatformCoordinator(Agent):
             bool: True if both the platform and identity are found in the routing table, False otherwise.
 
         """
-        if platform in self.routing_table and identity in self.routing_table[platform]:
-            return True
-        else:
-            return False
+        return self.routing.contains(platform, identity)
 
-    def update_routing_table(self, platform: str):
+    def update_routing_table(self, platform: str) -> List[str]:
         """
-        Update the routing table with the list of agents found on the specified platform
+        Query the list of agents found on the specified platform.
 
         Args:
             platform (str): The platform to query for the list of agents
 
-        This method queries control for a list of agents on the specified platform and
-        updates the local routing table with this information. If the query fails due to a timeout or
-        remote error, the routing table entry for the platform is set to an empty list.
+        This method queries control for a list of agents on the specified platform.  It is the fetch
+        function of the routing cache and only runs in the cache's background refresh greenlets.
+        If the query fails due to a timeout or remote error the exception is raised, the routing
+        cache keeps the previous peer list and no subscriptions are pruned.
+
+        Returns:
+            List[str]: The agents on the platform.
 
         Raises:
-            gevent.Timeout: If the RPC call times out
-            RemoteError: If there is an error in the remote call
+            gevent.Timeout: If the peer list query times out.
+            RemoteError: If there is an error in the remote call.
         """
         try:
             agent_list = self.vip.rpc.call('control', 'peerlist', external_platform=platform).get(timeout=10)
-            _log.debug(f'Update routing table for {platform}: {agent_list}')
-            self.routing_table[platform] = agent_list
         except (gevent.Timeout, RemoteError) as ex:
             _log.debug(f'Exception on connection to {platform} -- {ex}')
-            self.routing_table[platform] = []
+            raise
+        _log.debug(f'Update routing table for {platform}: {agent_list}')
+        return agent_list
 
     def create_routing_table(self):
         """
         Creates and initializes the routing table for the configured platforms.
 
-        This method sets up an empty routing table and iterates over the list
-        of configured platforms to update the routing information for each platform.
+        This method clears the routing cache, schedules a background refresh for each
+        configured platform and starts the periodic refresh of stale entries.
+        """
+        if self.routing_refresh is not None:
+            self.routing_refresh.kill()
+        self.routing.clear()
+        for platform in self.configured_platforms or []:
+            self.routing.refresh(platform)
+        self.routing_refresh = self.core.periodic(self.routing_refresh_interval, self.refresh_routing)
+
+    def refresh_routing(self):
+        """
+        Periodic callback that schedules background refreshes for stale routing cache entries.
+        """
+        platforms = set(self.configured_platforms or []) | set(self.subscription_index)
+        self.routing.refresh_stale(platforms)
+
+    def routing_changed(self, platform: str, identities: FrozenSet[str], removed: FrozenSet[str],
+                        generation: int):
+        """
+        Routing cache listener that prunes subscriptions of agents that are no longer on a platform.
 
-        The routing table is a dictionary where routing information such as
-        routes and destinations will be stored. The update_routing_table method
-        is called for each platform in the list of configured platforms, populating
-        the routing table with the necessary data.
+        Only the subscriptions of the refreshed platform are examined: identities that left the
+        platform and identities registered before they appeared in the platform's peer list.
+        Identities registered under this generation or later subscribed while the peer list query
+        was in flight; they are left for the next refresh, which the registration requested.
 
-        Raises:
-            KeyError: If a required key is missing in the platform configuration.
-            ValueError: If there is an invalid value in the platform configuration.
+        Args:
+            platform (str): The refreshed platform.
+            identities (FrozenSet[str]): Agents currently on the platform.
+            removed (FrozenSet[str]): Agents that left the platform since the previous refresh.
+            generation (int): Routing generation of the completed peer list query.
         """
-        self.routing_table = {}
-        for platform in self.configured_platforms:
-            self.update_routing_table(platform)
+        unverified = self.unverified.get(platform, {})
+        checked = {identity for identity, stamp in unverified.items() if stamp < generation}
+        for identity in checked:
+            del unverified[identity]
+        stale = (set(removed) | checked) - identities - set(unverified)
+        if not unverified:
+            self.unverified.pop(platform, None)
+        if stale:
+            self.prune_subscriptions(platform, stale)
 
     def configure_main(self, config_name: str, action: str, contents: Dict[str, Any]):
         """
@@ -143,8 +191,115 @@ class MultiplatformCoordinator(Agent):
         """
         self.config = contents
         self.configured_platforms = self.config.get("connected_platforms")
+        self.relay_timeout = float(self.config.get("relay_timeout", 10.0))
+        self.relay_queue_depth = int(self.config.get("relay_queue_depth", 1000))
+        self.relay_batch_size = int(self.config.get("relay_batch_size", 50))
+        self.breaker_failure_threshold = int(self.config.get("breaker_failure_threshold", 3))
+        self.breaker_reset_timeout = float(self.config.get("breaker_reset_timeout", 30.0))
+        self.routing.ttl = float(self.config.get("routing_ttl", 300.0))
+        self.routing_refresh_interval = float(self.config.get("routing_refresh_interval", 60.0))
+        self.create_relays()
         self.create_routing_table()
 
+    def create_relays(self):
+        """
+        Stops any running relay workers and creates one relay queue and worker greenlet per configured platform.
+
+        Messages still queued on the old relays are moved to the new relays of their platforms, so a
+        configuration update does not lose them.  Relays for platforms that are only known through a
+        subscription are created on demand by get_relay.
+        """
+        pending = {platform: relay.close() for platform, relay in self.relays.items()}
+        self.relays = {}
+        for platform in self.configured_platforms or []:
+            self.get_relay(platform)
+        for platform, items in pending.items():
+            if items:
+                relay = self.get_relay(platform)
+                for item in items:
+                    relay.put(item)
+
+    def get_relay(self, platform: str) -> PlatformRelay:
+        """
+        Returns the relay for the given platform, creating it and starting its worker if needed.
+
+        Args:
+            platform (str): The platform to relay messages to.
+
+        Returns:
+            PlatformRelay: The relay for the platform.
+        """
+        relay = self.relays.get(platform)
+        if relay is None:
+            breaker = CircuitBreaker(self.breaker_failure_threshold, self.breaker_reset_timeout)
+            relay = PlatformRelay(platform, self.send_relay_batch,
+                                  max_queue_depth=self.relay_queue_depth,
+                                  batch_size=self.relay_batch_size,
+                                  breaker=breaker,
+                                  on_failure=self.relay_failed)
+            self.relays[platform] = relay
+            relay.worker = self.relay_pool.spawn(relay.run)
+        return relay
+
+    def send_relay_batch(self, platform: str, batch: List[RelayItem]) -> List[RelayItem]:
+        """
+        Delivers a batch of queued messages to one platform.
+
+        Messages for an identity that registered a batch_function are sent in a single RPC as a list of
+        [topic, headers, message] entries; all other messages are sent one RPC per message to the
+        registered function.
+
+        Args:
+            platform (str): The platform to deliver to.
+            batch (List[RelayItem]): Messages queued for the platform.
+
+        Returns:
+            List[RelayItem]: The messages whose RPC failed; messages of a failed batch_function call all fail.
+        """
+        batched = defaultdict(list)
+        undelivered = []
+        for item in batch:
+            identity, callback, batch_callback, topic, headers, message = item
+            if batch_callback:
+                batched[(identity, batch_callback)].append(item)
+                continue
+            try:
+                self.vip.rpc.call(identity, callback, headers, message,
+                                  external_platform=platform).get(timeout=self.relay_timeout)
+            except (gevent.Timeout, RemoteError) as ex:
+                _log.error(f'Failed to call {callback} for {identity} on {platform}: {ex}')
+                undelivered.append(item)
+        for (identity, batch_callback), items in batched.items():
+            messages = [[topic, headers, message] for _, _, _, topic, headers, message in items]
+            try:
+                self.vip.rpc.call(identity, batch_callback, messages,
+                                  external_platform=platform).get(timeout=self.relay_timeout)
+            except (gevent.Timeout, RemoteError) as ex:
+                _log.error(f'Failed to call {batch_callback} for {identity} on {platform}: {ex}')
+                undelivered.extend(items)
+        return undelivered
+
+    def relay_failed(self, platform: str, batch: List[RelayItem], ex: Exception):
+        """
+        Invalidates the routing cache entry of a platform after a failed relay.
+
+        Args:
+            platform (str): The platform that failed.
+            batch (List[RelayItem]): Messages that were not delivered.
+            ex (Exception): The exception raised by send_batch, None if only some RPCs failed.
+        """
+        self.routing.invalidate(platform)
+
+    @RPC.export
+    def get_relay_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns relay latency, queue depth, delivery counters and circuit breaker state per platform.
+
+        Returns:
+            dict: Metrics keyed by platform.
+        """
+        return {platform: relay.metrics() for platform, relay in self.relays.items()}
+
     @RPC.export
     def relay(self, platform: str, identity: str, function: str, *args, **kwargs) -> Any:
         """
@@ -166,13 +321,14 @@ class MultiplatformCoordinator(Agent):
             Returns:
                 Any: The result from the remote procedure call, if successful; otherwise, None.
         """
+        result = None
         if self.check_routing(platform, identity):
             try:
                 result = self.vip.rpc.call(identity, function, *args, **kwargs,
-                                           external_platform=platform).get(timeout=10)
+                                           external_platform=platform).get(timeout=self.relay_timeout)
             except (gevent.Timeout, RemoteError) as ex:
                 _log.debug(f'Exception connection to {platform} - identity: {identity} -- function: {function} -- {ex}')
-                self.update_routing_table(platform)
+                self.routing.invalidate(platform)
         return result
 
     @RPC.export
@@ -184,6 +340,9 @@ class MultiplatformCoordinator(Agent):
             data (dict): A dictionary containing subscription details:
                          - 'topic' (str): The topic to subscribe to.
                          - 'all_platforms' (bool, optional): Whether to subscribe across all platforms. Defaults to False.
+                         - 'batch_function' (str, optional): Function that accepts a list of
+                           [topic, headers, message] entries; when set, queued messages are
+                           delivered to it in one RPC per batch instead of calling 'function' per message.
 
         Returns:
             bool: True if subscription was successful, False otherwise.
@@ -208,7 +367,11 @@ class MultiplatformCoordinator(Agent):
         """
         Builds a subscription map from the provided data.
 
-        Unpacks the subscription payload and updates the routing table and register subscriptions.
+        Unpacks the subscription payload and registers the subscription.  Registration never waits for a
+        peer list: if the identity is not yet in the cached routing table, or a peer list query for its
+        platform is already in flight, the subscription is stamped with the current routing generation and
+        kept as unverified.  routing_changed prunes it if the first refresh started after the registration
+        does not list it.
 
         Args:
             data: The subscription data to process. Expected to contain topic, identity, platform, and callback information.
@@ -217,60 +380,49 @@ class MultiplatformCoordinator(Agent):
             None
         """
         topic, platform, identity, callback = self.unpack_subscription_payload(data)
-        self.update_routing_table(platform)
-        _log.debug(f'Updating routing table: {self.routing_table}')
         self.subscription_registry[topic][platform][identity] = callback
-        self.update_routing_table(platform)
-        self.unregister_subscription()
-
-    def unregister_subscription(self):
-        """
-        Cleans up invalid subscriptions and empty topics from the current subscription list.
-
-        The function performs the following actions:
-        - Calls the `cleanup_invalid_subscriptions` method to remove any invalid subscriptions.
-        - Calls the `cleanup_empty_topics` method to remove any empty topics.
-        """
-        _log.debug(f'Running unsubscribe methods!')
-        self.cleanup_invalid_subscriptions()
-        self.cleanup_empty_topics()
-
-    def cleanup_invalid_subscriptions(self):
+        self.subscription_index[platform][identity].add(topic)
+        self.batch_callbacks[(platform, identity)] = data.get('batch_function')
+        if not self.check_routing(platform, identity) or platform in self.routing.pending:
+            generation = self.routing.generation(platform)
+            self.unverified[platform][identity] = generation
+            self.routing.refresh(platform, newer_than=generation)
+        _log.debug(f'Routing table: {self.routing.snapshot()}')
+
+    def prune_subscriptions(self, platform: str, identities: Set[str]):
         """
-        Removes invalid subscriptions from the subscription_registry dictionary.
+        Removes the subscriptions of the given identities on one platform.
 
-        Identifies invalid subscriptions by checking if routing exists for each identity in the subscription.
-        If routing does not exist, the identity is marked for cleanup.
+        Uses the subscription index so only the topics the identities subscribed to are visited;
+        topics left without subscribers are unsubscribed from the pubsub system.
 
-        This function iterates through each topic, platform, and identity in the subscription_registry dictionary.
-        If an identity is found to be invalid, it is added to a temporary cleanup dictionary.
-        After identifying all invalid subscriptions, it removes them from the original subscription_registry dictionary.
+        Args:
+            platform (str): The platform the identities were on.
+            identities (Set[str]): The identities to remove.
         """
-        cleanup = defaultdict(lambda: defaultdict(list))
-
-        for topic, topic_payload in self.subscription_registry.items():
-            for platform, identities in topic_payload.items():
-                for identity in identities:
-                    if not self.check_routing(platform, identity):
-                        cleanup[topic][platform].append(identity)
-        _log.debug(f'Running cleanup_invalid_subscriptions {cleanup}')
-        for topic, platforms in cleanup.items():
-            for platform, identities in platforms.items():
-                for identity in identities:
-                    self.subscription_registry[topic][platform].pop(identity, None)
-        _log.debug(f'Execute cleanup_invalid_subscriptions {self.subscription_registry}')
-
-    def cleanup_empty_topics(self):
+        affected = set()
+        platform_index = self.subscription_index.get(platform, {})
+        for identity in identities:
+            for topic in platform_index.pop(identity, ()):
+                self.subscription_registry[topic][platform].pop(identity, None)
+                affected.add(topic)
+            self.batch_callbacks.pop((platform, identity), None)
+        if not platform_index:
+            self.subscription_index.pop(platform, None)
+        _log.debug(f'Pruned subscriptions for {sorted(identities)} on {platform}: {sorted(affected)}')
+        self.cleanup_empty_topics(affected)
+
+    def cleanup_empty_topics(self, topics: Iterable[str]):
         """
         Cleans up empty topics from the subscription registry and unsubscribes them from the pubsub system.
 
-        This method iterates over the registered subscriptions to identify topics with no associated payloads.
-        For each identified empty topic, it removes the topic from the subscription registry and unsubscribes from the pubsub system.
-
+        Args:
+            topics (Iterable[str]): Topics whose subscriptions changed.
         """
         empty_topics = []
-        all_topics = list(self.subscription_registry.keys())
-        for topic in all_topics:
+        for topic in topics:
+            if topic not in self.subscription_registry:
+                continue
             if all(not payload for payload in self.subscription_registry[topic].values()):
                 empty_topics.append(topic)
         _log.debug(f'Running cleanup_empty_topics {empty_topics}')
@@ -300,7 +452,10 @@ class MultiplatformCoordinator(Agent):
     def subscription_handler(self, peer: str, sender: str, bus: str,
                              topic: str, headers: str, message: Any) -> None:
         """
-        Handles incoming subscriptions by forwarding messages to appropriate subscribed platforms and identities.
+        Handles incoming subscriptions by queueing messages for each subscribed platform and identity.
+
+        Delivery happens on the per-platform relay workers so that a slow or unreachable platform does not
+        delay delivery to the others.
 
         Args:
             peer (str): The peer from which the message is received.
@@ -313,26 +468,20 @@ class MultiplatformCoordinator(Agent):
         Logs:
             Logs debug information about received message and callback routing.
 
-        Exceptions:
-            Handles gevent.Timeout and RemoteError exceptions during RPC call and logs errors appropriately.
-
         """
         _log.debug(f'Received message from {peer} on {topic}')
-        on_error = False
         subscriptions = self.subscription_registry.get(topic, {})
         for platform, platform_payload in subscriptions.items():
+            relay = None
             for identity, callback in platform_payload.items():
-                _log.debug(f'Sending to {platform} -- {identity} with callback {callback}')
-                if self.check_routing(platform, identity):
-                    try:
-                        self.vip.rpc.call(identity, callback, headers, message,
-                                          external_platform=platform).get(timeout=10)
-                    except (gevent.Timeout, RemoteError) as ex:
-                        on_error = True
-                        self.update_routing_table(platform)
-                        _log.error(f'Failed to call {callback} for {identity} on {platform}: {ex}')
-        if on_error:
-            self.unregister_subscription()
+                if not self.check_routing(platform, identity):
+                    continue
+                _log.debug(f'Queueing for {platform} -- {identity} with callback {callback}')
+                if relay is None:
+                    relay = self.get_relay(platform)
+                batch_callback = self.batch_callbacks.get((platform, identity))
+                if not relay.put((identity, callback, batch_callback, topic, headers, message)):
+                    _log.warning(f'Relay queue for {platform} is full, dropped oldest message')
 
 
 def main(argv=sys.argv):
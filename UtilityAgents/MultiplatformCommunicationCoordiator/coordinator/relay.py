@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2024, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import gevent
+from gevent.queue import Queue, Empty, Full
+
+_log = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# (identity, callback, batch_callback, topic, headers, message)
+RelayItem = Tuple[str, str, Optional[str], str, Any, Any]
+
+
+class CircuitBreaker:
+    """
+    Per-platform circuit breaker for relayed RPC calls.
+
+    After failure_threshold consecutive failures the breaker opens and relays
+    to the platform are rejected without an RPC until reset_timeout seconds
+    have passed. The next relay is then let through as a trial (half open);
+    success closes the breaker and failure opens it again.
+    """
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        """
+        Returns True if a relay to the platform may be attempted.
+        """
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = HALF_OPEN
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.state = CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                _log.warning(f'Circuit breaker opened after {self.failures} failures')
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+class PlatformRelay:
+    """
+    Bounded relay queue and worker greenlet for one remote platform.
+
+    Messages are queued by the subscription handler and delivered by a
+    dedicated worker so a slow or unreachable platform only delays its own
+    deliveries.  When the queue is full the oldest message is dropped.  The
+    worker drains up to batch_size messages per wake-up and hands them to
+    send_batch in one call.  Failures are counted per message: send_batch
+    returns the messages it could not deliver, and the breaker only records
+    a failure when none of the batch was delivered.
+
+    Args:
+        platform (str): Name of the remote platform.
+        send_batch (Callable): Called as send_batch(platform, items); returns the items that were not delivered.
+        max_queue_depth (int): Maximum number of queued messages.
+        batch_size (int): Maximum number of messages delivered per send_batch call.
+        breaker (CircuitBreaker): Circuit breaker guarding the platform.
+        on_failure (Callable): Called as on_failure(platform, items, exception) with the undelivered items.
+    """
+    def __init__(self, platform: str, send_batch: Callable[[str, List[RelayItem]], List[RelayItem]],
+                 max_queue_depth: int = 1000, batch_size: int = 50,
+                 breaker: Optional[CircuitBreaker] = None,
+                 on_failure: Optional[Callable[[str, List[RelayItem], Exception], None]] = None):
+        self.platform = platform
+        self.send_batch = send_batch
+        self.batch_size = max(1, batch_size)
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.on_failure = on_failure
+        self.queue = Queue(maxsize=max(1, max_queue_depth))
+        self.sent = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+        self.max_queue_depth_seen = 0
+        self.closed = False
+        self.busy = False
+        self.worker = None
+
+    def put(self, item: RelayItem) -> bool:
+        """
+        Queue a message for delivery without blocking the caller.
+
+        Args:
+            item (RelayItem): Message to relay.
+
+        Returns:
+            bool: False if an older message had to be dropped to make room.
+        """
+        dropped = False
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                break
+            except Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                    dropped = True
+                except Empty:
+                    pass
+        self.max_queue_depth_seen = max(self.max_queue_depth_seen, self.queue.qsize())
+        return not dropped
+
+    def run(self):
+        """
+        Worker loop, spawned once per platform into the coordinator's greenlet pool.
+        """
+        while not self.closed:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            self.busy = True
+            try:
+                self.deliver(batch)
+            finally:
+                self.busy = False
+
+    def close(self) -> List[RelayItem]:
+        """
+        Stops the worker and returns the messages still queued.
+
+        A batch that is being delivered is finished by the worker, which then exits; an idle
+        worker is killed right away.
+
+        Returns:
+            List[RelayItem]: Queued messages that were not handed to send_batch, oldest first.
+        """
+        self.closed = True
+        if self.worker is not None and not self.busy:
+            self.worker.kill(block=False)
+        pending = []
+        while True:
+            try:
+                pending.append(self.queue.get_nowait())
+            except Empty:
+                return pending
+
+    def deliver(self, batch: List[RelayItem]):
+        """
+        Deliver one batch through send_batch and update breaker state and metrics.
+
+        Args:
+            batch (List[RelayItem]): Messages to deliver.
+        """
+        if not self.breaker.allow():
+            self.rejected += len(batch)
+            _log.debug(f'Circuit open for {self.platform}, dropping {len(batch)} messages')
+            return
+        start = time.monotonic()
+        error = None
+        try:
+            undelivered = list(self.send_batch(self.platform, batch) or [])
+        except Exception as ex:
+            undelivered = batch
+            error = ex
+        finally:
+            latency = time.monotonic() - start
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            self.total_latency += latency
+            self.batches += 1
+        self.sent += len(batch) - len(undelivered)
+        self.failed += len(undelivered)
+        if len(undelivered) < len(batch):
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        if undelivered:
+            _log.error(f'Relay to {self.platform} failed for {len(undelivered)} of {len(batch)} messages'
+                       + (f': {error}' if error is not None else ''))
+            if self.on_failure is not None:
+                self.on_failure(self.platform, undelivered, error)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: Queue depth, delivery counters, relay latency (seconds) and breaker state.
+        """
+        return {
+            'queue_depth': self.queue.qsize(),
+            'max_queue_depth': self.max_queue_depth_seen,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'batches': self.batches,
+            'last_latency': self.last_latency,
+            'max_latency': self.max_latency,
+            'mean_latency': self.total_latency / self.batches if self.batches else 0.0,
+            'breaker_state': self.breaker.state
+        }
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2024, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+
+import logging
+import time
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional
+
+import gevent
+
+_log = logging.getLogger(__name__)
+
+
+class RoutingCache:
+    """
+    Per-platform cache of the agents reachable on each connected platform.
+
+    Lookups never block: they answer from the cached peer list and, when the
+    entry is older than ttl seconds, schedule a refresh in a background
+    greenlet.  Concurrent refresh requests for the same platform share one
+    peer list query.  Every query is numbered with a per-platform generation
+    when it starts, so callers can tell whether a peer list was requested
+    before or after an event.  After every successful refresh the listener
+    is called with the platform, its current identities, the identities that
+    disappeared since the previous refresh and the generation of the query.
+    A failed query keeps the previous peer list and does not call the
+    listener.
+
+    Args:
+        fetch (Callable): Called as fetch(platform) in a background greenlet; returns the platform's peer list,
+            raises on failure.
+        ttl (float): Seconds a cached peer list is considered fresh.
+        listener (Callable): Called as listener(platform, identities, removed, generation) after each refresh.
+    """
+    def __init__(self, fetch: Callable[[str], List[str]], ttl: float = 300.0,
+                 listener: Optional[Callable[[str, FrozenSet[str], FrozenSet[str], int], None]] = None):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.listener = listener
+        self.tables: Dict[str, FrozenSet[str]] = {}
+        self.updated: Dict[str, float] = {}
+        self.pending: Dict[str, gevent.Greenlet] = {}
+        # platform -> generation of the last query started and of the newest query requested
+        self.generations: Dict[str, int] = {}
+        self.requested: Dict[str, int] = {}
+
+    def contains(self, platform: str, identity: str) -> bool:
+        """
+        Returns True if identity is in the cached peer list of platform.
+
+        Schedules a background refresh when the cached entry is missing or stale.
+        """
+        if self.is_stale(platform):
+            self.refresh(platform)
+        return identity in self.tables.get(platform, ())
+
+    def is_stale(self, platform: str) -> bool:
+        updated = self.updated.get(platform)
+        return updated is None or time.monotonic() - updated >= self.ttl
+
+    def generation(self, platform: str) -> int:
+        """
+        Returns the generation of the last peer list query started for platform, 0 if none.
+
+        Only queries with a higher generation can reflect changes made after this call.
+        """
+        return self.generations.get(platform, 0)
+
+    def refresh(self, platform: str, newer_than: Optional[int] = None) -> gevent.Greenlet:
+        """
+        Schedules a refresh of the peer list for platform unless one is already running.
+
+        Args:
+            platform (str): The platform to refresh.
+            newer_than (int): If given, a query with a higher generation is guaranteed: when the query in
+                flight is not newer, another one is run after it completes.
+
+        Returns:
+            gevent.Greenlet: The greenlet performing the refresh.
+        """
+        if newer_than is not None:
+            self.requested[platform] = max(self.requested.get(platform, 0), newer_than + 1)
+        greenlet = self.pending.get(platform)
+        if greenlet is None:
+            greenlet = gevent.spawn(self._refresh, platform)
+            self.pending[platform] = greenlet
+        return greenlet
+
+    def refresh_stale(self, platforms: Optional[Iterable[str]] = None):
+        """
+        Schedules a refresh for every stale platform in platforms (default: all cached platforms).
+        """
+        for platform in list(platforms if platforms is not None else self.tables):
+            if self.is_stale(platform):
+                self.refresh(platform)
+
+    def invalidate(self, platform: str):
+        """
+        Marks the platform entry stale and schedules a refresh; the cached peer list is kept until it completes.
+        """
+        self.updated.pop(platform, None)
+        self.refresh(platform)
+
+    def clear(self):
+        for greenlet in list(self.pending.values()):
+            greenlet.kill(block=False)
+        self.pending = {}
+        self.tables = {}
+        self.updated = {}
+        self.requested = {}
+
+    def snapshot(self) -> Dict[str, List[str]]:
+        return {platform: sorted(identities) for platform, identities in self.tables.items()}
+
+    def _refresh(self, platform: str):
+        try:
+            while self._query(platform) and self.requested.get(platform, 0) > self.generations[platform]:
+                pass
+        finally:
+            self.pending.pop(platform, None)
+
+    def _query(self, platform: str) -> bool:
+        generation = self.generations.get(platform, 0) + 1
+        self.generations[platform] = generation
+        try:
+            identities = frozenset(self.fetch(platform) or [])
+        except Exception as ex:
+            _log.warning(f'Routing table refresh for {platform} failed, keeping previous peer list: {ex}')
+            return False
+        previous = self.tables.get(platform, frozenset())
+        self.tables[platform] = identities
+        self.updated[platform] = time.monotonic()
+        removed = previous - identities
+        if identities != previous:
+            _log.debug(f'Routing table for {platform} changed: added {sorted(identities - previous)} '
+                       f'removed {sorted(removed)}')
+        if self.listener is not None:
+            self.listener(platform, identities, removed, generation)
+        return True
@@ -0,0 +1,145 @@
+from collections import defaultdict
+from types import SimpleNamespace
+
+import gevent
+import gevent.event
+from gevent.pool import Pool
+
+from coordinator.agent import MultiplatformCoordinator
+from coordinator.relay import CircuitBreaker, PlatformRelay
+
+
+def item(identity, message, batch_callback=None):
+    return identity, "on_message", batch_callback, "topic", {}, message
+
+
+class FakeResult:
+    def __init__(self, error=None):
+        self.error = error
+
+    def get(self, timeout=None):
+        if self.error is not None:
+            raise self.error
+        return None
+
+
+class FakeRPC:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+
+    def call(self, identity, function, *args, **kwargs):
+        self.calls.append((identity, function, args))
+        if identity in self.failing:
+            return FakeResult(gevent.Timeout())
+        return FakeResult()
+
+
+def make_coordinator(rpc):
+    agent = MultiplatformCoordinator.__new__(MultiplatformCoordinator)
+    agent.vip = SimpleNamespace(rpc=rpc)
+    agent.relays = {}
+    agent.relay_pool = Pool()
+    agent.relay_timeout = 1.0
+    agent.relay_queue_depth = 100
+    agent.relay_batch_size = 50
+    agent.breaker_failure_threshold = 3
+    agent.breaker_reset_timeout = 30.0
+    agent.configured_platforms = ["p1"]
+    agent.routing = SimpleNamespace(invalidate=lambda platform: None)
+    agent.batch_callbacks = defaultdict(dict)
+    return agent
+
+
+def test_partial_failure_counts_messages_and_keeps_breaker_closed():
+    failures = []
+    breaker = CircuitBreaker(failure_threshold=1)
+    relay = PlatformRelay("p1", lambda platform, batch: batch[1:2], breaker=breaker,
+                          on_failure=lambda platform, batch, ex: failures.append(batch))
+    batch = [item("a", 1), item("b", 2), item("c", 3)]
+    relay.deliver(batch)
+    assert relay.sent == 2
+    assert relay.failed == 1
+    assert failures == [[batch[1]]]
+    assert breaker.allow()
+
+
+def test_wholly_failed_batch_trips_breaker():
+    failures = []
+    breaker = CircuitBreaker(failure_threshold=1)
+    relay = PlatformRelay("p1", lambda platform, batch: batch, breaker=breaker,
+                          on_failure=lambda platform, batch, ex: failures.append((batch, ex)))
+    batch = [item("a", 1), item("b", 2)]
+    relay.deliver(batch)
+    assert relay.sent == 0
+    assert relay.failed == 2
+    assert failures == [(batch, None)]
+    assert not breaker.allow()
+
+
+def test_exception_fails_whole_batch():
+    error = RuntimeError("down")
+
+    def send(platform, batch):
+        raise error
+
+    failures = []
+    relay = PlatformRelay("p1", send, on_failure=lambda platform, batch, ex: failures.append(ex))
+    relay.deliver([item("a", 1), item("b", 2)])
+    assert relay.failed == 2
+    assert failures == [error]
+
+
+def test_send_relay_batch_returns_only_failed_messages():
+    agent = make_coordinator(FakeRPC(failing={"b", "c"}))
+    batch = [item("a", 1), item("b", 2), item("c", 3, "on_batch"), item("c", 4, "on_batch"),
+             item("d", 5, "on_batch")]
+    undelivered = agent.send_relay_batch("p1", batch)
+    assert undelivered == [batch[1], batch[2], batch[3]]
+    batch_calls = [call for call in agent.vip.rpc.calls if call[1] == "on_batch"]
+    assert [call[0] for call in batch_calls] == ["c", "d"]
+    assert batch_calls[0][2][0] == [["topic", {}, 3], ["topic", {}, 4]]
+
+
+def test_create_relays_migrates_queued_messages():
+    agent = make_coordinator(FakeRPC())
+    agent.create_relays()
+    old = agent.relays["p1"]
+    # Queued while the worker has not run yet.
+    messages = [item("a", n) for n in range(3)]
+    for message in messages:
+        old.put(message)
+    agent.configured_platforms = ["p1", "p2"]
+    agent.create_relays()
+    new = agent.relays["p1"]
+    assert new is not old
+    assert old.closed
+    assert "p2" in agent.relays
+    gevent.sleep(0)
+    assert new.sent == 3
+    assert old.sent == 0
+    assert [call[2][1] for call in agent.vip.rpc.calls] == [0, 1, 2]
+    agent.relay_pool.kill()
+
+
+def test_close_lets_in_flight_batch_finish():
+    delivered = []
+    release = gevent.event.Event()
+
+    def send(platform, batch):
+        release.wait()
+        delivered.extend(batch)
+        return []
+
+    relay = PlatformRelay("p1", send)
+    relay.worker = gevent.spawn(relay.run)
+    relay.put(item("a", 1))
+    gevent.sleep(0)
+    relay.put(item("a", 2))
+    assert relay.busy
+    pending = relay.close()
+    assert pending == [item("a", 2)]
+    release.set()
+    relay.worker.join(timeout=1)
+    assert relay.worker.dead
+    assert delivered == [item("a", 1)]
@@ -0,0 +1,105 @@
+from collections import defaultdict
+from types import SimpleNamespace
+
+import gevent
+import gevent.event
+
+from coordinator.agent import MultiplatformCoordinator
+from coordinator.routing import RoutingCache
+
+
+class FakeResult:
+    def get(self, timeout=None):
+        return None
+
+
+class ControlledFetch:
+    """
+    Peer list query whose answers are released one at a time by the test.
+    """
+    def __init__(self):
+        self.answers = []
+        self.calls = 0
+
+    def __call__(self, platform):
+        self.calls += 1
+        answer = gevent.event.AsyncResult()
+        self.answers.append(answer)
+        return answer.get()
+
+    def answer(self, peers=None, error=None):
+        gevent.sleep(0)
+        result = self.answers.pop(0)
+        if error is not None:
+            result.set_exception(error)
+        else:
+            result.set(peers)
+        gevent.sleep(0)
+
+
+def make_coordinator(fetch):
+    agent = MultiplatformCoordinator.__new__(MultiplatformCoordinator)
+    agent.vip = SimpleNamespace(pubsub=SimpleNamespace(unsubscribe=lambda **kwargs: FakeResult()))
+    agent.routing = RoutingCache(fetch, listener=agent.routing_changed)
+    agent.subscription_registry = defaultdict(lambda: defaultdict(dict))
+    agent.subscription_index = defaultdict(lambda: defaultdict(set))
+    agent.unverified = defaultdict(dict)
+    agent.batch_callbacks = {}
+    return agent
+
+
+def subscribe(agent, identity, topic="devices/all", platform="p1"):
+    agent.build_subscription_map({"topic": topic, "identity": identity,
+                                  "platform": platform, "function": "on_message"})
+
+
+def subscribed(agent, identity, topic="devices/all", platform="p1"):
+    return identity in agent.subscription_registry.get(topic, {}).get(platform, {})
+
+
+def test_registration_during_refresh_survives_older_peer_list():
+    fetch = ControlledFetch()
+    agent = make_coordinator(fetch)
+    subscribe(agent, "a")
+    gevent.sleep(0)
+    # First peer list query is in flight when b registers.
+    subscribe(agent, "b")
+    fetch.answer(["a"])
+    assert subscribed(agent, "a")
+    assert subscribed(agent, "b")
+    assert agent.unverified["p1"] == {"b": 1}
+    # The registration requested a newer query.
+    assert fetch.calls == 2
+    fetch.answer(["a", "b"])
+    assert subscribed(agent, "b")
+    assert "p1" not in agent.unverified
+
+
+def test_identity_missing_from_newer_peer_list_is_pruned():
+    fetch = ControlledFetch()
+    agent = make_coordinator(fetch)
+    subscribe(agent, "a")
+    gevent.sleep(0)
+    subscribe(agent, "b")
+    fetch.answer(["a"])
+    fetch.answer(["a"])
+    assert subscribed(agent, "a")
+    assert not subscribed(agent, "b")
+
+
+def test_refresh_failure_keeps_peer_list_and_subscriptions():
+    fetch = ControlledFetch()
+    agent = make_coordinator(fetch)
+    calls = []
+    listener = agent.routing.listener
+    agent.routing.listener = lambda *args: calls.append(args) or listener(*args)
+    subscribe(agent, "a")
+    fetch.answer(["a"])
+    assert len(calls) == 1
+    agent.routing.invalidate("p1")
+    fetch.answer(error=gevent.Timeout())
+    assert len(calls) == 1
+    assert agent.routing.tables["p1"] == frozenset(["a"])
+    assert agent.routing.is_stale("p1")
+    assert subscribed(agent, "a")
+    assert "p1" not in agent.routing.pending
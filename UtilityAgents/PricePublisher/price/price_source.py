@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2016, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+
+# }}}
+
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+_log = logging.getLogger(__name__)
+
+
+class PriceSource(object):
+    """
+    Time indexed price series read from a csv file.
+
+    The first column of the csv is the timestamp and price_column holds the
+    price; all other columns are ignored.  The file is parsed in chunks of
+    chunksize rows into a sorted DatetimeIndex and a float price array, so
+    windows are sliced with searchsorted instead of boolean masks.  When
+    cache_file is given the parsed arrays are saved there as .npy files and
+    memory-mapped on later loads as long as the csv has not changed.  The
+    csv is reloaded when its modification time or size changes.
+    """
+    def __init__(self, price_file, price_column="price", chunksize=100000, cache_file=None):
+        self.price_file = price_file
+        self.price_column = price_column
+        self.chunksize = chunksize
+        self.cache_file = cache_file
+        self.index = pd.DatetimeIndex([])
+        self.prices = np.empty(0)
+        self.file_stat = None
+
+    def __len__(self):
+        return len(self.prices)
+
+    def load(self):
+        """
+        Load the price series, from the memory-mapped cache when it is
+        current and from the csv otherwise.
+        """
+        stat = os.stat(self.price_file)
+        stamp = (stat.st_mtime, stat.st_size)
+        if not self._load_cache(stamp):
+            self._load_csv()
+            self._save_cache(stamp)
+        self.file_stat = stamp
+        _log.debug("Loaded {} prices from {}".format(len(self.prices), self.price_file))
+
+    def reload_if_changed(self):
+        """
+        Reload the price series if the csv changed since the last load.
+        :return: True if the prices were reloaded.
+        """
+        try:
+            stat = os.stat(self.price_file)
+        except OSError as ex:
+            _log.debug("Cannot stat price file {}: {}".format(self.price_file, ex))
+            return False
+        if (stat.st_mtime, stat.st_size) == self.file_stat:
+            return False
+        _log.info("Price file {} changed, reloading".format(self.price_file))
+        self.load()
+        return True
+
+    def window(self, current_time, trailing_hours=24, forward_hours=0):
+        """
+        Return the prices around current_time.
+        :param current_time: naive datetime in the time zone of the price file.
+        :param trailing_hours: hours before current_time, the window is
+            (current_time - trailing_hours, current_time].
+        :param forward_hours: hours after current_time, the window is
+            (current_time, current_time + forward_hours].
+        :return: (trailing prices, forward prices) as lists of floats.
+        """
+        current = pd.Timestamp(current_time)
+        index = self.index
+        now = index.searchsorted(current, side="right")
+        start = index.searchsorted(current - pd.Timedelta(hours=trailing_hours), side="right")
+        trailing = self.prices[start:now].tolist()
+        forward = []
+        if forward_hours:
+            end = index.searchsorted(current + pd.Timedelta(hours=forward_hours), side="right")
+            forward = self.prices[now:end].tolist()
+        return trailing, forward
+
+    def _load_csv(self):
+        timestamps = []
+        prices = []
+        columns = pd.read_csv(self.price_file, nrows=0).columns
+        reader = pd.read_csv(self.price_file, chunksize=self.chunksize,
+                             usecols=[columns[0], self.price_column])
+        for chunk in reader:
+            timestamps.append(pd.to_datetime(chunk.iloc[:, 0]).to_numpy(dtype="datetime64[ns]"))
+            prices.append(chunk[self.price_column].to_numpy(dtype=float))
+        if timestamps:
+            stamps = np.concatenate(timestamps)
+            values = np.concatenate(prices)
+        else:
+            stamps = np.empty(0, dtype="datetime64[ns]")
+            values = np.empty(0)
+        if len(stamps) > 1 and (np.diff(stamps.astype("int64")) < 0).any():
+            order = np.argsort(stamps, kind="stable")
+            stamps = stamps[order]
+            values = values[order]
+        self.index = pd.DatetimeIndex(stamps)
+        self.prices = values
+
+    def _cache_paths(self):
+        return self.cache_file + ".index.npy", self.cache_file + ".prices.npy", self.cache_file + ".stamp.npy"
+
+    def _load_cache(self, stamp):
+        if not self.cache_file:
+            return False
+        index_path, prices_path, stamp_path = self._cache_paths()
+        try:
+            if tuple(np.load(stamp_path).tolist()) != stamp:
+                return False
+            stamps = np.load(index_path, mmap_mode="r")
+            self.prices = np.load(prices_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return False
+        self.index = pd.DatetimeIndex(stamps.view("datetime64[ns]"))
+        return True
+
+    def _save_cache(self, stamp):
+        if not self.cache_file:
+            return
+        index_path, prices_path, stamp_path = self._cache_paths()
+        try:
+            np.save(index_path, self.index.to_numpy(dtype="datetime64[ns]").view("int64"))
+            np.save(prices_path, np.asarray(self.prices))
+            np.save(stamp_path, np.array(stamp, dtype=float))
+        except OSError as ex:
+            _log.debug("Cannot write price cache {}: {}".format(self.cache_file, ex))
@@ -58,8 +58,6 @@
 
 import sys
 import logging
-from datetime import timedelta as td
-import pandas as pd
 import dateutil.tz
 from dateutil import parser
 from volttron.platform.vip.agent import Agent, Core
@@ -70,6 +68,8 @@ from volttron.platform.agent.base_market_agent import MarketAgent
 from volttron.platform.agent.base_market_agent.buy_sell import SELLER
 from volttron.platform.scheduling import cron
 
+from price.price_source import PriceSource
+
 
 _log = logging.getLogger(__name__)
 utils.setup_logging()
@@ -99,7 +99,15 @@ def price_publisher(config_path, **kwargs):
     cron_schedule = config.get("cron_schedule")
     timezone = config.get("tz", "US/Pacific")
     building_sim_topic = config.get("building_sim_topic")
-    return PricePublisherAgent(agent_name, price_file, cron_schedule, timezone, building_sim_topic, **kwargs)
+    price_source = PriceSource(price_file,
+                               price_column=config.get("price_column", "price"),
+                               chunksize=config.get("chunksize", 100000),
+                               cache_file=config.get("cache_file"))
+    trailing_hours = config.get("trailing_hours", 24)
+    forward_hours = config.get("forward_hours", 0)
+    return PricePublisherAgent(agent_name, price_file, cron_schedule, timezone, building_sim_topic,
+                               price_source=price_source, trailing_hours=trailing_hours,
+                               forward_hours=forward_hours, **kwargs)
 
 
 class PricePublisherAgent(Agent):
@@ -108,13 +116,16 @@ class PricePublisherAgent(Agent):
     sells electricity for a single building at a fixed price.
     """
 
-    def __init__(self, agent_name, price_file, cron_schedule, timezone,  building_sim_topic, **kwargs):
+    def __init__(self, agent_name, price_file, cron_schedule, timezone,  building_sim_topic,
+                 price_source=None, trailing_hours=24, forward_hours=0, **kwargs):
         super(PricePublisherAgent, self).__init__(**kwargs)
         self.agent_name = agent_name
         self.price_file = price_file
         self.cron_schedule = cron_schedule
         self.timezone = timezone
-        self.power_prices = None
+        self.power_prices = price_source if price_source is not None else PriceSource(price_file)
+        self.trailing_hours = trailing_hours
+        self.forward_hours = forward_hours
         self.building_sim_topic = building_sim_topic
         self.current_time = None
 
@@ -130,13 +141,7 @@ class PricePublisherAgent(Agent):
             _log.debug("Electric supplier has no price information from file: {}".format(self.price_file))
             sys.exit()
         try:
-            self.power_prices = pd.read_csv(self.price_file)
-            self.power_prices = self.power_prices.set_index(self.power_prices.columns[0])
-            self.power_prices.index = pd.to_datetime(self.power_prices.index)
-
-            self.power_prices['month'] = self.power_prices.index.month.astype(int)
-            self.power_prices['day'] = self.power_prices.index.day.astype(int)
-            self.power_prices['hour'] = self.power_prices.index.hour.astype(int)
+            self.power_prices.load()
         except:
             _log.debug("ERROR reading price file!")
             sys.exit()
@@ -171,17 +176,20 @@ class PricePublisherAgent(Agent):
         current_hour = timestamp.hour
 
         current_time = timestamp.replace(minute=0, second=0, microsecond=0, tzinfo=None)
-        start_time = current_time - td(hours=24)
-        mask = (self.power_prices.index <= current_time) & (self.power_prices.index > start_time)
-        prices = self.power_prices.loc[mask]
-        prices = [price for price in prices['price']]
+        try:
+            self.power_prices.reload_if_changed()
+        except Exception as ex:
+            _log.debug("ERROR reloading price file, using previous prices: {}".format(ex))
+        prices, forward_prices = self.power_prices.window(current_time, self.trailing_hours, self.forward_hours)
         if not prices:
             _log.debug("No time coincides to the current date/hours!  - No prices to publish")
         else:
+            message = {"prices": prices, "hour": str(current_hour)}
+            if self.forward_hours:
+                message["forward_prices"] = forward_prices
             self.vip.pubsub.publish(peer='pubsub',
                                     topic='mixmarket/start_new_cycle',
-                                    message={"prices": prices,
-                                             "hour": str(current_hour)})
+                                    message=message)
 
 
 
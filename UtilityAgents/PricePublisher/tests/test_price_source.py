@@ -0,0 +1,120 @@
+import os
+from datetime import datetime, timedelta as td
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from price.price_source import PriceSource
+
+START = datetime(2020, 9, 1, 0, 0)
+
+
+def write_prices(path, hours, offset=0.0, order=None):
+    times = [START + td(hours=h) for h in range(hours)]
+    rows = ["{},{:.4f},{}".format(t.strftime("%Y-%m-%d %H:%M:%S"), 0.02 + 0.001 * (i % 48) + offset, i)
+            for i, t in enumerate(times)]
+    if order is not None:
+        rows = [rows[i] for i in order]
+    with open(path, "w") as price_file:
+        price_file.write("timestamp,price,other\n")
+        price_file.write("\n".join(rows) + "\n")
+
+
+def mask_window(path, current_time, trailing_hours=24, forward_hours=0):
+    # The boolean mask selection PricePublisherAgent used before PriceSource
+    power_prices = pd.read_csv(path)
+    power_prices = power_prices.set_index(power_prices.columns[0])
+    power_prices.index = pd.to_datetime(power_prices.index)
+    power_prices = power_prices.sort_index()
+    start_time = current_time - td(hours=trailing_hours)
+    mask = (power_prices.index <= current_time) & (power_prices.index > start_time)
+    trailing = [price for price in power_prices.loc[mask]['price']]
+    mask = (power_prices.index > current_time) & (power_prices.index <= current_time + td(hours=forward_hours))
+    forward = [price for price in power_prices.loc[mask]['price']]
+    return trailing, forward
+
+
+@pytest.fixture
+def price_file(tmpdir):
+    path = str(tmpdir.join("prices.csv"))
+    write_prices(path, 24 * 10)
+    return path
+
+
+@pytest.mark.parametrize("trailing_hours,forward_hours", [(24, 0), (24, 24), (48, 72), (168, 0), (1, 1)])
+def test_window_matches_mask(price_file, trailing_hours, forward_hours):
+    source = PriceSource(price_file, chunksize=50)
+    source.load()
+    assert len(source) == 240
+    for hours in [-5, 0, 1, 23, 24, 100, 200, 239, 260]:
+        for minutes in [0, 30]:
+            current_time = START + td(hours=hours, minutes=minutes)
+            assert source.window(current_time, trailing_hours, forward_hours) == \
+                mask_window(price_file, current_time, trailing_hours, forward_hours)
+
+
+def test_unsorted_file(tmpdir):
+    path = str(tmpdir.join("prices.csv"))
+    order = np.random.RandomState(0).permutation(72)
+    write_prices(path, 72, order=order)
+    source = PriceSource(path, chunksize=10)
+    source.load()
+    assert source.index.is_monotonic_increasing
+    current_time = START + td(hours=48)
+    assert source.window(current_time, 24, 12) == mask_window(path, current_time, 24, 12)
+
+
+def set_mtime(path, seconds):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + seconds))
+
+
+def test_reload_after_file_change(price_file):
+    source = PriceSource(price_file)
+    source.load()
+    current_time = START + td(hours=30)
+    assert not source.reload_if_changed()
+    before = source.window(current_time)[0]
+
+    write_prices(price_file, 24 * 10, offset=0.5)
+    set_mtime(price_file, 10)
+    assert source.reload_if_changed()
+    after = source.window(current_time)[0]
+    assert after == pytest.approx([x + 0.5 for x in before])
+    assert after == mask_window(price_file, current_time)[0]
+    assert not source.reload_if_changed()
+
+
+def test_cache_is_invalidated_by_file_change(price_file, tmpdir):
+    cache_file = str(tmpdir.join("cache", "prices"))
+    os.makedirs(os.path.dirname(cache_file))
+    current_time = START + td(hours=100)
+
+    PriceSource(price_file, cache_file=cache_file).load()
+    cached = PriceSource(price_file, cache_file=cache_file)
+    cached.load()
+    # An unchanged csv is memory-mapped from the cache
+    assert isinstance(cached.prices, np.memmap)
+    assert cached.window(current_time, 24, 24) == mask_window(price_file, current_time, 24, 24)
+
+    write_prices(price_file, 24 * 5, offset=0.1)
+    set_mtime(price_file, 10)
+    assert cached.reload_if_changed()
+    assert not isinstance(cached.prices, np.memmap)
+    assert len(cached) == 120
+    assert cached.window(current_time, 24, 24) == mask_window(price_file, current_time, 24, 24)
+
+    # The cache was rewritten for the new csv
+    reloaded = PriceSource(price_file, cache_file=cache_file)
+    reloaded.load()
+    assert isinstance(reloaded.prices, np.memmap)
+    assert len(reloaded) == 120
+
+
+def test_missing_file_keeps_prices(price_file):
+    source = PriceSource(price_file)
+    source.load()
+    os.remove(price_file)
+    assert not source.reload_if_changed()
+    assert len(source) == 240
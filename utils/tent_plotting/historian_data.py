@@ -0,0 +1,159 @@
+###  Single-pass data access for the VOLTTRON sqlite historian  ####
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+# sqlite limits the number of bound parameters per statement
+MAX_PARAMETERS = 900
+
+
+def parse_json_column(values):
+    """
+    Parse a column of JSON strings into a DataFrame with one column per
+    top level key, using pandas' vectorized normalizer instead of a
+    row-wise apply(pd.Series).
+    :param values: Series of JSON strings.
+    :return: DataFrame indexed like values.
+    """
+    parsed = [json.loads(value) if isinstance(value, str) else value for value in values]
+    return pd.json_normalize(parsed, max_level=0).set_index(values.index)
+
+
+def last_valid(records):
+    """
+    Combine a column of dicts (or lists) into one Series holding, for each
+    key, the value from the last record that contains it.
+    :param records: Series of dicts or lists.
+    :return: Series indexed by key.
+    """
+    frame = pd.DataFrame(records.tolist())
+    if frame.empty:
+        return pd.Series(dtype=object)
+    return frame.ffill().iloc[-1]
+
+
+class HistorianData(object):
+    """
+    Loads historian topics in bulk.
+
+    All requested topic ids are resolved with one query on the topics
+    table and all series are read with one query on the data table,
+    optionally bounded by start and end (strings comparable to the
+    historian ts column, e.g. "2020-08-01 00:00:00").  Results are cached
+    as Parquet files in cache_dir when a Parquet engine is installed; the
+    cache is ignored once the database file is newer than the cache file.
+    """
+    def __init__(self, db, start=None, end=None, cache_dir=None):
+        self.db = db
+        self.start = start
+        self.end = end
+        self.cache_dir = cache_dir
+        self.topic_id_map = {}
+
+    def topic_ids(self, topic_names):
+        """
+        Resolve topic names to topic ids.
+        :param topic_names: iterable of topic names.
+        :return: dict of topic name -> topic id for the topics that exist.
+        """
+        missing = [name for name in dict.fromkeys(topic_names) if name not in self.topic_id_map]
+        for i in range(0, len(missing), MAX_PARAMETERS):
+            names = missing[i:i + MAX_PARAMETERS]
+            query = "SELECT topic_id, topic_name FROM topics WHERE topic_name IN ({})".format(
+                ",".join("?" * len(names)))
+            topics = pd.read_sql_query(query, self.db, params=names)
+            self.topic_id_map.update(zip(topics['topic_name'], topics['topic_id']))
+        return {name: self.topic_id_map[name] for name in topic_names if name in self.topic_id_map}
+
+    def load_series(self, topic_names):
+        """
+        Read the data of all topics in one query.
+        :param topic_names: iterable of topic names.
+        :return: long DataFrame with columns ts, topic_name and value_string.
+        """
+        topic_names = list(dict.fromkeys(topic_names))
+        cached = self._read_cache(topic_names)
+        if cached is not None:
+            return cached
+        ids = self.topic_ids(topic_names)
+        names = {topic_id: name for name, topic_id in ids.items()}
+        id_list = list(names)
+        bounds = ""
+        bound_params = []
+        if self.start is not None:
+            bounds += " AND ts >= ?"
+            bound_params.append(self.start)
+        if self.end is not None:
+            bounds += " AND ts <= ?"
+            bound_params.append(self.end)
+        frames = []
+        step = MAX_PARAMETERS - len(bound_params)
+        for i in range(0, len(id_list), step):
+            chunk = id_list[i:i + step]
+            query = "SELECT ts, topic_id, value_string FROM data WHERE topic_id IN ({}){} ORDER BY ts".format(
+                ",".join("?" * len(chunk)), bounds)
+            frames.append(pd.read_sql_query(query, self.db, params=chunk + bound_params))
+        if frames:
+            data = pd.concat(frames, ignore_index=True)
+        else:
+            data = pd.DataFrame(columns=['ts', 'topic_id', 'value_string'])
+        data['topic_name'] = data['topic_id'].map(names)
+        data = data[['ts', 'topic_name', 'value_string']]
+        self._write_cache(topic_names, data)
+        return data
+
+    def load_numeric(self, topic_names):
+        """
+        Read all topics in one query and pivot them once into a wide frame.
+        :param topic_names: iterable of topic names.
+        :return: DataFrame indexed by ts (datetime) with one numeric column per topic.
+        """
+        topic_names = list(dict.fromkeys(topic_names))
+        data = self.load_series(topic_names)
+        data = data.drop_duplicates(subset=['ts', 'topic_name'], keep='last')
+        wide = data.pivot(index='ts', columns='topic_name', values='value_string')
+        wide = wide.apply(pd.to_numeric, errors='coerce')
+        wide.index = pd.to_datetime(wide.index)
+        wide = wide.sort_index()
+        wide.columns.name = None
+        return wide.reindex(columns=topic_names)
+
+    def _cache_path(self, topic_names):
+        if self.cache_dir is None:
+            return None
+        key = json.dumps([self._db_file(), sorted(topic_names), self.start, self.end])
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".parquet")
+
+    def _db_file(self):
+        try:
+            for _, name, path in self.db.execute("PRAGMA database_list").fetchall():
+                if name == "main":
+                    return path
+        except Exception:
+            pass
+        return ""
+
+    def _read_cache(self, topic_names):
+        path = self._cache_path(topic_names)
+        if path is None or not os.path.exists(path):
+            return None
+        db_file = self._db_file()
+        if db_file and os.path.exists(db_file) and os.path.getmtime(db_file) > os.path.getmtime(path):
+            return None
+        try:
+            return pd.read_parquet(path)
+        except (ImportError, ValueError, OSError) as ex:
+            print("Ignoring cache {}: {}".format(path, ex))
+            return None
+
+    def _write_cache(self, topic_names, data):
+        path = self._cache_path(topic_names)
+        if path is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            data.to_parquet(path, index=False)
+        except (ImportError, ValueError, OSError) as ex:
+            print("Could not write cache {}: {}".format(path, ex))
@@ -10,22 +10,14 @@ import sys
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 import plotly.express as px
+from historian_data import HistorianData, parse_json_column, last_valid
 pd.set_option('display.max_colwidth', None)
 pandas.set_option('display.max_rows', 1000)
 
 
 
-query_template = "SELECT ts, value_string FROM data " \
-                 "INNER JOIN topics ON data.topic_id = topics.topic_id " \
-                 "WHERE topics.topic_name = \"{campus}/{bldg}/{device}/{point}\""
-
-
-def gen_query(campus, bldg, device, point):
-    return query_template \
-        .replace("{campus}", campus) \
-        .replace("{bldg}", bldg) \
-        .replace("{device}", device) \
-        .replace("{point}", point)
+def gen_topic(campus, bldg, device, point):
+    return "{}/{}/{}/{}".format(campus, bldg, device, point)
 
 
 timestring = '%Y-%m-%dT%H:%M:%S'
@@ -33,40 +25,40 @@ timestring2 = '%Y%m%dT%H%M%S'
 
 
 class TENT_data(object):
-    def __init__(self, db_building, db_campus, db_city, building_list, baseline_building):
+    def __init__(self, db_building, db_campus, db_city, building_list, baseline_building, historian=None):
 
         self.local_tz = pytz.timezone('UTC')
         self.df_power = {}
         self.device_data = {}
         self.building_df = {}
+        self.historian = historian if historian is not None else HistorianData(db_building)
         bldg_list = list(building_list)
         if baseline_building is not None and baseline_building in bldg_list:
             bldg_list.remove(baseline_building)
-        for building in bldg_list:
-            df = self.transactive_record(db_building, building)
+        topics = {"tns/{}/market_balanced_prices".format(building): building for building in bldg_list}
+        try:
+            records = self.historian.load_series(list(topics))
+        except Exception as ex:
+            print(ex)
+            return
+        for topic, building_records in records.groupby('topic_name', sort=False):
+            df = self.transactive_record(building_records)
             if df is not None:
-                self.building_df[building] = df
+                self.building_df[topics[topic]] = df
 
-    def transactive_record(self, db, building):
+    def transactive_record(self, records):
         try:
             df = pd.DataFrame()
-            query = "SELECT ts, value_string FROM data " \
-                    "INNER JOIN topics ON data.topic_id = topics.topic_id " \
-                    "WHERE topics.topic_name = \"tns/{}/market_balanced_prices\""
-
-            records = pd.read_sql_query(query.format(building), db)
-
-            records = records.join(records['value_string'].apply(json.loads).apply(pd.Series)).dropna()
+            records = records.reset_index(drop=True)
+            records = records.join(parse_json_column(records['value_string'])).dropna()
 
             records = records[records.tnt_market_name.str.contains("Real-Time")]
 
-            record = records['balanced_prices'].apply(pd.Series).T
-            record = record.stack().groupby(level=0).last().reindex(record.index)
+            record = last_valid(records['balanced_prices'])
             df.index = record.index
             df['prices'] = record.values
 
-            record = records['schedule_powers'].apply(pd.Series).T
-            record = record.stack().groupby(level=0).last().reindex(record.index)
+            record = last_valid(records['schedule_powers']).reindex(df.index)
             df['campus_power'] = record.apply(lambda x: x.get('PNNL_Campus'))
             df['model'] = record.apply(lambda x: x.get('ModelFrame'))
             df.index = pd.to_datetime(df.index)
@@ -78,9 +70,11 @@ class TENT_data(object):
 
 class TCC_data(object):
 
-    def __init__(self, db, device_point_dict=None, csv=False):
+    def __init__(self, db, device_point_dict=None, csv=False, historian=None):
 
         self.database = db
+        self.historian = historian if historian is not None else HistorianData(db)
+        self.data = pd.DataFrame()
         self.start_time = None
         self.end_time = None
         self.local_tz = pytz.timezone('UTC')
@@ -107,10 +101,9 @@ class TCC_data(object):
                     "WHERE topics.topic_name = \"record/target_agent\""
 
             target = pd.read_sql_query(query, self.database)
-            target = target.join(target['value_string'].apply(json.loads).apply(pd.Series))
-            df['target'] = target[0].apply(lambda x: x.get('value').get('target'))
-            df['ts'] = target[0].apply(lambda x: x.get('value').get('start'))
-            df['ts'] = pd.to_datetime(df['ts'])
+            target = pd.json_normalize([json.loads(value)[0] for value in target['value_string']])
+            df['target'] = target['value.target']
+            df['ts'] = pd.to_datetime(target['value.start'])
             self.ilc_df = df
         except:
             self.ilc_df = None
@@ -132,18 +125,36 @@ class TCC_data(object):
 
     """ 
 
+    Loads all given topics with one query and pivots them once; the get_* methods below slice this frame
+    and only query the historian for topics that were not prefetched.
+
+    """
+    def prefetch(self, topic_names):
+        missing = [topic for topic in topic_names if topic not in self.data.columns]
+        if not missing:
+            return
+        data = self.historian.load_numeric(missing)
+        if self.data.empty:
+            self.data = data
+        else:
+            self.data = self.data.join(data, how='outer')
+
+    def get_topics(self, topic_names):
+        self.prefetch(topic_names)
+        return self.data[topic_names].dropna(how='all')
+
+    """ 
+
     This function generateS a Dataframe that contains system level operation info, including the whole building power consumption,
 
     demand limit threshold, and system loss.
 
     """
     def get_power_data(self, campus, building_topic, device, point):
-        query = gen_query(campus, building_topic, device, point)
-        power = pd.read_sql_query(query, self.database)
-        power.rename(columns={'value_string': point}, inplace=True)
-        power[point] = pd.to_numeric(power[point], errors='coerce')
+        topic = gen_topic(campus, building_topic, device, point)
+        power = self.get_topics([topic]).rename(columns={topic: point})
         power[point] = power[point] / 1000
-        power['ts'] = pd.to_datetime(power['ts'])
+        power = power.rename_axis('ts').reset_index()
         try:
             power['ts'] = power['ts'].dt.tz_localize(self.local_tz)
         except TypeError:
@@ -151,31 +162,18 @@ class TCC_data(object):
         return power
 
     def get_zone_data(self, device_type, campus, building, device):
-        device_data = None
-        for point in self.device_point_dict[device_type]:
-            control_query = gen_query(campus, building, device, point)
-            df = pd.read_sql_query(control_query, self.database)
-            df.rename(columns={'value_string': point}, inplace=True)
-            df[point] = pd.to_numeric(df[point], errors='coerce')
-            df[point] = df[point]
-            df['ts'] = pd.to_datetime(df['ts'])
-            if device_data is None:
-                device_data = df.set_index('ts')
-            else:
-                device_data = device_data.join(df.set_index('ts'))
-        return device_data
+        points = list(self.device_point_dict[device_type])
+        topics = [gen_topic(campus, building, device, point) for point in points]
+        self.prefetch(topics)
+        # Left join on the first point, as the per-point queries did
+        device_data = self.data.loc[self.data[topics[0]].notna(), topics]
+        device_data.columns = points
+        return device_data.rename_axis('ts')
 
     def get_df(self, topic, point):
-        query = "SELECT ts, value_string FROM data " \
-               "INNER JOIN topics ON data.topic_id = topics.topic_id " \
-               "WHERE topics.topic_name = \"{}/{}\""
-        query = query.format(topic, point)
-        df = pd.read_sql_query(query, self.database)
-        df.rename(columns={'value_string': point}, inplace=True)
-        df[point] = pd.to_numeric(df[point], errors='coerce')
-        df[point] = df[point]
-        df['ts'] = pd.to_datetime(df['ts'])
-        return df
+        topic_name = "{}/{}".format(topic, point)
+        df = self.get_topics([topic_name]).rename(columns={topic_name: point})
+        return df.rename_axis('ts').reset_index()
 
 
 class Main(object):
@@ -196,6 +194,10 @@ class Main(object):
         self.device_list = {}
         building_db_file = config.get("building_db", 'small_office.historian.sqlite')
         db_building = sqlite3.connect(building_db_file)
+        historian = HistorianData(db_building,
+                                  start=config.get("start_time"),
+                                  end=config.get("end_time"),
+                                  cache_dir=config.get("cache_dir"))
         campus_db_file = config.get("campus_db", None)
         if campus_db_file is not None:
             db_campus = sqlite3.connect(campus_db_file)
@@ -206,7 +208,8 @@ class Main(object):
             db_city = sqlite3.connect(city_db_file)
         else:
             db_city = None
-        self.tent_data = TENT_data(db_building, db_campus, db_city, self.building_topic_list, baseline_building)
+        self.tent_data = TENT_data(db_building, db_campus, db_city, self.building_topic_list, baseline_building,
+                                   historian=historian)
         devices = config.get("devices", {})
         for device_type, device_config in devices.items():
             self.device_list[device_type] = device_config.get("device_list", [])
@@ -214,7 +217,8 @@ class Main(object):
             self.x1[device_type] = ""
             self.x2[device_type] = ""
             self.create_device_units(device_type)
-        self.tcc_data = TCC_data(db_building, device_point_dict=self.device_data_dict)
+        self.tcc_data = TCC_data(db_building, device_point_dict=self.device_data_dict, historian=historian)
+        self.tcc_data.prefetch(self.plot_topics())
         self.power = {}
         self.build_power_df()
         self.additional_topic = self.tcc_data.get_df("PNNL/SMALL_OFFICE_VANILLA/HP1", "OutdoorAirTemperature")
@@ -229,6 +233,16 @@ class Main(object):
             self.specs = [[{"secondary_y": True}]]
 
 
+    def plot_topics(self):
+        topics = [gen_topic(self.campus, bldg, self.power_meter, self.power_point) for bldg in self.building_topic_list]
+        for device_type, device_ids in self.device_list.items():
+            for device_id in device_ids:
+                for building in self.building_topic_list:
+                    for point in self.device_data_dict[device_type]:
+                        topics.append(gen_topic(self.campus, building, device_id, point))
+        topics.append("PNNL/SMALL_OFFICE_VANILLA/HP1/OutdoorAirTemperature")
+        return topics
+
     def create_device_units(self, device_type):
         x1 = set()
         x2 = set()